@@ -235,3 +235,9 @@ WHERE COALESCE(l.titulo, r.titulo, d.titulo, a.titulo) IS NOT NULL;
 -- Cria um índice GIN para acelerar buscas textuais por título
 CREATE INDEX idx_mv_titulos_titulo ON mv_titulos_completos USING gin (to_tsvector('portuguese', titulo));
 CREATE INDEX idx_mv_titulos_titulo_en ON mv_titulos_completos USING gin (to_tsvector('english', titulo));
+
+
+
+-- Alterações posteriores ao esquema base (modelo de leitura EmprestimoAberto,
+-- índices parciais, etc.) ficam em app/db/migrations e são aplicadas com:
+--   python migrate.py
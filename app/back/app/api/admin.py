@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, List
+from datetime import datetime
+from app.core.admin import exigir_admin
+from app.core import perfilador
+from app.db import consultas_lentas
+import anyio
+import asyncio
+import threading
+
+router = APIRouter(dependencies=[Depends(exigir_admin)])
+
+@router.get("/consultas-lentas", response_model=List[Dict[str, Any]])
+def get_consultas_lentas(
+    limite: int = Query(50, ge=1, le=1000, description="Quantidade de registros, mais recentes primeiro")
+):
+    """Consultas acima de SLOW_QUERY_MS: SQL, parâmetros redigidos, duração, chamador e plano (quando amostrado)"""
+    if consultas_lentas.gravador is None:
+        raise HTTPException(status_code=404, detail="Registro de consultas lentas desligado")
+    return consultas_lentas.gravador.recentes(limite)
+
+@router.get("/perfil", response_class=PlainTextResponse)
+async def get_perfil(
+    duracao: float = Query(10, gt=0, le=60, description="Segundos de amostragem"),
+    modo: str = Query("threads", pattern="^(threads|tarefas)$", description="threads: pilhas de cada thread; tarefas: cadeia de awaits de cada tarefa asyncio"),
+    intervalo_ms: float = Query(10, ge=1, le=1000, description="Intervalo entre amostras"),
+    incluir_ociosos: bool = Query(False, description="Manter threads esperando trabalho e o loop parado em select")
+):
+    """Perfil por amostragem deste worker, em pilhas colapsadas (flamegraph.pl, speedscope)"""
+    # A amostragem roda numa thread do pool; o loop segue atendendo enquanto isso
+    loop, thread_loop = asyncio.get_running_loop(), threading.get_ident()
+    try:
+        texto, amostras = await anyio.to_thread.run_sync(
+            lambda: perfilador.perfilar(
+                duracao, modo, intervalo_ms / 1000, incluir_ociosos, loop=loop, thread_loop=thread_loop
+            )
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    nome = f"perfil-{modo}-{datetime.now():%Y%m%d-%H%M%S}.folded"
+    return PlainTextResponse(texto, headers={
+        "Content-Disposition": f'attachment; filename="{nome}"',
+        "X-Profile-Samples": str(amostras),
+        "Cache-Control": "no-store",
+    })
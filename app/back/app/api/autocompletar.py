@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Query
+from typing import List
+from app.core.config import settings
+from app.schemas.schemas import Sugestao, TipoSugestao
+from app.services.autocompletar_service import autocompletar_service
+from app.core.serializacao import resposta_rapida
+
+router = APIRouter()
+
+# Sem barra final: o cliente chama /autocomplete?q=... a cada tecla, sem redirecionamento
+@router.get("", response_model=List[Sugestao])
+def autocomplete(
+    q: str = Query(..., description="Texto digitado até agora"),
+    tipo: TipoSugestao = Query(TipoSugestao.titulo, description="Sugerir títulos ou autores"),
+    limite: int = Query(settings.AUTOCOMPLETE_MAX_RESULTS, ge=1, le=settings.AUTOCOMPLETE_MAX_RESULTS, description="Máximo de sugestões")
+):
+    """Sugestões por prefixo (mais emprestados primeiro), completadas por similaridade de trigramas"""
+    q = q.strip()
+    if len(q) < settings.AUTOCOMPLETE_MIN_LENGTH:
+        # Curto demais para sugerir: lista vazia, sem tocar em índice nem banco
+        return resposta_rapida(List[Sugestao], [])
+    return resposta_rapida(List[Sugestao], autocompletar_service.sugerir(q, tipo.value, limite))
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from datetime import date
 from app.schemas.schemas import Emprestimo, EmprestimoCreate, EmprestimoCompleto, RelatorioEmprestimos
 from app.services.emprestimo_service import emprestimo_service
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida
 
 router = APIRouter()
 
@@ -22,10 +23,11 @@ def get_emprestimo(id_emprestimo: int):
 @router.get("/", response_model=List[Emprestimo])
 def get_emprestimos(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Listar empréstimos com paginação"""
-    return emprestimo_service.get_emprestimos(skip=skip, limit=limit)
+    return resposta_rapida(List[Emprestimo], emprestimo_service.get_emprestimos(skip=skip, limit=limit, validar=False), formato=formato)
 
 @router.patch("/{id_emprestimo}/devolver", response_model=Emprestimo)
 def devolver_item(
@@ -38,18 +40,20 @@ def devolver_item(
 @router.get("/em-andamento/", response_model=List[EmprestimoCompleto])
 def get_emprestimos_em_andamento(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Listar empréstimos em andamento com informações completas"""
-    return emprestimo_service.get_emprestimos_em_andamento(skip, limit)
+    return resposta_rapida(List[EmprestimoCompleto], emprestimo_service.get_emprestimos_em_andamento(skip, limit, validar=False), formato=formato)
 
 @router.get("/vencidos/", response_model=List[EmprestimoCompleto])
 def get_emprestimos_vencidos(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Listar empréstimos vencidos"""
-    return emprestimo_service.get_emprestimos_vencidos(skip, limit)
+    return resposta_rapida(List[EmprestimoCompleto], emprestimo_service.get_emprestimos_vencidos(skip, limit, validar=False), formato=formato)
 
 @router.get("/relatorio/", response_model=RelatorioEmprestimos)
 def get_relatorio_emprestimos():
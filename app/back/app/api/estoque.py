@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
-from app.schemas.schemas import Estoque, EstoqueCreate, EstoqueUpdate, DisponibilidadeItem, TituloSearch
+from app.schemas.schemas import Estoque, EstoqueCreate, EstoqueUpdate, DisponibilidadeItem, DisponibilidadeBiblioteca, TituloRanqueado, ModoBusca
 from app.services.estoque_service import estoque_service
+from app.core.cache_busca import cache_busca
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida
 
 router = APIRouter()
 
@@ -21,19 +23,21 @@ def get_estoque(id_estoque: int):
 @router.get("/", response_model=List[Estoque])
 def get_estoques(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Listar itens do estoque com paginação"""
-    return estoque_service.get_estoques(skip=skip, limit=limit)
+    return resposta_rapida(List[Estoque], estoque_service.get_estoques(skip=skip, limit=limit, validar=False), formato=formato)
 
 @router.get("/biblioteca/{id_biblioteca}", response_model=List[Estoque])
 def get_estoque_por_biblioteca(
     id_biblioteca: int,
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Listar estoque de uma biblioteca específica"""
-    return estoque_service.get_estoque_por_biblioteca(id_biblioteca, skip, limit)
+    return resposta_rapida(List[Estoque], estoque_service.get_estoque_por_biblioteca(id_biblioteca, skip, limit, validar=False), formato=formato)
 
 @router.get("/disponibilidade/{id_titulo}", response_model=DisponibilidadeItem)
 def get_disponibilidade_item(id_titulo: int):
@@ -43,6 +47,18 @@ def get_disponibilidade_item(id_titulo: int):
         raise HTTPException(status_code=404, detail="Título não encontrado")
     return disponibilidade
 
+@router.get("/disponibilidade/{id_titulo}/bibliotecas", response_model=List[DisponibilidadeBiblioteca])
+def get_exemplares_livres(
+    id_titulo: int,
+    preferencia: List[int] = Query([], description="Bibliotecas preferidas, em ordem (repita o parâmetro)"),
+    livres: int = Query(5, ge=0, le=100, description="Máximo de id_estoque livres devolvidos por biblioteca")
+):
+    """Exemplares livres de um título em cada biblioteca, preferidas primeiro"""
+    bibliotecas = estoque_service.exemplares_livres(id_titulo, preferencia, livres)
+    if bibliotecas is None:
+        raise HTTPException(status_code=404, detail="Título não encontrado")
+    return bibliotecas
+
 @router.put("/{id_estoque}", response_model=Estoque)
 def update_estoque(id_estoque: int, estoque: EstoqueUpdate):
     """Atualizar item do estoque"""
@@ -59,14 +75,21 @@ def delete_estoque(id_estoque: int):
     return {"message": "Item removido do estoque com sucesso"}
 
 
-@router.get("/pesquisar/titulo", response_model=List[TituloSearch])
+@router.get("/pesquisar/titulo", response_model=List[TituloRanqueado])
 def search_from_title(
-    title: Optional[str] = Query(None, description="Título do item a ser pesquisado")
+    title: Optional[str] = Query(None, description="Título do item a ser pesquisado"),
+    modo: ModoBusca = Query(ModoBusca.contem, description="contem: ILIKE sem ordem; relevancia: full-text ranqueado, com fallback por trigrama"),
+    k: Optional[int] = Query(None, ge=1, le=200, description="Máximo de resultados (padrão: 200 em contem, SEARCH_TOP_K em relevancia)")
 ):
     """Buscar itens do estoque a partir do título"""
     if not title:
         raise HTTPException(status_code=400, detail="Título é obrigatório para busca")
-    return estoque_service.search_from_title(title)
+    # O modo relevancia usa stemmers que distinguem acentos: a chave só ignora caixa e espaços
+    return cache_busca.buscar(
+        "estoque_titulo", title, {"modo": modo.value, "k": k},
+        lambda: estoque_service.search_from_title(title, modo, k),
+        preservar_acentos=modo == ModoBusca.relevancia,
+    )
 
 
 @router.get("/pesquisar/estoque", response_model=List[Estoque])
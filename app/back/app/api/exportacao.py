@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Query
+from app.schemas.schemas import FormatoExportacao
+from app.services.exportacao_service import exportacao_service
+
+router = APIRouter()
+
+# Endpoints assíncronos: o corpo é transmitido em blocos lidos de um cursor no
+# servidor, e uma desconexão do cliente cancela a consulta em andamento
+
+@router.get("/emprestimos-vencidos")
+async def exportar_emprestimos_vencidos(
+    formato: FormatoExportacao = Query(FormatoExportacao.ndjson, description="ndjson ou csv"),
+    gzip: bool = Query(False, description="Compactar a resposta com gzip")
+):
+    """Exportar todos os empréstimos vencidos"""
+    return exportacao_service.exportar_emprestimos_vencidos(formato, gzip)
+
+@router.get("/bibliotecas/{id_biblioteca}/estoque")
+async def exportar_estoque_biblioteca(
+    id_biblioteca: int,
+    formato: FormatoExportacao = Query(FormatoExportacao.ndjson, description="ndjson ou csv"),
+    gzip: bool = Query(False, description="Compactar a resposta com gzip")
+):
+    """Exportar todo o estoque de uma biblioteca"""
+    return exportacao_service.exportar_estoque_biblioteca(id_biblioteca, formato, gzip)
+
+@router.get("/usuarios/emprestimos-ativos")
+async def exportar_usuarios_com_emprestimos_ativos(
+    formato: FormatoExportacao = Query(FormatoExportacao.ndjson, description="ndjson ou csv"),
+    gzip: bool = Query(False, description="Compactar a resposta com gzip")
+):
+    """Exportar todos os usuários com empréstimos em aberto"""
+    return exportacao_service.exportar_usuarios_com_emprestimos_ativos(formato, gzip)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List
 from app.schemas.schemas import Livro, LivroCreate, LivroUpdate
 from app.services.livro_service import livro_service
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida
 
 router = APIRouter()
 
@@ -11,17 +12,18 @@ def create_livro(livro: LivroCreate):
 
 @router.get("/{id_livro}", response_model=Livro)
 def get_livro(id_livro: int):
-    livro = livro_service.get_livro(id_livro)
+    livro = livro_service.get_livro(id_livro, validar=False)
     if not livro:
         raise HTTPException(status_code=404, detail="Livro não encontrado")
-    return livro
+    return resposta_rapida(Livro, livro)
 
 @router.get("/", response_model=List[Livro])
 def get_livros(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
-    return livro_service.get_livros(skip=skip, limit=limit)
+    return resposta_rapida(List[Livro], livro_service.get_livros(skip=skip, limit=limit, validar=False), formato=formato)
 
 @router.get("/search/", response_model=List[Livro])
 def search_livros(q: str = Query(..., min_length=1, description="Termo de busca")):
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from datetime import date, timedelta
+from app.schemas.schemas import (
+    MidiaTipo, EmprestimosPorBiblioteca, UsuarioPenalizado, DuracaoEmprestimos,
+    AutorEmprestado, SituacaoRelatorios
+)
+from app.services.relatorio_service import relatorio_service
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida
+
+router = APIRouter()
+
+def _um_ano_atras() -> date:
+    return date.today() - timedelta(days=365)
+
+@router.get("/situacao", response_model=SituacaoRelatorios)
+def get_situacao():
+    """Último dia já agregado nas tabelas de relatório"""
+    return relatorio_service.get_situacao()
+
+@router.get("/emprestimos-por-biblioteca", response_model=List[EmprestimosPorBiblioteca])
+def get_emprestimos_por_biblioteca(
+    desde: Optional[date] = Query(None, description="Data inicial (padrão: um ano atrás)"),
+    ate: Optional[date] = Query(None, description="Data final (padrão: hoje)"),
+    tipo_midia: Optional[MidiaTipo] = Query(None, description="Filtrar por tipo de mídia"),
+    formato: FormatoResposta = Depends(formato_resposta)
+):
+    """Total de empréstimos por biblioteca no período"""
+    return resposta_rapida(List[EmprestimosPorBiblioteca], relatorio_service.get_emprestimos_por_biblioteca(
+        desde or _um_ano_atras(), ate or date.today(), tipo_midia.value if tipo_midia else None
+    ), formato=formato)
+
+@router.get("/usuarios-penalizados", response_model=List[UsuarioPenalizado])
+def get_usuarios_penalizados(
+    acima_de: int = Query(3, ge=0, description="Listar usuários com mais penalizações que isso"),
+    skip: int = Query(0, ge=0, description="Número de registros para pular"),
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
+):
+    """Usuários com mais de N penalizações"""
+    return resposta_rapida(List[UsuarioPenalizado], relatorio_service.get_usuarios_penalizados(acima_de, skip, limit), formato=formato)
+
+@router.get("/duracao-emprestimos", response_model=List[DuracaoEmprestimos])
+def get_duracao_emprestimos(
+    desde: Optional[date] = Query(None, description="Devoluções a partir de (padrão: um ano atrás)"),
+    ate: Optional[date] = Query(None, description="Devoluções até (padrão: hoje)")
+):
+    """Duração média e histograma de duração dos empréstimos por tipo de mídia"""
+    return relatorio_service.get_duracao_emprestimos(desde or _um_ano_atras(), ate or date.today())
+
+@router.get("/autores-emprestados", response_model=List[AutorEmprestado])
+def get_autores_emprestados(
+    desde: Optional[date] = Query(None, description="Empréstimos a partir de (padrão: um ano atrás)"),
+    skip: int = Query(0, ge=0, description="Número de registros para pular"),
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
+):
+    """Autores emprestados desde uma data, por tipo de mídia"""
+    return resposta_rapida(List[AutorEmprestado], relatorio_service.get_autores_emprestados(desde or _um_ano_atras(), skip, limit), formato=formato)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from app.schemas.schemas import Usuario, UsuarioCreate, UsuarioUpdate
 from app.services.usuario_service import usuario_service
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida
 
 router = APIRouter()
 
@@ -21,10 +22,11 @@ def get_usuario(id_usuario: int):
 @router.get("/", response_model=List[Usuario])
 def get_usuarios(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Listar usuários com paginação"""
-    return usuario_service.get_usuarios(skip=skip, limit=limit)
+    return resposta_rapida(List[Usuario], usuario_service.get_usuarios(skip=skip, limit=limit, validar=False), formato=formato)
 
 @router.put("/{id_usuario}", response_model=Usuario)
 def update_usuario(id_usuario: int, usuario: UsuarioUpdate):
@@ -44,10 +46,11 @@ def delete_usuario(id_usuario: int):
 @router.get("/emprestimos/ativos", response_model=List[Usuario])
 def get_usuarios_com_emprestimos_ativos(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
-    limit: int = Query(100, ge=1, le=1000, description="Limite de registros")
+    limit: int = Query(100, ge=1, le=1000, description="Limite de registros"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Listar usuários com empréstimos em andamento"""
-    return usuario_service.get_usuarios_com_emprestimos_em_andamento(skip, limit)
+    return resposta_rapida(List[Usuario], usuario_service.get_usuarios_com_emprestimos_em_andamento(skip, limit, validar=False), formato=formato)
 
 @router.get("/pesquisar/usuarios", response_model=List[Usuario])
 def search_usuarios(
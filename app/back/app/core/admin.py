@@ -0,0 +1,19 @@
+"""
+Guard for the operational endpoints under /api/v1/admin.
+
+They stay hidden (404) until ``ADMIN_TOKEN`` is configured; after that every
+request must carry the token in ``X-Admin-Token``.
+"""
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.core.config import settings
+
+
+def exigir_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
@@ -0,0 +1,70 @@
+"""
+In-memory prefix index for the autocomplete endpoint.
+
+Holds a bounded set of suggestions (the most-borrowed titles and authors),
+each with a weight. Every suggestion is keyed by each of its word-boundary
+suffixes, normalized with app.core.texto: "A Guerra dos Tronos" answers
+"gue", "guerra d" and "tro". Keys live in one sorted list, so a prefix is a
+``bisect`` range; for the shortest prefixes (where the range is largest) the
+top suggestions are precomputed when the index is built.
+
+The index is immutable: a refresh builds a new one and swaps the reference,
+so readers never lock.
+"""
+import heapq
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.texto import normalizar, palavras
+
+
+class Sugestao(NamedTuple):
+    tipo: str
+    id: int
+    texto: str
+    peso: int
+    tipo_midia: Optional[str] = None
+
+
+class IndicePrefixos:
+    def __init__(self, sugestoes: Sequence[Sugestao], maximo: int = 50, pre_calculado: int = 3):
+        self.sugestoes = list(sugestoes)
+        self.maximo = maximo
+        self.pre_calculado = pre_calculado
+        chaves: List[Tuple[str, int]] = []
+        for posicao, sugestao in enumerate(self.sugestoes):
+            termos = palavras(sugestao.texto)
+            for inicio in range(len(termos)):
+                chaves.append((" ".join(termos[inicio:]), posicao))
+        chaves.sort()
+        self._chaves = [chave for chave, _ in chaves]
+        self._posicoes = [posicao for _, posicao in chaves]
+        self._topo: Dict[str, List[int]] = self._calcular_topo()
+
+    def _calcular_topo(self) -> Dict[str, List[int]]:
+        candidatos: Dict[str, set] = {}
+        for chave, posicao in zip(self._chaves, self._posicoes):
+            for tamanho in range(1, min(self.pre_calculado, len(chave)) + 1):
+                candidatos.setdefault(chave[:tamanho], set()).add(posicao)
+        return {prefixo: self._melhores(posicoes, self.maximo) for prefixo, posicoes in candidatos.items()}
+
+    def _melhores(self, posicoes, limite: int) -> List[int]:
+        return heapq.nlargest(limite, posicoes, key=lambda posicao: (self.sugestoes[posicao].peso, -posicao))
+
+    def buscar(self, consulta: str, limite: int = 10) -> List[Sugestao]:
+        """Suggestions with a word starting with ``consulta``, heaviest first"""
+        prefixo = normalizar(consulta)
+        if not prefixo:
+            return []
+        if len(prefixo) <= self.pre_calculado and limite <= self.maximo:
+            return [self.sugestoes[posicao] for posicao in self._topo.get(prefixo, ())[:limite]]
+        inicio = bisect_left(self._chaves, prefixo)
+        posicoes = set()
+        for indice in range(inicio, len(self._chaves)):
+            if not self._chaves[indice].startswith(prefixo):
+                break
+            posicoes.add(self._posicoes[indice])
+        return [self.sugestoes[posicao] for posicao in self._melhores(posicoes, limite)]
+
+    def __len__(self) -> int:
+        return len(self.sugestoes)
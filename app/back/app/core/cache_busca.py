@@ -0,0 +1,129 @@
+"""
+Result cache for the search endpoints.
+
+Search traffic repeats itself (the same trending titles, the same author
+names), so each endpoint keeps its recent answers in a :class:`CacheBusca`:
+
+* the key is the endpoint, the search term as the database compares it (folded
+  with :func:`app.core.texto.normalizar`, so "Coração" and " coracao " share an
+  entry) and the remaining parameters (filters, page, size);
+* entries live ``ttl`` seconds, which bounds how stale availability-dependent
+  answers (the ``disponivel`` filter and facet) can get;
+* the cache holds at most ``capacidade`` entries, least recently used first out;
+* media writes call :meth:`CacheBusca.invalidar` (through
+  ``IndiceBuscaService.reindexar``, after the commit), which drops every entry and
+  bumps the catalog generation; an answer computed while the generation
+  changed is returned but not stored, so a search racing a write cannot put
+  the pre-write result back.
+
+Endpoints are served from worker threads, hence the lock; a miss computes
+outside it, so two concurrent misses for one key may both hit the database.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.texto import normalizar
+
+# Endpoints with a cache, as labelled in the metrics (onix_cache_*{cache="busca_<endpoint>"})
+ENDPOINTS = ("midias", "estoque_titulo", "revistas")
+
+
+def chave_termo(termo: str, preservar_acentos: bool = False) -> str:
+    """The term as far as the search can tell: case, accents and spacing folded.
+
+    ``preservar_acentos`` for the full-text modes, whose stemmers are not
+    accent-insensitive ("acao" and "ação" may rank differently).
+    """
+    if preservar_acentos:
+        return " ".join(termo.casefold().split())
+    return normalizar(termo)
+
+
+class CacheBusca:
+
+    def __init__(self, capacidade: int, ttl: float, relogio: Callable[[], float] = time.monotonic):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.geracao = 0
+        self._relogio = relogio
+        # chave -> (expira_em, valor)
+        self._itens: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._contagens: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chave(endpoint: str, termo: str, parametros: Optional[Dict[str, Hashable]] = None,
+              preservar_acentos: bool = False) -> Tuple:
+        # Parameters left as None are the defaults: ?tipo= absent or empty is the same search
+        filtros = tuple(sorted((nome, valor) for nome, valor in (parametros or {}).items() if valor is not None))
+        return (endpoint, chave_termo(termo, preservar_acentos), filtros)
+
+    def _consultar(self, endpoint: str, chave: Tuple, agora: float) -> Tuple[bool, Any]:
+        with self._lock:
+            contagem = self._contagens.setdefault(endpoint, [0, 0])
+            item = self._itens.get(chave)
+            if item is not None:
+                expira_em, valor = item
+                if agora < expira_em:
+                    self._itens.move_to_end(chave)
+                    contagem[0] += 1
+                    return True, valor
+                del self._itens[chave]
+            contagem[1] += 1
+            return False, self.geracao
+
+    def _guardar(self, chave: Tuple, geracao: int, agora: float, valor: Any) -> None:
+        with self._lock:
+            # A write during the computation may have made this answer stale already
+            if geracao == self.geracao:
+                self._itens[chave] = (agora + self.ttl, valor)
+                self._itens.move_to_end(chave)
+                while len(self._itens) > self.capacidade:
+                    self._itens.popitem(last=False)
+
+    def buscar(self, endpoint: str, termo: str, parametros: Optional[Dict[str, Hashable]],
+               calcular: Callable[[], Any], preservar_acentos: bool = False) -> Any:
+        """The cached answer for this search, or ``calcular()`` stored for the next one"""
+        if self.capacidade <= 0:
+            return calcular()
+        chave = self.chave(endpoint, termo, parametros, preservar_acentos)
+        agora = self._relogio()
+        acerto, valor = self._consultar(endpoint, chave, agora)
+        if acerto:
+            return valor
+        geracao, valor = valor, calcular()
+        self._guardar(chave, geracao, agora, valor)
+        return valor
+
+    async def buscar_async(self, endpoint: str, termo: str, parametros: Optional[Dict[str, Hashable]],
+                           calcular: Callable[[], Awaitable[Any]], preservar_acentos: bool = False) -> Any:
+        """:meth:`buscar` for services whose search methods are coroutines"""
+        if self.capacidade <= 0:
+            return await calcular()
+        chave = self.chave(endpoint, termo, parametros, preservar_acentos)
+        agora = self._relogio()
+        acerto, valor = self._consultar(endpoint, chave, agora)
+        if acerto:
+            return valor
+        geracao, valor = valor, await calcular()
+        self._guardar(chave, geracao, agora, valor)
+        return valor
+
+    def invalidar(self) -> None:
+        """The catalog changed: every entry computed so far is stale"""
+        with self._lock:
+            self.geracao += 1
+            self._itens.clear()
+
+    def contagens(self, endpoint: str) -> Tuple[int, int]:
+        """``(hits, misses)`` of one endpoint, as :func:`app.core.metricas.registrar_cache` reads them"""
+        return tuple(self._contagens.get(endpoint, (0, 0)))
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+cache_busca = CacheBusca(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL)
@@ -0,0 +1,270 @@
+"""
+Response compression middleware (gzip, plus brotli/zstd when installed).
+
+A pure ASGI middleware, so streaming responses (the exports) are compressed
+chunk by chunk and flushed as they go instead of being buffered. Rules:
+
+* the encoding is negotiated from ``Accept-Encoding`` (q-values honoured; on
+  a tie the server prefers br, then zstd, then gzip);
+* bodies smaller than ``minimo`` are sent as they are: a stream is buffered
+  only until it reaches ``minimo`` bytes or ends;
+* every response of a compressible type carries ``Vary: Accept-Encoding``,
+  compressed or not, so shared caches keep one copy per encoding;
+* responses that already have a ``Content-Encoding`` (e.g. ``?gzip=true``
+  exports), non-text content types, ``Cache-Control: no-transform`` and
+  partial/empty responses are passed through untouched;
+* complete bodies are looked up in :class:`CacheComprimido`, a
+  content-addressed LRU, so a hot response is compressed once per encoding and
+  not on every request.
+"""
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metricas
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+NIVEL_ZSTD = 3
+
+# Compressing bigger bodies than this blocks the event loop for too long
+_MAXIMO_NO_LOOP = 256 * 1024
+
+_TIPOS_COMPRIMIVEIS = (
+    "text/", "application/json", "application/x-ndjson", "application/msgpack",
+    "application/javascript", "application/xml",
+)
+
+
+def codificacoes_disponiveis() -> List[str]:
+    """Supported encodings, in server preference order"""
+    disponiveis = []
+    if brotli is not None:
+        disponiveis.append("br")
+    if zstandard is not None:
+        disponiveis.append("zstd")
+    disponiveis.append("gzip")
+    return disponiveis
+
+
+def escolher_codificacao(aceita: str, disponiveis: Optional[List[str]] = None) -> Optional[str]:
+    """Pick the encoding for an ``Accept-Encoding`` header, or None for identity"""
+    if not aceita:
+        return None
+    pesos: Dict[str, float] = {}
+    for parte in aceita.split(","):
+        nome, _, parametros = parte.partition(";")
+        peso = 1.0
+        for parametro in parametros.split(";"):
+            chave, _, valor = parametro.strip().partition("=")
+            if chave == "q":
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        pesos[nome.strip().lower()] = peso
+    melhor, melhor_peso = None, 0.0
+    for codificacao in disponiveis or codificacoes_disponiveis():
+        peso = pesos.get(codificacao, pesos.get("*", 0.0))
+        if peso > melhor_peso:
+            melhor, melhor_peso = codificacao, peso
+    return melhor
+
+
+def comprimir(corpo: bytes, codificacao: str) -> bytes:
+    """One-shot compression of a complete body"""
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI)
+    if codificacao == "zstd":
+        return zstandard.ZstdCompressor(level=NIVEL_ZSTD).compress(corpo)
+    # mtime=0: the same body always compresses to the same bytes
+    return gzip.compress(corpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+class _Fluxo:
+    """Incremental compressor; ``parcial`` flushes so the client can decode what was sent"""
+
+    def __init__(self, codificacao: str):
+        self.codificacao = codificacao
+        if codificacao == "br":
+            self._compressor = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        elif codificacao == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=NIVEL_ZSTD).compressobj()
+        else:
+            self._compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+
+    def parcial(self, dados: bytes) -> bytes:
+        if self.codificacao == "br":
+            return self._compressor.process(dados) + self._compressor.flush()
+        if self.codificacao == "zstd":
+            return self._compressor.compress(dados) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(dados) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def final(self, dados: bytes) -> bytes:
+        if self.codificacao == "br":
+            return self._compressor.process(dados) + self._compressor.finish()
+        return self._compressor.compress(dados) + self._compressor.flush()
+
+
+class CacheComprimido:
+    """Content-addressed LRU of compressed bodies, bounded by total size.
+
+    The key is a hash of the uncompressed body plus the encoding, so identical
+    responses share an entry whatever route produced them, and a changed body
+    simply misses. Compression may run in worker threads, hence the lock.
+    """
+
+    def __init__(self, limite_bytes: int):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._itens: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter_ou_comprimir(self, corpo: bytes, codificacao: str) -> bytes:
+        chave = (hashlib.blake2b(corpo, digest_size=16).digest(), codificacao)
+        with self._lock:
+            comprimido = self._itens.get(chave)
+            if comprimido is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return comprimido
+            self.falhas += 1
+        comprimido = comprimir(corpo, codificacao)
+        # An entry bigger than a fraction of the cache would just flush everything else
+        if len(comprimido) <= self.limite_bytes // 8:
+            with self._lock:
+                if chave not in self._itens:
+                    self._itens[chave] = comprimido
+                    self.bytes += len(comprimido)
+                    while self.bytes > self.limite_bytes:
+                        _, antigo = self._itens.popitem(last=False)
+                        self.bytes -= len(antigo)
+        return comprimido
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+class CompressaoMiddleware:
+    def __init__(self, app: ASGIApp, minimo: int = 1024, cache_bytes: int = 32 * 1024 * 1024):
+        self.app = app
+        self.minimo = minimo
+        self.cache = CacheComprimido(cache_bytes)
+        metricas.registrar_cache("compressao", lambda: (self.cache.acertos, self.cache.falhas))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding", ""))
+        resposta = _RespostaComprimida(self, codificacao, send)
+        await self.app(scope, receive, resposta.enviar)
+
+
+class _RespostaComprimida:
+    """Per-request state: decides on the start message and compresses the body messages"""
+
+    def __init__(self, middleware: CompressaoMiddleware, codificacao: Optional[str], send: Send):
+        self.middleware = middleware
+        self.codificacao = codificacao
+        self.send = send
+        self.inicio: Optional[Message] = None
+        self.repassar = False
+        self.pendente: List[bytes] = []
+        self.tamanho_pendente = 0
+        self.fluxo: Optional[_Fluxo] = None
+
+    def _comprimivel(self, inicio: Message) -> bool:
+        headers = Headers(raw=inicio["headers"])
+        if inicio["status"] < 200 or inicio["status"] in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        return headers.get("content-type", "").startswith(_TIPOS_COMPRIMIVEIS)
+
+    def _pequeno(self, inicio: Message) -> bool:
+        tamanho = Headers(raw=inicio["headers"]).get("content-length")
+        return tamanho is not None and int(tamanho) < self.middleware.minimo
+
+    def _cabecalhos_comprimidos(self, tamanho: Optional[int]):
+        headers = MutableHeaders(scope=self.inicio)
+        headers["Content-Encoding"] = self.codificacao
+        if tamanho is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(tamanho)
+
+    async def enviar(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.inicio = message
+            comprimivel = self._comprimivel(message)
+            if comprimivel:
+                # Whether this one ends up compressed or not, the body depends on Accept-Encoding
+                MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+            self.repassar = not comprimivel or self.codificacao is None or self._pequeno(message)
+            if self.repassar:
+                await self.send(message)
+            return
+        if self.repassar or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        corpo = message.get("body", b"")
+        mais = message.get("more_body", False)
+        if self.fluxo is not None:
+            comprimido = self.fluxo.parcial(corpo) if mais else self.fluxo.final(corpo)
+            if comprimido or not mais:
+                await self.send({"type": "http.response.body", "body": comprimido, "more_body": mais})
+            return
+
+        if corpo:
+            self.pendente.append(corpo)
+            self.tamanho_pendente += len(corpo)
+        if mais and self.tamanho_pendente < self.middleware.minimo:
+            return
+        acumulado = b"".join(self.pendente)
+        self.pendente = []
+
+        if not mais:
+            # Whole body known: small ones go as they are, the rest through the cache
+            if len(acumulado) < self.middleware.minimo:
+                await self.send(self.inicio)
+                await self.send({"type": "http.response.body", "body": acumulado, "more_body": False})
+                return
+            if len(acumulado) > _MAXIMO_NO_LOOP:
+                comprimido = await anyio.to_thread.run_sync(
+                    self.middleware.cache.obter_ou_comprimir, acumulado, self.codificacao
+                )
+            else:
+                comprimido = self.middleware.cache.obter_ou_comprimir(acumulado, self.codificacao)
+            self._cabecalhos_comprimidos(len(comprimido))
+            await self.send(self.inicio)
+            await self.send({"type": "http.response.body", "body": comprimido, "more_body": False})
+            return
+
+        # Stream past the threshold: compress from here on, flushing every chunk
+        self.fluxo = _Fluxo(self.codificacao)
+        self._cabecalhos_comprimidos(None)
+        await self.send(self.inicio)
+        await self.send({"type": "http.response.body", "body": self.fluxo.parcial(acumulado), "more_body": True})
@@ -8,6 +8,71 @@ class Settings(BaseSettings):
     DATABASE_USER: str = "super_user"
     DATABASE_PASSWORD: str = "carimboatrasado"
     
+    # Connection pool (app.db.database), used by streaming exports
+    MIN_CONNECTIONS: int = 1
+    MAX_CONNECTIONS: int = 10
+    
+    # Exports: rows fetched per round trip from the server-side cursor, concurrent exports (capped below MAX_CONNECTIONS)
+    EXPORT_CHUNK_SIZE: int = 2000
+    EXPORT_MAX_CONCURRENT: int = 3
+    
+    # Serialization: let endpoints opt into app.core.serializacao.resposta_rapida
+    FAST_SERIALIZATION: bool = True
+    
+    # Compression (app.core.compressao): smallest body worth compressing, memory for precompressed bodies
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_CACHE_BYTES: int = 32 * 1024 * 1024
+    
+    # Query instrumentation (app.core.instrumentacao): on/off, repeats of one statement shape flagged as N+1
+    QUERY_INSTRUMENTATION: bool = True
+    QUERY_REPEAT_THRESHOLD: int = 5
+    
+    # Metrics (app.core.metricas): /metrics endpoint, event loop lag sampling interval in seconds
+    METRICS_ENABLED: bool = True
+    METRICS_LOOP_INTERVAL: float = 0.5
+    
+    # Slow queries (app.db.consultas_lentas): threshold in ms (0 disables), fraction explained, records kept, log file
+    SLOW_QUERY_MS: float = 200
+    SLOW_QUERY_EXPLAIN_SAMPLE: float = 0.1
+    SLOW_QUERY_BUFFER: int = 200
+    SLOW_QUERY_LOG_FILE: str = "logs/consultas_lentas.jsonl"
+    
+    # Admin endpoints (/api/v1/admin): disabled while empty, otherwise sent in the X-Admin-Token header
+    ADMIN_TOKEN: str = ""
+    
+    # Catalog search (modo=relevancia): default top-k, minimum word similarity for the trigram fallback
+    SEARCH_TOP_K: int = 20
+    SEARCH_TRIGRAM_THRESHOLD: float = 0.4
+    
+    # Per-type search endpoints (app.services.busca_service): trigrama, texto or indice; trigrama when the choice cannot serve
+    SEARCH_BACKEND: str = "trigrama"
+    
+    # Autocomplete (/api/v1/autocomplete): minimum query length, max suggestions, most-borrowed titles/authors kept in memory, refresh seconds
+    AUTOCOMPLETE_MIN_LENGTH: int = 2
+    AUTOCOMPLETE_MAX_RESULTS: int = 10
+    AUTOCOMPLETE_INDEX_SIZE: int = 20000
+    AUTOCOMPLETE_REFRESH_SECONDS: float = 900
+    
+    # Media search index (app.core.indice_invertido): rebuild seconds, age after which search falls back to SQL, snapshot file ("" disables)
+    SEARCH_INDEX_REFRESH_SECONDS: float = 600
+    SEARCH_INDEX_MAX_AGE: float = 1800
+    SEARCH_INDEX_SNAPSHOT: str = "cache/indice_busca.json.gz"
+    
+    # Search facets (/api/v1/midias/buscar): values returned per facet, seconds between availability refreshes
+    SEARCH_FACET_LIMIT: int = 10
+    SEARCH_AVAILABILITY_REFRESH_SECONDS: float = 60
+    
+    # Search result cache (app.core.cache_busca): entries kept (0 disables), seconds an entry is served
+    SEARCH_CACHE_SIZE: int = 2048
+    SEARCH_CACHE_TTL: float = 30
+    
+    # Migrations: minimum relative gain (cost or buffers) for a planned index to be kept
+    MIGRATION_MIN_PLAN_GAIN: float = 0.05
+    
+    # Partitioning: months of Emprestimo partitions kept ahead of today, schema for archived ones
+    PARTICOES_MESES_A_FRENTE: int = 3
+    PARTICOES_ESQUEMA_ARQUIVO: str = "arquivo"
+    
     # API
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Biblioteca Onix"
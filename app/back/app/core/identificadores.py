@@ -0,0 +1,104 @@
+"""
+Recognition and normalization of media identifiers typed or scanned into a search box.
+
+``identificar`` tells whether a search term is an ISBN-10/13, ISSN, ISAN or
+DOI and returns the normalized forms to look up. The normalization is the one
+of the generated ``codigo_normalizado`` columns (migration 0008), so a lookup
+is an equality on an indexed column:
+
+* ISBN, ISSN, ISAN: uppercase, a leading ``ISBN``/``ISSN``/``ISAN`` label and
+  every character other than letters and digits removed
+  (``ISBN 978-85-359-0277-8`` -> ``9788535902778``).
+* DOI: lowercase (DOIs are case-insensitive), ``doi:`` and
+  ``https://doi.org/`` prefixes removed.
+
+ISBN and ISSN check digits must be valid; a string of digits with a wrong
+check digit is treated as an ordinary search term. An ISBN is looked up in
+both its 10- and 13-digit forms, since the catalog stores either.
+"""
+import re
+from typing import NamedTuple, Optional, Tuple
+
+# Mesmas expressões das colunas geradas da migração 0008
+_CODIGO = re.compile(r"^\s*IS[BSA]N|[^0-9A-Z]")
+_PREFIXO_DOI = re.compile(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+
+_DOI = re.compile(r"^10\.\d{4,9}/\S+$")
+# Only letters, digits, separators and an optional label: anything else is text
+_FORMATO_CODIGO = re.compile(r"^\s*(IS[BSA]N[:\s]*)?[0-9A-Z][0-9A-Z\s-]*$", re.IGNORECASE)
+_ISAN = re.compile(r"^[0-9A-F]{16}([0-9A-Z]([0-9A-F]{8}[0-9A-Z]?)?)?$")
+
+TIPOS = ("isbn", "issn", "isan", "doi")
+
+
+class Identificador(NamedTuple):
+    tipo: str
+    valores: Tuple[str, ...]
+
+
+def normalizar_codigo(codigo: str) -> str:
+    """ISBN/ISSN/ISAN as stored in ``codigo_normalizado``"""
+    return _CODIGO.sub("", codigo.upper())
+
+
+def normalizar_doi(doi: str) -> str:
+    """DOI as stored in ``Artigos.codigo_normalizado``"""
+    return _PREFIXO_DOI.sub("", doi.strip(" ")).lower()
+
+
+def _isbn10_valido(codigo: str) -> bool:
+    if not re.fullmatch(r"\d{9}[\dX]", codigo):
+        return False
+    soma = sum((10 - i) * (10 if c == "X" else int(c)) for i, c in enumerate(codigo))
+    return soma % 11 == 0
+
+
+def _isbn13_valido(codigo: str) -> bool:
+    if not re.fullmatch(r"97[89]\d{10}", codigo):
+        return False
+    return sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(codigo)) % 10 == 0
+
+
+def _issn_valido(codigo: str) -> bool:
+    if not re.fullmatch(r"\d{7}[\dX]", codigo):
+        return False
+    soma = sum((8 - i) * int(c) for i, c in enumerate(codigo[:7]))
+    verificador = (11 - soma % 11) % 11
+    return codigo[7] == ("X" if verificador == 10 else str(verificador))
+
+
+def isbn13_para_10(codigo: str) -> Optional[str]:
+    """The ISBN-10 form of a 978 ISBN-13 (979 ones have none)"""
+    if not codigo.startswith("978"):
+        return None
+    corpo = codigo[3:12]
+    verificador = (11 - sum((10 - i) * int(c) for i, c in enumerate(corpo)) % 11) % 11
+    return corpo + ("X" if verificador == 10 else str(verificador))
+
+
+def isbn10_para_13(codigo: str) -> str:
+    corpo = "978" + codigo[:9]
+    verificador = (10 - sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(corpo)) % 10) % 10
+    return corpo + str(verificador)
+
+
+def identificar(termo: str) -> Optional[Identificador]:
+    """The identifier a search term is, normalized for lookup, or None for ordinary text"""
+    doi = normalizar_doi(termo)
+    if _DOI.match(doi):
+        return Identificador("doi", (doi,))
+    if not _FORMATO_CODIGO.match(termo):
+        return None
+    codigo = normalizar_codigo(termo)
+    if _isbn13_valido(codigo):
+        isbn10 = isbn13_para_10(codigo)
+        return Identificador("isbn", (codigo, isbn10) if isbn10 else (codigo,))
+    if _isbn10_valido(codigo):
+        return Identificador("isbn", (isbn10_para_13(codigo), codigo))
+    if _issn_valido(codigo):
+        return Identificador("issn", (codigo,))
+    # ISAN: 12-digit root + episode (16 hex), optional check character and version;
+    # only with a separator or label, so a long hex-looking word is not taken for one
+    if _ISAN.match(codigo) and ("-" in termo or termo.strip().upper().startswith("ISAN")):
+        return Identificador("isan", (codigo,))
+    return None
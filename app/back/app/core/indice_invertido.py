@@ -0,0 +1,436 @@
+"""
+In-process inverted index over the catalog, for media search without the database.
+
+One document per title: id, media type, title, code (ISBN/ISSN/ISAN/DOI),
+publisher, publication date and author names. Terms are the words of the
+title and of the author names, normalized with app.core.texto, plus the code
+reduced to its letters and digits (``978-85-359-0277-5`` -> ``9788535902775``).
+
+Storage is column-wise: ids in an ``array('i')``, media types as one byte per
+document, strings in plain lists; each posting list is an ``array('I')`` of
+document positions, ascending. A query keeps the documents having every word
+of the search term (the last word as a prefix, since people stop typing
+mid-word), or whose code equals the whole term.
+
+Documents are laid out in title order when the index is built, so a page is a
+slice of the matching positions. Writes append (an update is a tombstone plus
+an append) and are serialized by a lock; once anything was appended, pages
+are ordered with a bounded heap instead. Reads take no lock. A periodic
+rebuild compacts tombstones and restores the layout.
+
+Facets (media type, publisher, decade, library, availability) keep one
+bitmap per value: a Python ``int`` whose bit ``p`` is set when document ``p``
+has that value. Filtering is an AND of bitmaps, and a facet count is
+``(matches & bitmap).bit_count()``. Counts are disjunctive: the counts of a
+facet ignore the filter on that same facet, so the user sees the other values
+to switch to. Only the top values are returned, and values are visited by
+their catalog-wide count, which bounds their count within the matches; once
+the top list is full and no remaining value can enter it, counting stops.
+When the matches are few, walking their documents is cheaper than AND-ing
+bitmaps the size of the catalog, and the counts come from the document
+columns instead.
+"""
+import gzip
+import heapq
+import json
+import os
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime
+from itertools import chain
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.texto import normalizar, palavras
+
+TIPOS = ("livro", "revista", "dvd", "artigo")
+
+_NAO_ALFANUMERICO = re.compile(r"[^0-9a-z]")
+# Code terms live in the same dictionary as words; the prefix keeps them apart
+_CODIGO = "#"
+# Below this a whole-term code lookup would just match short numeric words
+_MINIMO_CODIGO = 4
+
+FACETAS = ("tipo_midia", "editora", "decada", "biblioteca", "disponivel")
+# Below this fraction of the catalog, facet counts walk the matching documents
+_VARREDURA = 1 / 32
+
+_VERSAO_SNAPSHOT = 2
+
+
+class Documento(NamedTuple):
+    id_titulo: int
+    tipo_midia: str
+    titulo: str
+    codigo: Optional[str] = None
+    editora: Optional[str] = None
+    data_pub: Optional[str] = None
+    autores: Tuple[str, ...] = ()
+    bibliotecas: Tuple[int, ...] = ()
+    disponivel: bool = False
+
+
+class Resultado(NamedTuple):
+    documentos: List[Documento]
+    total: int
+    # {faceta: [(valor, contagem), ...]}, largest counts first; None when not requested
+    facetas: Optional[Dict[str, List[Tuple[Any, int]]]] = None
+
+
+def codigo_normalizado(codigo: Optional[str]) -> str:
+    return _NAO_ALFANUMERICO.sub("", normalizar(codigo)) if codigo else ""
+
+
+def _termos(documento: Documento) -> set:
+    termos = set(palavras(documento.titulo))
+    for autor in documento.autores:
+        termos.update(palavras(autor))
+    codigo = codigo_normalizado(documento.codigo)
+    if codigo:
+        termos.add(_CODIGO + codigo)
+    return termos
+
+
+def _decada(data: Optional[str]) -> Optional[int]:
+    try:
+        return int(data[:4]) // 10 * 10 if data else None
+    except ValueError:
+        return None
+
+
+def _bitmap(posicoes: Iterable[int], tamanho: int) -> int:
+    bits = bytearray((tamanho + 7) // 8)
+    for posicao in posicoes:
+        bits[posicao >> 3] |= 1 << (posicao & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _melhores(contagens: Iterable[Tuple[Any, int]], limite: int) -> List[Tuple[Any, int]]:
+    return heapq.nsmallest(limite, contagens, key=lambda item: (-item[1], str(item[0])))
+
+
+class IndiceInvertido:
+    def __init__(self, documentos: Iterable[Documento] = ()):
+        ordenados = sorted(documentos, key=lambda d: (normalizar(d.titulo), d.id_titulo))
+        self.ids = array("i")
+        self.tipos = bytearray()
+        self.vivos = bytearray()
+        self.titulos: List[str] = []
+        self.codigos: List[Optional[str]] = []
+        self.editoras: List[Optional[str]] = []
+        self.datas: List[Optional[str]] = []
+        self.autores: List[Tuple[str, ...]] = []
+        self.bibliotecas: List[Tuple[int, ...]] = []
+        self.disponiveis = bytearray()
+        self._ordem: List[str] = []
+        self._posicao: Dict[int, int] = {}
+        self._postagens: Dict[str, array] = {}
+        # Sorted terms and facet bitmaps are built once the bulk load is done
+        self._termos: Optional[List[str]] = None
+        self._facetas: Optional[Dict[str, Dict[Any, int]]] = None
+        # Per facet, (catalog-wide count, value) largest first; dropped by writes
+        self._frequencias: Dict[str, List[Tuple[int, Any]]] = {}
+        self._lock = threading.Lock()
+        for documento in ordenados:
+            self._anexar(documento)
+        self._termos = sorted(self._postagens)
+        self._facetas = self._calcular_facetas()
+        # Positions below this are in title order
+        self._ordenados = len(self.ids)
+
+    def _anexar(self, documento: Documento) -> None:
+        posicao = len(self.ids)
+        self.ids.append(documento.id_titulo)
+        self.tipos.append(TIPOS.index(documento.tipo_midia))
+        self.vivos.append(1)
+        self.titulos.append(documento.titulo)
+        self.codigos.append(documento.codigo)
+        self.editoras.append(documento.editora)
+        self.datas.append(documento.data_pub)
+        self.autores.append(tuple(documento.autores))
+        self.bibliotecas.append(tuple(documento.bibliotecas))
+        self.disponiveis.append(1 if documento.disponivel else 0)
+        self._ordem.append(normalizar(documento.titulo))
+        self._posicao[documento.id_titulo] = posicao
+        for termo in _termos(documento):
+            postagem = self._postagens.get(termo)
+            if postagem is None:
+                self._postagens[termo] = array("I", (posicao,))
+                if self._termos is not None:
+                    insort(self._termos, termo)
+            else:
+                postagem.append(posicao)
+        if self._facetas is not None:
+            for faceta in FACETAS:
+                valores = self._facetas[faceta]
+                for valor in self._valores(faceta, posicao):
+                    if valor not in valores:
+                        # A new value replaces the dict instead of growing it: searches iterate
+                        # the values without the lock and would see it change size
+                        valores = dict(valores)
+                        self._facetas[faceta] = valores
+                    valores[valor] = valores.get(valor, 0) | (1 << posicao)
+            self._frequencias = {}
+
+    def _valores(self, faceta: str, posicao: int) -> Tuple[Any, ...]:
+        """Values of one facet for one document (libraries are multi-valued)"""
+        if faceta == "tipo_midia":
+            return (TIPOS[self.tipos[posicao]],)
+        if faceta == "editora":
+            return (self.editoras[posicao],) if self.editoras[posicao] else ()
+        if faceta == "decada":
+            decada = _decada(self.datas[posicao])
+            return (decada,) if decada is not None else ()
+        if faceta == "biblioteca":
+            return self.bibliotecas[posicao]
+        return (bool(self.disponiveis[posicao]),)
+
+    def _calcular_facetas(self) -> Dict[str, Dict[Any, int]]:
+        facetas = {}
+        for faceta in FACETAS:
+            posicoes: Dict[Any, List[int]] = {}
+            for posicao in range(len(self.ids)):
+                for valor in self._valores(faceta, posicao):
+                    posicoes.setdefault(valor, []).append(posicao)
+            facetas[faceta] = {valor: _bitmap(lista, len(self.ids)) for valor, lista in posicoes.items()}
+        return facetas
+
+    def adicionar(self, documento: Documento) -> None:
+        """Insert or replace the document with this id"""
+        with self._lock:
+            posicao = self._posicao.get(documento.id_titulo)
+            if posicao is not None:
+                self.vivos[posicao] = 0
+            self._anexar(documento)
+
+    def remover(self, id_titulo: int) -> bool:
+        with self._lock:
+            posicao = self._posicao.pop(id_titulo, None)
+            if posicao is None:
+                return False
+            self.vivos[posicao] = 0
+            return True
+
+    def atualizar_disponibilidade(self, disponiveis: Iterable[int]) -> None:
+        """Replace the availability facet: ``disponiveis`` are the ids with a free copy now"""
+        disponiveis = set(disponiveis)
+        with self._lock:
+            for posicao, id_titulo in enumerate(self.ids):
+                self.disponiveis[posicao] = id_titulo in disponiveis
+            livres = _bitmap((p for p in range(len(self.ids)) if self.disponiveis[p]), len(self.ids))
+            todos = (1 << len(self.ids)) - 1
+            self._facetas["disponivel"] = {True: livres, False: todos & ~livres}
+            self._frequencias = {}
+
+    def documento(self, posicao: int) -> Documento:
+        return Documento(
+            self.ids[posicao], TIPOS[self.tipos[posicao]], self.titulos[posicao], self.codigos[posicao],
+            self.editoras[posicao], self.datas[posicao], self.autores[posicao],
+            self.bibliotecas[posicao], bool(self.disponiveis[posicao]),
+        )
+
+    def documentos(self) -> Iterable[Documento]:
+        return (self.documento(posicao) for posicao in range(len(self.ids)) if self.vivos[posicao])
+
+    def _prefixadas(self, prefixo: str) -> List[array]:
+        postagens = []
+        for indice in range(bisect_left(self._termos, prefixo), len(self._termos)):
+            termo = self._termos[indice]
+            if not termo.startswith(prefixo):
+                break
+            postagens.append(self._postagens[termo])
+        return postagens
+
+    def _casam(self, consulta: str) -> List[int]:
+        """Positions matching every word (the last one as a prefix), ascending"""
+        termos = palavras(consulta)
+        if not termos:
+            return []
+        grupos = [[self._postagens[termo]] if termo in self._postagens else [] for termo in termos[:-1]]
+        grupos.append(self._prefixadas(termos[-1]))
+        if not all(grupos):
+            return []
+        grupos.sort(key=lambda grupo: sum(len(postagem) for postagem in grupo))
+        menor = grupos[0]
+        candidatos = menor[0] if len(menor) == 1 else sorted(set(chain.from_iterable(menor)))
+        for grupo in grupos[1:]:
+            if len(grupo) == 1:
+                postagem = grupo[0]
+                candidatos = [p for p in candidatos if _contem(postagem, p)]
+            else:
+                conjunto = set(chain.from_iterable(grupo))
+                candidatos = [p for p in candidatos if p in conjunto]
+            if not candidatos:
+                break
+        return list(candidatos)
+
+    def buscar(self, consulta: str, filtros: Optional[Dict[str, Any]] = None,
+               deslocamento: int = 0, limite: int = 10, facetas: bool = False,
+               limite_facetas: int = 10) -> Resultado:
+        """One page of matches in title order, the total, and optionally the facet counts.
+
+        ``filtros`` maps facet names (:data:`FACETAS`) to one value each; None values are ignored.
+        """
+        posicoes = self._casam(consulta)
+        codigo = codigo_normalizado(consulta)
+        if len(codigo) >= _MINIMO_CODIGO:
+            por_codigo = self._postagens.get(_CODIGO + codigo)
+            if por_codigo:
+                posicoes = sorted(set(posicoes).union(por_codigo))
+        posicoes = [p for p in posicoes if self.vivos[p]]
+        filtros = {faceta: valor for faceta, valor in (filtros or {}).items() if valor is not None}
+        contagens = None
+        if filtros or facetas:
+            if len(posicoes) < len(self.ids) * _VARREDURA:
+                posicoes, contagens = self._varrer(posicoes, filtros, facetas, limite_facetas)
+            else:
+                posicoes, contagens = self._cruzar(posicoes, filtros, facetas, limite_facetas)
+        fim = deslocamento + limite
+        if not posicoes or posicoes[-1] < self._ordenados:
+            pagina = posicoes[deslocamento:fim]
+        else:
+            pagina = heapq.nsmallest(fim, posicoes, key=lambda p: (self._ordem[p], self.ids[p]))[deslocamento:]
+        return Resultado([self.documento(p) for p in pagina], len(posicoes), contagens)
+
+    def _varrer(self, posicoes: List[int], filtros: Dict[str, Any], facetas: bool,
+                limite_facetas: int) -> Tuple[List[int], Optional[Dict[str, List[Tuple[Any, int]]]]]:
+        """Filters and counts from the document columns, one pass over the matches"""
+        contagens = {faceta: Counter() for faceta in FACETAS}
+        resultado = []
+        for posicao in posicoes:
+            falhas = [faceta for faceta, valor in filtros.items() if valor not in self._valores(faceta, posicao)]
+            if not falhas:
+                resultado.append(posicao)
+                contadas = FACETAS if facetas else ()
+            else:
+                # A document outside only one filter still counts for that facet
+                contadas = falhas if facetas and len(falhas) == 1 else ()
+            for faceta in contadas:
+                contagens[faceta].update(self._valores(faceta, posicao))
+        if not facetas:
+            return resultado, None
+        return resultado, {faceta: _melhores(contagem.items(), limite_facetas) for faceta, contagem in contagens.items()}
+
+    def _cruzar(self, posicoes: List[int], filtros: Dict[str, Any], facetas: bool,
+                limite_facetas: int) -> Tuple[List[int], Optional[Dict[str, List[Tuple[Any, int]]]]]:
+        """Filters and counts with the facet bitmaps"""
+        tamanho = len(self.ids)
+        casam = _bitmap(posicoes, tamanho)
+        filtrados = {faceta: self._facetas[faceta].get(valor, 0) for faceta, valor in filtros.items()}
+        resultado = posicoes
+        if filtrados:
+            todos = casam
+            for bits in filtrados.values():
+                todos &= bits
+            presentes = todos.to_bytes((tamanho + 7) // 8, "little")
+            resultado = [p for p in posicoes if presentes[p >> 3] >> (p & 7) & 1]
+        if not facetas:
+            return resultado, None
+        contagens = {}
+        for faceta in FACETAS:
+            base = casam
+            for outra, bits in filtrados.items():
+                if outra != faceta:
+                    base &= bits
+            contagens[faceta] = self._contar(faceta, base, posicoes, limite_facetas)
+        return resultado, contagens
+
+    def _contar(self, faceta: str, base: int, candidatos: List[int], limite: int) -> List[Tuple[Any, int]]:
+        """Top values of one facet within the documents of ``base`` (a subset of ``candidatos``)"""
+        quantidade = base.bit_count()
+        if not quantidade:
+            return []
+        valores = self._facetas[faceta]
+        # One AND per value over the whole catalog, or one visit per document: the cheaper one.
+        # A machine word of AND costs about 1/64 of a document visit.
+        if len(valores) * (len(self.ids) >> 6) > quantidade * 64:
+            presentes = base.to_bytes((len(self.ids) + 7) // 8, "little")
+            contagem = Counter()
+            for p in candidatos:
+                if presentes[p >> 3] >> (p & 7) & 1:
+                    contagem.update(self._valores(faceta, p))
+            return _melhores(contagem.items(), limite)
+        frequencias = self._frequencias.get(faceta)
+        if frequencias is None:
+            frequencias = sorted(((bits.bit_count(), valor) for valor, bits in list(valores.items())),
+                                 key=lambda item: (-item[0], str(item[1])))
+            self._frequencias[faceta] = frequencias
+        contagens: List[Tuple[Any, int]] = []
+        # The ``limite`` largest counts so far; its head is the count to beat
+        maiores: List[int] = []
+        for frequencia, valor in frequencias:
+            # A value cannot match more documents than it has in the whole catalog
+            if len(maiores) >= limite and frequencia < maiores[0]:
+                break
+            contagem = (base & valores.get(valor, 0)).bit_count()
+            if contagem:
+                contagens.append((valor, contagem))
+                if len(maiores) < limite:
+                    heapq.heappush(maiores, contagem)
+                else:
+                    heapq.heappushpop(maiores, contagem)
+        return _melhores(contagens, limite)
+
+    def __len__(self) -> int:
+        return len(self._posicao)
+
+    def memoria(self) -> Dict[str, int]:
+        """Approximate bytes held, by part (containers and the objects they own)"""
+        # Snapshots: writes may add terms while this runs (list() of a dict view holds the GIL)
+        postagens = sys.getsizeof(self._postagens) + sys.getsizeof(self._termos) + sum(
+            sys.getsizeof(termo) + sys.getsizeof(postagem) for termo, postagem in list(self._postagens.items())
+        )
+        documentos = sum(sys.getsizeof(coluna) for coluna in (
+            self.ids, self.tipos, self.vivos, self.titulos, self.codigos, self.editoras,
+            self.datas, self.autores, self._ordem,
+        ))
+        documentos += sum(
+            sys.getsizeof(valor)
+            for valor in chain(self.titulos, self.codigos, self.editoras, self.datas, self._ordem)
+            if valor is not None
+        )
+        documentos += sum(sys.getsizeof(nomes) + sum(map(sys.getsizeof, nomes)) for nomes in self.autores)
+        documentos += sys.getsizeof(self.bibliotecas) + sys.getsizeof(self.disponiveis) + sum(
+            map(sys.getsizeof, self.bibliotecas)
+        )
+        ids = sys.getsizeof(self._posicao)
+        facetas = sum(
+            sys.getsizeof(valores)
+            + sum(sys.getsizeof(valor) + sys.getsizeof(bits) for valor, bits in list(valores.items()))
+            for valores in list((self._facetas or {}).values())
+        )
+        return {"postagens": postagens, "documentos": documentos, "ids": ids, "facetas": facetas}
+
+    def salvar(self, caminho: str, gerado_em: datetime) -> None:
+        """Write the live documents as gzip JSON; the file is replaced atomically"""
+        conteudo = {
+            "versao": _VERSAO_SNAPSHOT,
+            "gerado_em": gerado_em.isoformat(),
+            "documentos": [list(documento) for documento in self.documentos()],
+        }
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with gzip.open(temporario, "wt", encoding="utf-8") as arquivo:
+            json.dump(conteudo, arquivo, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> Tuple["IndiceInvertido", datetime]:
+        """Index from a snapshot written by :meth:`salvar`, and when the snapshot was taken"""
+        with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+            conteudo = json.load(arquivo)
+        if conteudo.get("versao") != _VERSAO_SNAPSHOT:
+            raise ValueError(f"versão de snapshot não suportada: {conteudo.get('versao')}")
+        documentos = [
+            Documento(*campos[:6], tuple(campos[6]), tuple(campos[7]), campos[8])
+            for campos in conteudo["documentos"]
+        ]
+        return cls(documentos), datetime.fromisoformat(conteudo["gerado_em"])
+
+
+def _contem(postagem: Sequence[int], posicao: int) -> bool:
+    indice = bisect_left(postagem, posicao)
+    return indice < len(postagem) and postagem[indice] == posicao
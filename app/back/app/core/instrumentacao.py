@@ -0,0 +1,94 @@
+"""
+Per-request query instrumentation: Server-Timing header, one log line, N+1 flag.
+
+``InstrumentacaoMiddleware`` is a pure ASGI middleware that opens a statement
+collector (app.db.instrumentacao) for each HTTP request. When the response
+starts it adds::
+
+    Server-Timing: db;dur=12.41;desc="7 consultas", app;dur=30.02
+
+and when the request ends it logs one JSON line with the route template,
+status, statement count, database and total time and the statement shapes.
+Requests that run the same shape more than ``limite_repeticoes`` times are
+logged as warnings with the offending shapes under ``repetidas``.
+"""
+import json
+import logging
+import time
+from typing import Any, Dict
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.instrumentacao import ColetorConsultas, encerrar_coleta, iniciar_coleta, coletor_atual
+
+logger = logging.getLogger(__name__)
+
+
+def rota_da_requisicao(scope: Scope) -> str:
+    """Route template (``/api/v1/livros/{id_livro}``) once routing has run, else the raw path"""
+    rota = scope.get("route")
+    caminho = getattr(rota, "path", None)
+    if caminho is None:
+        return scope.get("path", "")
+    return scope.get("root_path", "") + caminho
+
+
+def server_timing(coletor: ColetorConsultas, total: float) -> str:
+    return (
+        f'db;dur={coletor.duracao * 1000:.2f};desc="{len(coletor.consultas)} consultas", '
+        f"app;dur={total * 1000:.2f}"
+    )
+
+
+class InstrumentacaoMiddleware:
+    def __init__(self, app: ASGIApp, limite_repeticoes: int = 5):
+        self.app = app
+        self.limite_repeticoes = limite_repeticoes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = iniciar_coleta()
+        coletor = coletor_atual()
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                coletor.rota = rota_da_requisicao(scope)
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", server_timing(coletor, time.perf_counter() - inicio)
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            encerrar_coleta(token)
+            self._registrar(scope, coletor, status, time.perf_counter() - inicio)
+
+    def _registrar(self, scope: Scope, coletor: ColetorConsultas, status: int, total: float) -> None:
+        repetidas = coletor.repetidas(self.limite_repeticoes)
+        linha: Dict[str, Any] = {
+            "metodo": scope["method"],
+            "rota": coletor.rota or rota_da_requisicao(scope),
+            "status": status,
+            "consultas": len(coletor.consultas),
+            "db_ms": round(coletor.duracao * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "formatos": [
+                {"sql": sql, "vezes": resumo["vezes"], "ms": round(resumo["duracao"] * 1000, 2),
+                 "linhas": resumo["linhas"]}
+                for sql, resumo in coletor.por_formato().items()
+            ],
+        }
+        if repetidas:
+            linha["repetidas"] = repetidas
+            logger.warning(json.dumps(linha, ensure_ascii=False))
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(linha, ensure_ascii=False))
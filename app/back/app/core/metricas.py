@@ -0,0 +1,309 @@
+"""
+Prometheus metrics: HTTP latency, in-flight requests, pool, statements, caches, loop lag.
+
+Hot-path counters are sharded per thread: every thread writes only to its own
+shard (a plain dict found through ``threading.local``), so recording takes no
+lock. The lock is taken once per thread, to register its shard, and by the
+scrape, which sums the shards. The scrape may miss an increment that is
+happening concurrently, which Prometheus tolerates.
+
+Values that already live elsewhere (pool occupancy, cache hit counts) are read
+at scrape time through callbacks registered with :func:`registrar_medidor` and
+:func:`registrar_cache`.
+
+``GET /metrics`` renders everything in the text exposition format.
+"""
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.instrumentacao import rota_da_requisicao
+from app.db.instrumentacao import Execucao
+
+logger = logging.getLogger(__name__)
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+FAIXAS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAIXAS_SQL = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+FAIXAS_LOOP = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Statement shapes tracked one by one; the rest are summed under "outros"
+MAXIMO_FORMATOS = 500
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+class _Fragmentado:
+    """Per-thread shards of ``labels -> value`` (or bucket list), summed on read"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._fragmentos: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _fragmento(self) -> dict:
+        try:
+            return self._local.valores
+        except AttributeError:
+            valores = {}
+            with self._lock:
+                self._fragmentos.append(valores)
+            self._local.valores = valores
+            return valores
+
+    def _fragmentos_atuais(self) -> List[dict]:
+        with self._lock:
+            return list(self._fragmentos)
+
+
+class Contador(_Fragmentado):
+    def __init__(self, nome: str, ajuda: str, tipo: str = "counter"):
+        super().__init__()
+        self.nome = nome
+        self.ajuda = ajuda
+        self.tipo = tipo
+
+    def somar(self, valor: float = 1.0, rotulos: Rotulos = ()) -> None:
+        fragmento = self._fragmento()
+        fragmento[rotulos] = fragmento.get(rotulos, 0.0) + valor
+
+    def definir(self, valor: float, rotulos: Rotulos = ()) -> None:
+        """Gauge with a single writer thread (e.g. the event loop)"""
+        self._fragmento()[rotulos] = valor
+
+    def valores(self) -> Dict[Rotulos, float]:
+        total: Dict[Rotulos, float] = {}
+        for fragmento in self._fragmentos_atuais():
+            for rotulos, valor in list(fragmento.items()):
+                total[rotulos] = total.get(rotulos, 0.0) + valor
+        return total
+
+    def exposicao(self) -> Iterable[str]:
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} {self.tipo}"
+        for rotulos, valor in sorted(self.valores().items()):
+            yield f"{self.nome}{_rotulos(rotulos)} {_numero(valor)}"
+
+
+class Histograma(_Fragmentado):
+    """Cumulative-bucket histogram; ``quantis`` estimates percentiles from the buckets"""
+
+    def __init__(self, nome: str, ajuda: str, faixas: Tuple[float, ...]):
+        super().__init__()
+        self.nome = nome
+        self.ajuda = ajuda
+        self.faixas = faixas
+
+    def observar(self, valor: float, rotulos: Rotulos = ()) -> None:
+        fragmento = self._fragmento()
+        contagens = fragmento.get(rotulos)
+        if contagens is None:
+            # one slot per bucket, +Inf, then sum and count
+            contagens = fragmento[rotulos] = [0] * (len(self.faixas) + 1) + [0.0, 0]
+        contagens[bisect.bisect_left(self.faixas, valor)] += 1
+        contagens[-2] += valor
+        contagens[-1] += 1
+
+    def valores(self) -> Dict[Rotulos, list]:
+        total: Dict[Rotulos, list] = {}
+        for fragmento in self._fragmentos_atuais():
+            for rotulos, contagens in list(fragmento.items()):
+                soma = total.get(rotulos)
+                if soma is None:
+                    total[rotulos] = list(contagens)
+                else:
+                    for i, valor in enumerate(contagens):
+                        soma[i] += valor
+        return total
+
+    def quantis(self, contagens: list, quantis: Iterable[float]) -> List[float]:
+        """Percentiles by linear interpolation inside the bucket that holds them"""
+        quantidade = contagens[-1]
+        resultado = []
+        for quantil in quantis:
+            alvo = quantil * quantidade
+            acumulado, inferior = 0, 0.0
+            for i, superior in enumerate(self.faixas + (float("inf"),)):
+                na_faixa = contagens[i]
+                if acumulado + na_faixa >= alvo and na_faixa:
+                    if superior == float("inf"):
+                        resultado.append(inferior)
+                    else:
+                        resultado.append(inferior + (superior - inferior) * (alvo - acumulado) / na_faixa)
+                    break
+                acumulado += na_faixa
+                inferior = superior
+            else:
+                resultado.append(0.0)
+        return resultado
+
+    def exposicao(self) -> Iterable[str]:
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} histogram"
+        for rotulos, contagens in sorted(self.valores().items()):
+            acumulado = 0
+            for faixa, contagem in zip(self.faixas + (float("inf"),), contagens):
+                acumulado += contagem
+                yield f"{self.nome}_bucket{_rotulos(rotulos + (('le', _numero(faixa)),))} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(rotulos)} {_numero(contagens[-2])}"
+            yield f"{self.nome}_count{_rotulos(rotulos)} {contagens[-1]}"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(rotulos: Rotulos) -> str:
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(str(valor))}"' for nome, valor in rotulos) + "}"
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) and not valor.is_integer() else str(int(valor))
+
+
+# --- Metrics ---------------------------------------------------------------
+
+requisicoes = Histograma(
+    "onix_http_request_duration_seconds", "HTTP request latency by route template", FAIXAS_HTTP
+)
+em_andamento = Contador("onix_http_requests_in_flight", "HTTP requests being served", tipo="gauge")
+consultas = Histograma(
+    "onix_db_statement_duration_seconds", "Statement latency by normalized statement", FAIXAS_SQL
+)
+espera_pool = Histograma(
+    "onix_db_pool_wait_seconds", "Time to check a connection out of the pool", FAIXAS_SQL
+)
+pool_esgotado = Contador("onix_db_pool_exhausted_total", "Checkouts refused because the pool was full")
+atraso_loop = Histograma("onix_event_loop_lag_seconds", "Event loop scheduling delay", FAIXAS_LOOP)
+ultimo_atraso_loop = Contador("onix_event_loop_lag_last_seconds", "Last measured event loop delay", tipo="gauge")
+
+_formatos_vistos: set = set()
+_medidores: Dict[str, Tuple[str, Callable[[], Dict[Rotulos, float]]]] = {}
+_caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+
+def observar_consulta(execucao: Execucao) -> None:
+    """Listener for app.db.instrumentacao: one observation per executed statement"""
+    sql = execucao.sql
+    if sql not in _formatos_vistos:
+        if len(_formatos_vistos) >= MAXIMO_FORMATOS:
+            sql = "outros"
+        else:
+            _formatos_vistos.add(sql)
+    consultas.observar(execucao.duracao, (("statement", sql),))
+
+
+def registrar_medidor(nome: str, ajuda: str, leitura: Callable[[], Dict[Rotulos, float]]) -> None:
+    """Gauge read at scrape time; ``leitura`` returns ``{labels: value}``"""
+    _medidores[nome] = (ajuda, leitura)
+
+
+def registrar_cache(nome: str, leitura: Callable[[], Tuple[int, int]]) -> None:
+    """Cache whose ``(hits, misses)`` are exported, with the hit ratio"""
+    _caches[nome] = leitura
+
+
+def _exposicao_consultas() -> Iterable[str]:
+    nome = "onix_db_statement_latency_seconds"
+    yield f"# HELP {nome} Estimated statement latency percentiles"
+    yield f"# TYPE {nome} summary"
+    for rotulos, contagens in sorted(consultas.valores().items()):
+        for quantil, valor in zip((0.5, 0.95, 0.99), consultas.quantis(contagens, (0.5, 0.95, 0.99))):
+            yield f"{nome}{_rotulos(rotulos + (('quantile', str(quantil)),))} {_numero(valor)}"
+        yield f"{nome}_sum{_rotulos(rotulos)} {_numero(contagens[-2])}"
+        yield f"{nome}_count{_rotulos(rotulos)} {contagens[-1]}"
+
+
+def _exposicao_caches() -> Iterable[str]:
+    leituras = {}
+    for nome, leitura in _caches.items():
+        try:
+            leituras[nome] = leitura()
+        except Exception as e:
+            logger.warning(f"Falha ao ler o cache {nome}: {e}")
+    for metrica, indice, ajuda in (("onix_cache_hits_total", 0, "Cache hits"),
+                                   ("onix_cache_misses_total", 1, "Cache misses")):
+        yield f"# HELP {metrica} {ajuda}"
+        yield f"# TYPE {metrica} counter"
+        for nome, valores in sorted(leituras.items()):
+            yield f"{metrica}{_rotulos((('cache', nome),))} {valores[indice]}"
+    yield "# HELP onix_cache_hit_ratio Hits over lookups since start"
+    yield "# TYPE onix_cache_hit_ratio gauge"
+    for nome, (acertos, falhas) in sorted(leituras.items()):
+        total = acertos + falhas
+        yield f"onix_cache_hit_ratio{_rotulos((('cache', nome),))} {_numero(acertos / total if total else 0.0)}"
+
+
+def _exposicao_medidores() -> Iterable[str]:
+    for nome, (ajuda, leitura) in sorted(_medidores.items()):
+        try:
+            valores = leitura()
+        except Exception as e:
+            logger.warning(f"Falha ao ler a métrica {nome}: {e}")
+            continue
+        yield f"# HELP {nome} {ajuda}"
+        yield f"# TYPE {nome} gauge"
+        for rotulos, valor in sorted(valores.items()):
+            yield f"{nome}{_rotulos(rotulos)} {_numero(valor)}"
+
+
+def exposicao() -> str:
+    linhas: List[str] = []
+    # Statements only as percentiles: a full histogram per shape is too many series
+    for metrica in (requisicoes, em_andamento, espera_pool, pool_esgotado, atraso_loop, ultimo_atraso_loop):
+        linhas.extend(metrica.exposicao())
+    linhas.extend(_exposicao_consultas())
+    linhas.extend(_exposicao_medidores())
+    linhas.extend(_exposicao_caches())
+    return "\n".join(linhas) + "\n"
+
+
+class MetricasMiddleware:
+    """In-flight gauge and latency histogram per (method, route template, status)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        em_andamento.somar(1)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            em_andamento.somar(-1)
+            # Unmatched paths share one label, so scanners cannot blow up the cardinality
+            rota = rota_da_requisicao(scope) if scope.get("route") else "desconhecida"
+            rotulos = (("method", scope["method"]), ("route", rota), ("status", str(status)))
+            requisicoes.observar(time.perf_counter() - inicio, rotulos)
+
+
+async def monitorar_loop(intervalo: float = 0.5) -> None:
+    """Background task: how late the loop wakes up from a sleep of ``intervalo``"""
+    loop = asyncio.get_running_loop()
+    while True:
+        antes = loop.time()
+        await asyncio.sleep(intervalo)
+        atraso = max(loop.time() - antes - intervalo, 0.0)
+        atraso_loop.observar(atraso)
+        ultimo_atraso_loop.definir(atraso)
@@ -0,0 +1,163 @@
+"""
+Sampling profiler for a live worker, output in the collapsed-stack format.
+
+A background thread wakes every ``intervalo`` seconds for ``duracao`` seconds
+and records stacks; each distinct stack becomes one line
+``raiz;...;folha contagem``, which flamegraph.pl, speedscope and inferno read
+as they are. Nothing is installed in the interpreter (no tracing hook), so the
+cost is one stack walk per thread per sample and only while a profile runs.
+
+Two modes:
+
+* ``threads``: what every thread is executing right now (``sys._current_frames``).
+  Sync endpoints run in the threadpool, so this is where CPU time shows up.
+  Threads parked waiting for work and the event loop idling in ``select`` are
+  skipped unless ``incluir_ociosos`` is set.
+* ``tarefas``: for every asyncio task of the event loop, the chain of
+  coroutines it is awaiting, rooted at the task name. An ``async def``
+  endpoint spends most of its life suspended, invisible to ``threads``; here
+  its wall-clock time is attributed to the await it is stuck on. The stack of
+  the loop thread is added too, so code running on the loop is not lost.
+"""
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+MODOS = ("threads", "tarefas")
+
+# (file name, function) at the top of a stack that is just waiting for work
+_OCIOSOS = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+_STDLIB = os.path.abspath(sysconfig.get_paths()["stdlib"]) + os.sep
+
+_rotulos: Dict[object, str] = {}
+
+
+def _rotulo(codigo) -> str:
+    """``função (arquivo:linha)`` of a code object; cached, labels are built once per function"""
+    rotulo = _rotulos.get(codigo)
+    if rotulo is None:
+        arquivo = codigo.co_filename
+        partes = arquivo.replace(os.sep, "/").split("/")
+        if "site-packages" in partes:
+            arquivo = "/".join(partes[partes.index("site-packages") + 1:])
+        elif arquivo.startswith(_STDLIB):
+            arquivo = arquivo[len(_STDLIB):]
+        elif os.path.isabs(arquivo) and arquivo.startswith(os.getcwd()):
+            arquivo = os.path.relpath(arquivo)
+        nome = getattr(codigo, "co_qualname", codigo.co_name)
+        rotulo = f"{nome} ({arquivo}:{codigo.co_firstlineno})".replace(";", ":")
+        _rotulos[codigo] = rotulo
+    return rotulo
+
+
+def _pilha_do_frame(frame) -> List[str]:
+    """Labels from the outermost frame to ``frame``"""
+    pilha = []
+    while frame is not None:
+        pilha.append(_rotulo(frame.f_code))
+        frame = frame.f_back
+    pilha.reverse()
+    return pilha
+
+
+def _ocioso(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _OCIOSOS
+
+
+def _pilha_da_tarefa(tarefa: asyncio.Task) -> List[str]:
+    """Task name, then each coroutine down the ``await`` chain"""
+    pilha = [f"tarefa:{tarefa.get_name()}".replace(";", ":")]
+    corrotina = tarefa.get_coro()
+    while corrotina is not None:
+        frame = getattr(corrotina, "cr_frame", None) or getattr(corrotina, "gi_frame", None)
+        if frame is not None:
+            pilha.append(_rotulo(frame.f_code))
+        elif hasattr(corrotina, "__qualname__"):
+            pilha.append(corrotina.__qualname__)
+        corrotina = getattr(corrotina, "cr_await", None) or getattr(corrotina, "gi_yieldfrom", None)
+    return pilha
+
+
+class Perfilador:
+    def __init__(self, modo: str = "threads", intervalo: float = 0.01,
+                 incluir_ociosos: bool = False, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 thread_loop: Optional[int] = None):
+        if modo not in MODOS:
+            raise ValueError(f"modo deve ser um de {MODOS}")
+        if modo == "tarefas" and loop is None:
+            raise ValueError("o modo tarefas precisa do event loop")
+        self.modo = modo
+        self.intervalo = intervalo
+        self.incluir_ociosos = incluir_ociosos
+        self.loop = loop
+        self.thread_loop = thread_loop
+        self.pilhas: Counter = Counter()
+        self.amostras = 0
+
+    def _amostrar_threads(self, proprio: int) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == proprio or (not self.incluir_ociosos and _ocioso(frame)):
+                continue
+            self.pilhas[";".join(_pilha_do_frame(frame))] += 1
+
+    def _amostrar_tarefas(self) -> None:
+        try:
+            tarefas = asyncio.all_tasks(self.loop)
+        except RuntimeError:
+            # The loop's task set changed while being copied; skip this sample
+            return
+        for tarefa in tarefas:
+            if not tarefa.done():
+                self.pilhas[";".join(_pilha_da_tarefa(tarefa))] += 1
+        frame = sys._current_frames().get(self.thread_loop) if self.thread_loop else None
+        if frame is not None and (self.incluir_ociosos or not _ocioso(frame)):
+            self.pilhas[";".join(["loop"] + _pilha_do_frame(frame))] += 1
+
+    def executar(self, duracao: float) -> "Perfilador":
+        """Sample for ``duracao`` seconds on the calling thread (blocking)"""
+        proprio = threading.get_ident()
+        fim = time.monotonic() + duracao
+        proximo = time.monotonic()
+        while proximo < fim:
+            if self.modo == "threads":
+                self._amostrar_threads(proprio)
+            else:
+                self._amostrar_tarefas()
+            self.amostras += 1
+            proximo += self.intervalo
+            time.sleep(max(proximo - time.monotonic(), 0))
+        return self
+
+    def colapsado(self) -> str:
+        """Collapsed stacks, heaviest first"""
+        return "".join(f"{pilha} {contagem}\n" for pilha, contagem in self.pilhas.most_common())
+
+
+_em_andamento = threading.Lock()
+
+
+def perfilar(duracao: float, modo: str = "threads", intervalo: float = 0.01,
+             incluir_ociosos: bool = False, loop: Optional[asyncio.AbstractEventLoop] = None,
+             thread_loop: Optional[int] = None) -> Tuple[str, int]:
+    """Run one profile (one at a time per process); returns the collapsed text and the sample count.
+
+    Raises RuntimeError if another profile is running.
+    """
+    if not _em_andamento.acquire(blocking=False):
+        raise RuntimeError("já existe um perfil em andamento")
+    try:
+        perfilador = Perfilador(modo, intervalo, incluir_ociosos, loop, thread_loop).executar(duracao)
+        return perfilador.colapsado(), perfilador.amostras
+    finally:
+        _em_andamento.release()
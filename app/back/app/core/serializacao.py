@@ -0,0 +1,246 @@
+"""
+Fast-path JSON responses for rows that come straight from the database.
+
+A read endpoint normally builds one Pydantic model per row in the service and
+FastAPI validates and serializes the whole list again through
+``response_model``. For rows read from our own tables that work only checks
+what the schema constraints and the write path already guarantee, so
+``resposta_rapida`` skips it: each row is projected onto the response model's
+fields (same keys, same order, defaults for missing optional fields) and the
+result is encoded in one call by orjson. When the service hands over a
+:class:`~app.db.linhas.Linhas` page (tuple rows from a plain cursor), the model
+fields are mapped to column positions once per page and each output object is
+built straight from the tuple, with no per-row dict in between.
+
+List endpoints also take :func:`formato_resposta` as a dependency:
+``?format=columnar`` sends the column names once and one array of values per
+column (``DadosColunares``; for the *ListResponse envelopes only ``data``
+changes), and ``Accept: application/msgpack`` encodes the same content as
+MessagePack when the ``msgpack`` package is installed.
+
+The bytes are the same FastAPI would produce for the validated models; see
+tests/test_serializacao.py. The remaining differences are deliberate: values
+are not coerced or re-validated (e.g. EmailStr normalization, which already
+happened when the row was written).
+"""
+import json
+import typing
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple, Type
+
+from fastapi import Query, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.config import settings
+from app.db.linhas import Linha, Linhas
+from app.schemas.base import FormatoLista
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+TIPOS_MSGPACK = ("application/msgpack", "application/x-msgpack")
+
+# (field name, default value, nested plan, nested is a list)
+_Campo = Tuple[str, Any, Optional[tuple], bool]
+
+
+def _modelo_aninhado(anotacao) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """Return (model, is_list) if the annotation is Model, Optional[Model] or List[Model]"""
+    origem = typing.get_origin(anotacao)
+    if origem is typing.Union:
+        argumentos = [a for a in typing.get_args(anotacao) if a is not type(None)]
+        return _modelo_aninhado(argumentos[0]) if len(argumentos) == 1 else (None, False)
+    if origem in (list, List):
+        modelo, _ = _modelo_aninhado(typing.get_args(anotacao)[0])
+        return modelo, modelo is not None
+    if isinstance(anotacao, type) and issubclass(anotacao, BaseModel):
+        return anotacao, False
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def _plano(modelo: Type[BaseModel]) -> Tuple[_Campo, ...]:
+    campos = []
+    for nome, info in modelo.model_fields.items():
+        aninhado, lista = _modelo_aninhado(info.annotation)
+        padrao = None if info.is_required() else info.get_default(call_default_factory=True)
+        campos.append((nome, padrao, _plano(aninhado) if aninhado else None, lista))
+    return tuple(campos)
+
+
+def _projetar(plano: Tuple[_Campo, ...], row: Mapping[str, Any]) -> Dict[str, Any]:
+    if isinstance(row, BaseModel):
+        # Already validated when built; its fields are read as they are
+        row = row.__dict__
+    saida = {}
+    for nome, padrao, aninhado, lista in plano:
+        valor = row.get(nome, padrao)
+        if aninhado is not None and valor is not None:
+            valor = _projetar_lista(aninhado, valor) if lista else _projetar(aninhado, valor)
+        saida[nome] = valor
+    return saida
+
+
+def _projetar_lista(plano: Tuple[_Campo, ...], rows) -> List[Dict[str, Any]]:
+    if isinstance(rows, Linhas):
+        return _projetar_tuplas(plano, rows)
+    return [_projetar(plano, row) for row in rows]
+
+
+def _projetar_tuplas(plano: Tuple[_Campo, ...], linhas: Linhas) -> List[Dict[str, Any]]:
+    indices = linhas.colunas.indices
+    if any(aninhado is not None for _, _, aninhado, _ in plano):
+        # Nested models need the mapping path; Linha gives it without copying
+        return [_projetar(plano, Linha(linhas.colunas, valores)) for valores in linhas.tuplas]
+    nomes = tuple(nome for nome, _, _, _ in plano)
+    if len(nomes) > 1 and all(nome in indices for nome in nomes):
+        # Every field is a column: one C-level itemgetter call per row
+        valores_de = itemgetter(*(indices[nome] for nome in nomes))
+        return [dict(zip(nomes, valores_de(valores))) for valores in linhas.tuplas]
+    posicoes = tuple((nome, indices.get(nome), padrao) for nome, padrao, _, _ in plano)
+    return [
+        {nome: padrao if indice is None else valores[indice] for nome, indice, padrao in posicoes}
+        for valores in linhas.tuplas
+    ]
+
+
+def _colunar(plano: Tuple[_Campo, ...], rows) -> Dict[str, List[Any]]:
+    """Transpose a page into ``DadosColunares``"""
+    nomes = [nome for nome, _, _, _ in plano]
+    if isinstance(rows, Linhas) and all(aninhado is None for _, _, aninhado, _ in plano):
+        indices = rows.colunas.indices
+        if all(nome in indices for nome in nomes):
+            # zip(*) transposes the tuples in C; the page is never turned into objects
+            transposta = list(zip(*rows.tuplas)) or [()] * len(rows.colunas)
+            return {"columns": nomes, "values": [list(transposta[indices[nome]]) for nome in nomes]}
+    objetos = _projetar_lista(plano, rows)
+    return {"columns": nomes, "values": [[objeto[nome] for objeto in objetos] for nome in nomes]}
+
+
+def _projetar_colunar(plano: Tuple[_Campo, ...], row) -> Dict[str, Any]:
+    """Project an envelope (e.g. a *ListResponse), turning its lists of models columnar"""
+    if isinstance(row, BaseModel):
+        row = row.__dict__
+    saida = {}
+    for nome, padrao, aninhado, lista in plano:
+        valor = row.get(nome, padrao)
+        if aninhado is not None and valor is not None:
+            valor = _colunar(aninhado, valor) if lista else _projetar(aninhado, valor)
+        saida[nome] = valor
+    return saida
+
+
+def _padrao_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, Decimal):
+        # As pydantic does for Decimal fields: a string, with no precision lost to float
+        return str(valor)
+    raise TypeError(f"Type is not JSON serializable: {type(valor).__name__}")
+
+
+def codificar(conteudo: Any) -> bytes:
+    """Compact UTF-8 JSON, byte-compatible with FastAPI's JSONResponse.render"""
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_padrao_json)
+    return json.dumps(
+        conteudo, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_padrao_json
+    ).encode("utf-8")
+
+
+def _msgpack(conteudo: Any) -> bytes:
+    return msgpack.packb(conteudo, default=_padrao_json)
+
+
+class FormatoResposta(NamedTuple):
+    colunar: bool = False
+    msgpack: bool = False
+
+
+def formato_resposta(
+    request: Request,
+    formato: FormatoLista = Query(
+        FormatoLista.objetos, alias="format",
+        description="objects (padrão) ou columnar: nomes das colunas uma vez e um array de valores por coluna"
+    )
+) -> FormatoResposta:
+    """Dependency for list endpoints: ``?format=`` plus MessagePack negotiation via ``Accept``.
+
+    Without the ``msgpack`` package the response stays JSON, which every
+    client of these endpoints accepts anyway.
+    """
+    aceita = request.headers.get("accept", "")
+    return FormatoResposta(
+        colunar=formato == FormatoLista.colunar,
+        msgpack=msgpack is not None and any(tipo in aceita for tipo in TIPOS_MSGPACK),
+    )
+
+
+def _modelo_e_lista(tipo) -> Tuple[Type[BaseModel], bool]:
+    modelo, lista = _modelo_aninhado(tipo)
+    if modelo is None:
+        raise TypeError(f"Unsupported response type for the fast path: {tipo!r}")
+    return modelo, lista
+
+
+_adaptador = lru_cache(maxsize=None)(TypeAdapter)
+
+
+def _validado(tipo, dados: Any) -> Any:
+    adaptador = _adaptador(tipo)
+    if isinstance(dados, Linhas):
+        dados = dados.dicts()
+    return adaptador.dump_python(adaptador.validate_python(dados), mode="json")
+
+
+def resposta_validada(tipo, dados: Any, status_code: int = 200) -> Response:
+    """What FastAPI does with ``response_model=tipo``: validate, dump in JSON mode, render"""
+    return JSONResponse(_validado(tipo, dados), status_code=status_code)
+
+
+def resposta_rapida(tipo, dados: Any, status_code: int = 200,
+                    formato: Optional[FormatoResposta] = None) -> Response:
+    """Serialize trusted rows (a mapping, a list of mappings or ``Linhas``) as ``tipo``.
+
+    ``tipo`` is the endpoint's response model, ``Model``, ``List[Model]`` or a
+    *ListResponse envelope; models are accepted in place of mappings.
+    ``formato`` comes from :func:`formato_resposta`. With ``FAST_SERIALIZATION``
+    off the data is validated first, as FastAPI would.
+    """
+    modelo, lista = _modelo_e_lista(tipo)
+    plano = _plano(modelo)
+    negociado = formato is not None
+    formato = formato or FormatoResposta()
+    if not settings.FAST_SERIALIZATION:
+        if formato == FormatoResposta():
+            return resposta_validada(tipo, dados, status_code)
+        dados = _validado(tipo, dados)
+
+    if lista:
+        conteudo = _colunar(plano, dados) if formato.colunar else _projetar_lista(plano, dados)
+    else:
+        conteudo = _projetar_colunar(plano, dados) if formato.colunar else _projetar(plano, dados)
+
+    if formato.msgpack:
+        corpo, tipo_conteudo = _msgpack(conteudo), TIPOS_MSGPACK[0]
+    else:
+        corpo, tipo_conteudo = codificar(conteudo), "application/json"
+    resposta = Response(content=corpo, status_code=status_code, media_type=tipo_conteudo)
+    if negociado:
+        # Caches must keep the JSON and MessagePack bodies apart
+        resposta.headers["Vary"] = "Accept"
+    return resposta
@@ -0,0 +1,32 @@
+"""
+Text normalization shared by the in-memory search structures.
+
+``normalizar`` folds case and accents and collapses whitespace, so "Coração",
+"coracao" and "  CORAÇÃO " compare equal. The database side is the SQL
+function ``normalizar_busca`` (migration 0009), behind the generated
+``titulo_busca``/``nome_busca`` columns; both give the same result for Latin text.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+_ESPACOS = re.compile(r"\s+")
+_SEPARADORES = re.compile(r"[^\w]+")
+
+
+@lru_cache(maxsize=4096)
+def normalizar(texto: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return _ESPACOS.sub(" ", sem_acentos.casefold()).strip()
+
+
+def palavras(texto: str) -> List[str]:
+    """Normalized words, punctuation dropped"""
+    return [palavra for palavra in _SEPARADORES.split(normalizar(texto)) if palavra]
+
+
+def escapar_like(texto: str) -> str:
+    """``texto`` matched literally inside a LIKE pattern (``%`` and ``_`` are not wildcards)"""
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
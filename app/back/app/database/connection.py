@@ -1,16 +1,17 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from contextlib import contextmanager
 import time
 import logging
 from app.core.config import settings
+from app.db.instrumentacao import CursorDictInstrumentado
+from app.db.linhas import CursorTuplas
 
 logger = logging.getLogger(__name__)
 
 class Database:
     def __init__(self):
+        # Conecta no primeiro uso: importar os serviços não exige um banco no ar
         self.connection = None
-        self.connect()
     
     def connect(self):
         max_retries = 5
@@ -24,7 +25,7 @@ class Database:
                     database=settings.DATABASE_NAME,
                     user=settings.DATABASE_USER,
                     password=settings.DATABASE_PASSWORD,
-                    cursor_factory=RealDictCursor
+                    cursor_factory=CursorDictInstrumentado
                 )
                 logger.info("Conectado ao banco de dados PostgreSQL")
                 break
@@ -39,16 +40,24 @@ class Database:
     def close(self):
         if self.connection:
             self.connection.close()
+            self.connection = None
             logger.info("Conexão com banco de dados fechada")
     
+    def conexao(self):
+        if self.connection is None or self.connection.closed:
+            self.connect()
+        return self.connection
+    
     @contextmanager
-    def get_cursor(self):
-        cursor = self.connection.cursor()
+    def get_cursor(self, tuplas: bool = False):
+        # tuplas=True: linhas como tuplas, para leituras em lote com app.db.linhas.Linhas
+        connection = self.conexao()
+        cursor = connection.cursor(cursor_factory=CursorTuplas) if tuplas else connection.cursor()
         try:
             yield cursor
-            self.connection.commit()
+            connection.commit()
         except Exception as e:
-            self.connection.rollback()
+            connection.rollback()
             raise e
         finally:
             cursor.close()
@@ -57,7 +66,7 @@ class Database:
 db = Database()
 
 def get_db_connection():
-    return db.connection
+    return db.conexao()
 
-def get_db_cursor():
-    return db.get_cursor()
+def get_db_cursor(tuplas: bool = False):
+    return db.get_cursor(tuplas)
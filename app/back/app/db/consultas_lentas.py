@@ -0,0 +1,180 @@
+"""
+Slow-query recorder.
+
+A listener of app.db.instrumentacao: every statement slower than the
+threshold becomes a record with the statement text, redacted parameters,
+duration, row count, route and the application frame that issued it. Records
+go to an in-memory ring buffer (served by the admin endpoint) and, one JSON
+line each, to a rotating log file.
+
+For a sampled fraction of SELECT/WITH statements a background thread re-runs
+``EXPLAIN (FORMAT JSON)`` with the original parameters on its own read-only
+connection, and attaches the plan to the record. The request thread only
+builds the record and enqueues it; file I/O and EXPLAIN never run on it.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import sysconfig
+import threading
+from collections import deque
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+from app.core.config import settings
+from app.db.instrumentacao import Execucao, coletor_atual
+
+logger = logging.getLogger(__name__)
+
+# Frames from these directories are data-layer plumbing, not the caller
+_DIRETORIOS_IGNORADOS = (
+    os.path.dirname(os.path.abspath(__file__)),
+    os.path.abspath(sysconfig.get_paths()["stdlib"]),
+)
+
+_EXPLICAVEIS = ("select", "with")
+
+
+def redigir(parametros: Any) -> Any:
+    """Parameters safe to store: text becomes ``<str:N>``, other scalars are kept"""
+    if parametros is None:
+        return None
+    if isinstance(parametros, dict):
+        return {chave: redigir(valor) for chave, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        return [redigir(valor) for valor in parametros]
+    if isinstance(parametros, str):
+        return f"<str:{len(parametros)}>"
+    if isinstance(parametros, (bytes, bytearray, memoryview)):
+        return f"<bytes:{len(parametros)}>"
+    if isinstance(parametros, (bool, int, float, Decimal)):
+        return parametros
+    if isinstance(parametros, (date, datetime)):
+        return parametros.isoformat()
+    return f"<{type(parametros).__name__}>"
+
+
+def chamador() -> Optional[str]:
+    """``arquivo:linha in função`` of the first frame outside the data layer and libraries"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        arquivo = os.path.abspath(frame.f_code.co_filename)
+        if not arquivo.startswith(_DIRETORIOS_IGNORADOS) and "site-packages" not in arquivo:
+            return f"{os.path.relpath(arquivo)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class GravadorConsultasLentas:
+    def __init__(self, limite_ms: float, amostragem: float, capacidade: int,
+                 arquivo: Optional[str] = None, dsn: Optional[str] = None):
+        self.limite = limite_ms / 1000
+        self.amostragem = amostragem
+        self.registros: deque = deque(maxlen=capacidade)
+        self.dsn = dsn
+        self._lock = threading.Lock()
+        self._fila: "queue.Queue" = queue.Queue(maxsize=1000)
+        self._conexao = None
+        self._log = None
+        if arquivo:
+            os.makedirs(os.path.dirname(arquivo) or ".", exist_ok=True)
+            self._log = logging.getLogger(f"{__name__}.arquivo")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            self._log.handlers = [logging.handlers.RotatingFileHandler(
+                arquivo, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
+            )]
+        self._thread = threading.Thread(target=self._trabalhar, name="consultas-lentas", daemon=True)
+        self._thread.start()
+
+    def __call__(self, execucao: Execucao) -> None:
+        if execucao.duracao < self.limite:
+            return
+        coletor = coletor_atual()
+        registro = {
+            "em": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "duracao_ms": round(execucao.duracao * 1000, 2),
+            "linhas": execucao.linhas,
+            "rota": coletor.rota if coletor else None,
+            "chamador": chamador(),
+            "formato": execucao.sql,
+            "sql": execucao.texto,
+            "parametros": redigir(execucao.parametros),
+        }
+        explicar = (
+            self.dsn is not None
+            and execucao.texto.lstrip().lower().startswith(_EXPLICAVEIS)
+            and random.random() < self.amostragem
+        )
+        if explicar:
+            # Filled in by the worker; the key exists already so readers never see the dict grow
+            registro["plano"] = None
+        with self._lock:
+            self.registros.append(registro)
+        try:
+            # The raw parameters only travel to the EXPLAIN thread, they are never stored
+            self._fila.put_nowait((registro, execucao.parametros if explicar else None, explicar))
+        except queue.Full:
+            logger.warning("Fila de consultas lentas cheia; registro não gravado em disco")
+
+    def recentes(self, limite: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.registros)[-limite:][::-1]
+
+    def encerrar(self) -> None:
+        self._fila.put(None)
+        self._thread.join(timeout=5)
+
+    def _trabalhar(self) -> None:
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            registro, parametros, explicar = item
+            if explicar:
+                registro["plano"] = self._explicar(registro["sql"], parametros)
+            if self._log:
+                self._log.info(json.dumps(registro, ensure_ascii=False, default=str))
+        if self._conexao is not None:
+            self._conexao.close()
+
+    def _explicar(self, sql: str, parametros: Any) -> Any:
+        try:
+            if self._conexao is None or self._conexao.closed:
+                self._conexao = psycopg2.connect(self.dsn)
+                self._conexao.set_session(readonly=True)
+            with self._conexao.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = '5s'")
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, parametros)
+                plano = cursor.fetchone()[0]
+            self._conexao.rollback()
+            return plano
+        except Exception as e:
+            if self._conexao is not None and not self._conexao.closed:
+                self._conexao.rollback()
+            return {"erro": str(e)}
+
+
+gravador: Optional[GravadorConsultasLentas] = None
+
+
+def configurar() -> Optional[GravadorConsultasLentas]:
+    """Create the process-wide recorder from settings (None when SLOW_QUERY_MS is 0)"""
+    global gravador
+    if settings.SLOW_QUERY_MS <= 0:
+        return None
+    gravador = GravadorConsultasLentas(
+        limite_ms=settings.SLOW_QUERY_MS,
+        amostragem=settings.SLOW_QUERY_EXPLAIN_SAMPLE,
+        capacidade=settings.SLOW_QUERY_BUFFER,
+        arquivo=settings.SLOW_QUERY_LOG_FILE or None,
+        dsn=settings.database_url,
+    )
+    return gravador
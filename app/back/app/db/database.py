@@ -4,9 +4,12 @@ Database connection and pool management
 import psycopg2
 from psycopg2 import pool
 import logging
+import time
 from typing import Optional
 from contextlib import contextmanager
 from app.core.config import settings
+from app.core import metricas
+from app.db.instrumentacao import CursorInstrumentado
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +27,8 @@ class DatabaseManager:
                 port=settings.DATABASE_PORT,
                 database=settings.DATABASE_NAME,
                 user=settings.DATABASE_USER,
-                password=settings.DATABASE_PASSWORD
+                password=settings.DATABASE_PASSWORD,
+                cursor_factory=CursorInstrumentado
             )
             logger.info("Connection pool created successfully")
         except Exception as e:
@@ -37,12 +41,41 @@ class DatabaseManager:
             self.connection_pool.closeall()
             logger.info("Connection pool closed")
     
+    def getconn(self):
+        """Check a connection out of the pool, recording wait time and exhaustion"""
+        inicio = time.perf_counter()
+        try:
+            return self.connection_pool.getconn()
+        except pool.PoolError:
+            metricas.pool_esgotado.somar(1)
+            raise
+        finally:
+            metricas.espera_pool.observar(time.perf_counter() - inicio)
+    
+    def putconn(self, connection, close: bool = False):
+        self.connection_pool.putconn(connection, close=close)
+    
+    def stats(self) -> dict:
+        """Pool occupancy: configured bounds, open, checked-out and idle connections"""
+        if not self.connection_pool:
+            return {}
+        # ThreadedConnectionPool keeps idle connections in _pool and checked-out ones in _used
+        em_uso = len(self.connection_pool._used)
+        ociosas = len(self.connection_pool._pool)
+        return {
+            "min": self.connection_pool.minconn,
+            "max": self.connection_pool.maxconn,
+            "open": em_uso + ociosas,
+            "checked_out": em_uso,
+            "idle": ociosas,
+        }
+    
     @contextmanager
     def get_connection(self):
         """Get connection from pool with proper cleanup"""
         connection = None
         try:
-            connection = self.connection_pool.getconn()
+            connection = self.getconn()
             yield connection
         except Exception as e:
             if connection:
@@ -51,7 +84,7 @@ class DatabaseManager:
             raise
         finally:
             if connection:
-                self.connection_pool.putconn(connection)
+                self.putconn(connection)
 
 # Global database manager instance
 db_manager = DatabaseManager()
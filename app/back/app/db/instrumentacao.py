@@ -0,0 +1,152 @@
+"""
+Statement instrumentation for the data layer.
+
+Every connection (the global one in app.database.connection and the pool in
+app.db.database) is opened with one of the cursor classes below. They time
+each execute and report it to the collector of the current request, kept in a
+context variable: the request middleware (app.core.instrumentacao) installs a
+:class:`ColetorConsultas`, and the context is copied into the worker threads
+that run sync endpoints, so statements land in the right request. Outside a
+request (jobs, migrations) nothing is collected.
+
+Process-wide listeners (``ouvintes``: the Prometheus statement histogram, the
+slow-query recorder) get every statement, in or out of a request, as an
+:class:`Execucao`. With no collector and no listener the overhead is one
+``ContextVar.get``.
+"""
+import re
+import time
+from contextvars import ContextVar, Token
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+_COMENTARIOS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_TEXTOS = re.compile(r"'(?:[^']|'')*'")
+_PARAMETROS = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMEROS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalizar_sql(sql: str) -> str:
+    """Statement shape: literals and parameters become ``?``, whitespace collapses"""
+    sql = _COMENTARIOS.sub(" ", sql)
+    sql = _TEXTOS.sub("?", sql)
+    sql = _PARAMETROS.sub("?", sql)
+    sql = _NUMEROS.sub("?", sql)
+    sql = _LISTAS.sub("(...)", sql)
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+class Consulta(NamedTuple):
+    sql: str
+    duracao: float
+    linhas: int
+
+
+class Execucao(NamedTuple):
+    """What listeners receive; ``texto`` and ``parametros`` are raw, handle with care"""
+    sql: str
+    texto: str
+    parametros: Any
+    duracao: float
+    linhas: int
+
+
+class ColetorConsultas:
+    """Statements run while serving one request"""
+
+    __slots__ = ("consultas", "rota")
+
+    def __init__(self):
+        self.consultas: List[Consulta] = []
+        self.rota: Optional[str] = None
+
+    @property
+    def duracao(self) -> float:
+        return sum(consulta.duracao for consulta in self.consultas)
+
+    def por_formato(self) -> Dict[str, Dict[str, float]]:
+        """Count, total seconds and rows per statement shape, most frequent first"""
+        formatos: Dict[str, Dict[str, float]] = {}
+        for consulta in self.consultas:
+            resumo = formatos.setdefault(consulta.sql, {"vezes": 0, "duracao": 0.0, "linhas": 0})
+            resumo["vezes"] += 1
+            resumo["duracao"] += consulta.duracao
+            resumo["linhas"] += max(consulta.linhas, 0)
+        return dict(sorted(formatos.items(), key=lambda item: -item[1]["vezes"]))
+
+    def repetidas(self, limite: int) -> Dict[str, int]:
+        """Shapes run more than ``limite`` times (likely N+1 loops)"""
+        return {sql: int(resumo["vezes"]) for sql, resumo in self.por_formato().items() if resumo["vezes"] > limite}
+
+
+_coletor: ContextVar[Optional[ColetorConsultas]] = ContextVar("coletor_consultas", default=None)
+
+ouvintes: List[Callable[[Execucao], None]] = []
+
+
+def iniciar_coleta() -> Token:
+    return _coletor.set(ColetorConsultas())
+
+
+def encerrar_coleta(token: Token) -> None:
+    _coletor.reset(token)
+
+
+def coletor_atual() -> Optional[ColetorConsultas]:
+    return _coletor.get()
+
+
+def _texto(cursor, query) -> str:
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    if isinstance(query, str):
+        return query
+    # psycopg2.sql.Composed
+    return query.as_string(cursor)
+
+
+class _Instrumentado:
+    def execute(self, query, vars=None):
+        coletor = _coletor.get()
+        if coletor is None and not ouvintes:
+            return super().execute(query, vars)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _registrar(coletor, self, query, vars, time.perf_counter() - inicio)
+
+    def executemany(self, query, vars_list):
+        coletor = _coletor.get()
+        if coletor is None and not ouvintes:
+            return super().executemany(query, vars_list)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _registrar(coletor, self, query, vars_list, time.perf_counter() - inicio)
+
+
+def _registrar(coletor: Optional[ColetorConsultas], cursor, query, parametros, duracao: float) -> None:
+    texto = _texto(cursor, query)
+    sql = normalizar_sql(texto)
+    if coletor is not None:
+        coletor.consultas.append(Consulta(sql, duracao, cursor.rowcount))
+    if ouvintes:
+        execucao = Execucao(sql, texto, parametros, duracao, cursor.rowcount)
+        for ouvinte in ouvintes:
+            ouvinte(execucao)
+
+
+class CursorInstrumentado(_Instrumentado, psycopg2.extensions.cursor):
+    """Tuple rows"""
+
+
+class CursorDictInstrumentado(_Instrumentado, RealDictCursor):
+    """Dict rows (RealDictCursor)"""
@@ -0,0 +1,119 @@
+"""
+Tuple rows with column metadata captured once per result set.
+
+``RealDictCursor`` builds one dict per row (keys repeated in every row) and
+callers usually copy it again with ``dict(row)``. For page-sized reads we fetch
+plain tuples instead and keep the column names once, in :class:`Colunas`.
+:class:`Linhas` is the page: a list of tuples plus that shared metadata.
+Indexing it yields :class:`Linha`, a read-only mapping view over one tuple, so
+code written for dict rows (``row["nome"]``, ``row.get``, ``Model(**row)``)
+keeps working without materializing dicts. The JSON fast path
+(``app.core.serializacao``) reads the tuples directly.
+"""
+from collections import namedtuple
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.db.instrumentacao import CursorInstrumentado
+
+# Plain tuple cursor, for connections whose default factory is RealDictCursor
+CursorTuplas = CursorInstrumentado
+
+
+class Colunas:
+    """Column names of one result set and their positions"""
+
+    __slots__ = ("nomes", "indices", "_tupla_nomeada")
+
+    def __init__(self, nomes):
+        self.nomes: Tuple[str, ...] = tuple(nomes)
+        self.indices: Dict[str, int] = {nome: i for i, nome in enumerate(self.nomes)}
+        self._tupla_nomeada = None
+
+    @classmethod
+    def do_cursor(cls, cursor) -> "Colunas":
+        return cls(coluna[0] for coluna in cursor.description)
+
+    @property
+    def tupla_nomeada(self):
+        """namedtuple type for these columns, created on first use"""
+        if self._tupla_nomeada is None:
+            self._tupla_nomeada = namedtuple("Linha", self.nomes, rename=True)
+        return self._tupla_nomeada
+
+    def __len__(self) -> int:
+        return len(self.nomes)
+
+    def __repr__(self) -> str:
+        return f"Colunas{self.nomes!r}"
+
+
+class Linha(Mapping):
+    """Read-only mapping view of one tuple row"""
+
+    __slots__ = ("_colunas", "_valores")
+
+    def __init__(self, colunas: Colunas, valores: tuple):
+        self._colunas = colunas
+        self._valores = valores
+
+    def __getitem__(self, nome: str) -> Any:
+        return self._valores[self._colunas.indices[nome]]
+
+    def get(self, nome: str, padrao: Any = None) -> Any:
+        indice = self._colunas.indices.get(nome)
+        return padrao if indice is None else self._valores[indice]
+
+    def __contains__(self, nome) -> bool:
+        return nome in self._colunas.indices
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._colunas.nomes)
+
+    def __len__(self) -> int:
+        return len(self._valores)
+
+    def __repr__(self) -> str:
+        return f"Linha({dict(zip(self._colunas.nomes, self._valores))!r})"
+
+
+class Linhas(Sequence):
+    """A page of tuple rows sharing one :class:`Colunas`"""
+
+    __slots__ = ("colunas", "tuplas")
+
+    def __init__(self, colunas: Colunas, tuplas: List[tuple]):
+        self.colunas = colunas
+        self.tuplas = tuplas
+
+    @classmethod
+    def do_cursor(cls, cursor, quantidade: Optional[int] = None) -> "Linhas":
+        """Fetch the remaining rows (or ``quantidade`` of them) from a tuple cursor"""
+        tuplas = cursor.fetchall() if quantidade is None else cursor.fetchmany(quantidade)
+        return cls(Colunas.do_cursor(cursor), tuplas)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return Linhas(self.colunas, self.tuplas[indice])
+        return Linha(self.colunas, self.tuplas[indice])
+
+    def __len__(self) -> int:
+        return len(self.tuplas)
+
+    def __iter__(self) -> Iterator[Linha]:
+        colunas = self.colunas
+        return (Linha(colunas, valores) for valores in self.tuplas)
+
+    def primeira(self) -> Optional[Linha]:
+        return Linha(self.colunas, self.tuplas[0]) if self.tuplas else None
+
+    def dicts(self) -> List[Dict[str, Any]]:
+        nomes = self.colunas.nomes
+        return [dict(zip(nomes, valores)) for valores in self.tuplas]
+
+    def namedtuples(self) -> list:
+        tipo = self.colunas.tupla_nomeada
+        return [tipo._make(valores) for valores in self.tuplas]
+
+    def __repr__(self) -> str:
+        return f"Linhas({self.colunas.nomes!r}, {len(self.tuplas)} linhas)"
@@ -0,0 +1,6 @@
+"""
+Schema migrations applied on top of BD2_ONIX_SCRIPT.sql
+
+Each module is named ``vNNNN_description.py`` and is applied once, in version
+order, by ``app.db.migrator.MigrationRunner`` (see ``migrate.py``).
+"""
@@ -0,0 +1,59 @@
+"""
+Open-loan read model (EmprestimoAberto) used by the loan listings
+"""
+
+DESCRIPTION = "Modelo de leitura EmprestimoAberto com carga inicial"
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS EmprestimoAberto (
+        id_emprestimo INT PRIMARY KEY NOT NULL,
+        data_emprestimo DATE NOT NULL,
+        data_devolucao_prevista DATE,
+        id_estoque INT NOT NULL,
+        id_usuario INT NOT NULL,
+        usuario_nome VARCHAR NOT NULL,
+        usuario_email VARCHAR,
+        usuario_endereco VARCHAR,
+        usuario_telefone VARCHAR,
+        id_titulo INT NOT NULL,
+        item_titulo VARCHAR,
+        tipo_midia MidiaTipo NOT NULL,
+        id_biblioteca INT NOT NULL,
+        biblioteca_nome VARCHAR NOT NULL,
+        FOREIGN KEY (id_emprestimo) REFERENCES Emprestimo(id_emprestimo) ON DELETE CASCADE
+    )
+    """,
+    # "Mais recentes" (em andamento) e "mais atrasados" (vencidos)
+    "CREATE INDEX IF NOT EXISTS idx_emprestimo_aberto_recentes ON EmprestimoAberto (data_emprestimo DESC, id_emprestimo DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_emprestimo_aberto_vencimento ON EmprestimoAberto (data_devolucao_prevista ASC, id_emprestimo ASC)",
+    "CREATE INDEX IF NOT EXISTS idx_emprestimo_aberto_id_estoque ON EmprestimoAberto (id_estoque)",
+    "CREATE INDEX IF NOT EXISTS idx_emprestimo_aberto_id_usuario ON EmprestimoAberto (id_usuario)",
+    "CREATE INDEX IF NOT EXISTS idx_emprestimo_aberto_id_titulo ON EmprestimoAberto (id_titulo)",
+    "CREATE INDEX IF NOT EXISTS idx_emprestimo_aberto_id_biblioteca ON EmprestimoAberto (id_biblioteca)",
+    # Carga inicial a partir dos empréstimos já existentes
+    """
+    INSERT INTO EmprestimoAberto (
+        id_emprestimo, data_emprestimo, data_devolucao_prevista, id_estoque,
+        id_usuario, usuario_nome, usuario_email, usuario_endereco, usuario_telefone,
+        id_titulo, item_titulo, tipo_midia, id_biblioteca, biblioteca_nome
+    )
+    SELECT
+        e.id_emprestimo, e.data_emprestimo, e.data_devolucao_prevista, e.id_estoque,
+        u.id_usuario, u.nome, u.email, u.endereco, u.telefone,
+        t.id_titulo, COALESCE(l.titulo, r.titulo, d.titulo, a.titulo), t.tipo_midia,
+        b.id_biblioteca, b.nome
+    FROM Emprestimo e
+    INNER JOIN Usuario u ON e.id_usuario = u.id_usuario
+    INNER JOIN Estoque est ON e.id_estoque = est.id_estoque
+    INNER JOIN Titulo t ON est.id_titulo = t.id_titulo
+    INNER JOIN Biblioteca b ON est.id_biblioteca = b.id_biblioteca
+    LEFT JOIN Livros l ON t.id_titulo = l.id_livro
+    LEFT JOIN Revistas r ON t.id_titulo = r.id_revista
+    LEFT JOIN DVDs d ON t.id_titulo = d.id_dvd
+    LEFT JOIN Artigos a ON t.id_titulo = a.id_artigo
+    WHERE e.data_devolucao IS NULL
+    ON CONFLICT (id_emprestimo) DO NOTHING
+    """,
+    "ANALYZE EmprestimoAberto",
+]
@@ -0,0 +1,68 @@
+"""
+Partial and covering indexes for the open-loan predicate (data_devolucao IS NULL)
+"""
+from app.db.migrator import PlannedIndex
+
+DESCRIPTION = "Índices parciais/cobrindo para empréstimos em aberto"
+
+# Um exemplar e um usuário reais, para que os planos reflitam dados existentes
+_UM_ESTOQUE = "(SELECT id_estoque FROM Emprestimo WHERE data_devolucao IS NULL LIMIT 1)"
+_UM_TITULO = "(SELECT id_titulo FROM Estoque LIMIT 1)"
+
+INDEXES = [
+    # create_emprestimo: verificação de disponibilidade do exemplar
+    PlannedIndex(
+        name="idx_emprestimo_aberto_estoque_parcial",
+        ddl="""
+            CREATE INDEX idx_emprestimo_aberto_estoque_parcial
+            ON Emprestimo (id_estoque) WHERE data_devolucao IS NULL
+        """,
+        target_queries=[
+            (f"SELECT COUNT(*) FROM Emprestimo WHERE id_estoque = {_UM_ESTOQUE} AND data_devolucao IS NULL", ()),
+        ],
+    ),
+    # get_disponibilidade_item: exemplares de um título + anti-join com os em aberto
+    PlannedIndex(
+        name="idx_estoque_titulo_cobrindo",
+        ddl="""
+            CREATE INDEX idx_estoque_titulo_cobrindo
+            ON Estoque (id_titulo) INCLUDE (id_estoque, id_biblioteca)
+        """,
+        target_queries=[
+            (f"""
+                SELECT COUNT(*) FROM Estoque e
+                INNER JOIN Emprestimo emp ON e.id_estoque = emp.id_estoque
+                WHERE e.id_titulo = {_UM_TITULO} AND emp.data_devolucao IS NULL
+            """, ()),
+        ],
+    ),
+    # get_usuarios_com_emprestimos_em_andamento
+    PlannedIndex(
+        name="idx_emprestimo_aberto_usuario_parcial",
+        ddl="""
+            CREATE INDEX idx_emprestimo_aberto_usuario_parcial
+            ON Emprestimo (id_usuario) WHERE data_devolucao IS NULL
+        """,
+        target_queries=[
+            ("""
+                SELECT DISTINCT u.* FROM Usuario u
+                INNER JOIN Emprestimo e ON u.id_usuario = e.id_usuario
+                WHERE e.data_devolucao IS NULL
+                ORDER BY u.nome OFFSET 0 LIMIT 100
+            """, ()),
+        ],
+    ),
+    # get_relatorio_emprestimos: contagens de abertos e vencidos via index-only scan
+    PlannedIndex(
+        name="idx_emprestimo_aberto_vencimento_parcial",
+        ddl="""
+            CREATE INDEX idx_emprestimo_aberto_vencimento_parcial
+            ON Emprestimo (data_devolucao_prevista) INCLUDE (id_emprestimo)
+            WHERE data_devolucao IS NULL
+        """,
+        target_queries=[
+            ("SELECT COUNT(*) FROM Emprestimo WHERE data_devolucao IS NULL", ()),
+            ("SELECT COUNT(*) FROM Emprestimo WHERE data_devolucao IS NULL AND data_devolucao_prevista < CURRENT_DATE", ()),
+        ],
+    ),
+]
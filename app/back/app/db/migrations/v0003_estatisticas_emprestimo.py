@@ -0,0 +1,74 @@
+"""
+Incrementally maintained loan counters for the loan report
+"""
+
+DESCRIPTION = "Contadores de empréstimos e vencimentos por data"
+
+# Mesma constante de app.services.emprestimo_service._FATIAS_ESTATISTICA
+FATIAS = 8
+
+STATEMENTS = [
+    # Contadores fatiados: cada empréstimo atualiza a fatia id_emprestimo % FATIAS,
+    # para que empréstimos concorrentes não disputem o bloqueio da mesma linha.
+    """
+    CREATE TABLE IF NOT EXISTS EstatisticaEmprestimo (
+        fatia SMALLINT PRIMARY KEY NOT NULL,
+        total BIGINT NOT NULL DEFAULT 0,
+        em_andamento BIGINT NOT NULL DEFAULT 0,
+        devolvidos BIGINT NOT NULL DEFAULT 0,
+        vencidos_consolidados BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    # Empréstimos em aberto por data prevista de devolução. Vencidos = soma dos
+    # baldes anteriores a hoje + vencidos_consolidados (baldes já dobrados pelo job).
+    """
+    CREATE TABLE IF NOT EXISTS VencimentoEmprestimo (
+        data_devolucao_prevista DATE NOT NULL,
+        fatia SMALLINT NOT NULL,
+        em_aberto BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (data_devolucao_prevista, fatia)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS EstatisticaEmprestimoCorte (
+        id SMALLINT PRIMARY KEY NOT NULL DEFAULT 1 CHECK (id = 1),
+        consolidado_ate DATE NOT NULL
+    )
+    """,
+    # Carga inicial a partir da tabela base
+    "LOCK TABLE Emprestimo IN SHARE MODE",
+    f"""
+    INSERT INTO EstatisticaEmprestimo (fatia)
+    SELECT generate_series(0, {FATIAS - 1})
+    ON CONFLICT (fatia) DO NOTHING
+    """,
+    """
+    UPDATE EstatisticaEmprestimo s
+    SET total = c.total,
+        em_andamento = c.em_andamento,
+        devolvidos = c.devolvidos,
+        vencidos_consolidados = c.vencidos
+    FROM (
+        SELECT
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE data_devolucao IS NULL) AS em_andamento,
+            COUNT(*) FILTER (WHERE data_devolucao IS NOT NULL) AS devolvidos,
+            COUNT(*) FILTER (WHERE data_devolucao IS NULL AND data_devolucao_prevista < CURRENT_DATE) AS vencidos
+        FROM Emprestimo
+    ) c
+    WHERE s.fatia = 0
+    """,
+    """
+    INSERT INTO VencimentoEmprestimo (data_devolucao_prevista, fatia, em_aberto)
+    SELECT data_devolucao_prevista, 0, COUNT(*)
+    FROM Emprestimo
+    WHERE data_devolucao IS NULL AND data_devolucao_prevista >= CURRENT_DATE
+    GROUP BY data_devolucao_prevista
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO EstatisticaEmprestimoCorte (id, consolidado_ate)
+    VALUES (1, CURRENT_DATE)
+    ON CONFLICT (id) DO NOTHING
+    """,
+]
@@ -0,0 +1,313 @@
+"""
+Range-partition Emprestimo (monthly, data_emprestimo) and Penalizacao (yearly,
+Final_penalizacao), moving the existing rows online.
+
+For each table: a partitioned copy is created next to the original and a
+trigger logs the id of every row written on the original from then on. The
+existing rows are copied in small autocommitted batches, the logged ids are
+re-synced from the original in rounds until the backlog is small, and the last
+round plus the name swap run inside one short transaction holding ACCESS
+EXCLUSIVE on the original. The original is kept as ``<tabela>_legado`` until
+someone drops it by hand.
+
+A unique constraint on a partitioned table must contain the partition key, so
+id_emprestimo can no longer be referenced by foreign keys: the FKs from
+Penalizacao and EmprestimoAberto to Emprestimo are dropped in the swap.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import date
+
+from psycopg2 import sql
+
+from app.core.config import settings
+from app.db.particionamento import EMPRESTIMO, PENALIZACAO, Particionamento, garantir_particoes, meses_adiante, particionada
+
+logger = logging.getLogger(__name__)
+
+DESCRIPTION = "Particionamento por data de Emprestimo e Penalizacao"
+
+TRANSACTIONAL = False
+
+STATEMENTS = [
+    # Destination of detached partitions (see app.jobs.particoes)
+    "CREATE SCHEMA IF NOT EXISTS arquivo",
+    """
+    CREATE TABLE IF NOT EXISTS ParticaoArquivada (
+        particao VARCHAR PRIMARY KEY NOT NULL,
+        tabela VARCHAR NOT NULL,
+        esquema VARCHAR NOT NULL,
+        inicio DATE NOT NULL,
+        fim DATE NOT NULL,
+        linhas BIGINT NOT NULL,
+        arquivada_em TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+]
+
+LOTE = 10000
+# Re-sync rounds stop (and the locked swap starts) below this many logged ids
+RESTANTES_PARA_TROCA = 1000
+
+
+class _Tabela:
+    def __init__(self, part: Particionamento, id_coluna: str, colunas, ddl: str, indices, planejados=()):
+        self.part = part
+        self.nome = part.tabela
+        self.nova = f"{part.tabela}_nova"
+        self.legado = f"{part.tabela}_legado"
+        self.alterados = f"{part.tabela}_migracao_alterados"
+        self.id_coluna = id_coluna
+        self.colunas = colunas
+        self.ddl = ddl
+        # (canonical name, column list / predicate) created on the partitioned parent
+        self.indices = indices
+        # Same, but only recreated if the original has them: planned indexes (app.db.migrator)
+        # of earlier migrations are dropped when the plan check finds no gain
+        self.planejados = planejados
+        self.criados = list(indices)
+
+
+TABELAS = [
+    _Tabela(
+        EMPRESTIMO,
+        "id_emprestimo",
+        ["id_emprestimo", "data_emprestimo", "data_devolucao_prevista", "data_devolucao", "id_estoque", "id_usuario"],
+        """
+        CREATE TABLE emprestimo_nova (
+            id_emprestimo INT NOT NULL DEFAULT nextval('emprestimo_id_emprestimo_seq'),
+            data_emprestimo DATE NOT NULL,
+            data_devolucao_prevista DATE,
+            data_devolucao DATE,
+            id_estoque INT NOT NULL,
+            id_usuario INT NOT NULL,
+            PRIMARY KEY (id_emprestimo, data_emprestimo),
+            FOREIGN KEY (id_estoque) REFERENCES Estoque(id_estoque),
+            FOREIGN KEY (id_usuario) REFERENCES Usuario(id_usuario)
+        ) PARTITION BY RANGE (data_emprestimo)
+        """,
+        [
+            ("idx_emprestimo_id_estoque", "(id_estoque)"),
+            ("idx_emprestimo_id_usuario", "(id_usuario)"),
+            ("idx_emprestimo_data_emprestimo", "(data_emprestimo)"),
+            ("idx_emprestimo_data_devolucao_prevista", "(data_devolucao_prevista)"),
+            ("idx_emprestimo_data_devolucao", "(data_devolucao)"),
+            # Lets the archive job tell fully returned partitions apart cheaply
+            ("idx_emprestimo_em_aberto", "(data_emprestimo) WHERE data_devolucao IS NULL"),
+        ],
+        # Migration 0002: open-loan partial indexes
+        [
+            ("idx_emprestimo_aberto_estoque_parcial", "(id_estoque) WHERE data_devolucao IS NULL"),
+            ("idx_emprestimo_aberto_usuario_parcial", "(id_usuario) WHERE data_devolucao IS NULL"),
+            ("idx_emprestimo_aberto_vencimento_parcial",
+             "(data_devolucao_prevista) INCLUDE (id_emprestimo) WHERE data_devolucao IS NULL"),
+        ],
+    ),
+    _Tabela(
+        PENALIZACAO,
+        "id_penalizacao",
+        ["id_penalizacao", "descricao", "final_penalizacao", "id_usuario", "id_emprestimo"],
+        """
+        CREATE TABLE penalizacao_nova (
+            id_penalizacao INT NOT NULL DEFAULT nextval('penalizacao_id_penalizacao_seq'),
+            descricao TEXT,
+            Final_penalizacao DATE,
+            id_usuario INT,
+            id_emprestimo INT,
+            UNIQUE (id_penalizacao, Final_penalizacao),
+            FOREIGN KEY (id_usuario) REFERENCES Usuario(id_usuario)
+        ) PARTITION BY RANGE (Final_penalizacao)
+        """,
+        [
+            ("idx_penalizacao_id_usuario", "(id_usuario)"),
+            ("idx_penalizacao_id_emprestimo", "(id_emprestimo)"),
+        ],
+    ),
+]
+
+
+def _identificadores(t: _Tabela):
+    return {
+        "nome": sql.Identifier(t.nome),
+        "nova": sql.Identifier(t.nova),
+        "legado": sql.Identifier(t.legado),
+        "alterados": sql.Identifier(t.alterados),
+        "padrao": sql.Identifier(t.part.padrao),
+        "coluna": sql.Identifier(t.part.coluna),
+        "id": sql.Identifier(t.id_coluna),
+        "funcao": sql.Identifier(f"{t.nome}_registrar_alteracao"),
+        "gatilho": sql.Identifier(f"{t.nome}_migracao"),
+        "colunas": sql.SQL(", ").join(map(sql.Identifier, t.colunas)),
+    }
+
+
+@contextmanager
+def _transacao(conn):
+    """Explicit transaction on an autocommit connection"""
+    with conn.cursor() as cursor:
+        cursor.execute("BEGIN")
+        try:
+            yield cursor
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+
+def _preparar(conn, t: _Tabela):
+    """Partitioned copy, its partitions and indexes, plus the change-log trigger"""
+    ident = _identificadores(t)
+    with _transacao(conn) as cursor:
+        # Leftovers of an interrupted run are rebuilt from scratch
+        cursor.execute(sql.SQL("DROP TRIGGER IF EXISTS {gatilho} ON {nome}").format(**ident))
+        cursor.execute(sql.SQL("DROP FUNCTION IF EXISTS {funcao}()").format(**ident))
+        cursor.execute(sql.SQL("DROP TABLE IF EXISTS {nova} CASCADE").format(**ident))
+        cursor.execute(sql.SQL("DROP TABLE IF EXISTS {alterados}").format(**ident))
+
+        cursor.execute(t.ddl)
+        cursor.execute(sql.SQL("CREATE TABLE {padrao} PARTITION OF {nova} DEFAULT").format(**ident))
+        cursor.execute(sql.SQL("SELECT MIN({coluna}) FROM {nome}").format(**ident))
+        menor = cursor.fetchone()[0] or date.today()
+        # app.jobs.particoes keeps this window rolling afterwards
+        ate = meses_adiante(date.today(), settings.PARTICOES_MESES_A_FRENTE)
+        garantir_particoes(cursor, t.part, menor, ate, tabela=t.nova)
+        t.criados = list(t.indices)
+        for nome_indice, definicao in t.planejados:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (nome_indice,))
+            if cursor.fetchone()[0]:
+                t.criados.append((nome_indice, definicao))
+        for nome_indice, definicao in t.criados:
+            cursor.execute(sql.SQL("CREATE INDEX {} ON {} ").format(
+                sql.Identifier(f"{nome_indice}_nova"), sql.Identifier(t.nova)
+            ) + sql.SQL(definicao))
+
+        # Append-only on purpose: with a unique id, a writer that is still
+        # uncommitted could skip its entry while a re-sync round deletes the old one
+        cursor.execute(sql.SQL("CREATE TABLE {alterados} (id INT NOT NULL)").format(**ident))
+        cursor.execute(sql.SQL("""
+            CREATE FUNCTION {funcao}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    INSERT INTO {alterados} (id) VALUES (OLD.{id});
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {alterados} (id) VALUES (NEW.{id});
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """).format(**ident))
+        cursor.execute(sql.SQL("""
+            CREATE TRIGGER {gatilho}
+            AFTER INSERT OR UPDATE OR DELETE ON {nome}
+            FOR EACH ROW EXECUTE FUNCTION {funcao}()
+        """).format(**ident))
+
+
+def _copiar(conn, t: _Tabela):
+    """Backfill in id batches; each batch commits on its own"""
+    ident = _identificadores(t)
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("SELECT MIN({id}), MAX({id}) FROM {nome}").format(**ident))
+        menor, maior = cursor.fetchone()
+        if menor is None:
+            return
+        copia = sql.SQL("""
+            INSERT INTO {nova} ({colunas})
+            SELECT {colunas} FROM {nome} WHERE {id} >= %s AND {id} < %s
+        """).format(**ident)
+        for inicio in range(menor, maior + 1, LOTE):
+            cursor.execute(copia, (inicio, inicio + LOTE))
+            logger.info(f"{t.nome}: copiados ids [{inicio}, {inicio + LOTE}) ({cursor.rowcount} linhas)")
+
+
+def _ressincronizar(cursor, t: _Tabela, limite: int = None) -> int:
+    """Replace, in the copy, every row whose id the trigger logged; returns ids handled"""
+    ident = _identificadores(t)
+    if limite is None:
+        cursor.execute(sql.SQL("DELETE FROM {alterados} RETURNING id").format(**ident))
+    else:
+        cursor.execute(sql.SQL("""
+            DELETE FROM {alterados}
+            WHERE ctid IN (SELECT ctid FROM {alterados} LIMIT %s)
+            RETURNING id
+        """).format(**ident), (limite,))
+    ids = list({row[0] for row in cursor.fetchall()})
+    if ids:
+        cursor.execute(sql.SQL("DELETE FROM {nova} WHERE {id} = ANY(%s)").format(**ident), (ids,))
+        cursor.execute(sql.SQL("""
+            INSERT INTO {nova} ({colunas})
+            SELECT {colunas} FROM {nome} WHERE {id} = ANY(%s)
+        """).format(**ident), (ids,))
+    return len(ids)
+
+
+def _alcancar(conn, t: _Tabela):
+    """Drain the change log without locks until it is small enough for the swap"""
+    while True:
+        with _transacao(conn) as cursor:
+            tratados = _ressincronizar(cursor, t, LOTE)
+        logger.info(f"{t.nome}: {tratados} ids ressincronizados")
+        if tratados < RESTANTES_PARA_TROCA:
+            return
+
+
+def _trocar(conn, t: _Tabela):
+    """Short ACCESS EXCLUSIVE window: last re-sync, drop inbound FKs and swap names"""
+    ident = _identificadores(t)
+    with _transacao(conn) as cursor:
+        cursor.execute("SET LOCAL lock_timeout = '10s'")
+        cursor.execute(sql.SQL("LOCK TABLE {nome} IN ACCESS EXCLUSIVE MODE").format(**ident))
+        _ressincronizar(cursor, t)
+
+        cursor.execute(sql.SQL("SELECT (SELECT COUNT(*) FROM {nome}), (SELECT COUNT(*) FROM {nova})").format(**ident))
+        originais, copiadas = cursor.fetchone()
+        if originais != copiadas:
+            raise RuntimeError(f"{t.nome}: {originais} linhas no original, {copiadas} na cópia particionada")
+
+        cursor.execute("""
+            SELECT conrelid::regclass::text, conname
+            FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = to_regclass(%s)
+        """, (t.nome,))
+        for tabela, restricao in cursor.fetchall():
+            logger.info(f"{t.nome}: removendo FK {restricao} de {tabela}")
+            cursor.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(
+                sql.SQL(tabela), sql.Identifier(restricao)
+            ))
+
+        cursor.execute(sql.SQL("DROP TRIGGER {gatilho} ON {nome}").format(**ident))
+        cursor.execute(sql.SQL("DROP FUNCTION {funcao}()").format(**ident))
+        cursor.execute(sql.SQL("DROP TABLE {alterados}").format(**ident))
+        cursor.execute(sql.SQL("ALTER TABLE {nome} RENAME TO {legado}").format(**ident))
+        cursor.execute(sql.SQL("ALTER TABLE {nova} RENAME TO {nome}").format(**ident))
+
+        for nome_indice, _ in t.criados:
+            cursor.execute(sql.SQL("ALTER INDEX IF EXISTS {} RENAME TO {}").format(
+                sql.Identifier(nome_indice), sql.Identifier(nome_indice.replace(t.nome, t.legado, 1))
+            ))
+            cursor.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                sql.Identifier(f"{nome_indice}_nova"), sql.Identifier(nome_indice)
+            ))
+
+        # The sequence must outlive the legacy table
+        cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (t.legado, t.id_coluna))
+        sequencia = cursor.fetchone()[0]
+        cursor.execute(sql.SQL("ALTER TABLE {legado} ALTER COLUMN {id} DROP DEFAULT").format(**ident))
+        cursor.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY {}.{}").format(
+            sql.SQL(sequencia), sql.Identifier(t.nome), sql.Identifier(t.id_coluna)
+        ))
+
+
+def upgrade(conn):
+    for t in TABELAS:
+        with conn.cursor() as cursor:
+            if particionada(cursor, t.nome):
+                logger.info(f"{t.nome} já é particionada")
+                continue
+        _preparar(conn, t)
+        _copiar(conn, t)
+        _alcancar(conn, t)
+        _trocar(conn, t)
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(t.nome)))
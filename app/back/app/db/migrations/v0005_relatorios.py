@@ -0,0 +1,54 @@
+"""
+Daily rollup tables behind the /relatorios endpoints (filled by app.jobs.relatorios)
+"""
+
+DESCRIPTION = "Tabelas de agregação diária para relatórios analíticos"
+
+STATEMENTS = [
+    # Empréstimos por dia, biblioteca e tipo de mídia
+    """
+    CREATE TABLE IF NOT EXISTS RelatorioEmprestimoDia (
+        dia DATE NOT NULL,
+        id_biblioteca INT NOT NULL,
+        tipo_midia MidiaTipo NOT NULL,
+        emprestimos BIGINT NOT NULL,
+        PRIMARY KEY (dia, id_biblioteca, tipo_midia)
+    )
+    """,
+    # Histograma de duração (em dias) das devoluções de cada dia, por tipo de mídia
+    """
+    CREATE TABLE IF NOT EXISTS RelatorioDuracaoDia (
+        dia DATE NOT NULL,
+        tipo_midia MidiaTipo NOT NULL,
+        duracao_dias INT NOT NULL,
+        devolucoes BIGINT NOT NULL,
+        PRIMARY KEY (dia, tipo_midia, duracao_dias)
+    )
+    """,
+    # Empréstimos por dia, autor e tipo de mídia
+    """
+    CREATE TABLE IF NOT EXISTS RelatorioAutorDia (
+        dia DATE NOT NULL,
+        id_autor INT NOT NULL,
+        tipo_midia MidiaTipo NOT NULL,
+        emprestimos BIGINT NOT NULL,
+        PRIMARY KEY (dia, id_autor, tipo_midia)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS RelatorioPenalizacaoUsuario (
+        id_usuario INT PRIMARY KEY NOT NULL,
+        penalizacoes BIGINT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_relatorio_penalizacao_total ON RelatorioPenalizacaoUsuario (penalizacoes DESC)",
+    # Até onde cada agregação já foi processada
+    """
+    CREATE TABLE IF NOT EXISTS RelatorioCorte (
+        id SMALLINT PRIMARY KEY NOT NULL DEFAULT 1 CHECK (id = 1),
+        processado_ate DATE,
+        ultima_penalizacao INT NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT INTO RelatorioCorte (id) VALUES (1) ON CONFLICT (id) DO NOTHING",
+]
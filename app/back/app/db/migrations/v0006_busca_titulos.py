@@ -0,0 +1,21 @@
+"""
+Trigram index on mv_titulos_completos for the ranked title search fallback
+"""
+from app.db.migrator import PlannedIndex
+
+DESCRIPTION = "Índice trigrama em mv_titulos_completos para a busca por relevância"
+
+INDEXES = [
+    # EstoqueService.search_from_title (modo relevancia): termos com erro de digitação
+    # ou que o full-text descarta caem em word_similarity sobre lower(titulo)
+    PlannedIndex(
+        name="idx_mv_titulos_titulo_trgm",
+        ddl="""
+            CREATE INDEX idx_mv_titulos_titulo_trgm
+            ON mv_titulos_completos USING gin (lower(titulo) gin_trgm_ops)
+        """,
+        target_queries=[
+            ("SELECT id_titulo FROM mv_titulos_completos WHERE %s <%% lower(titulo)", ("histria",)),
+        ],
+    ),
+]
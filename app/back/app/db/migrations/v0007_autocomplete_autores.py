@@ -0,0 +1,20 @@
+"""
+Trigram index on Autores names for the autocomplete fallback
+"""
+from app.db.migrator import PlannedIndex
+
+DESCRIPTION = "Índice trigrama em lower(Autores.nome) para o autocomplete"
+
+INDEXES = [
+    # AutocompletarService.sugerir (tipo autor), quando o índice em memória não basta
+    PlannedIndex(
+        name="idx_autores_nome_trgm",
+        ddl="""
+            CREATE INDEX idx_autores_nome_trgm
+            ON Autores USING gin (lower(nome) gin_trgm_ops)
+        """,
+        target_queries=[
+            ("SELECT id_autor FROM Autores WHERE %s <%% lower(nome)", ("machdo",)),
+        ],
+    ),
+]
@@ -0,0 +1,39 @@
+"""
+Normalized identifier columns (ISBN/ISSN/ISAN/DOI) for exact lookups from search
+"""
+from app.db.migrator import PlannedIndex
+
+DESCRIPTION = "Colunas geradas codigo_normalizado em Livros, Revistas, DVDs e Artigos"
+
+# Mesmas regras de app.core.identificadores.normalizar_codigo / normalizar_doi
+_CODIGO = r"regexp_replace(upper({coluna}), '^\s*IS[BSA]N|[^0-9A-Z]', '', 'g')"
+_DOI = r"lower(regexp_replace(btrim(DOI), '^(https?://(dx\.)?doi\.org/|doi:\s*)', '', 'i'))"
+
+STATEMENTS = [
+    f"ALTER TABLE Livros ADD COLUMN IF NOT EXISTS codigo_normalizado VARCHAR "
+    f"GENERATED ALWAYS AS ({_CODIGO.format(coluna='ISBN')}) STORED",
+    f"ALTER TABLE Revistas ADD COLUMN IF NOT EXISTS codigo_normalizado VARCHAR "
+    f"GENERATED ALWAYS AS ({_CODIGO.format(coluna='ISSN')}) STORED",
+    f"ALTER TABLE DVDs ADD COLUMN IF NOT EXISTS codigo_normalizado VARCHAR "
+    f"GENERATED ALWAYS AS ({_CODIGO.format(coluna='ISAN')}) STORED",
+    f"ALTER TABLE Artigos ADD COLUMN IF NOT EXISTS codigo_normalizado VARCHAR "
+    f"GENERATED ALWAYS AS ({_DOI}) STORED",
+]
+
+# MediaService.lookup_identifier e os search_* por tipo: um termo reconhecido como
+# identificador vira igualdade em codigo_normalizado, uma sondagem de índice por tabela
+INDEXES = [
+    PlannedIndex(
+        name=f"idx_{tabela.lower()}_codigo_normalizado",
+        ddl=f"CREATE INDEX idx_{tabela.lower()}_codigo_normalizado ON {tabela} (codigo_normalizado)",
+        target_queries=[
+            (f"SELECT {chave} FROM {tabela} WHERE codigo_normalizado = ANY(%s)", (exemplo,)),
+        ],
+    )
+    for tabela, chave, exemplo in (
+        ("Livros", "id_livro", ["9788535902778", "8535902775"]),
+        ("Revistas", "id_revista", ["03178471"]),
+        ("DVDs", "id_dvd", ["000000018CFA0000"]),
+        ("Artigos", "id_artigo", ["10.1000/xyz123"]),
+    )
+]
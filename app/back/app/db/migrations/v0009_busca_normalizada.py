@@ -0,0 +1,84 @@
+"""
+Accent-, case- and whitespace-insensitive search columns (unaccent), trigram-indexed
+"""
+from app.db.migrator import PlannedIndex
+
+DESCRIPTION = "Função normalizar_busca e colunas geradas *_busca com índices trigrama"
+
+# (tabela, chave, coluna de origem, coluna gerada)
+COLUNAS = [
+    ("Livros", "id_livro", "titulo", "titulo_busca"),
+    ("Revistas", "id_revista", "titulo", "titulo_busca"),
+    ("DVDs", "id_dvd", "titulo", "titulo_busca"),
+    ("Artigos", "id_artigo", "titulo", "titulo_busca"),
+    ("Autores", "id_autor", "nome", "nome_busca"),
+    ("Usuario", "id_usuario", "nome", "nome_busca"),
+    ("Biblioteca", "id_biblioteca", "nome", "nome_busca"),
+]
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent(text) é STABLE (o dicionário pode mudar) e não entra em coluna gerada nem
+    # em índice; com o dicionário explícito e qualificado por esquema, o wrapper pode ser
+    # IMMUTABLE. Mesmo resultado de app.core.texto.normalizar para o alfabeto latino.
+    r"""
+    CREATE OR REPLACE FUNCTION public.normalizar_busca(texto text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+    $$ SELECT lower(regexp_replace(btrim(public.unaccent('public.unaccent'::regdictionary, texto)), '\s+', ' ', 'g')) $$
+    """,
+] + [
+    f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS {gerada} TEXT "
+    f"GENERATED ALWAYS AS (public.normalizar_busca({origem})) STORED"
+    for tabela, _, origem, gerada in COLUNAS
+] + [
+    # Substituídos por idx_mv_titulos_titulo_busca_trgm e idx_autores_nome_busca_trgm:
+    # nenhuma consulta compara mais com lower(titulo) ou lower(nome)
+    "DROP INDEX IF EXISTS idx_mv_titulos_titulo_trgm",
+    "DROP INDEX IF EXISTS idx_autores_nome_trgm",
+]
+
+# Os search_* comparam com LIKE '%' || normalizar_busca(termo) || '%'; a função é
+# IMMUTABLE, então o padrão vira constante no planejamento e o índice trigrama é usado
+INDEXES = [
+    PlannedIndex(
+        name=f"idx_{tabela.lower()}_{gerada}_trgm",
+        ddl=f"CREATE INDEX idx_{tabela.lower()}_{gerada}_trgm ON {tabela} USING gin ({gerada} gin_trgm_ops)",
+        target_queries=[
+            (f"SELECT {chave} FROM {tabela} WHERE {gerada} LIKE '%%' || normalizar_busca(%s) || '%%'", ("São Paulo",)),
+        ],
+    )
+    for tabela, chave, _, gerada in COLUNAS
+] + [
+    # EstoqueService.search_from_title/search_from_estoque e o autocomplete: a view
+    # materializada não tem coluna gerada, o índice é sobre a expressão
+    PlannedIndex(
+        name="idx_mv_titulos_titulo_busca_trgm",
+        ddl="""
+            CREATE INDEX idx_mv_titulos_titulo_busca_trgm
+            ON mv_titulos_completos USING gin (normalizar_busca(titulo) gin_trgm_ops)
+        """,
+        target_queries=[
+            ("SELECT id_titulo FROM mv_titulos_completos "
+             "WHERE normalizar_busca(titulo) LIKE '%%' || normalizar_busca(%s) || '%%'", ("Ação",)),
+            ("SELECT id_titulo FROM mv_titulos_completos "
+             "WHERE normalizar_busca(%s) <%% normalizar_busca(titulo)", ("coracao",)),
+        ],
+    ),
+    # UsuarioService.search_usuarios: o OR com e-mail e telefone só fica indexado
+    # (BitmapOr) se todos os ramos tiverem índice
+    PlannedIndex(
+        name="idx_usuario_email_trgm",
+        ddl="CREATE INDEX idx_usuario_email_trgm ON Usuario USING gin (lower(email) gin_trgm_ops)",
+        target_queries=[
+            ("SELECT id_usuario FROM Usuario WHERE lower(email) LIKE '%%' || lower(%s) || '%%'", ("silva@",)),
+        ],
+    ),
+    PlannedIndex(
+        name="idx_usuario_telefone_trgm",
+        ddl="CREATE INDEX idx_usuario_telefone_trgm ON Usuario USING gin (telefone gin_trgm_ops)",
+        target_queries=[
+            ("SELECT id_usuario FROM Usuario WHERE telefone LIKE '%%' || %s || '%%'", ("98765",)),
+        ],
+    ),
+]
@@ -0,0 +1,29 @@
+"""
+Composite authorship index for the keyset-paginated author works listing
+"""
+from app.db.migrator import PlannedIndex
+
+DESCRIPTION = "Índice Autorias (id_autor, id_titulo) para /autores/{id}/obras, no lugar de (id_autor)"
+
+# AutorService.obras: com (id_autor, id_titulo) a página é uma faixa do índice já na
+# ordem do cursor (id_titulo > último visto), sem ordenar todas as obras do autor.
+# idx_autorias_id_titulo continua servindo o caminho inverso (autores de um título)
+INDEXES = [
+    PlannedIndex(
+        name="idx_autorias_autor_titulo",
+        ddl="CREATE INDEX idx_autorias_autor_titulo ON Autorias (id_autor, id_titulo)",
+        target_queries=[
+            ("SELECT id_titulo FROM Autorias WHERE id_autor = ANY(%s) AND id_titulo > %s "
+             "ORDER BY id_titulo LIMIT 20", ([42], 0)),
+        ],
+    ),
+]
+
+
+def upgrade(conn):
+    # (id_autor, id_titulo) atende tudo o que idx_autorias_id_autor (BD2_ONIX_SCRIPT.sql)
+    # atendia; o antigo só custaria escrita. Fica se o planejador rejeitou o novo
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('idx_autorias_autor_titulo') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute("DROP INDEX IF EXISTS idx_autorias_id_autor")
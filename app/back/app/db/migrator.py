@@ -0,0 +1,274 @@
+"""
+Versioned schema migrations with planner-aware index checks
+"""
+import importlib
+import json
+import logging
+import pkgutil
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2.extras import Json
+
+from app.core.config import settings
+import app.db.migrations as migrations_package
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+_MODULE_PATTERN = re.compile(r"^v(\d{4})_(\w+)$")
+
+
+class PlannedIndex:
+    """An index that is only kept if it makes its target queries cheaper.
+
+    ``target_queries`` is a list of ``(sql, params)`` read-only queries. They are
+    run with ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`` before and after the
+    index is created inside a savepoint; if none of them improves, the savepoint
+    is rolled back and the index is reported as rejected.
+    """
+
+    def __init__(self, name: str, ddl: str, target_queries: Sequence[Tuple[str, Sequence[Any]]]):
+        self.name = name
+        self.ddl = ddl
+        self.target_queries = list(target_queries)
+
+
+class PlanMetrics:
+    """Numbers extracted from one EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) run"""
+
+    def __init__(self, plan: Dict[str, Any]):
+        root = plan["Plan"]
+        self.total_cost = float(root["Total Cost"])
+        self.execution_time = float(plan.get("Execution Time", 0.0))
+        self.buffers = int(root.get("Shared Hit Blocks", 0)) + int(root.get("Shared Read Blocks", 0))
+        self.node_types = sorted(self._node_types(root))
+
+    def _node_types(self, node: Dict[str, Any]) -> set:
+        found = {node["Node Type"]}
+        for child in node.get("Plans", []):
+            found |= self._node_types(child)
+        return found
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_cost": self.total_cost,
+            "execution_time_ms": self.execution_time,
+            "shared_buffers": self.buffers,
+            "nodes": self.node_types,
+        }
+
+
+def improved(before: PlanMetrics, after: PlanMetrics, min_gain: float) -> bool:
+    """An index helps when it cuts either the estimated cost or the buffers touched"""
+    cheaper = after.total_cost < before.total_cost * (1 - min_gain)
+    fewer_buffers = after.buffers < before.buffers * (1 - min_gain)
+    return cheaper or fewer_buffers
+
+
+class Migration:
+    """A migration module loaded from ``app/db/migrations/vNNNN_name.py``
+
+    Supported module attributes:
+      DESCRIPTION     short human readable description
+      STATEMENTS      list of SQL statements applied unconditionally
+      INDEXES         list of PlannedIndex checked against the planner
+      TRANSACTIONAL   False for migrations that manage their own transactions
+      upgrade(conn)   optional callable run after STATEMENTS and INDEXES
+    """
+
+    def __init__(self, version: int, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+        self.description = getattr(module, "DESCRIPTION", name)
+        self.statements: List[str] = list(getattr(module, "STATEMENTS", []))
+        self.indexes: List[PlannedIndex] = list(getattr(module, "INDEXES", []))
+        self.transactional: bool = getattr(module, "TRANSACTIONAL", True)
+        self.upgrade = getattr(module, "upgrade", None)
+
+
+def discover_migrations() -> List[Migration]:
+    """Load every migration module in version order"""
+    found = []
+    for module_info in pkgutil.iter_modules(migrations_package.__path__):
+        match = _MODULE_PATTERN.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{migrations_package.__name__}.{module_info.name}")
+        found.append(Migration(int(match.group(1)), match.group(2), module))
+    found.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return found
+
+
+class MigrationRunner:
+    """Applies pending migrations and records them in ``schema_migrations``"""
+
+    def __init__(self, dsn: Optional[str] = None, min_gain: Optional[float] = None,
+                 check_plans: bool = True, dry_run: bool = False):
+        self.dsn = dsn or settings.database_url
+        self.min_gain = settings.MIGRATION_MIN_PLAN_GAIN if min_gain is None else min_gain
+        self.check_plans = check_plans
+        self.dry_run = dry_run
+
+    def connect(self):
+        return psycopg2.connect(self.dsn)
+
+    def ensure_table(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                    version INT PRIMARY KEY,
+                    name VARCHAR NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    report JSONB
+                )
+            """)
+        conn.commit()
+
+    def applied_versions(self, conn) -> Dict[int, Dict[str, Any]]:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT version, name, applied_at FROM {MIGRATIONS_TABLE} ORDER BY version")
+            return {row[0]: {"name": row[1], "applied_at": row[2]} for row in cursor.fetchall()}
+
+    def status(self) -> List[Dict[str, Any]]:
+        """List every known migration and whether it has been applied"""
+        conn = self.connect()
+        try:
+            self.ensure_table(conn)
+            applied = self.applied_versions(conn)
+            return [
+                {
+                    "version": migration.version,
+                    "name": migration.name,
+                    "description": migration.description,
+                    "applied_at": applied.get(migration.version, {}).get("applied_at"),
+                }
+                for migration in discover_migrations()
+            ]
+        finally:
+            conn.close()
+
+    def run(self, target: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Apply all pending migrations up to ``target`` (inclusive)"""
+        reports = []
+        conn = self.connect()
+        try:
+            self.ensure_table(conn)
+            applied = self.applied_versions(conn)
+            for migration in discover_migrations():
+                if migration.version in applied:
+                    continue
+                if target is not None and migration.version > target:
+                    break
+                report = self.apply(conn, migration)
+                reports.append(report)
+                logger.info(json.dumps(report, default=str))
+        finally:
+            conn.close()
+        return reports
+
+    def apply(self, conn, migration: Migration) -> Dict[str, Any]:
+        report: Dict[str, Any] = {
+            "version": migration.version,
+            "name": migration.name,
+            "dry_run": self.dry_run,
+            "indexes": [],
+        }
+
+        if not migration.transactional:
+            if self.dry_run:
+                report["skipped"] = "non-transactional migration cannot be dry-run"
+                return report
+            conn.autocommit = True
+            try:
+                self._apply_body(conn, migration, report)
+            finally:
+                conn.autocommit = False
+            self._record(conn, migration, report)
+            conn.commit()
+            return report
+
+        try:
+            self._apply_body(conn, migration, report)
+            if self.dry_run:
+                conn.rollback()
+            else:
+                self._record(conn, migration, report)
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {migration.version:04d}_{migration.name} failed, rolled back")
+            raise
+        return report
+
+    def _apply_body(self, conn, migration: Migration, report: Dict[str, Any]):
+        with conn.cursor() as cursor:
+            for statement in migration.statements:
+                cursor.execute(statement)
+        for index in migration.indexes:
+            report["indexes"].append(self._apply_index(conn, index, migration.transactional))
+        if migration.upgrade:
+            migration.upgrade(conn)
+
+    def _apply_index(self, conn, index: PlannedIndex, transactional: bool) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"name": index.name, "queries": []}
+        if not self.check_plans or not index.target_queries:
+            with conn.cursor() as cursor:
+                cursor.execute(index.ddl)
+            result["decision"] = "applied (plan check disabled)" if not self.check_plans else "applied"
+            return result
+        if not transactional:
+            raise RuntimeError(f"Planned index {index.name} needs a transactional migration")
+
+        with conn.cursor() as cursor:
+            before = [self._explain(cursor, sql, params) for sql, params in index.target_queries]
+            cursor.execute("SAVEPOINT planned_index")
+            cursor.execute(index.ddl)
+            cursor.execute(f"ANALYZE {self._index_table(cursor, index.name)}")
+            after = [self._explain(cursor, sql, params) for sql, params in index.target_queries]
+
+            any_improved = False
+            for (sql, _), old, new in zip(index.target_queries, before, after):
+                gain = improved(old, new, self.min_gain)
+                any_improved = any_improved or gain
+                result["queries"].append({
+                    "query": " ".join(sql.split()),
+                    "before": old.as_dict(),
+                    "after": new.as_dict(),
+                    "improved": gain,
+                })
+
+            if any_improved:
+                cursor.execute("RELEASE SAVEPOINT planned_index")
+                result["decision"] = "applied"
+            else:
+                cursor.execute("ROLLBACK TO SAVEPOINT planned_index")
+                result["decision"] = "rejected: no target query improved"
+                logger.warning(f"Index {index.name} rejected, plans did not improve")
+        return result
+
+    def _explain(self, cursor, sql: str, params: Sequence[Any]) -> PlanMetrics:
+        if not re.match(r"^\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+            raise ValueError("Planner checks only accept read-only queries")
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        return PlanMetrics(cursor.fetchone()[0][0])
+
+    def _index_table(self, cursor, index_name: str) -> str:
+        cursor.execute(
+            "SELECT indrelid::regclass::text FROM pg_index WHERE indexrelid = to_regclass(%s)",
+            (index_name,)
+        )
+        return cursor.fetchone()[0]
+
+    def _record(self, conn, migration: Migration, report: Dict[str, Any]):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name, report) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, Json(report, dumps=lambda obj: json.dumps(obj, default=str)))
+            )
@@ -0,0 +1,158 @@
+"""
+Range partitioning helpers for Emprestimo (monthly) and Penalizacao (yearly)
+"""
+import re
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from psycopg2 import sql
+
+
+class Particionamento:
+    """Naming and bounds for the range partitions of one table.
+
+    Partitions are named ``<tabela>_pYYYY_MM`` (monthly) or ``<tabela>_pYYYY``
+    (yearly) and cover ``[inicio, fim)``. Each table also has a
+    ``<tabela>_padrao`` DEFAULT partition that catches rows outside every
+    range (and NULL keys, which range partitions cannot hold).
+    """
+
+    def __init__(self, tabela: str, coluna: str, intervalo: str):
+        if intervalo not in ("mes", "ano"):
+            raise ValueError(f"Unsupported partition interval: {intervalo}")
+        self.tabela = tabela
+        self.coluna = coluna
+        self.intervalo = intervalo
+        sufixo = r"(\d{4})_(\d{2})" if intervalo == "mes" else r"(\d{4})"
+        self._padrao_nome = re.compile(rf"^{tabela}_p{sufixo}$")
+
+    @property
+    def padrao(self) -> str:
+        return f"{self.tabela}_padrao"
+
+    def inicio(self, dia: date) -> date:
+        """First day of the partition that holds ``dia``"""
+        if self.intervalo == "mes":
+            return dia.replace(day=1)
+        return dia.replace(month=1, day=1)
+
+    def proximo(self, inicio: date) -> date:
+        """First day of the partition following the one starting at ``inicio``"""
+        if self.intervalo == "ano":
+            return inicio.replace(year=inicio.year + 1)
+        if inicio.month == 12:
+            return inicio.replace(year=inicio.year + 1, month=1)
+        return inicio.replace(month=inicio.month + 1)
+
+    def limites(self, dia: date) -> Tuple[date, date]:
+        inicio = self.inicio(dia)
+        return inicio, self.proximo(inicio)
+
+    def intervalos(self, de: date, ate: date) -> Iterator[Tuple[date, date]]:
+        """Bounds of every partition from the one holding ``de`` to the one holding ``ate``"""
+        inicio = self.inicio(de)
+        while inicio <= ate:
+            fim = self.proximo(inicio)
+            yield inicio, fim
+            inicio = fim
+
+    def nome(self, inicio: date) -> str:
+        if self.intervalo == "mes":
+            return f"{self.tabela}_p{inicio.year:04d}_{inicio.month:02d}"
+        return f"{self.tabela}_p{inicio.year:04d}"
+
+    def inicio_do_nome(self, nome: str) -> Optional[date]:
+        """Inverse of :meth:`nome`; None for names outside the convention"""
+        encontrado = self._padrao_nome.match(nome)
+        if not encontrado:
+            return None
+        ano = int(encontrado.group(1))
+        mes = int(encontrado.group(2)) if self.intervalo == "mes" else 1
+        return date(ano, mes, 1)
+
+
+def meses_adiante(dia: date, meses: int) -> date:
+    """First day of the month ``meses`` months after the one holding ``dia``"""
+    total = dia.month - 1 + meses
+    return date(dia.year + total // 12, total % 12 + 1, 1)
+
+
+EMPRESTIMO = Particionamento("emprestimo", "data_emprestimo", "mes")
+PENALIZACAO = Particionamento("penalizacao", "final_penalizacao", "ano")
+
+
+def _valor(row, chave: str):
+    # Works with both RealDictCursor rows and plain tuples
+    return row[chave] if isinstance(row, dict) else row[0]
+
+
+def particionada(cursor, tabela: str) -> bool:
+    cursor.execute("SELECT relkind = 'p' AS particionada FROM pg_class WHERE oid = to_regclass(%s)", (tabela,))
+    row = cursor.fetchone()
+    return row is not None and bool(_valor(row, "particionada"))
+
+
+def listar_particoes(cursor, part: Particionamento) -> List[Dict[str, Any]]:
+    """Attached range partitions of ``part.tabela``, oldest first"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        INNER JOIN pg_class c ON c.oid = i.inhrelid
+        INNER JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s
+    """, (part.tabela,))
+    particoes = []
+    for row in cursor.fetchall():
+        nome = _valor(row, "relname")
+        inicio = part.inicio_do_nome(nome)
+        if inicio is not None:
+            particoes.append({"nome": nome, "inicio": inicio, "fim": part.proximo(inicio)})
+    return sorted(particoes, key=lambda p: p["inicio"])
+
+
+def criar_particao(cursor, part: Particionamento, inicio: date, tabela: Optional[str] = None) -> bool:
+    """Create the partition starting at ``inicio`` if it does not exist.
+
+    Rows that already landed in the DEFAULT partition for this range are moved
+    into the new table before it is attached, otherwise ATTACH would fail. Must
+    run inside a transaction. ``tabela`` overrides the parent name (used by the
+    migration while the partitioned copy still has a temporary name).
+    """
+    pai = tabela or part.tabela
+    nome = part.nome(inicio)
+    fim = part.proximo(inicio)
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS existe", (nome,))
+    if _valor(cursor.fetchone(), "existe"):
+        return False
+
+    identificadores = {
+        "pai": sql.Identifier(pai),
+        "nome": sql.Identifier(nome),
+        "padrao": sql.Identifier(part.padrao),
+        "coluna": sql.Identifier(part.coluna),
+    }
+    cursor.execute(sql.SQL(
+        "CREATE TABLE {nome} (LIKE {pai} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ).format(**identificadores))
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS existe", (part.padrao,))
+    if _valor(cursor.fetchone(), "existe"):
+        cursor.execute(sql.SQL("""
+            WITH movidos AS (
+                DELETE FROM {padrao} WHERE {coluna} >= %s AND {coluna} < %s RETURNING *
+            )
+            INSERT INTO {nome} SELECT * FROM movidos
+        """).format(**identificadores), (inicio, fim))
+    cursor.execute(sql.SQL(
+        "ALTER TABLE {pai} ATTACH PARTITION {nome} FOR VALUES FROM (%s) TO (%s)"
+    ).format(**identificadores), (inicio, fim))
+    return True
+
+
+def garantir_particoes(cursor, part: Particionamento, de: date, ate: date,
+                       tabela: Optional[str] = None) -> List[str]:
+    """Create every missing partition between ``de`` and ``ate``; returns the new names"""
+    criadas = []
+    for inicio, _ in part.intervalos(de, ate):
+        if criar_particao(cursor, part, inicio, tabela):
+            criadas.append(part.nome(inicio))
+    return criadas
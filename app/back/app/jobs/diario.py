@@ -0,0 +1,28 @@
+"""
+Rotina diária de manutenção, para agendar no cron logo após a meia-noite:
+
+    5 0 * * *  cd app/back && python -m app.jobs.diario
+"""
+import json
+import logging
+
+from app.jobs.estatisticas import consolidar_vencidos, reconciliar
+from app.jobs.particoes import criar_particoes_futuras
+from app.jobs.relatorios import atualizar_relatorios
+
+logger = logging.getLogger(__name__)
+
+
+def executar():
+    resultado = {}
+    # Partições primeiro: os demais jobs podem gravar/ler o mês que começa hoje
+    resultado["particoes_criadas"] = criar_particoes_futuras()
+    consolidar_vencidos()
+    resultado["estatisticas"] = reconciliar()
+    resultado["relatorios"] = atualizar_relatorios()
+    return resultado
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(executar(), indent=2, ensure_ascii=False))
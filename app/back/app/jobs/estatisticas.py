@@ -0,0 +1,136 @@
+"""
+Manutenção dos contadores de empréstimos (EstatisticaEmprestimo)
+
+    python -m app.jobs.estatisticas              consolida vencidos e verifica os contadores
+    python -m app.jobs.estatisticas --corrigir   reconstrói os contadores se houver divergência
+"""
+import argparse
+import json
+import logging
+from datetime import date
+from typing import Dict, Any
+
+from app.database.connection import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+
+def consolidar_vencidos(hoje: date = None) -> int:
+    """Dobra os baldes de vencimento anteriores a hoje em vencidos_consolidados"""
+    hoje = hoje or date.today()
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT consolidado_ate FROM EstatisticaEmprestimoCorte WHERE id = 1 FOR UPDATE")
+        cursor.execute('''
+            WITH movidos AS (
+                DELETE FROM VencimentoEmprestimo
+                WHERE data_devolucao_prevista < %s
+                RETURNING fatia, em_aberto
+            ), somas AS (
+                SELECT fatia, SUM(em_aberto) AS vencidos FROM movidos GROUP BY fatia
+            )
+            UPDATE EstatisticaEmprestimo e
+            SET vencidos_consolidados = e.vencidos_consolidados + somas.vencidos
+            FROM somas
+            WHERE e.fatia = somas.fatia
+        ''', (hoje,))
+        cursor.execute("DELETE FROM VencimentoEmprestimo WHERE em_aberto = 0")
+        removidos = cursor.rowcount
+        cursor.execute("UPDATE EstatisticaEmprestimoCorte SET consolidado_ate = %s WHERE id = 1", (hoje,))
+        return removidos
+
+
+def _contadores(cursor, hoje: date) -> Dict[str, int]:
+    cursor.execute('''
+        SELECT 
+            COALESCE(SUM(total), 0) AS total_emprestimos,
+            COALESCE(SUM(em_andamento), 0) AS emprestimos_em_andamento,
+            COALESCE(SUM(devolvidos), 0) AS emprestimos_devolvidos,
+            COALESCE(SUM(vencidos_consolidados), 0) + (
+                SELECT COALESCE(SUM(em_aberto), 0)
+                FROM VencimentoEmprestimo
+                WHERE data_devolucao_prevista < %s
+            ) AS emprestimos_vencidos
+        FROM EstatisticaEmprestimo
+    ''', (hoje,))
+    return {chave: int(valor) for chave, valor in cursor.fetchone().items()}
+
+
+# Empréstimos de partições arquivadas (app.jobs.particoes) continuam nos
+# contadores; todos já estavam devolvidos quando a partição foi desanexada
+_ARQUIVADOS = "(SELECT COALESCE(SUM(linhas), 0) FROM ParticaoArquivada WHERE tabela = 'emprestimo')"
+
+
+def _contagem_real(cursor, hoje: date) -> Dict[str, int]:
+    # Uma única varredura da tabela base com agregados filtrados
+    cursor.execute(f'''
+        SELECT 
+            COUNT(*) + {_ARQUIVADOS} AS total_emprestimos,
+            COUNT(*) FILTER (WHERE data_devolucao IS NULL) AS emprestimos_em_andamento,
+            COUNT(*) FILTER (WHERE data_devolucao IS NOT NULL) + {_ARQUIVADOS} AS emprestimos_devolvidos,
+            COUNT(*) FILTER (WHERE data_devolucao IS NULL AND data_devolucao_prevista < %s) AS emprestimos_vencidos
+        FROM Emprestimo
+    ''', (hoje,))
+    return {chave: int(valor) for chave, valor in cursor.fetchone().items()}
+
+
+def _reconstruir(cursor, hoje: date):
+    cursor.execute("UPDATE EstatisticaEmprestimo SET total = 0, em_andamento = 0, devolvidos = 0, vencidos_consolidados = 0")
+    cursor.execute(f'''
+        UPDATE EstatisticaEmprestimo s
+        SET total = c.total, em_andamento = c.em_andamento,
+            devolvidos = c.devolvidos, vencidos_consolidados = c.vencidos
+        FROM (
+            SELECT 
+                COUNT(*) + {_ARQUIVADOS} AS total,
+                COUNT(*) FILTER (WHERE data_devolucao IS NULL) AS em_andamento,
+                COUNT(*) FILTER (WHERE data_devolucao IS NOT NULL) + {_ARQUIVADOS} AS devolvidos,
+                COUNT(*) FILTER (WHERE data_devolucao IS NULL AND data_devolucao_prevista < %s) AS vencidos
+            FROM Emprestimo
+        ) c
+        WHERE s.fatia = 0
+    ''', (hoje,))
+    cursor.execute("DELETE FROM VencimentoEmprestimo")
+    cursor.execute('''
+        INSERT INTO VencimentoEmprestimo (data_devolucao_prevista, fatia, em_aberto)
+        SELECT data_devolucao_prevista, 0, COUNT(*)
+        FROM Emprestimo
+        WHERE data_devolucao IS NULL AND data_devolucao_prevista >= %s
+        GROUP BY data_devolucao_prevista
+    ''', (hoje,))
+    cursor.execute("UPDATE EstatisticaEmprestimoCorte SET consolidado_ate = %s WHERE id = 1", (hoje,))
+
+
+def reconciliar(corrigir: bool = False, hoje: date = None) -> Dict[str, Any]:
+    """Compara os contadores com a tabela Emprestimo e, se pedido, os reconstrói"""
+    hoje = hoje or date.today()
+    with get_db_cursor() as cursor:
+        if corrigir:
+            # Bloqueia escritas em Emprestimo para que contagem e reconstrução vejam o mesmo estado
+            cursor.execute("LOCK TABLE Emprestimo IN SHARE MODE")
+        contadores = _contadores(cursor, hoje)
+        real = _contagem_real(cursor, hoje)
+        divergencias = {
+            chave: {"contador": contadores[chave], "real": real[chave]}
+            for chave in real
+            if contadores[chave] != real[chave]
+        }
+        if divergencias:
+            logger.warning(f"Contadores de empréstimos divergentes: {divergencias}")
+            if corrigir:
+                _reconstruir(cursor, hoje)
+        return {
+            "data": hoje.isoformat(),
+            "consistente": not divergencias,
+            "divergencias": divergencias,
+            "corrigido": bool(divergencias) and corrigir,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Consolida e verifica os contadores de empréstimos")
+    parser.add_argument("--corrigir", action="store_true", help="Reconstruir os contadores divergentes")
+    args = parser.parse_args()
+
+    consolidar_vencidos()
+    print(json.dumps(reconciliar(corrigir=args.corrigir), indent=2, ensure_ascii=False))
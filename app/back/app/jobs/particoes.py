@@ -0,0 +1,101 @@
+"""
+Manutenção das partições de Emprestimo e Penalizacao (ver migração v0004)
+
+    python -m app.jobs.particoes                               cria as partições futuras
+    python -m app.jobs.particoes --arquivar-antes 2023-01-01   também desanexa e arquiva as antigas
+"""
+import argparse
+import json
+import logging
+from datetime import date
+from typing import Dict, List
+
+from psycopg2 import sql
+
+from app.core.config import settings
+from app.database.connection import get_db_cursor
+from app.db.particionamento import (
+    EMPRESTIMO, PENALIZACAO, garantir_particoes, listar_particoes, meses_adiante, particionada
+)
+
+logger = logging.getLogger(__name__)
+
+
+def criar_particoes_futuras(meses: int = None, hoje: date = None) -> List[str]:
+    """Garante partições até ``meses`` meses à frente de hoje"""
+    hoje = hoje or date.today()
+    ate = meses_adiante(hoje, settings.PARTICOES_MESES_A_FRENTE if meses is None else meses)
+    criadas = []
+    for part in (EMPRESTIMO, PENALIZACAO):
+        with get_db_cursor() as cursor:
+            if not particionada(cursor, part.tabela):
+                logger.warning(f"{part.tabela} ainda não é particionada; aplique as migrações")
+                continue
+            criadas += garantir_particoes(cursor, part, hoje, ate)
+    if criadas:
+        logger.info(f"Partições criadas: {criadas}")
+    return criadas
+
+
+def arquivar_particoes(antes_de: date, esquema: str = None) -> List[Dict]:
+    """Desanexa as partições inteiramente anteriores a ``antes_de`` e as move para ``esquema``.
+
+    Partições de Emprestimo com algum empréstimo em aberto são mantidas. As
+    linhas arquivadas ficam registradas em ParticaoArquivada, que o job de
+    estatísticas soma à contagem da tabela viva.
+    """
+    esquema = esquema or settings.PARTICOES_ESQUEMA_ARQUIVO
+    arquivadas = []
+    for part in (EMPRESTIMO, PENALIZACAO):
+        with get_db_cursor() as cursor:
+            if not particionada(cursor, part.tabela):
+                continue
+            candidatas = [p for p in listar_particoes(cursor, part) if p["fim"] <= antes_de]
+
+        for particao in candidatas:
+            ident = {
+                "pai": sql.Identifier(part.tabela),
+                "particao": sql.Identifier(particao["nome"]),
+                "esquema": sql.Identifier(esquema),
+            }
+            # Uma transação por partição: o bloqueio do DETACH sobre a tabela pai é curto
+            with get_db_cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = '5s'")
+                if part is EMPRESTIMO:
+                    cursor.execute(sql.SQL(
+                        "SELECT EXISTS (SELECT 1 FROM {particao} WHERE data_devolucao IS NULL) AS em_aberto"
+                    ).format(**ident))
+                    if cursor.fetchone()["em_aberto"]:
+                        logger.info(f"{particao['nome']} tem empréstimos em aberto; mantida")
+                        continue
+                cursor.execute(sql.SQL("SELECT COUNT(*) AS linhas FROM {particao}").format(**ident))
+                linhas = cursor.fetchone()["linhas"]
+                cursor.execute(sql.SQL("ALTER TABLE {pai} DETACH PARTITION {particao}").format(**ident))
+                cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {esquema}").format(**ident))
+                cursor.execute(sql.SQL("ALTER TABLE {particao} SET SCHEMA {esquema}").format(**ident))
+                cursor.execute('''
+                    INSERT INTO ParticaoArquivada (particao, tabela, esquema, inicio, fim, linhas)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                ''', (particao["nome"], part.tabela, esquema, particao["inicio"], particao["fim"], linhas))
+            arquivadas.append({
+                "particao": particao["nome"],
+                "esquema": esquema,
+                "linhas": linhas,
+            })
+            logger.info(f"{particao['nome']} arquivada em {esquema} ({linhas} linhas)")
+    return arquivadas
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Cria partições futuras e arquiva as antigas")
+    parser.add_argument("--meses", type=int, default=None, help="Meses de partições à frente de hoje")
+    parser.add_argument("--arquivar-antes", type=date.fromisoformat, default=None,
+                        help="Arquivar partições que terminam até esta data (AAAA-MM-DD)")
+    parser.add_argument("--esquema", default=None, help="Esquema de destino das partições arquivadas")
+    args = parser.parse_args()
+
+    resultado = {"criadas": criar_particoes_futuras(args.meses)}
+    if args.arquivar_antes:
+        resultado["arquivadas"] = arquivar_particoes(args.arquivar_antes, args.esquema)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
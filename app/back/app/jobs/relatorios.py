@@ -0,0 +1,142 @@
+"""
+Atualização incremental das tabelas de agregação dos relatórios (ver migração v0005)
+
+    python -m app.jobs.relatorios                         processa os dias ainda não agregados e refaz os últimos
+    python -m app.jobs.relatorios --desde 2024-01-01      reprocessa a partir de uma data (correções antigas)
+    python -m app.jobs.relatorios --reconstruir           refaz todas as agregações
+"""
+import argparse
+import json
+import logging
+from datetime import date, timedelta
+from typing import Dict, Any
+
+from app.database.connection import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Dias já agregados que toda execução refaz, para absorver lançamentos retroativos
+JANELA_REPROCESSAMENTO = 3
+
+_JUNCAO_TITULO = '''
+    FROM Emprestimo e
+    INNER JOIN Estoque est ON e.id_estoque = est.id_estoque
+    INNER JOIN Titulo t ON est.id_titulo = t.id_titulo
+'''
+
+
+def _agregar_dia(cursor, dia: date):
+    """Recalcula as agregações de um dia; apagar antes torna o reprocessamento idempotente"""
+    cursor.execute("DELETE FROM RelatorioEmprestimoDia WHERE dia = %s", (dia,))
+    cursor.execute(f'''
+        INSERT INTO RelatorioEmprestimoDia (dia, id_biblioteca, tipo_midia, emprestimos)
+        SELECT e.data_emprestimo, est.id_biblioteca, t.tipo_midia, COUNT(*)
+        {_JUNCAO_TITULO}
+        WHERE e.data_emprestimo = %s AND est.id_biblioteca IS NOT NULL
+        GROUP BY e.data_emprestimo, est.id_biblioteca, t.tipo_midia
+    ''', (dia,))
+
+    cursor.execute("DELETE FROM RelatorioAutorDia WHERE dia = %s", (dia,))
+    cursor.execute(f'''
+        INSERT INTO RelatorioAutorDia (dia, id_autor, tipo_midia, emprestimos)
+        SELECT e.data_emprestimo, au.id_autor, t.tipo_midia, COUNT(*)
+        {_JUNCAO_TITULO}
+        INNER JOIN Autorias au ON t.id_titulo = au.id_titulo
+        WHERE e.data_emprestimo = %s
+        GROUP BY e.data_emprestimo, au.id_autor, t.tipo_midia
+    ''', (dia,))
+
+    # Devoluções entram no dia em que foram registradas como devolvidas
+    cursor.execute("DELETE FROM RelatorioDuracaoDia WHERE dia = %s", (dia,))
+    cursor.execute(f'''
+        INSERT INTO RelatorioDuracaoDia (dia, tipo_midia, duracao_dias, devolucoes)
+        SELECT e.data_devolucao, t.tipo_midia, e.data_devolucao - e.data_emprestimo, COUNT(*)
+        {_JUNCAO_TITULO}
+        WHERE e.data_devolucao = %s
+        GROUP BY e.data_devolucao, t.tipo_midia, e.data_devolucao - e.data_emprestimo
+    ''', (dia,))
+
+
+def _agregar_penalizacoes(cursor) -> int:
+    """Recalcula o total de penalizações de cada usuário e devolve quantos totais mudaram.
+
+    Penalizacao não tem data de criação, e um corte por id_penalizacao perde as
+    linhas que fazem commit fora de ordem e nunca desconta as apagadas; por isso
+    o total é refeito a partir da tabela inteira, gravando só o que mudou.
+    """
+    cursor.execute('''
+        INSERT INTO RelatorioPenalizacaoUsuario (id_usuario, penalizacoes)
+        SELECT id_usuario, COUNT(*)
+        FROM Penalizacao
+        WHERE id_usuario IS NOT NULL
+        GROUP BY id_usuario
+        ON CONFLICT (id_usuario)
+        DO UPDATE SET penalizacoes = EXCLUDED.penalizacoes
+        WHERE RelatorioPenalizacaoUsuario.penalizacoes <> EXCLUDED.penalizacoes
+    ''')
+    alterados = cursor.rowcount
+    cursor.execute('''
+        DELETE FROM RelatorioPenalizacaoUsuario r
+        WHERE NOT EXISTS (SELECT 1 FROM Penalizacao p WHERE p.id_usuario = r.id_usuario)
+    ''')
+    return alterados + cursor.rowcount
+
+
+def atualizar_relatorios(desde: date = None, ate: date = None, reconstruir: bool = False) -> Dict[str, Any]:
+    """Agrega os dias de ``desde`` (padrão: o dia seguinte ao último processado) até ``ate``.
+
+    O padrão de ``ate`` é ontem, o último dia completo. Cada dia é gravado em
+    sua própria transação, então uma execução interrompida continua de onde parou.
+    Os últimos ``JANELA_REPROCESSAMENTO`` dias já processados são refeitos a cada
+    execução para pegar devoluções lançadas com atraso; correções mais antigas
+    exigem ``desde`` (``--desde``).
+    """
+    ate = ate or date.today() - timedelta(days=1)
+    with get_db_cursor() as cursor:
+        if reconstruir:
+            cursor.execute("TRUNCATE RelatorioEmprestimoDia, RelatorioAutorDia, RelatorioDuracaoDia, RelatorioPenalizacaoUsuario")
+            cursor.execute("UPDATE RelatorioCorte SET processado_ate = NULL WHERE id = 1")
+        if desde is None:
+            cursor.execute("SELECT processado_ate FROM RelatorioCorte WHERE id = 1")
+            processado_ate = cursor.fetchone()['processado_ate']
+            if processado_ate is not None:
+                desde = processado_ate + timedelta(days=1) - timedelta(days=JANELA_REPROCESSAMENTO)
+            else:
+                cursor.execute("SELECT MIN(data_emprestimo) AS primeiro FROM Emprestimo")
+                desde = cursor.fetchone()['primeiro'] or date.today()
+
+    dias = 0
+    dia = desde
+    while dia <= ate:
+        with get_db_cursor() as cursor:
+            _agregar_dia(cursor, dia)
+            cursor.execute('''
+                UPDATE RelatorioCorte
+                SET processado_ate = GREATEST(COALESCE(processado_ate, %s), %s)
+                WHERE id = 1
+            ''', (dia, dia))
+        dias += 1
+        dia += timedelta(days=1)
+
+    with get_db_cursor() as cursor:
+        usuarios = _agregar_penalizacoes(cursor)
+
+    resultado = {
+        "desde": desde.isoformat(),
+        "ate": ate.isoformat(),
+        "dias_processados": dias,
+        "usuarios_penalizados_atualizados": usuarios,
+    }
+    logger.info(f"Relatórios atualizados: {resultado}")
+    return resultado
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Atualiza as tabelas de agregação dos relatórios")
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="Reprocessar a partir desta data (AAAA-MM-DD)")
+    parser.add_argument("--ate", type=date.fromisoformat, default=None, help="Último dia a processar (padrão: ontem)")
+    parser.add_argument("--reconstruir", action="store_true", help="Apagar e refazer todas as agregações")
+    args = parser.parse_args()
+
+    print(json.dumps(atualizar_relatorios(args.desde, args.ate, args.reconstruir), indent=2, ensure_ascii=False))
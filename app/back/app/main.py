@@ -1,9 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from app.core.config import settings
-from app.api import usuarios, emprestimos, estoque, livros
-from app.routers import revistas, dvds, artigos, biblioteca, autor
+from app.core.compressao import CompressaoMiddleware
+from app.core.instrumentacao import InstrumentacaoMiddleware
+from app.core import metricas
+from app.core.cache_busca import ENDPOINTS as ENDPOINTS_CACHE_BUSCA, cache_busca
+from app.core.serializacao import _plano
+from app.db import instrumentacao, consultas_lentas
+from app.api import usuarios, emprestimos, estoque, livros, relatorios, exportacao, admin, autocompletar
+from app.services.autocompletar_service import autocompletar_service
+from app.services.indice_busca_service import indice_busca_service
+from app.db.database import db_manager
+from app.routers import revistas, dvds, artigos, biblioteca, autor, media
+import anyio
+import asyncio
 import logging
 
 # Configurar logging
@@ -18,6 +29,13 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
+# Compressão das respostas (gzip, brotli/zstd se instalados)
+app.add_middleware(
+    CompressaoMiddleware,
+    minimo=settings.COMPRESSION_MIN_SIZE,
+    cache_bytes=settings.COMPRESSION_CACHE_BYTES,
+)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +45,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Consultas por requisição: Server-Timing, log estruturado e alerta de N+1
+if settings.QUERY_INSTRUMENTATION:
+    app.add_middleware(InstrumentacaoMiddleware, limite_repeticoes=settings.QUERY_REPEAT_THRESHOLD)
+
+# Métricas Prometheus em /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(metricas.MetricasMiddleware)
+    instrumentacao.ouvintes.append(metricas.observar_consulta)
+    metricas.registrar_medidor(
+        "onix_db_pool_connections", "Connection pool bounds and occupancy",
+        lambda: {(("state", estado),): valor for estado, valor in db_manager.stats().items()}
+    )
+    metricas.registrar_cache("serializacao_plano", lambda: tuple(_plano.cache_info())[:2])
+    metricas.registrar_cache("sql_normalizado", lambda: tuple(instrumentacao.normalizar_sql.cache_info())[:2])
+    metricas.registrar_cache("autocomplete", lambda: (autocompletar_service.acertos, autocompletar_service.falhas))
+    metricas.registrar_cache(
+        "indice_busca", lambda: (indice_busca_service.consultas_memoria, indice_busca_service.consultas_banco)
+    )
+    for endpoint in ENDPOINTS_CACHE_BUSCA:
+        metricas.registrar_cache(f"busca_{endpoint}", lambda endpoint=endpoint: cache_busca.contagens(endpoint))
+    metricas.registrar_medidor(
+        "onix_search_index_bytes", "Approximate memory held by the in-process media search index",
+        lambda: {(("part", parte),): valor for parte, valor in indice_busca_service.memoria().items()}
+    )
+
 # Incluir rotas
 app.include_router(
     usuarios.router, 
@@ -46,6 +89,29 @@ app.include_router(
     tags=["Estoque"]
 )
 
+app.include_router(
+    relatorios.router, 
+    prefix=f"{settings.API_V1_STR}/relatorios", 
+    tags=["Relatórios"]
+)
+
+app.include_router(
+    exportacao.router, 
+    prefix=f"{settings.API_V1_STR}/exportar", 
+    tags=["Exportação"]
+)
+
+app.include_router(
+    autocompletar.router, 
+    prefix=f"{settings.API_V1_STR}/autocomplete", 
+    tags=["Autocomplete"]
+)
+
+app.include_router(
+    admin.router, 
+    prefix=f"{settings.API_V1_STR}/admin", 
+    tags=["Administração"]
+)
 
 
 # Incluir os roteadores no main
@@ -55,6 +121,7 @@ app.include_router(dvds.router, prefix="/api/v1/dvds", tags=["dvds"])
 app.include_router(artigos.router, prefix="/api/v1/artigos", tags=["artigos"])
 app.include_router(biblioteca.router, prefix="/api/v1/bibliotecas", tags=["bibliotecas"])
 app.include_router(autor.router, prefix="/api/v1/autores", tags=["autores"])
+app.include_router(media.router, prefix="/api/v1")
 
 # Rota raiz
 @app.get("/")
@@ -71,6 +138,11 @@ def read_root():
 def health_check():
     return {"status": "healthy", "message": "API funcionando corretamente"}
 
+# Métricas no formato de exposição do Prometheus
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(metricas.exposicao(), media_type=metricas.TIPO_CONTEUDO)
+
 # Handler global para exceções
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -85,13 +157,48 @@ async def global_exception_handler(request, exc):
 async def startup_event():
     logger.info(f"Iniciando {settings.PROJECT_NAME}")
     logger.info(f"Versão: {settings.VERSION}")
+    # Pool usado pelas exportações, que seguram uma conexão durante todo o download
+    db_manager.create_pool()
+    if settings.METRICS_ENABLED:
+        app.state.monitor_loop = asyncio.create_task(metricas.monitorar_loop(settings.METRICS_LOOP_INTERVAL))
+    # Consultas lentas: buffer em memória, log em disco e EXPLAIN por amostragem
+    gravador = consultas_lentas.configurar()
+    if gravador is not None:
+        instrumentacao.ouvintes.append(gravador)
+    # Autocomplete: índice em memória carregado antes de atender, depois recarregado em segundo plano
+    try:
+        await anyio.to_thread.run_sync(autocompletar_service.recarregar)
+    except Exception as e:
+        logger.warning(f"Não foi possível carregar o índice do autocomplete: {e}")
+    app.state.autocomplete = asyncio.create_task(
+        autocompletar_service.manter_atualizado(settings.AUTOCOMPLETE_REFRESH_SECONDS)
+    )
+    # Índice de busca de mídias: snapshot em disco para atender já na partida, reconstruído em segundo plano
+    try:
+        await anyio.to_thread.run_sync(indice_busca_service.carregar_snapshot)
+    except Exception as e:
+        logger.warning(f"Não foi possível carregar o snapshot do índice de busca: {e}")
+    app.state.indice_busca = asyncio.create_task(
+        indice_busca_service.manter_atualizado(settings.SEARCH_INDEX_REFRESH_SECONDS)
+    )
+    app.state.disponibilidade_busca = asyncio.create_task(
+        indice_busca_service.manter_disponibilidade(settings.SEARCH_AVAILABILITY_REFRESH_SECONDS)
+    )
 
 # Evento de finalização
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Finalizando aplicação")
+    for nome in ("monitor_loop", "autocomplete", "indice_busca", "disponibilidade_busca"):
+        tarefa = getattr(app.state, nome, None)
+        if tarefa:
+            tarefa.cancel()
+    if consultas_lentas.gravador is not None:
+        instrumentacao.ouvintes.remove(consultas_lentas.gravador)
+        consultas_lentas.gravador.encerrar()
     from app.database.connection import db
     db.close()
+    db_manager.close_pool()
 
 if __name__ == "__main__":
     import uvicorn
@@ -2,14 +2,16 @@
 Autor API routes
 """
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.schemas.autor import (
     AutorCreate, AutorUpdate, AutorResponse, AutorListResponse,
-    AutoriasCreate, AutoriasResponse, AutoriasListResponse
+    AutoriasCreate, AutoriasResponse, AutoriasListResponse,
+    ObraAutorListResponse
 )
 from app.schemas.base import BaseResponse
 from app.services.base_service import BaseService
 from app.services.autor_service import autor_service
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida
 
 router = APIRouter()
 
@@ -36,59 +38,23 @@ async def create_autor(autor: AutorCreate):
 @router.get("/", response_model=AutorListResponse)
 async def list_autores(
     page: int = Query(1, ge=1, description="Page number"),
-    size: int = Query(10, ge=1, le=100, description="Items per page")
+    size: int = Query(10, ge=1, le=100, description="Items per page"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Get list of authors"""
     try:
         authors = autor_service.get_autores(page, size)
         leng = len(authors)
-        return AutorListResponse(
+        return resposta_rapida(AutorListResponse, dict(
             data=authors,
             total=leng,
-        )
+        ), formato=formato)
     except Exception as e:
         print(e)
         # raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/{author_id}", response_model=AutorResponse)
-async def get_autor(author_id: int):
-    """Get author by ID"""
-    author = autor_service.get_autor(author_id)
-    if not author:
-        raise HTTPException(status_code=404, detail="Author not found")
-    return AutorResponse(**author)
-
-@router.put("/{author_id}", response_model=AutorResponse)
-async def update_autor(author_id: int, autor: AutorUpdate):
-    """Update author"""
-    try:
-        author_data = autor.dict(exclude_unset=True, exclude_none=True)
-        if not author_data:
-            raise HTTPException(status_code=400, detail="No data provided for update")
-        
-        author = autor_service.update_autor(author_id, AutorUpdate(**author_data))
-        if not author:
-            raise HTTPException(status_code=500, detail="Failed to update author")
-        
-        return author
-        
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Internal server error")
-
-@router.delete("/{author_id}", response_model=BaseResponse)
-async def delete_autor(author_id: int):
-    """Delete author"""
-    try:
-        success = autor_service.delete_autor(author_id)
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to delete author")
-        
-        return BaseResponse(message="Author deleted successfully")
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Internal server error")
+# Rotas fixas antes de /{author_id}: o Starlette usa a primeira que casar, e
+# "autorias" ou "pesquisar" cairiam no parâmetro inteiro (422)
 
 # Autorias endpoints
 @router.post("/autorias", response_model=AutoriasResponse, status_code=201)
@@ -114,7 +80,8 @@ async def list_autorias(
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Items per page"),
     id_autor: int = Query(None, description="Filter by author ID"),
-    id_titulo: int = Query(None, description="Filter by title ID")
+    id_titulo: int = Query(None, description="Filter by title ID"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Get list of authorship relationships"""
     try:
@@ -126,11 +93,11 @@ async def list_autorias(
             
         authorships, total = autor_service.get_all(page, size, filters)
         
-        return AutoriasListResponse(
-            data=[AutoriasResponse(**authorship) for authorship in authorships],
+        return resposta_rapida(AutoriasListResponse, dict(
+            data=authorships,
             total=total,
             message=f"Found {total} authorship relationships"
-        )
+        ), formato=formato)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -142,4 +109,75 @@ def search_bibliotecas(
     """Buscar itens do estoque a partir do ID do estoque ou da biblioteca"""
     if not name:
         raise HTTPException(status_code=400, detail="Nome é obrigatório para busca")
-    return autor_service.search_autores(name)
\ No newline at end of file
+    return autor_service.search_autores(name)
+
+
+@router.get("/pesquisar/obras", response_model=ObraAutorListResponse)
+def search_obras_por_autor(
+    nome: str = Query(..., min_length=1, description="Parte do nome do autor (sem distinção de acentos e caixa)"),
+    apos: int = Query(0, ge=0, description="Cursor: `proximo` da página anterior"),
+    size: int = Query(20, ge=1, le=100, description="Items per page"),
+    formato: FormatoResposta = Depends(formato_resposta)
+):
+    """Titles by every author whose name matches, in the same single query as /{id}/obras"""
+    obras, proximo = autor_service.obras(nome=nome, apos=apos, limite=size)
+    return resposta_rapida(ObraAutorListResponse, dict(
+        data=obras,
+        proximo=proximo,
+        message=f"Found {len(obras)} titles"
+    ), formato=formato)
+
+@router.get("/{author_id}", response_model=AutorResponse)
+async def get_autor(author_id: int):
+    """Get author by ID"""
+    author = autor_service.get_autor(author_id)
+    if not author:
+        raise HTTPException(status_code=404, detail="Author not found")
+    return AutorResponse(**author)
+
+@router.get("/{author_id}/obras", response_model=ObraAutorListResponse)
+def list_obras_autor(
+    author_id: int,
+    apos: int = Query(0, ge=0, description="Cursor: `proximo` da página anterior"),
+    size: int = Query(20, ge=1, le=100, description="Items per page"),
+    formato: FormatoResposta = Depends(formato_resposta)
+):
+    """Titles by the author with media type and copy availability, keyset-paginated"""
+    obras, proximo = autor_service.obras(id_autor=author_id, apos=apos, limite=size)
+    return resposta_rapida(ObraAutorListResponse, dict(
+        data=obras,
+        proximo=proximo,
+        message=f"Found {len(obras)} titles"
+    ), formato=formato)
+
+@router.put("/{author_id}", response_model=AutorResponse)
+async def update_autor(author_id: int, autor: AutorUpdate):
+    """Update author"""
+    try:
+        author_data = autor.dict(exclude_unset=True, exclude_none=True)
+        if not author_data:
+            raise HTTPException(status_code=400, detail="No data provided for update")
+        
+        author = autor_service.update_autor(author_id, AutorUpdate(**author_data))
+        if not author:
+            raise HTTPException(status_code=500, detail="Failed to update author")
+        
+        return author
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.delete("/{author_id}", response_model=BaseResponse)
+async def delete_autor(author_id: int):
+    """Delete author"""
+    try:
+        success = autor_service.delete_autor(author_id)
+        if not success:
+            raise HTTPException(status_code=500, detail="Failed to delete author")
+        
+        return BaseResponse(message="Author deleted successfully")
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -9,6 +9,7 @@ from app.schemas.biblioteca import (
 )
 from app.schemas.base import BaseResponse
 from app.services.biblioteca_service import biblioteca_service
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida
 
 router = APIRouter()
 
@@ -31,17 +32,18 @@ async def create_biblioteca(biblioteca: BibliotecaCreate):
 @router.get("/", response_model=BibliotecaListResponse)
 async def list_bibliotecas(
     page: int = Query(0, ge=0, description="Page number"),
-    size: int = Query(100, ge=1, le=10000, description="Items per page")
+    size: int = Query(100, ge=1, le=10000, description="Items per page"),
+    formato: FormatoResposta = Depends(formato_resposta)
 ):
     """Get list of libraries"""
     try:
         libraries = biblioteca_service.get_bibliotecas(page, size)
         leng = len(libraries)
-        return BibliotecaListResponse(
+        return resposta_rapida(BibliotecaListResponse, dict(
             data=libraries,
             total=leng,
             message=f"Found {leng} libraries"
-        )
+        ), formato=formato)
     except Exception as e:
         print(f"Error listing libraries: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
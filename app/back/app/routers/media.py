@@ -3,38 +3,55 @@ Media API routes for different types of content
 """
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
-from app.schemas.livro import LivroCreate, LivroUpdate, LivroResponse, LivroListResponse
-from app.schemas.revista import RevistaCreate, RevistaUpdate, RevistaResponse, RevistaListResponse
-from app.schemas.dvd import DVDCreate, DVDUpdate, DVDResponse, DVDListResponse
-from app.schemas.artigo import ArtigoCreate, ArtigoUpdate, ArtigoResponse, ArtigoListResponse
-from app.schemas.titulo import TituloCreate, TituloResponse
-from app.schemas.base import BaseResponse, MidiaTipo
+from app.schemas.livro import LivroCreate, LivroUpdate, LivroResponse
+from app.schemas.revista import RevistaCreate, RevistaResponse
+from app.schemas.dvd import DVDCreate, DVDResponse
+from app.schemas.artigo import ArtigoCreate, ArtigoResponse
+from app.schemas.base import MidiaTipo
 from app.services.media_service import media_service
+from app.core.cache_busca import cache_busca
 
 router = APIRouter(prefix="/midias", tags=["midias"])
 
 # Generic media endpoints
+# def, não async: uma falta no cache roda a busca SQL e as facetas no threadpool, fora do event loop
 @router.get("/buscar")
-async def search_media(
+def search_media(
     termo: str = Query(..., description="Search term"),
     tipo: Optional[MidiaTipo] = Query(None, description="Media type filter"),
+    editora: Optional[str] = Query(None, description="Publisher/distributor filter"),
+    decada: Optional[int] = Query(None, ge=0, multiple_of=10, description="Publication decade filter, e.g. 1990"),
+    biblioteca: Optional[int] = Query(None, description="Only titles with copies in this library"),
+    disponivel: Optional[bool] = Query(None, description="Only titles with (or without) a free copy now"),
+    facetas: bool = Query(False, description="Include facet counts"),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Items per page")
 ):
-    """Search across all media types"""
+    """Search across all media types, optionally narrowed and counted by facets"""
     try:
-        results, total = media_service.search_media(termo, tipo, page, size)
-        return {
+        filters = {"editora": editora, "decada": decada, "biblioteca": biblioteca, "disponivel": disponivel}
+        media_type = tipo.value if tipo else None
+        results, total, facet_counts = cache_busca.buscar(
+            "midias", termo, dict(filters, tipo=media_type, facetas=facetas, page=page, size=size),
+            lambda: media_service.search_media(termo, media_type, page, size, filters=filters, facets=facetas)
+        )
+        response = {
             "success": True,
-            "data": results,
+            "data": results.dicts(),
             "total": total,
             "message": f"Found {total} items matching '{termo}'"
         }
+        if facetas:
+            response["facetas"] = {
+                faceta: [{"valor": valor, "total": contagem} for valor, contagem in contagens]
+                for faceta, contagens in facet_counts.items()
+            }
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/{title_id}/detalhes")
-async def get_media_details(title_id: int):
+def get_media_details(title_id: int):
     """Get complete media details"""
     details = media_service.get_media_details(title_id)
     if not details:
@@ -47,7 +64,7 @@ async def get_media_details(title_id: int):
 
 # Livros endpoints
 @router.post("/livros", response_model=LivroResponse, status_code=201)
-async def create_livro(livro: LivroCreate):
+def create_livro(livro: LivroCreate):
     """Create a new book"""
     try:
         book_data = livro.dict(exclude={'id_livro'})
@@ -65,7 +82,7 @@ async def create_livro(livro: LivroCreate):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/livros/{book_id}", response_model=LivroResponse)
-async def get_livro(book_id: int):
+def get_livro(book_id: int):
     """Get book by ID"""
     book = media_service.livro_service.get_by_id(book_id)
     if not book:
@@ -73,7 +90,7 @@ async def get_livro(book_id: int):
     return LivroResponse(**book)
 
 @router.put("/livros/{book_id}", response_model=LivroResponse)
-async def update_livro(book_id: int, livro: LivroUpdate):
+def update_livro(book_id: int, livro: LivroUpdate):
     """Update book"""
     if not media_service.livro_service.exists(book_id):
         raise HTTPException(status_code=404, detail="Book not found")
@@ -83,7 +100,7 @@ async def update_livro(book_id: int, livro: LivroUpdate):
         if not book_data:
             raise HTTPException(status_code=400, detail="No data provided for update")
         
-        success = media_service.livro_service.update(book_id, book_data)
+        success = media_service.update_media('livro', book_id, book_data)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to update book")
         
@@ -97,7 +114,7 @@ async def update_livro(book_id: int, livro: LivroUpdate):
 
 # Revistas endpoints
 @router.post("/revistas", response_model=RevistaResponse, status_code=201)
-async def create_revista(revista: RevistaCreate):
+def create_revista(revista: RevistaCreate):
     """Create a new magazine"""
     try:
         magazine_data = revista.dict(exclude={'id_revista'})
@@ -115,7 +132,7 @@ async def create_revista(revista: RevistaCreate):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/revistas/{magazine_id}", response_model=RevistaResponse)
-async def get_revista(magazine_id: int):
+def get_revista(magazine_id: int):
     """Get magazine by ID"""
     magazine = media_service.revista_service.get_by_id(magazine_id)
     if not magazine:
@@ -124,7 +141,7 @@ async def get_revista(magazine_id: int):
 
 # DVDs endpoints
 @router.post("/dvds", response_model=DVDResponse, status_code=201)
-async def create_dvd(dvd: DVDCreate):
+def create_dvd(dvd: DVDCreate):
     """Create a new DVD"""
     try:
         dvd_data = dvd.dict(exclude={'id_dvd'})
@@ -142,7 +159,7 @@ async def create_dvd(dvd: DVDCreate):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/dvds/{dvd_id}", response_model=DVDResponse)
-async def get_dvd(dvd_id: int):
+def get_dvd(dvd_id: int):
     """Get DVD by ID"""
     dvd = media_service.dvd_service.get_by_id(dvd_id)
     if not dvd:
@@ -151,7 +168,7 @@ async def get_dvd(dvd_id: int):
 
 # Artigos endpoints
 @router.post("/artigos", response_model=ArtigoResponse, status_code=201)
-async def create_artigo(artigo: ArtigoCreate):
+def create_artigo(artigo: ArtigoCreate):
     """Create a new article"""
     try:
         article_data = artigo.dict(exclude={'id_artigo'})
@@ -169,7 +186,7 @@ async def create_artigo(artigo: ArtigoCreate):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/artigos/{article_id}", response_model=ArtigoResponse)
-async def get_artigo(article_id: int):
+def get_artigo(article_id: int):
     """Get article by ID"""
     article = media_service.artigo_service.get_by_id(article_id)
     if not article:
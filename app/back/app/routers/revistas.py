@@ -3,6 +3,7 @@ from typing import List, Optional
 from app.schemas.revista import RevistaCreate, RevistaUpdate, RevistaResponse, RevistaWithAuthors
 from app.services.revista_service import RevistaService
 from app.schemas.schemas import Revista
+from app.core.cache_busca import cache_busca
 
 router = APIRouter()
 revista_service = RevistaService()
@@ -58,7 +59,7 @@ async def delete_revista(revista_id: int):
 @router.get("/search/", response_model=List[RevistaResponse])
 async def search_revistas(q: str = Query(..., min_length=1)):
     """Buscar revistas por título, ISSN ou editora"""
-    return await revista_service.search_revistas(q)
+    return await cache_busca.buscar_async("revistas", q, None, lambda: revista_service.search_revistas(q))
 
 @router.get("/{revista_id}/autores", response_model=RevistaWithAuthors)
 async def get_revista_with_authors(revista_id: int):
@@ -76,4 +77,4 @@ async def search_revistas(
     """Buscar itens do estoque a partir do ID do estoque ou da biblioteca"""
     if not title:
         raise HTTPException(status_code=400, detail="Título é obrigatório para busca")
-    return await revista_service.search_revistas(title)
\ No newline at end of file
+    return await cache_busca.buscar_async("revistas", title, None, lambda: revista_service.search_revistas(title))
\ No newline at end of file
@@ -59,3 +59,18 @@ class AutoriasListResponse(BaseResponse):
     """Schema for authorship list response"""
     data: list[AutoriasResponse]
     total: int
+
+# Obras de autores
+class ObraAutorResponse(BaseModel):
+    """A title by the author(s), with its copies counted from Estoque/EmprestimoAberto"""
+    id_titulo: int
+    titulo: Optional[str] = None
+    tipo_midia: str
+    autores: list[str] = Field(default_factory=list, description="Todos os autores do título")
+    total_exemplares: int
+    exemplares_disponiveis: int
+
+class ObraAutorListResponse(BaseResponse):
+    """Keyset page of author works: pass ``proximo`` back as ``apos`` for the next page"""
+    data: list[ObraAutorResponse]
+    proximo: Optional[int] = Field(None, description="Cursor da próxima página; nulo na última")
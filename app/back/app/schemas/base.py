@@ -2,7 +2,7 @@
 Base schemas for the application
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import date, datetime
 from enum import Enum
 
@@ -12,6 +12,20 @@ class MidiaTipo(str, Enum):
     dvd = "dvd"
     artigo = "artigo"
 
+class FormatoLista(str, Enum):
+    """Layout of list payloads, chosen with ``?format=``"""
+    objetos = "objects"
+    colunar = "columnar"
+
+class DadosColunares(BaseModel):
+    """Columnar page: column names once, then one array of values per column.
+
+    With ``?format=columnar`` a list endpoint returns this instead of a list of
+    objects; for the *ListResponse envelopes only ``data`` changes shape.
+    """
+    columns: List[str]
+    values: List[List[Any]]
+
 class BaseResponse(BaseModel):
     """Base response model"""
     success: bool = True
@@ -85,6 +85,28 @@ class TituloSearch(BaseModel):
     titulo: str
     tipo_midia: MidiaTipo
 
+# Busca de títulos: contem = ILIKE '%termo%' sem ordem; relevancia = full-text ranqueado
+class ModoBusca(str, Enum):
+    contem = "contem"
+    relevancia = "relevancia"
+
+class TituloRanqueado(TituloSearch):
+    # Só no modo relevancia: 0..1, maior é melhor; texto (full-text) ou trigrama (fallback)
+    pontuacao: Optional[float] = None
+    correspondencia: Optional[str] = None
+
+# Autocomplete
+class TipoSugestao(str, Enum):
+    titulo = "titulo"
+    autor = "autor"
+
+class Sugestao(BaseModel):
+    id: int
+    texto: str
+    tipo_midia: Optional[MidiaTipo] = None
+    # memoria: índice dos mais emprestados; banco: completado por prefixo/trigrama
+    origem: str
+
 class Estoque(EstoqueBase):
     id_estoque: int
     
@@ -285,6 +307,8 @@ class RelatorioEmprestimos(BaseModel):
     emprestimos_em_andamento: int
     emprestimos_vencidos: int
     emprestimos_devolvidos: int
+    # Último dia consolidado por app.jobs.diario; muito antigo indica o cron parado
+    consolidado_ate: Optional[date] = None
 
 class DisponibilidadeItem(BaseModel):
     id_titulo: int
@@ -293,3 +317,46 @@ class DisponibilidadeItem(BaseModel):
     total_exemplares: int
     exemplares_disponiveis: int
     exemplares_emprestados: int
+
+# Exemplares livres de um título por biblioteca, na ordem de preferência pedida
+class DisponibilidadeBiblioteca(BaseModel):
+    id_biblioteca: int
+    biblioteca: str
+    total_exemplares: int
+    exemplares_disponiveis: int
+    exemplares_livres: List[int]
+
+# Schemas para relatórios analíticos (lidos das tabelas de agregação diária)
+class EmprestimosPorBiblioteca(BaseModel):
+    id_biblioteca: int
+    biblioteca: str
+    total_emprestimos: int
+
+class UsuarioPenalizado(BaseModel):
+    id_usuario: int
+    nome: str
+    total_penalizacoes: int
+
+class FaixaDuracao(BaseModel):
+    duracao_dias: int
+    devolucoes: int
+
+class DuracaoEmprestimos(BaseModel):
+    tipo_midia: str
+    media_dias_emprestimo: float
+    total_devolucoes: int
+    histograma: List[FaixaDuracao]
+
+class AutorEmprestado(BaseModel):
+    id_autor: int
+    autor: str
+    tipo_midia: str
+    emprestimos: int
+
+class SituacaoRelatorios(BaseModel):
+    processado_ate: Optional[date] = None
+
+# Formatos das exportações em /exportar
+class FormatoExportacao(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
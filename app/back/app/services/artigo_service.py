@@ -1,11 +1,14 @@
 from typing import List, Optional
 from app.database.connection import Database
 from app.database.connection import get_db_cursor
+from app.services.busca_service import ARTIGOS, busca_service
 from app.schemas.artigo import ArtigoCreate, ArtigoUpdate, ArtigoResponse, ArtigoWithAuthors
 import logging
 
 from app.schemas.schemas import Artigo
 from app.services import estoque_service
+from app.services.emprestimo_service import emprestimo_service
+from app.services.indice_busca_service import indice_busca_service
 
 logger = logging.getLogger(__name__)
 
@@ -42,12 +45,15 @@ class ArtigoService:
                 
                 result = cursor.fetchone()
                 # estoque_service.reload_materialized_view()  
-                return ArtigoResponse(**result)
+                criado = ArtigoResponse(**result)
                 
             except Exception as e:
                 logger.error(f"Erro ao criar artigo: {e}")
                 raise
-            
+        # Depois do commit, para o índice de busca ler o que foi gravado
+        indice_busca_service.reindexar(criado.id_artigo)
+        return criado
+
 
     async def get_artigo_by_id(self, artigo_id: int) -> Optional[ArtigoResponse]:
         """Buscar artigo por ID"""
@@ -127,14 +133,17 @@ class ArtigoService:
                 cursor.execute(query, values)
                 result = cursor.fetchone()
                 
-                if result:
-                    return ArtigoResponse(**result)
-                return None
+                if not result:
+                    return None
+                if artigo_data.titulo is not None:
+                    emprestimo_service.sincronizar_titulo(cursor, artigo_id, result['titulo'])
                 
             except Exception as e:
                 logger.error(f"Erro ao atualizar artigo {artigo_id}: {e}")
                 raise
-            
+        indice_busca_service.reindexar(artigo_id)
+        return ArtigoResponse(**result)
+
 
     async def delete_artigo(self, artigo_id: int) -> bool:
         """Excluir artigo"""
@@ -161,36 +170,15 @@ class ArtigoService:
                 delete_titulo_query = "DELETE FROM Titulo WHERE id_titulo = %s"
                 cursor.execute(delete_titulo_query, (artigo_id,))
                 
-                return cursor.rowcount > 0
+                excluido = cursor.rowcount > 0
                 
             except Exception as e:
                 logger.error(f"Erro ao excluir artigo {artigo_id}: {e}")
                 raise
-            
+        if excluido:
+            indice_busca_service.reindexar(artigo_id)
+        return excluido
 
-    async def search_artigos(self, query: str) -> List[ArtigoResponse]:
-        """Buscar artigos por título, DOI ou publicadora"""
-        with get_db_cursor() as cursor:
-            try:
-                search_query = """
-                    SELECT id_artigo, titulo, DOI, publicadora, data_publicacao
-                    FROM Artigos 
-                    WHERE titulo ILIKE %s OR DOI ILIKE %s OR publicadora ILIKE %s
-                    ORDER BY titulo
-                """
-                search_param = f"%{query}%"
-                cursor.execute(search_query, (search_param, search_param, search_param))
-                results = cursor.fetchall()
-                
-                return [
-                    ArtigoResponse(**row)
-                    for row in results
-                ]
-                
-            except Exception as e:
-                logger.error(f"Erro ao buscar artigos: {e}")
-                raise
-        
 
     async def get_artigo_with_authors(self, artigo_id: int) -> Optional[ArtigoWithAuthors]:
         """Buscar artigo com seus autores"""
@@ -232,15 +220,4 @@ class ArtigoService:
                 raise
         
     async def search_artigos(self, q: str):
-        with get_db_cursor() as cursor:
-            query = """
-                SELECT id_artigo, titulo, DOI, publicadora, data_publicacao
-                FROM Artigos
-                WHERE titulo ILIKE %s OR DOI ILIKE %s
-                ORDER BY titulo
-                LIMIT 200 
-            """
-            param = f"%{q}%"
-            cursor.execute(query, tuple([param for _ in range(2)]))
-            results = cursor.fetchall()
-            return [Artigo(**row) for row in results]
+        return [Artigo(**row) for row in busca_service.buscar(ARTIGOS, q)]
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import anyio
+
+from app.core.autocompletar import IndicePrefixos, Sugestao
+from app.core.config import settings
+from app.core.texto import escapar_like, normalizar
+from app.database.connection import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Abaixo disso o trigrama não ajuda e a resposta sai só da memória
+_MINIMO_BANCO = 3
+
+# Consulta ao banco por tipo: mesmo formato de linha (id, texto, tipo_midia, pontuacao).
+# Comparações sobre o texto normalizado (normalizar_busca, migração 0009)
+_CONSULTAS_BANCO = {
+    "titulo": '''
+        SELECT id_titulo, titulo, tipo_midia,
+               word_similarity(normalizar_busca(%(q)s), normalizar_busca(titulo))
+                   + (normalizar_busca(titulo) LIKE %(prefixo)s)::int AS pontuacao
+        FROM mv_titulos_completos
+        WHERE normalizar_busca(%(q)s) <%% normalizar_busca(titulo)
+          AND id_titulo <> ALL(%(exceto)s)
+        ORDER BY pontuacao DESC, id_titulo
+        LIMIT %(limite)s
+    ''',
+    "autor": '''
+        SELECT id_autor, nome, NULL AS tipo_midia,
+               word_similarity(normalizar_busca(%(q)s), nome_busca)
+                   + (nome_busca LIKE %(prefixo)s)::int AS pontuacao
+        FROM Autores
+        WHERE normalizar_busca(%(q)s) <%% nome_busca
+          AND id_autor <> ALL(%(exceto)s)
+        ORDER BY pontuacao DESC, id_autor
+        LIMIT %(limite)s
+    ''',
+}
+
+
+class AutocompletarService:
+    
+    def __init__(self):
+        # Um índice por tipo; trocados inteiros a cada recarga, sem lock na leitura
+        self.indices: Dict[str, IndicePrefixos] = {}
+        self.atualizado_em: Optional[datetime] = None
+        self.acertos = 0
+        self.falhas = 0
+    
+    def recarregar(self) -> Dict[str, int]:
+        """Reconstrói os índices com os títulos e autores mais emprestados no último ano"""
+        limite = settings.AUTOCOMPLETE_INDEX_SIZE
+        with get_db_cursor(tuplas=True) as cursor:
+            # Emprestimo é particionado por data_emprestimo: o filtro de data poda as partições antigas
+            cursor.execute('''
+                SELECT m.id_titulo, m.titulo, m.tipo_midia, p.emprestimos
+                FROM (
+                    SELECT e.id_titulo, COUNT(*) AS emprestimos
+                    FROM Emprestimo emp
+                    INNER JOIN Estoque e ON e.id_estoque = emp.id_estoque
+                    WHERE emp.data_emprestimo >= CURRENT_DATE - 365
+                    GROUP BY e.id_titulo
+                    ORDER BY emprestimos DESC
+                    LIMIT %s
+                ) p
+                INNER JOIN mv_titulos_completos m ON m.id_titulo = p.id_titulo
+            ''', (limite,))
+            titulos = [Sugestao("titulo", id_titulo, titulo, emprestimos, tipo_midia)
+                       for id_titulo, titulo, tipo_midia, emprestimos in cursor.fetchall()]
+            # Autores: a agregação diária dos relatórios já tem os empréstimos por autor
+            cursor.execute('''
+                SELECT a.id_autor, a.nome, r.emprestimos
+                FROM (
+                    SELECT id_autor, SUM(emprestimos) AS emprestimos
+                    FROM RelatorioAutorDia
+                    WHERE dia >= CURRENT_DATE - 365
+                    GROUP BY id_autor
+                    ORDER BY emprestimos DESC
+                    LIMIT %s
+                ) r
+                INNER JOIN Autores a ON a.id_autor = r.id_autor
+            ''', (limite,))
+            autores = [Sugestao("autor", id_autor, nome, int(emprestimos))
+                       for id_autor, nome, emprestimos in cursor.fetchall()]
+        
+        self.indices = {"titulo": IndicePrefixos(titulos), "autor": IndicePrefixos(autores)}
+        self.atualizado_em = datetime.now()
+        return {tipo: len(indice) for tipo, indice in self.indices.items()}
+    
+    async def manter_atualizado(self, intervalo: float) -> None:
+        """Tarefa de fundo: recarrega os índices a cada ``intervalo`` segundos, fora do event loop"""
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await anyio.to_thread.run_sync(self.recarregar)
+            except Exception as e:
+                logger.warning(f"Falha ao recarregar o autocomplete: {e}")
+    
+    def sugerir(self, consulta: str, tipo: str = "titulo", limite: int = 10) -> List[dict]:
+        indice = self.indices.get(tipo)
+        sugestoes = [
+            {"id": s.id, "texto": s.texto, "tipo_midia": s.tipo_midia, "origem": "memoria"}
+            for s in (indice.buscar(consulta, limite) if indice is not None else [])
+        ]
+        if len(sugestoes) >= limite or len(normalizar(consulta)) < _MINIMO_BANCO:
+            self.acertos += 1
+            return sugestoes
+        
+        self.falhas += 1
+        prefixo = escapar_like(normalizar(consulta)) + "%"
+        with get_db_cursor(tuplas=True) as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                           (str(settings.SEARCH_TRIGRAM_THRESHOLD),))
+            cursor.execute(_CONSULTAS_BANCO[tipo], {
+                "q": consulta,
+                "prefixo": prefixo,
+                "exceto": [sugestao["id"] for sugestao in sugestoes],
+                "limite": limite - len(sugestoes),
+            })
+            sugestoes.extend(
+                {"id": id_, "texto": texto, "tipo_midia": tipo_midia, "origem": "banco"}
+                for id_, texto, tipo_midia, _ in cursor.fetchall()
+            )
+        return sugestoes
+
+autocompletar_service = AutocompletarService()
@@ -1,8 +1,45 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from app.core.texto import escapar_like
 from app.database.connection import get_db_cursor
+from app.services.busca_service import AUTORES, busca_service
 from app.schemas.schemas import AutorCreate, AutorUpdate, Autor
 from fastapi import HTTPException
 
+# Obras com tipo e disponibilidade numa consulta só: a página de títulos sai de uma
+# faixa do índice Autorias (id_autor, id_titulo) a partir do cursor, e só essas linhas
+# são juntadas às tabelas de mídia (por PK) e ao estoque; nada é buscado por título depois.
+# O título vem das tabelas, não de mv_titulos_completos, para obras recém-criadas aparecerem
+_CONSULTA_OBRAS = '''
+    SELECT p.id_titulo, COALESCE(l.titulo, r.titulo, d.titulo, a.titulo) AS titulo,
+           t.tipo_midia, COALESCE(co.autores, '{{}}') AS autores,
+           COUNT(e.id_estoque) AS total_exemplares,
+           COUNT(e.id_estoque) FILTER (WHERE ab.id_estoque IS NULL) AS exemplares_disponiveis
+    FROM (
+        SELECT ao.id_titulo
+        FROM Autorias ao
+        WHERE {filtro} AND ao.id_titulo > %s
+        GROUP BY ao.id_titulo
+        ORDER BY ao.id_titulo
+        LIMIT %s
+    ) p
+    INNER JOIN Titulo t ON t.id_titulo = p.id_titulo
+    -- Todos os autores do título (idx_autorias_id_titulo), não só os que atenderam ao filtro
+    LEFT JOIN LATERAL (
+        SELECT array_agg(au.nome ORDER BY au.nome) AS autores
+        FROM Autorias todas
+        INNER JOIN Autores au ON au.id_autor = todas.id_autor
+        WHERE todas.id_titulo = p.id_titulo
+    ) co ON true
+    LEFT JOIN Livros l ON l.id_livro = p.id_titulo
+    LEFT JOIN Revistas r ON r.id_revista = p.id_titulo
+    LEFT JOIN DVDs d ON d.id_dvd = p.id_titulo
+    LEFT JOIN Artigos a ON a.id_artigo = p.id_titulo
+    LEFT JOIN Estoque e ON e.id_titulo = p.id_titulo
+    LEFT JOIN EmprestimoAberto ab ON ab.id_estoque = e.id_estoque
+    GROUP BY p.id_titulo, l.titulo, r.titulo, d.titulo, a.titulo, t.tipo_midia, co.autores
+    ORDER BY p.id_titulo
+'''
+
 class AutorService:
     def create_autor(self, autor: AutorCreate) -> Autor:
         with get_db_cursor() as cursor:
@@ -36,17 +73,26 @@ class AutorService:
             return [Autor(**result) for result in results]
     
     def search_autores(self, query: str) -> List[Autor]:
-        with get_db_cursor() as cursor:
-            search_query = '''
-                SELECT * FROM Autores 
-                WHERE nome ILIKE %s
-                ORDER BY nome
-            '''
-            search_term = f"%{query}%"
-            cursor.execute(search_query, (search_term,))
-            results = cursor.fetchall()
-            return [Autor(**result) for result in results]
+        return [Autor(**result) for result in busca_service.buscar(AUTORES, query)]
     
+    def obras(self, id_autor: Optional[int] = None, nome: Optional[str] = None,
+              apos: int = 0, limite: int = 20) -> Tuple[List[dict], Optional[int]]:
+        """Títulos de um autor (``id_autor``) ou dos autores cujo nome contém ``nome``,
+        em ordem de id_titulo a partir do cursor ``apos``; devolve a página e o próximo cursor"""
+        if id_autor is not None:
+            filtro, parametro = "ao.id_autor = %s", id_autor
+        else:
+            filtro = ("ao.id_autor IN (SELECT id_autor FROM Autores "
+                      "WHERE nome_busca LIKE '%%' || normalizar_busca(%s) || '%%')")
+            parametro = escapar_like(nome)
+        with get_db_cursor() as cursor:
+            # Uma linha a mais só para saber se há próxima página
+            cursor.execute(_CONSULTA_OBRAS.format(filtro=filtro), (parametro, apos, limite + 1))
+            obras = cursor.fetchall()
+        if len(obras) > limite:
+            return obras[:limite], obras[limite - 1]["id_titulo"]
+        return obras, None
+
     def update_autor(self, id_autor: int, autor: AutorUpdate) -> Optional[Autor]:
         fields = []
         values = []
@@ -94,18 +140,5 @@ class AutorService:
             query = "DELETE FROM Autores WHERE id_autor = %s"
             cursor.execute(query, (id_autor,))
             return cursor.rowcount > 0
-        
-    def search_livros(self, q: str):
-        with get_db_cursor() as cursor:
-            query = """
-                SELECT id_autor, nome, data_nascimento, data_falecimento
-                FROM Autores
-                WHERE nome ILIKE %s
-                LIMIT 200 
-            """
-            param = f"%{q}%"
-            cursor.execute(query, tuple([param for _ in range(1)]))
-            results = cursor.fetchall()
-            return [Autor(**row) for row in results]
 
 autor_service = AutorService()
@@ -4,6 +4,7 @@ Base service class with common database operations
 import psycopg2
 from typing import List, Optional, Dict, Any, Tuple
 from app.db.database import get_db_connection
+from app.db.linhas import Linhas
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,8 +16,8 @@ class BaseService:
         self.table_name = table_name
         self.primary_key = primary_key
     
-    def create(self, data: Dict[str, Any]) -> Optional[int]:
-        """Create a new record"""
+    def create(self, data: Dict[str, Any], cursor=None) -> Optional[int]:
+        """Create a new record; with ``cursor``, inside the caller's transaction (no commit)"""
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['%s'] * len(data))
         query = f"""
@@ -25,6 +26,11 @@ class BaseService:
             RETURNING {self.primary_key}
         """
         
+        if cursor is not None:
+            cursor.execute(query, list(data.values()))
+            result = cursor.fetchone()
+            return result[0] if result else None
+        
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
                 try:
@@ -42,13 +48,20 @@ class BaseService:
         query = f"SELECT * FROM {self.table_name} WHERE {self.primary_key} = %s"
         
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            with conn.cursor() as cursor:
                 cursor.execute(query, (record_id,))
                 result = cursor.fetchone()
-                return dict(result) if result else None
+                if not result:
+                    return None
+                return dict(zip((coluna[0] for coluna in cursor.description), result))
     
-    def get_all(self, page: int = 1, size: int = 10, filters: Dict[str, Any] = None) -> Tuple[List[Dict[str, Any]], int]:
-        """Get all records with pagination and optional filters"""
+    def get_all(self, page: int = 1, size: int = 10, filters: Dict[str, Any] = None) -> Tuple[Linhas, int]:
+        """Get all records with pagination and optional filters.
+
+        Rows come back as a :class:`Linhas` page: tuples plus the column names
+        captured once. Each item is a read-only mapping, so ``Model(**row)``
+        and ``row.get(...)`` work as with dict rows.
+        """
         offset = (page - 1) * size
         where_clause = ""
         params = []
@@ -73,19 +86,17 @@ class BaseService:
         """
         
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            with conn.cursor() as cursor:
                 # Get total count
                 cursor.execute(count_query, params)
-                total = cursor.fetchone()['counter']
+                total = cursor.fetchone()[0]
                 
                 # Get data
                 cursor.execute(data_query, params + [size, offset])
-                results = cursor.fetchall()
-                
-                return [dict(row) for row in results], total
+                return Linhas.do_cursor(cursor), total
     
-    def update(self, record_id: int, data: Dict[str, Any]) -> bool:
-        """Update a record"""
+    def update(self, record_id: int, data: Dict[str, Any], cursor=None) -> bool:
+        """Update a record; with ``cursor``, inside the caller's transaction (no commit)"""
         if not data:
             return False
             
@@ -96,6 +107,10 @@ class BaseService:
             WHERE {self.primary_key} = %s
         """
         
+        if cursor is not None:
+            cursor.execute(query, list(data.values()) + [record_id])
+            return cursor.rowcount > 0
+        
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
                 try:
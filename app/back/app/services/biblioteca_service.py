@@ -1,6 +1,8 @@
 from typing import List, Optional
+from app.core.texto import escapar_like
 from app.database.connection import get_db_cursor
 from app.schemas.schemas import BibliotecaCreate, BibliotecaUpdate, Biblioteca
+from app.services.emprestimo_service import emprestimo_service
 from fastapi import HTTPException
 
 class BibliotecaService:
@@ -61,6 +63,8 @@ class BibliotecaService:
             cursor.execute(query, values)
             result = cursor.fetchone()
             if result:
+                if biblioteca.nome is not None:
+                    emprestimo_service.sincronizar_biblioteca(cursor, id_biblioteca, result['nome'])
                 return Biblioteca(**result)
             return None
     
@@ -85,11 +89,12 @@ class BibliotecaService:
             query = """
                 SELECT id_biblioteca, nome, endereco
                 FROM Biblioteca
-                WHERE nome ILIKE %s OR endereco ILIKE %s
+                WHERE nome_busca LIKE '%%' || normalizar_busca(%s) || '%%'
+                   OR normalizar_busca(endereco) LIKE '%%' || normalizar_busca(%s) || '%%'
                 ORDER BY nome
                 LIMIT 200 
             """
-            param = f"%{q}%"
+            param = escapar_like(q)
             cursor.execute(query, tuple([param for _ in range(2)]))
             results = cursor.fetchall()
             return [Biblioteca(**row) for row in results]
@@ -0,0 +1,201 @@
+"""
+Busca por texto compartilhada pelos endpoints de pesquisa
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.core.identificadores import identificar
+from app.core.texto import escapar_like
+from app.database.connection import get_db_cursor
+from app.services.indice_busca_service import indice_busca_service
+
+
+class Catalogo(NamedTuple):
+    """O que um endpoint pesquisa e devolve.
+
+    ``origem`` é o FROM (pode ter JOIN), ``colunas`` o SELECT e ``chave`` a coluna
+    que os backends por título (índice em memória, full-text) devolvem: com
+    ``por_titulo`` ela é um id_titulo. ``coluna_busca`` é a coluna ou expressão
+    normalizada com índice trigrama (migração 0009); ``coluna_codigo`` também é
+    comparada quando o termo tem dígitos. ``identificador`` é o tipo de
+    app.core.identificadores buscado por igualdade em ``codigo_normalizado``.
+    """
+    origem: str
+    colunas: str
+    chave: str
+    coluna_busca: str
+    ordem: Optional[str] = None
+    por_titulo: bool = False
+    tipo_midia: Optional[str] = None
+    identificador: Optional[str] = None
+    coluna_codigo: Optional[str] = None
+
+
+LIVROS = Catalogo(
+    "Livros", "id_livro, titulo, ISBN, numero_paginas, editora, data_publicacao", "id_livro",
+    "titulo_busca", por_titulo=True, tipo_midia="livro", identificador="isbn", coluna_codigo="ISBN",
+)
+REVISTAS = Catalogo(
+    "Revistas", "id_revista, titulo, ISSN, periodicidade, editora, data_publicacao", "id_revista",
+    "titulo_busca", por_titulo=True, tipo_midia="revista", identificador="issn", coluna_codigo="ISSN",
+)
+DVDS = Catalogo(
+    "DVDs", "id_dvd, titulo, ISAN, duracao, distribuidora, data_lancamento", "id_dvd",
+    "titulo_busca", por_titulo=True, tipo_midia="dvd", identificador="isan", coluna_codigo="ISAN",
+)
+ARTIGOS = Catalogo(
+    "Artigos", "id_artigo, titulo, DOI, publicadora, data_publicacao", "id_artigo",
+    "titulo_busca", ordem="titulo", por_titulo=True, tipo_midia="artigo", identificador="doi", coluna_codigo="DOI",
+)
+AUTORES = Catalogo(
+    "Autores", "id_autor, nome, data_nascimento, data_falecimento", "id_autor", "nome_busca", ordem="nome",
+)
+# Todos os tipos de mídia (EstoqueService.search_from_title, modo contem)
+TITULOS = Catalogo(
+    "mv_titulos_completos", "id_titulo, tipo_midia, titulo", "id_titulo", "normalizar_busca(titulo)",
+    por_titulo=True,
+)
+# Exemplares cujo título contém o termo (EstoqueService.search_from_estoque)
+EXEMPLARES = Catalogo(
+    "Estoque e JOIN mv_titulos_completos t ON t.id_titulo = e.id_titulo",
+    "e.id_estoque, e.condicao, e.id_titulo, e.id_biblioteca", "e.id_titulo", "normalizar_busca(t.titulo)",
+    ordem="e.id_estoque", por_titulo=True,
+)
+
+
+class BackendBusca(ABC):
+    """Um jeito de achar as linhas de um catálogo que casam com o termo"""
+    nome = ""
+
+    def atende(self, catalogo: Catalogo) -> bool:
+        return True
+
+    @abstractmethod
+    def ids(self, catalogo: Catalogo, termo: str, limite: int) -> List[int]:
+        """Chaves dos resultados, na ordem do backend"""
+
+    def buscar(self, catalogo: Catalogo, termo: str, limite: int) -> List[dict]:
+        # Os ids viram linhas numa consulta só, por chave (sem uma ida ao banco por resultado)
+        ids = self.ids(catalogo, termo, limite)
+        if not ids:
+            return []
+        ordem = catalogo.ordem or f"array_position(%s::int[], {catalogo.chave})"
+        parametros = (ids, ids, limite) if not catalogo.ordem else (ids, limite)
+        with get_db_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {catalogo.colunas} FROM {catalogo.origem}
+                WHERE {catalogo.chave} = ANY(%s)
+                ORDER BY {ordem}
+                LIMIT %s
+            """, parametros)
+            return cursor.fetchall()
+
+
+class BackendTrigrama(BackendBusca):
+    """Substring sem acento nem caixa na coluna normalizada, pelo índice trigrama (padrão)"""
+    nome = "trigrama"
+
+    def _where(self, catalogo: Catalogo, termo: str) -> Tuple[str, list]:
+        where = f"{catalogo.coluna_busca} LIKE '%%' || normalizar_busca(%s) || '%%'"
+        parametros = [escapar_like(termo)]
+        # A coluna de código não tem índice e o OR com ela vira varredura: só entra quando
+        # o termo pode ser um trecho de código
+        if catalogo.coluna_codigo and any(caractere.isdigit() for caractere in termo):
+            where += f" OR {catalogo.coluna_codigo} ILIKE %s"
+            parametros.append(f"%{escapar_like(termo)}%")
+        return where, parametros
+
+    def ids(self, catalogo: Catalogo, termo: str, limite: int) -> List[int]:
+        where, parametros = self._where(catalogo, termo)
+        with get_db_cursor(tuplas=True) as cursor:
+            cursor.execute(f"SELECT {catalogo.chave} FROM {catalogo.origem} WHERE {where} LIMIT %s",
+                           parametros + [limite])
+            return [chave for chave, in cursor.fetchall()]
+
+    def buscar(self, catalogo: Catalogo, termo: str, limite: int) -> List[dict]:
+        # Filtro e colunas na mesma consulta, sem passar pelos ids
+        where, parametros = self._where(catalogo, termo)
+        ordem = f"ORDER BY {catalogo.ordem}" if catalogo.ordem else ""
+        with get_db_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {catalogo.colunas} FROM {catalogo.origem}
+                WHERE {where}
+                {ordem}
+                LIMIT %s
+            """, parametros + [limite])
+            return cursor.fetchall()
+
+
+class BackendTextoCompleto(BackendBusca):
+    """Full-text ranqueado sobre mv_titulos_completos (índices GIN português e inglês)"""
+    nome = "texto"
+
+    def atende(self, catalogo: Catalogo) -> bool:
+        return catalogo.por_titulo
+
+    def ids(self, catalogo: Catalogo, termo: str, limite: int) -> List[int]:
+        # Mesmas expressões de EstoqueService._search_texto, para usar os mesmos índices
+        with get_db_cursor(tuplas=True) as cursor:
+            cursor.execute(f"""
+                SELECT id_titulo FROM mv_titulos_completos
+                WHERE (to_tsvector('portuguese', titulo) @@ websearch_to_tsquery('portuguese', %(q)s)
+                    OR to_tsvector('english', titulo) @@ websearch_to_tsquery('english', %(q)s))
+                  {"AND tipo_midia = %(tipo)s" if catalogo.tipo_midia else ""}
+                ORDER BY GREATEST(
+                    ts_rank_cd(to_tsvector('portuguese', titulo), websearch_to_tsquery('portuguese', %(q)s), 32),
+                    ts_rank_cd(to_tsvector('english', titulo), websearch_to_tsquery('english', %(q)s), 32)
+                ) DESC, id_titulo
+                LIMIT %(k)s
+            """, {"q": termo, "tipo": catalogo.tipo_midia, "k": limite})
+            return [id_titulo for id_titulo, in cursor.fetchall()]
+
+
+class BackendIndice(BackendBusca):
+    """Palavras e prefixos no índice invertido em memória (títulos, autores e códigos)"""
+    nome = "indice"
+
+    def atende(self, catalogo: Catalogo) -> bool:
+        return catalogo.por_titulo and indice_busca_service.fresco()
+
+    def ids(self, catalogo: Catalogo, termo: str, limite: int) -> List[int]:
+        filtros = {"tipo_midia": catalogo.tipo_midia} if catalogo.tipo_midia else {}
+        resultado = indice_busca_service.indice.buscar(termo, filtros, 0, limite)
+        return [documento.id_titulo for documento in resultado.documentos]
+
+
+BACKENDS: Dict[str, BackendBusca] = {
+    backend.nome: backend for backend in (BackendTrigrama(), BackendTextoCompleto(), BackendIndice())
+}
+
+
+class BuscaService:
+
+    def backend(self, nome: Optional[str], catalogo: Catalogo) -> BackendBusca:
+        """O backend pedido (ou SEARCH_BACKEND) se ele atende o catálogo agora; senão trigrama"""
+        escolhido = BACKENDS.get(nome or settings.SEARCH_BACKEND)
+        if escolhido is None or not escolhido.atende(catalogo):
+            return BACKENDS["trigrama"]
+        return escolhido
+
+    def buscar(self, catalogo: Catalogo, termo: str, limite: int = 200,
+               backend: Optional[str] = None) -> List[dict]:
+        """Linhas de ``catalogo`` que casam com ``termo`` (no máximo ``limite``).
+
+        Um termo que é identificador (ISBN, ISSN, ISAN, DOI) vira igualdade em
+        codigo_normalizado (migração 0008), só no catálogo daquele tipo.
+        """
+        if catalogo.identificador:
+            identificador = identificar(termo)
+            if identificador is not None:
+                if identificador.tipo != catalogo.identificador:
+                    return []
+                with get_db_cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT {catalogo.colunas} FROM {catalogo.origem} WHERE codigo_normalizado = ANY(%s)",
+                        (list(identificador.valores),)
+                    )
+                    return cursor.fetchall()
+        return self.backend(backend, catalogo).buscar(catalogo, termo, limite)
+
+busca_service = BuscaService()
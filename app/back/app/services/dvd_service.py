@@ -1,11 +1,14 @@
 from typing import List, Optional
 from app.database.connection import Database
 from app.database.connection import get_db_cursor
+from app.services.busca_service import DVDS, busca_service
 from app.schemas.dvd import DVDCreate, DVDUpdate, DVDResponse, DVDWithAuthors
 from app.schemas.schemas import DVD
 import logging
 
 from app.services import estoque_service
+from app.services.emprestimo_service import emprestimo_service
+from app.services.indice_busca_service import indice_busca_service
 
 logger = logging.getLogger(__name__)
 
@@ -43,12 +46,15 @@ class DVDService:
                 
                 result = cursor.fetchone()
                 # estoque_service.reload_materialized_view()  
-                return DVDResponse(**result)
+                criado = DVDResponse(**result)
                 
             except Exception as e:
                 logger.error(f"Erro ao criar DVD: {e}")
                 raise
-        
+        # Depois do commit, para o índice de busca ler o que foi gravado
+        indice_busca_service.reindexar(criado.id_dvd)
+        return criado
+
 
     async def get_dvd_by_id(self, dvd_id: int) -> Optional[DVDResponse]:
         """Buscar DVD por ID"""
@@ -132,13 +138,16 @@ class DVDService:
                 cursor.execute(query, values)
                 result = cursor.fetchone()
                 
-                if result:
-                    return DVDResponse(**result)
-                return None
+                if not result:
+                    return None
+                if dvd_data.titulo is not None:
+                    emprestimo_service.sincronizar_titulo(cursor, dvd_id, result['titulo'])
                 
             except Exception as e:
                 logger.error(f"Erro ao atualizar DVD {dvd_id}: {e}")
                 raise
+        indice_busca_service.reindexar(dvd_id)
+        return DVDResponse(**result)
 
 
     async def delete_dvd(self, dvd_id: int) -> bool:
@@ -166,12 +175,15 @@ class DVDService:
                 delete_titulo_query = "DELETE FROM Titulo WHERE id_titulo = %s"
                 cursor.execute(delete_titulo_query, (dvd_id,))
 
-                return cursor.rowcount > 0
+                excluido = cursor.rowcount > 0
                 
             except Exception as e:
                 logger.error(f"Erro ao excluir DVD {dvd_id}: {e}")
                 raise
-      
+        if excluido:
+            indice_busca_service.reindexar(dvd_id)
+        return excluido
+
 
     # async def search_dvds(self, query: str) -> List[DVDResponse]:
     #     """Buscar DVDs por título, ISAN ou distribuidora"""
@@ -238,14 +250,4 @@ class DVDService:
                 raise
 
     async def search_dvds(self, q: str) -> List[DVD]:
-        with get_db_cursor() as cursor:
-            query = """
-                SELECT id_dvd, titulo, ISAN, duracao, distribuidora, data_lancamento
-                FROM DVDs
-                WHERE titulo ILIKE %s OR ISAN ILIKE %s 
-                LIMIT 200 
-            """
-            param = f"%{q}%"
-            cursor.execute(query, tuple([param for _ in range(2)]))
-            results = cursor.fetchall()
-            return [DVD(**row) for row in results]
\ No newline at end of file
+        return [DVD(**row) for row in busca_service.buscar(DVDS, q)]
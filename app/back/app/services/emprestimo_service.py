@@ -1,17 +1,29 @@
 from typing import List, Optional
 from datetime import date, timedelta
 from app.database.connection import get_db_cursor
+from app.db.linhas import Linhas
 from app.schemas.schemas import EmprestimoCreate, EmprestimoUpdate, Emprestimo, EmprestimoCompleto, RelatorioEmprestimos
 from fastapi import HTTPException
 
+# Colunas do modelo de leitura EmprestimoAberto, na ordem do SELECT de carga
+_COLUNAS_EMPRESTIMO_ABERTO = '''
+    id_emprestimo, data_emprestimo, data_devolucao_prevista, id_estoque,
+    id_usuario, usuario_nome, usuario_email, usuario_endereco, usuario_telefone,
+    id_titulo, item_titulo, tipo_midia, id_biblioteca, biblioteca_nome
+'''
+
+# Número de fatias de EstatisticaEmprestimo/VencimentoEmprestimo (ver migração v0003)
+_FATIAS_ESTATISTICA = 8
+
 class EmprestimoService:
     
     def create_emprestimo(self, emprestimo: EmprestimoCreate) -> Emprestimo:
         with get_db_cursor() as cursor:
-            # Verificar se o item está disponível
+            # Verificar se o item está disponível (EmprestimoAberto evita varrer
+            # todas as partições de Emprestimo atrás de data_devolucao IS NULL)
             cursor.execute('''
-                SELECT COUNT(*) FROM Emprestimo 
-                WHERE id_estoque = %s AND data_devolucao IS NULL
+                SELECT COUNT(*) FROM EmprestimoAberto 
+                WHERE id_estoque = %s
             ''', (emprestimo.id_estoque,))
             
             if cursor.fetchone()['count'] > 0:
@@ -45,6 +57,8 @@ class EmprestimoService:
                 emprestimo.id_usuario
             ))
             result = cursor.fetchone()
+            self._abrir_emprestimo(cursor, result['id_emprestimo'])
+            self._contabilizar_emprestimo(cursor, result)
             return Emprestimo(**result)
     
     def get_emprestimo(self, id_emprestimo: int) -> Optional[Emprestimo]:
@@ -56,27 +70,42 @@ class EmprestimoService:
                 return Emprestimo(**result)
             return None
     
-    def get_emprestimos(self, skip: int = 0, limit: int = 100) -> List[Emprestimo]:
-        with get_db_cursor() as cursor:
+    # validar=False devolve linhas/dicionários sem montar os modelos, para
+    # endpoints que respondem com app.core.serializacao.resposta_rapida
+    
+    def get_emprestimos(self, skip: int = 0, limit: int = 100, validar: bool = True) -> List[Emprestimo]:
+        with get_db_cursor(tuplas=not validar) as cursor:
             query = "SELECT * FROM Emprestimo ORDER BY id_emprestimo OFFSET %s LIMIT %s"
             cursor.execute(query, (skip, limit))
-            results = cursor.fetchall()
-            return [Emprestimo(**result) for result in results]
+            if not validar:
+                return Linhas.do_cursor(cursor)
+            return [Emprestimo(**result) for result in cursor.fetchall()]
     
     def devolver_item(self, id_emprestimo: int, data_devolucao: date = None) -> Optional[Emprestimo]:
         if data_devolucao is None:
             data_devolucao = date.today()
         
         with get_db_cursor() as cursor:
-            query = '''
-                UPDATE Emprestimo 
-                SET data_devolucao = %s
-                WHERE id_emprestimo = %s AND data_devolucao IS NULL
-                RETURNING id_emprestimo, data_emprestimo, data_devolucao_prevista, data_devolucao, id_estoque, id_usuario
-            '''
-            cursor.execute(query, (data_devolucao, id_emprestimo))
-            result = cursor.fetchone()
+            # data_emprestimo vem do modelo de leitura para que o UPDATE toque
+            # uma única partição de Emprestimo
+            cursor.execute(
+                "SELECT data_emprestimo FROM EmprestimoAberto WHERE id_emprestimo = %s FOR UPDATE",
+                (id_emprestimo,)
+            )
+            aberto = cursor.fetchone()
+            result = None
+            if aberto:
+                query = '''
+                    UPDATE Emprestimo 
+                    SET data_devolucao = %s
+                    WHERE id_emprestimo = %s AND data_emprestimo = %s AND data_devolucao IS NULL
+                    RETURNING id_emprestimo, data_emprestimo, data_devolucao_prevista, data_devolucao, id_estoque, id_usuario
+                '''
+                cursor.execute(query, (data_devolucao, id_emprestimo, aberto['data_emprestimo']))
+                result = cursor.fetchone()
             if result:
+                cursor.execute("DELETE FROM EmprestimoAberto WHERE id_emprestimo = %s", (id_emprestimo,))
+                self._contabilizar_devolucao(cursor, result)
                 return Emprestimo(**result)
             else:
                 raise HTTPException(
@@ -84,129 +113,51 @@ class EmprestimoService:
                     detail="Empréstimo não encontrado ou já devolvido"
                 )
     
-    def get_emprestimos_em_andamento(self, skip: int = 0, limit: int = 100) -> List[EmprestimoCompleto]:
+    def get_emprestimos_em_andamento(self, skip: int = 0, limit: int = 100, validar: bool = True) -> List[EmprestimoCompleto]:
         with get_db_cursor() as cursor:
-            query = '''
-                SELECT 
-                    e.id_emprestimo,
-                    e.data_emprestimo,
-                    e.data_devolucao_prevista,
-                    e.data_devolucao,
-                    u.id_usuario, u.nome as usuario_nome, u.email, u.endereco, u.telefone,
-                    COALESCE(l.titulo, r.titulo, d.titulo, a.titulo) as item_titulo,
-                    t.tipo_midia,
-                    b.nome as biblioteca_nome
-                FROM Emprestimo e
-                INNER JOIN Usuario u ON e.id_usuario = u.id_usuario
-                INNER JOIN Estoque est ON e.id_estoque = est.id_estoque
-                INNER JOIN Titulo t ON est.id_titulo = t.id_titulo
-                INNER JOIN Biblioteca b ON est.id_biblioteca = b.id_biblioteca
-                LEFT JOIN Livros l ON t.id_titulo = l.id_livro
-                LEFT JOIN Revistas r ON t.id_titulo = r.id_revista
-                LEFT JOIN DVDs d ON t.id_titulo = d.id_dvd
-                LEFT JOIN Artigos a ON t.id_titulo = a.id_artigo
-                WHERE e.data_devolucao IS NULL
-                ORDER BY e.data_emprestimo DESC
+            query = f'''
+                SELECT {_COLUNAS_EMPRESTIMO_ABERTO}
+                FROM EmprestimoAberto
+                ORDER BY data_emprestimo DESC, id_emprestimo DESC
                 OFFSET %s LIMIT %s
             '''
             cursor.execute(query, (skip, limit))
             results = cursor.fetchall()
-            
-            emprestimos = []
-            for result in results:
-                emprestimos.append(EmprestimoCompleto(
-                    id_emprestimo=result['id_emprestimo'],
-                    data_emprestimo=result['data_emprestimo'],
-                    data_devolucao_prevista=result['data_devolucao_prevista'],
-                    data_devolucao=result['data_devolucao'],
-                    usuario={
-                        'id_usuario': result['id_usuario'],
-                        'nome': result['usuario_nome'],
-                        'email': result['email'],
-                        'endereco': result['endereco'],
-                        'telefone': result['telefone']
-                    },
-                    item_titulo=result['item_titulo'],
-                    tipo_midia=result['tipo_midia'],
-                    biblioteca=result['biblioteca_nome']
-                ))
-            return emprestimos
-    
-    def get_emprestimos_vencidos(self, skip: int = 0, limit: int = 100) -> List[EmprestimoCompleto]:
+            return [self._emprestimo_completo(result, validar) for result in results]
+    
+    def get_emprestimos_vencidos(self, skip: int = 0, limit: int = 100, validar: bool = True) -> List[EmprestimoCompleto]:
         with get_db_cursor() as cursor:
-            query = '''
-                SELECT 
-                    e.id_emprestimo,
-                    e.data_emprestimo,
-                    e.data_devolucao_prevista,
-                    e.data_devolucao,
-                    u.id_usuario, u.nome as usuario_nome, u.email, u.endereco, u.telefone,
-                    COALESCE(l.titulo, r.titulo, d.titulo, a.titulo) as item_titulo,
-                    t.tipo_midia,
-                    b.nome as biblioteca_nome
-                FROM Emprestimo e
-                INNER JOIN Usuario u ON e.id_usuario = u.id_usuario
-                INNER JOIN Estoque est ON e.id_estoque = est.id_estoque
-                INNER JOIN Titulo t ON est.id_titulo = t.id_titulo
-                INNER JOIN Biblioteca b ON est.id_biblioteca = b.id_biblioteca
-                LEFT JOIN Livros l ON t.id_titulo = l.id_livro
-                LEFT JOIN Revistas r ON t.id_titulo = r.id_revista
-                LEFT JOIN DVDs d ON t.id_titulo = d.id_dvd
-                LEFT JOIN Artigos a ON t.id_titulo = a.id_artigo
-                WHERE e.data_devolucao IS NULL AND e.data_devolucao_prevista < %s
-                ORDER BY e.data_devolucao_prevista ASC
+            query = f'''
+                SELECT {_COLUNAS_EMPRESTIMO_ABERTO}
+                FROM EmprestimoAberto
+                WHERE data_devolucao_prevista < %s
+                ORDER BY data_devolucao_prevista ASC, id_emprestimo ASC
                 OFFSET %s LIMIT %s
             '''
             cursor.execute(query, (date.today(), skip, limit))
             results = cursor.fetchall()
-            
-            emprestimos = []
-            for result in results:
-                emprestimos.append(EmprestimoCompleto(
-                    id_emprestimo=result['id_emprestimo'],
-                    data_emprestimo=result['data_emprestimo'],
-                    data_devolucao_prevista=result['data_devolucao_prevista'],
-                    data_devolucao=result['data_devolucao'],
-                    usuario={
-                        'id_usuario': result['id_usuario'],
-                        'nome': result['usuario_nome'],
-                        'email': result['email'],
-                        'endereco': result['endereco'],
-                        'telefone': result['telefone']
-                    },
-                    item_titulo=result['item_titulo'],
-                    tipo_midia=result['tipo_midia'],
-                    biblioteca=result['biblioteca_nome']
-                ))
-            return emprestimos
+            return [self._emprestimo_completo(result, validar) for result in results]
     
     def get_relatorio_emprestimos(self) -> RelatorioEmprestimos:
         with get_db_cursor() as cursor:
-            # Total de empréstimos
-            cursor.execute("SELECT COUNT(*) FROM Emprestimo")
-            total_emprestimos = cursor.fetchone()['count']
-            
-            # Empréstimos em andamento
-            cursor.execute("SELECT COUNT(*) FROM Emprestimo WHERE data_devolucao IS NULL")
-            emprestimos_em_andamento = cursor.fetchone()['count']
-            
-            # Empréstimos vencidos
-            cursor.execute(
-                "SELECT COUNT(*) FROM Emprestimo WHERE data_devolucao IS NULL AND data_devolucao_prevista < %s",
-                (date.today(),)
-            )
-            emprestimos_vencidos = cursor.fetchone()['count']
-            
-            # Empréstimos devolvidos
-            cursor.execute("SELECT COUNT(*) FROM Emprestimo WHERE data_devolucao IS NOT NULL")
-            emprestimos_devolvidos = cursor.fetchone()['count']
-            
-            return RelatorioEmprestimos(
-                total_emprestimos=total_emprestimos,
-                emprestimos_em_andamento=emprestimos_em_andamento,
-                emprestimos_vencidos=emprestimos_vencidos,
-                emprestimos_devolvidos=emprestimos_devolvidos
-            )
+            # Contadores mantidos no empréstimo/devolução (ver _contabilizar_*);
+            # vencidos = baldes com data prevista anterior a hoje + já consolidados.
+            # Sem a consolidação diária (app.jobs.diario) os baldes vencidos se
+            # acumulam e a soma deixa de ser O(1); consolidado_ate mostra o último dia consolidado
+            cursor.execute('''
+                SELECT 
+                    COALESCE(SUM(total), 0) AS total_emprestimos,
+                    COALESCE(SUM(em_andamento), 0) AS emprestimos_em_andamento,
+                    COALESCE(SUM(devolvidos), 0) AS emprestimos_devolvidos,
+                    COALESCE(SUM(vencidos_consolidados), 0) + (
+                        SELECT COALESCE(SUM(em_aberto), 0)
+                        FROM VencimentoEmprestimo
+                        WHERE data_devolucao_prevista < %s
+                    ) AS emprestimos_vencidos,
+                    (SELECT consolidado_ate FROM EstatisticaEmprestimoCorte WHERE id = 1) AS consolidado_ate
+                FROM EstatisticaEmprestimo
+            ''', (date.today(),))
+            return RelatorioEmprestimos(**cursor.fetchone())
         
     def search_emprestimos(self, q: str):
         with get_db_cursor() as cursor:
@@ -223,5 +174,118 @@ class EmprestimoService:
             cursor.execute(query, tuple([param for _ in range(5)]))
             results = cursor.fetchall()
             return [Emprestimo(**row) for row in results]
+    
+    # Manutenção do modelo de leitura EmprestimoAberto. Todos os métodos abaixo
+    # recebem o cursor da operação chamadora para rodar na mesma transação.
+    
+    def _abrir_emprestimo(self, cursor, id_emprestimo: int):
+        cursor.execute(f'''
+            INSERT INTO EmprestimoAberto ({_COLUNAS_EMPRESTIMO_ABERTO})
+            SELECT 
+                e.id_emprestimo, e.data_emprestimo, e.data_devolucao_prevista, e.id_estoque,
+                u.id_usuario, u.nome, u.email, u.endereco, u.telefone,
+                t.id_titulo, COALESCE(l.titulo, r.titulo, d.titulo, a.titulo), t.tipo_midia,
+                b.id_biblioteca, b.nome
+            FROM Emprestimo e
+            INNER JOIN Usuario u ON e.id_usuario = u.id_usuario
+            INNER JOIN Estoque est ON e.id_estoque = est.id_estoque
+            INNER JOIN Titulo t ON est.id_titulo = t.id_titulo
+            INNER JOIN Biblioteca b ON est.id_biblioteca = b.id_biblioteca
+            LEFT JOIN Livros l ON t.id_titulo = l.id_livro
+            LEFT JOIN Revistas r ON t.id_titulo = r.id_revista
+            LEFT JOIN DVDs d ON t.id_titulo = d.id_dvd
+            LEFT JOIN Artigos a ON t.id_titulo = a.id_artigo
+            WHERE e.id_emprestimo = %s
+        ''', (id_emprestimo,))
+    
+    def _contabilizar_emprestimo(self, cursor, emprestimo: dict):
+        fatia = emprestimo['id_emprestimo'] % _FATIAS_ESTATISTICA
+        cursor.execute('''
+            UPDATE EstatisticaEmprestimo
+            SET total = total + 1, em_andamento = em_andamento + 1
+            WHERE fatia = %s
+        ''', (fatia,))
+        if emprestimo['data_devolucao_prevista'] is not None:
+            cursor.execute('''
+                INSERT INTO VencimentoEmprestimo (data_devolucao_prevista, fatia, em_aberto)
+                VALUES (%s, %s, 1)
+                ON CONFLICT (data_devolucao_prevista, fatia)
+                DO UPDATE SET em_aberto = VencimentoEmprestimo.em_aberto + 1
+            ''', (emprestimo['data_devolucao_prevista'], fatia))
+    
+    def _contabilizar_devolucao(self, cursor, emprestimo: dict):
+        fatia = emprestimo['id_emprestimo'] % _FATIAS_ESTATISTICA
+        consolidado = 0
+        if emprestimo['data_devolucao_prevista'] is not None:
+            cursor.execute('''
+                UPDATE VencimentoEmprestimo SET em_aberto = em_aberto - 1
+                WHERE data_devolucao_prevista = %s AND fatia = %s
+            ''', (emprestimo['data_devolucao_prevista'], fatia))
+            # Balde já dobrado em vencidos_consolidados pelo job de consolidação
+            consolidado = 1 if cursor.rowcount == 0 else 0
+        cursor.execute('''
+            UPDATE EstatisticaEmprestimo
+            SET em_andamento = em_andamento - 1,
+                devolvidos = devolvidos + 1,
+                vencidos_consolidados = vencidos_consolidados - %s
+            WHERE fatia = %s
+        ''', (consolidado, fatia))
+    
+    def sincronizar_usuario(self, cursor, usuario: dict):
+        cursor.execute('''
+            UPDATE EmprestimoAberto
+            SET usuario_nome = %s, usuario_email = %s, usuario_endereco = %s, usuario_telefone = %s
+            WHERE id_usuario = %s
+        ''', (usuario['nome'], usuario['email'], usuario['endereco'], usuario['telefone'], usuario['id_usuario']))
+    
+    def sincronizar_biblioteca(self, cursor, id_biblioteca: int, nome: str):
+        cursor.execute(
+            "UPDATE EmprestimoAberto SET biblioteca_nome = %s WHERE id_biblioteca = %s",
+            (nome, id_biblioteca)
+        )
+    
+    def sincronizar_titulo(self, cursor, id_titulo: int, titulo: str):
+        cursor.execute(
+            "UPDATE EmprestimoAberto SET item_titulo = %s WHERE id_titulo = %s",
+            (titulo, id_titulo)
+        )
+    
+    def sincronizar_estoque(self, cursor, id_estoque: int):
+        # O exemplar mudou de título ou de biblioteca: relê as colunas que vêm dele
+        cursor.execute('''
+            UPDATE EmprestimoAberto ab
+            SET id_titulo = t.id_titulo,
+                item_titulo = COALESCE(l.titulo, r.titulo, d.titulo, a.titulo),
+                tipo_midia = t.tipo_midia,
+                id_biblioteca = b.id_biblioteca,
+                biblioteca_nome = b.nome
+            FROM Estoque est
+            INNER JOIN Titulo t ON est.id_titulo = t.id_titulo
+            INNER JOIN Biblioteca b ON est.id_biblioteca = b.id_biblioteca
+            LEFT JOIN Livros l ON t.id_titulo = l.id_livro
+            LEFT JOIN Revistas r ON t.id_titulo = r.id_revista
+            LEFT JOIN DVDs d ON t.id_titulo = d.id_dvd
+            LEFT JOIN Artigos a ON t.id_titulo = a.id_artigo
+            WHERE est.id_estoque = %s AND ab.id_estoque = est.id_estoque
+        ''', (id_estoque,))
+    
+    def _emprestimo_completo(self, result, validar: bool = True) -> EmprestimoCompleto:
+        emprestimo = dict(
+            id_emprestimo=result['id_emprestimo'],
+            data_emprestimo=result['data_emprestimo'],
+            data_devolucao_prevista=result['data_devolucao_prevista'],
+            data_devolucao=None,
+            usuario={
+                'id_usuario': result['id_usuario'],
+                'nome': result['usuario_nome'],
+                'email': result['usuario_email'],
+                'endereco': result['usuario_endereco'],
+                'telefone': result['usuario_telefone']
+            },
+            item_titulo=result['item_titulo'],
+            tipo_midia=result['tipo_midia'],
+            biblioteca=result['biblioteca_nome']
+        )
+        return EmprestimoCompleto(**emprestimo) if validar else emprestimo
 
 emprestimo_service = EmprestimoService()
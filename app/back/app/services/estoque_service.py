@@ -1,6 +1,10 @@
 from typing import List, Optional
+from app.core.config import settings
 from app.database.connection import get_db_cursor
-from app.schemas.schemas import EstoqueCreate, EstoqueUpdate, Estoque, DisponibilidadeItem, TituloSearch
+from app.services.busca_service import EXEMPLARES, TITULOS, busca_service
+from app.services.emprestimo_service import emprestimo_service
+from app.db.linhas import Linhas
+from app.schemas.schemas import EstoqueCreate, EstoqueUpdate, Estoque, DisponibilidadeItem, DisponibilidadeBiblioteca, TituloRanqueado, ModoBusca
 from fastapi import HTTPException
 
 class EstoqueService:
@@ -39,19 +43,24 @@ class EstoqueService:
                 return Estoque(**result)
             return None
     
-    def get_estoques(self, skip: int = 0, limit: int = 100) -> List[Estoque]:
-        with get_db_cursor() as cursor:
+    # validar=False devolve as linhas do banco sem montar os modelos, para
+    # endpoints que respondem com app.core.serializacao.resposta_rapida
+    
+    def get_estoques(self, skip: int = 0, limit: int = 100, validar: bool = True) -> List[Estoque]:
+        with get_db_cursor(tuplas=not validar) as cursor:
             query = "SELECT * FROM Estoque ORDER BY id_estoque OFFSET %s LIMIT %s"
             cursor.execute(query, (skip, limit))
-            results = cursor.fetchall()
-            return [Estoque(**result) for result in results]
+            if not validar:
+                return Linhas.do_cursor(cursor)
+            return [Estoque(**result) for result in cursor.fetchall()]
     
-    def get_estoque_por_biblioteca(self, id_biblioteca: int, skip: int = 0, limit: int = 100) -> List[Estoque]:
-        with get_db_cursor() as cursor:
+    def get_estoque_por_biblioteca(self, id_biblioteca: int, skip: int = 0, limit: int = 100, validar: bool = True) -> List[Estoque]:
+        with get_db_cursor(tuplas=not validar) as cursor:
             query = "SELECT * FROM Estoque WHERE id_biblioteca = %s ORDER BY id_estoque OFFSET %s LIMIT %s"
             cursor.execute(query, (id_biblioteca, skip, limit))
-            results = cursor.fetchall()
-            return [Estoque(**result) for result in results]
+            if not validar:
+                return Linhas.do_cursor(cursor)
+            return [Estoque(**result) for result in cursor.fetchall()]
     
     def get_disponibilidade_item(self, id_titulo: int) -> Optional[DisponibilidadeItem]:
         with get_db_cursor() as cursor:
@@ -83,8 +92,8 @@ class EstoqueService:
             cursor.execute('''
                 SELECT COUNT(*) as emprestados
                 FROM Estoque e
-                INNER JOIN Emprestimo emp ON e.id_estoque = emp.id_estoque
-                WHERE e.id_titulo = %s AND emp.data_devolucao IS NULL
+                INNER JOIN EmprestimoAberto emp ON e.id_estoque = emp.id_estoque
+                WHERE e.id_titulo = %s
             ''', (id_titulo,))
             exemplares_emprestados = cursor.fetchone()['emprestados']
             
@@ -128,16 +137,17 @@ class EstoqueService:
             cursor.execute(query, values)
             result = cursor.fetchone()
             if result:
+                if estoque.id_titulo is not None or estoque.id_biblioteca is not None:
+                    emprestimo_service.sincronizar_estoque(cursor, id_estoque)
                 return Estoque(**result)
             return None
     
     def delete_estoque(self, id_estoque: int) -> bool:
         with get_db_cursor() as cursor:
             # Verificar se há empréstimos associados
-            cursor.execute("SELECT COUNT(*) FROM Emprestimo WHERE id_estoque = %s", (id_estoque,))
-            count = cursor.fetchone()['count']
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM Emprestimo WHERE id_estoque = %s) AS possui", (id_estoque,))
             
-            if count > 0:
+            if cursor.fetchone()['possui']:
                 raise HTTPException(
                     status_code=400,
                     detail="Não é possível excluir item do estoque com empréstimos associados"
@@ -147,40 +157,96 @@ class EstoqueService:
             cursor.execute(query, (id_estoque,))
             return cursor.rowcount > 0
         
-    def search_from_title(self, search_query: str) -> List[Estoque]:
+    def exemplares_livres(self, id_titulo: int, preferencia: Optional[List[int]] = None,
+                          livres: int = 5) -> Optional[List[DisponibilidadeBiblioteca]]:
+        """Exemplares do título por biblioteca, com até ``livres`` id_estoque fora de empréstimo
+        em cada uma; as bibliotecas de ``preferencia`` vêm primeiro, na ordem dada.
+        None se o título não existe"""
+        with get_db_cursor() as cursor:
+            # Uma consulta: exemplares por idx_estoque_titulo_cobrindo (migração 0002, já traz
+            # id_estoque e id_biblioteca), anti-join com EmprestimoAberto por id_estoque. O LEFT
+            # JOIN a partir de Titulo distingue título inexistente (nenhuma linha) de título sem
+            # exemplares (biblioteca nula)
+            cursor.execute('''
+                SELECT
+                    e.id_biblioteca,
+                    b.nome AS biblioteca,
+                    COUNT(e.id_estoque) AS total_exemplares,
+                    COUNT(e.id_estoque) FILTER (WHERE ab.id_estoque IS NULL) AS exemplares_disponiveis,
+                    COALESCE(
+                        (array_agg(e.id_estoque ORDER BY e.id_estoque) FILTER (WHERE ab.id_estoque IS NULL))[1:%(livres)s],
+                        '{}'
+                    ) AS exemplares_livres
+                FROM Titulo t
+                LEFT JOIN Estoque e ON e.id_titulo = t.id_titulo
+                LEFT JOIN Biblioteca b ON b.id_biblioteca = e.id_biblioteca
+                LEFT JOIN EmprestimoAberto ab ON ab.id_estoque = e.id_estoque
+                WHERE t.id_titulo = %(id_titulo)s
+                GROUP BY e.id_biblioteca, b.nome
+                ORDER BY array_position(%(preferencia)s::int[], e.id_biblioteca) NULLS LAST,
+                         exemplares_disponiveis DESC, e.id_biblioteca
+            ''', {"id_titulo": id_titulo, "preferencia": preferencia or [], "livres": livres})
+            results = cursor.fetchall()
+            if not results:
+                return None
+            return [DisponibilidadeBiblioteca(**result) for result in results if result['id_biblioteca'] is not None]
+
+    def search_from_title(self, search_query: str, modo: ModoBusca = ModoBusca.contem,
+                          k: Optional[int] = None) -> List[TituloRanqueado]:
+        if modo == ModoBusca.relevancia:
+            k = k or settings.SEARCH_TOP_K
+            # Full-text primeiro; sem nenhum resultado (erro de digitação, só stopwords), trigrama
+            return self._search_texto(search_query, k) or self._search_trigrama(search_query, k)
+        return [TituloRanqueado(**result) for result in busca_service.buscar(TITULOS, search_query, k or 200)]
+
+    def _search_texto(self, search_query: str, k: int) -> List[TituloRanqueado]:
+        # As expressões to_tsvector(...) precisam ser idênticas às dos índices GIN de
+        # mv_titulos_completos; o OR entre as duas vira um BitmapOr dos dois índices.
+        # ts_rank_cd com normalização 32 devolve rank / (rank + 1), entre 0 e 1.
         with get_db_cursor() as cursor:
-            search_query = f"%{search_query}%"
             query = '''
-                SELECT 
+                SELECT
                     id_titulo,
                     tipo_midia,
-                    titulo  
+                    titulo,
+                    GREATEST(
+                        ts_rank_cd(to_tsvector('portuguese', titulo), websearch_to_tsquery('portuguese', %(q)s), 32),
+                        ts_rank_cd(to_tsvector('english', titulo), websearch_to_tsquery('english', %(q)s), 32)
+                    ) AS pontuacao,
+                    'texto' AS correspondencia
                 FROM mv_titulos_completos
-                WHERE titulo ILIKE %s
-                LIMIT 200; 
+                WHERE to_tsvector('portuguese', titulo) @@ websearch_to_tsquery('portuguese', %(q)s)
+                   OR to_tsvector('english', titulo) @@ websearch_to_tsquery('english', %(q)s)
+                ORDER BY pontuacao DESC, id_titulo
+                LIMIT %(k)s
             '''
-            cursor.execute(query, tuple([search_query for _ in range(1)]))
-            results = cursor.fetchall()
-            return [TituloSearch(**result) for result in results]
+            cursor.execute(query, {"q": search_query, "k": k})
+            return [TituloRanqueado(**result) for result in cursor.fetchall()]
 
-    def search_from_estoque(self, search_query: str) -> List[Estoque]:
+    def _search_trigrama(self, search_query: str, k: int) -> List[TituloRanqueado]:
+        # word_similarity: o termo contra o trecho mais parecido do título, ambos normalizados
+        # (idx_mv_titulos_titulo_busca_trgm)
         with get_db_cursor() as cursor:
-            search_query = f"%{search_query}%"
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                           (str(settings.SEARCH_TRIGRAM_THRESHOLD),))
             query = '''
-                SELECT 
-                    e.id_estoque,
-                    e.condicao,
-                    e.id_titulo,
-                    e.id_biblioteca
-                FROM Estoque AS e
-                JOIN Titulo AS t ON e.id_titulo = t.id_titulo
-                WHERE t.titulo ILIKE %s
-                ORDER BY e.id_estoque ASC 
-                LIMIT 200; 
+                SELECT
+                    id_titulo,
+                    tipo_midia,
+                    titulo,
+                    word_similarity(normalizar_busca(%(q)s), normalizar_busca(titulo)) AS pontuacao,
+                    'trigrama' AS correspondencia
+                FROM mv_titulos_completos
+                WHERE normalizar_busca(%(q)s) <%% normalizar_busca(titulo)
+                ORDER BY pontuacao DESC, id_titulo
+                LIMIT %(k)s
             '''
-            cursor.execute(query, (search_query,))
-            results = cursor.fetchall()
-            return [Estoque(**result) for result in results]
+            cursor.execute(query, {"q": search_query, "k": k})
+            return [TituloRanqueado(**result) for result in cursor.fetchall()]
+
+    def search_from_estoque(self, search_query: str) -> List[Estoque]:
+        # Titulo não tem o nome da obra: o filtro é sobre mv_titulos_completos
+        return [Estoque(**result) for result in busca_service.buscar(EXEMPLARES, search_query)]
     
     def reload_materialized_view(self):
         with get_db_cursor() as cursor:
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import logging
+import threading
+import uuid
+import weakref
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, List, Sequence, Any
+
+import anyio
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from psycopg2 import pool
+
+from app.core.config import settings
+from app.db.database import db_manager
+from app.schemas.schemas import FormatoExportacao
+
+logger = logging.getLogger(__name__)
+
+# Cada exportação segura uma conexão do pool durante todo o download; o teto
+# deixa ao menos uma conexão livre para o restante da API
+_vagas = threading.BoundedSemaphore(
+    max(0, min(settings.EXPORT_MAX_CONCURRENT, settings.MAX_CONNECTIONS - 1))
+)
+
+_TIPOS_CONTEUDO = {
+    FormatoExportacao.ndjson: "application/x-ndjson",
+    FormatoExportacao.csv: "text/csv; charset=utf-8",
+}
+
+
+class _CursorExportacao:
+    """Cursor nomeado (server-side) numa conexão exclusiva do pool.
+
+    O banco só entrega as linhas a cada fetchmany, então a memória fica
+    limitada a um bloco. O lock marca quando há uma busca em andamento, para
+    que uma desconexão do cliente cancele a consulta e a limpeza espere por ela.
+    """
+
+    def __init__(self, query: str, params: Sequence[Any]):
+        if not _vagas.acquire(blocking=False):
+            raise HTTPException(status_code=503, detail="Limite de exportações simultâneas atingido")
+        try:
+            self.conn = db_manager.getconn()
+        except pool.PoolError:
+            _vagas.release()
+            raise HTTPException(status_code=503, detail="Limite de exportações simultâneas atingido")
+        self.cursor = self.conn.cursor(name=f"exportacao_{uuid.uuid4().hex}")
+        self.query = query
+        self.params = params
+        self.colunas: List[str] = None
+        self._em_uso = threading.Lock()
+        self._liberado = False
+
+    def buscar(self, quantidade: int) -> list:
+        with self._em_uso:
+            if self.colunas is None:
+                self.cursor.execute(self.query, self.params)
+            rows = self.cursor.fetchmany(quantidade)
+            if self.colunas is None:
+                self.colunas = [coluna.name for coluna in self.cursor.description]
+            return rows
+
+    def liberar(self, interrompida: bool):
+        if self._liberado:
+            return
+        self._liberado = True
+        if interrompida and self._em_uso.locked():
+            # A thread de busca recebe QueryCanceled e solta o lock em seguida
+            self.conn.cancel()
+        # Fora do event loop: pode ter que esperar a busca cancelada terminar
+        threading.Thread(target=self._devolver_conexao, daemon=True).start()
+
+    def _devolver_conexao(self):
+        with self._em_uso:
+            try:
+                self.conn.rollback()
+                self.cursor.close()
+            except Exception as e:
+                logger.warning(f"Erro ao encerrar cursor de exportação: {e}")
+            finally:
+                try:
+                    db_manager.putconn(self.conn, close=bool(self.conn.closed))
+                finally:
+                    _vagas.release()
+
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _ndjson(colunas: List[str], rows: list, primeiro: bool) -> str:
+    return "".join(
+        json.dumps(dict(zip(colunas, row)), ensure_ascii=False, default=_valor_json) + "\n"
+        for row in rows
+    )
+
+
+def _csv(colunas: List[str], rows: list, primeiro: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if primeiro:
+        writer.writerow(colunas)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class ExportacaoService:
+
+    def exportar_emprestimos_vencidos(self, formato: FormatoExportacao, compactar: bool) -> StreamingResponse:
+        query = '''
+            SELECT id_emprestimo, data_emprestimo, data_devolucao_prevista, id_estoque,
+                   id_usuario, usuario_nome, usuario_email, usuario_telefone,
+                   id_titulo, item_titulo, tipo_midia, id_biblioteca, biblioteca_nome
+            FROM EmprestimoAberto
+            WHERE data_devolucao_prevista < %s
+            ORDER BY data_devolucao_prevista ASC, id_emprestimo ASC
+        '''
+        return self._exportar("emprestimos-vencidos", query, (date.today(),), formato, compactar)
+
+    def exportar_estoque_biblioteca(self, id_biblioteca: int, formato: FormatoExportacao, compactar: bool) -> StreamingResponse:
+        query = '''
+            SELECT e.id_estoque, e.condicao, e.id_titulo, t.tipo_midia,
+                   COALESCE(l.titulo, r.titulo, d.titulo, a.titulo) AS titulo,
+                   e.id_biblioteca,
+                   EXISTS (SELECT 1 FROM EmprestimoAberto ea WHERE ea.id_estoque = e.id_estoque) AS emprestado
+            FROM Estoque e
+            INNER JOIN Titulo t ON e.id_titulo = t.id_titulo
+            LEFT JOIN Livros l ON t.id_titulo = l.id_livro
+            LEFT JOIN Revistas r ON t.id_titulo = r.id_revista
+            LEFT JOIN DVDs d ON t.id_titulo = d.id_dvd
+            LEFT JOIN Artigos a ON t.id_titulo = a.id_artigo
+            WHERE e.id_biblioteca = %s
+            ORDER BY e.id_estoque
+        '''
+        return self._exportar(f"estoque-biblioteca-{id_biblioteca}", query, (id_biblioteca,), formato, compactar)
+
+    def exportar_usuarios_com_emprestimos_ativos(self, formato: FormatoExportacao, compactar: bool) -> StreamingResponse:
+        query = '''
+            SELECT u.id_usuario, u.nome, u.email, u.endereco, u.telefone,
+                   COUNT(*) AS emprestimos_ativos,
+                   MIN(ea.data_devolucao_prevista) AS proxima_devolucao
+            FROM Usuario u
+            INNER JOIN EmprestimoAberto ea ON ea.id_usuario = u.id_usuario
+            GROUP BY u.id_usuario
+            ORDER BY u.nome, u.id_usuario
+        '''
+        return self._exportar("usuarios-emprestimos-ativos", query, (), formato, compactar)
+
+    def _exportar(self, nome: str, query: str, params: Sequence[Any],
+                  formato: FormatoExportacao, compactar: bool) -> StreamingResponse:
+        # A conexão é reservada antes da resposta começar, para o 503 ainda ser possível
+        cursor = _CursorExportacao(query, params)
+        corpo = self._corpo(cursor, formato, compactar)
+        # Se o cliente cair antes do primeiro bloco o gerador nem chega a rodar
+        # o finally; a conexão volta ao pool quando ele for coletado
+        weakref.finalize(corpo, cursor.liberar, True)
+        headers = {"Content-Disposition": f'attachment; filename="{nome}.{formato.value}"'}
+        if compactar:
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(
+            corpo,
+            media_type=_TIPOS_CONTEUDO[formato],
+            headers=headers
+        )
+
+    async def _corpo(self, cursor: _CursorExportacao, formato: FormatoExportacao, compactar: bool) -> AsyncIterator[bytes]:
+        codificar = _ndjson if formato == FormatoExportacao.ndjson else _csv
+        # wbits=31: fluxo gzip (cabeçalho + CRC), não zlib puro
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compactar else None
+        tamanho = settings.EXPORT_CHUNK_SIZE
+        concluida = False
+        primeiro = True
+        try:
+            while True:
+                # cancellable: uma desconexão interrompe a espera e liberar() cancela a consulta
+                rows = await anyio.to_thread.run_sync(cursor.buscar, tamanho, cancellable=True)
+                bloco = codificar(cursor.colunas, rows, primeiro).encode("utf-8")
+                primeiro = False
+                if compressor:
+                    bloco = compressor.compress(bloco)
+                if bloco:
+                    yield bloco
+                if len(rows) < tamanho:
+                    break
+            if compressor:
+                yield compressor.flush()
+            concluida = True
+        finally:
+            cursor.liberar(interrompida=not concluida)
+
+exportacao_service = ExportacaoService()
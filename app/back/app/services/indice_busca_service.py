@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+import anyio
+
+from app.core.cache_busca import cache_busca
+from app.core.config import settings
+from app.core.indice_invertido import Documento, IndiceInvertido
+from app.database.connection import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Mesmas colunas de MediaService.search_media, mais os autores do título e, para as
+# facetas, as bibliotecas com exemplares e se algum está livre agora
+_CONSULTA = '''
+    SELECT t.id_titulo, t.tipo_midia, t.titulo,
+           COALESCE(l.isbn, r.issn, d.isan, a.doi) AS codigo,
+           COALESCE(l.editora, r.editora, d.distribuidora, a.publicadora) AS editora,
+           COALESCE(l.data_publicacao, r.data_publicacao, d.data_lancamento, a.data_publicacao)::text AS data_pub,
+           COALESCE(au.nomes, '{{}}') AS autores,
+           COALESCE(es.bibliotecas, '{{}}') AS bibliotecas,
+           COALESCE(es.disponivel, false) AS disponivel
+    FROM {origem}
+    LEFT JOIN Livros l ON l.id_livro = t.id_titulo
+    LEFT JOIN Revistas r ON r.id_revista = t.id_titulo
+    LEFT JOIN DVDs d ON d.id_dvd = t.id_titulo
+    LEFT JOIN Artigos a ON a.id_artigo = t.id_titulo
+    LEFT JOIN (
+        SELECT ao.id_titulo, array_agg(au.nome ORDER BY au.nome) AS nomes
+        FROM Autorias ao
+        INNER JOIN Autores au ON au.id_autor = ao.id_autor
+        {filtro_autorias}
+        GROUP BY ao.id_titulo
+    ) au ON au.id_titulo = t.id_titulo
+    LEFT JOIN (
+        SELECT e.id_titulo, array_agg(DISTINCT e.id_biblioteca) AS bibliotecas,
+               bool_or(ab.id_estoque IS NULL) AS disponivel
+        FROM Estoque e
+        LEFT JOIN EmprestimoAberto ab ON ab.id_estoque = e.id_estoque
+        {filtro_estoque}
+        GROUP BY e.id_titulo
+    ) es ON es.id_titulo = t.id_titulo
+'''
+
+# Carga completa: a view materializada já tem o título de cada mídia
+_CONSULTA_COMPLETA = _CONSULTA.format(origem="mv_titulos_completos t", filtro_autorias="", filtro_estoque="")
+
+# Títulos alterados agora: a view só enxerga o que existia no último REFRESH, então lê das tabelas
+_CONSULTA_TITULOS = _CONSULTA.format(
+    origem='''(
+        SELECT t.id_titulo, t.tipo_midia, COALESCE(l.titulo, r.titulo, d.titulo, a.titulo) AS titulo
+        FROM Titulo t
+        LEFT JOIN Livros l ON l.id_livro = t.id_titulo
+        LEFT JOIN Revistas r ON r.id_revista = t.id_titulo
+        LEFT JOIN DVDs d ON d.id_dvd = t.id_titulo
+        LEFT JOIN Artigos a ON a.id_artigo = t.id_titulo
+        WHERE t.id_titulo = ANY(%(ids)s)
+    ) t''',
+    filtro_autorias="WHERE ao.id_titulo = ANY(%(ids)s)",
+    filtro_estoque="WHERE e.id_titulo = ANY(%(ids)s)",
+)
+
+# Títulos com algum exemplar fora de empréstimo agora (modelo de leitura EmprestimoAberto)
+_CONSULTA_DISPONIVEIS = '''
+    SELECT DISTINCT e.id_titulo
+    FROM Estoque e
+    WHERE NOT EXISTS (SELECT 1 FROM EmprestimoAberto ab WHERE ab.id_estoque = e.id_estoque)
+'''
+
+
+class IndiceBuscaService:
+
+    def __init__(self):
+        # Trocado inteiro a cada reconstrução; escritas pontuais vão para o índice corrente
+        self.indice: Optional[IndiceInvertido] = None
+        self.sincronizado_em: Optional[datetime] = None
+        self.consultas_memoria = 0
+        self.consultas_banco = 0
+        # Tamanho aproximado do índice, medido a cada carga: medir percorre o índice inteiro
+        self.bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Ids escritos durante uma reconstrução, reaplicados no índice novo antes da troca
+        self._pendentes: Optional[Set[int]] = None
+
+    def fresco(self) -> bool:
+        """Índice carregado e sincronizado há menos de SEARCH_INDEX_MAX_AGE segundos"""
+        return (
+            self.indice is not None
+            and self.sincronizado_em is not None
+            and datetime.now() - self.sincronizado_em <= timedelta(seconds=settings.SEARCH_INDEX_MAX_AGE)
+        )
+
+    def _documentos(self, consulta: str, parametros: Optional[dict] = None) -> List[Documento]:
+        with get_db_cursor(tuplas=True) as cursor:
+            cursor.execute(consulta, parametros)
+            return [
+                Documento(*linha[:6], tuple(linha[6]), tuple(linha[7]), linha[8])
+                for linha in cursor.fetchall()
+            ]
+
+    def reconstruir(self) -> int:
+        """Lê o catálogo inteiro, troca o índice e grava o snapshot; devolve o número de títulos"""
+        with self._lock:
+            self._pendentes = set()
+        inicio = datetime.now()
+        try:
+            indice = IndiceInvertido(self._documentos(_CONSULTA_COMPLETA))
+            # Reaplica as escritas que chegaram durante a carga até não sobrar nenhuma; a
+            # troca é feita sob o lock junto com o fim da coleta, então um reindexar ou
+            # entra em _pendentes antes dela, ou já encontra o índice novo
+            while True:
+                with self._lock:
+                    pendentes, self._pendentes = self._pendentes, set()
+                    if not pendentes:
+                        self.indice = indice
+                        self.sincronizado_em = inicio
+                        self._pendentes = None
+                        break
+                self._aplicar(indice, pendentes)
+        finally:
+            with self._lock:
+                self._pendentes = None
+        self.bytes = indice.memoria()
+        if settings.SEARCH_INDEX_SNAPSHOT:
+            try:
+                indice.salvar(settings.SEARCH_INDEX_SNAPSHOT, inicio)
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar o snapshot do índice de busca: {e}")
+        return len(indice)
+
+    def carregar_snapshot(self) -> bool:
+        """Partida a frio: carrega o último snapshot, que vale como fresco até SEARCH_INDEX_MAX_AGE"""
+        caminho = settings.SEARCH_INDEX_SNAPSHOT
+        if not caminho or not os.path.exists(caminho):
+            return False
+        self.indice, self.sincronizado_em = IndiceInvertido.carregar(caminho)
+        self.bytes = self.indice.memoria()
+        return True
+
+    async def manter_atualizado(self, intervalo: float) -> None:
+        """Tarefa de fundo: reconstrói o índice a cada ``intervalo`` segundos, fora do event loop"""
+        while True:
+            try:
+                await anyio.to_thread.run_sync(self.reconstruir)
+            except Exception as e:
+                logger.warning(f"Falha ao reconstruir o índice de busca: {e}")
+            await asyncio.sleep(intervalo)
+
+    def atualizar_disponibilidade(self) -> None:
+        """Faceta disponível: muda a cada empréstimo, então é relida bem mais vezes que o índice"""
+        indice = self.indice
+        if indice is None:
+            return
+        with get_db_cursor(tuplas=True) as cursor:
+            cursor.execute(_CONSULTA_DISPONIVEIS)
+            indice.atualizar_disponibilidade(id_titulo for id_titulo, in cursor.fetchall())
+    
+    async def manter_disponibilidade(self, intervalo: float) -> None:
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await anyio.to_thread.run_sync(self.atualizar_disponibilidade)
+            except Exception as e:
+                logger.warning(f"Falha ao atualizar a disponibilidade do índice de busca: {e}")
+    
+    def _aplicar(self, indice: IndiceInvertido, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        documentos = {documento.id_titulo: documento
+                      for documento in self._documentos(_CONSULTA_TITULOS, {"ids": ids})}
+        for id_titulo in ids:
+            if id_titulo in documentos:
+                indice.adicionar(documentos[id_titulo])
+            else:
+                indice.remover(id_titulo)
+
+    def reindexar(self, *ids: int) -> None:
+        """Chamado depois do commit de uma escrita de mídia: relê esses títulos do banco
+        e descarta as respostas guardadas em app.core.cache_busca"""
+        with self._lock:
+            if self._pendentes is not None:
+                self._pendentes.update(ids)
+        if self.indice is not None:
+            try:
+                self._aplicar(self.indice, ids)
+            except Exception as e:
+                # Sem a atualização o índice fica defasado; a busca volta ao SQL até a próxima reconstrução
+                logger.warning(f"Falha ao reindexar os títulos {ids}: {e}")
+                self.sincronizado_em = None
+        # Depois do índice, para uma busca refeita a partir daqui já encontrar a escrita
+        cache_busca.invalidar()
+
+    def memoria(self) -> Dict[str, int]:
+        """Medido na última reconstrução ou carga de snapshot (lido a cada scrape de /metrics)"""
+        return self.bytes
+
+indice_busca_service = IndiceBuscaService()
@@ -1,9 +1,13 @@
 from typing import List, Optional
 from app.database.connection import get_db_cursor
+from app.services.busca_service import LIVROS, busca_service
+from app.db.linhas import Linhas
 from app.schemas.schemas import LivroCreate, LivroUpdate, Livro, MidiaTipo
 from fastapi import HTTPException
 
 from app.services import estoque_service
+from app.services.emprestimo_service import emprestimo_service
+from app.services.indice_busca_service import indice_busca_service
 
 class LivroService:
     
@@ -33,26 +37,31 @@ class LivroService:
                 ))
                 result = cursor.fetchone()
                 # estoque_service.reload_materialized_view()  
-                return Livro(**result)
+                livro_criado = Livro(**result)
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Erro ao criar livro: {str(e)}")
+        # Depois do commit, para o índice de busca ler o que foi gravado
+        indice_busca_service.reindexar(livro_criado.id_livro)
+        return livro_criado
     
-    def get_livro(self, id_livro: int) -> Optional[Livro]:
+    # validar=False devolve as linhas do banco (ver app.core.serializacao)
+    
+    def get_livro(self, id_livro: int, validar: bool = True) -> Optional[Livro]:
         with get_db_cursor() as cursor:
             query = "SELECT * FROM Livros WHERE id_livro = %s"
             cursor.execute(query, (id_livro,))
             result = cursor.fetchone()
             if result:
-                return Livro(**result)
+                return Livro(**result) if validar else result
             return None
     
-    def get_livros(self, skip: int = 0, limit: int = 100) -> List[Livro]:
-        with get_db_cursor() as cursor:
+    def get_livros(self, skip: int = 0, limit: int = 100, validar: bool = True) -> List[Livro]:
+        with get_db_cursor(tuplas=not validar) as cursor:
             query = "SELECT * FROM Livros ORDER BY id_livro OFFSET %s LIMIT %s"
             cursor.execute(query, (skip, limit))
-            results = cursor.fetchall()
-            print([Livro(**result) for result in results])
-            return [Livro(**result) for result in results]
+            if not validar:
+                return Linhas.do_cursor(cursor)
+            return [Livro(**result) for result in cursor.fetchall()]
     
     def update_livro(self, id_livro: int, livro: LivroUpdate) -> Optional[Livro]:
         fields = []
@@ -88,9 +97,12 @@ class LivroService:
             '''
             cursor.execute(query, values)
             result = cursor.fetchone()
-            if result:
-                return Livro(**result)
-            return None
+            if not result:
+                return None
+            if livro.titulo is not None:
+                emprestimo_service.sincronizar_titulo(cursor, id_livro, result['titulo'])
+        indice_busca_service.reindexar(id_livro)
+        return Livro(**result)
     
     def delete_livro(self, id_livro: int) -> bool:
         with get_db_cursor() as cursor:
@@ -107,19 +119,12 @@ class LivroService:
             # Excluir livro e título
             cursor.execute("DELETE FROM Livros WHERE id_livro = %s", (id_livro,))
             cursor.execute("DELETE FROM Titulo WHERE id_titulo = %s", (id_livro,))
-            return cursor.rowcount > 0
+            excluido = cursor.rowcount > 0
+        if excluido:
+            indice_busca_service.reindexar(id_livro)
+        return excluido
     
     def search_livros(self, q: str):
-        with get_db_cursor() as cursor:
-            query = """
-                SELECT id_livro, titulo, ISBN, numero_paginas, editora, data_publicacao
-                FROM Livros
-                WHERE titulo ILIKE %s OR ISBN ILIKE
-                LIMIT 200 
-            """
-            param = f"%{q}%"
-            cursor.execute(query, tuple([param for _ in range(2)]))
-            results = cursor.fetchall()
-            return [Livro(**row) for row in results]
+        return [Livro(**row) for row in busca_service.buscar(LIVROS, q)]
 
 livro_service = LivroService()
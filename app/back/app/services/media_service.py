@@ -2,13 +2,142 @@
 Media service for handling different media types
 """
 import psycopg2.extras
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from app.core.config import settings
 from .base_service import BaseService
+from app.core.identificadores import Identificador, identificar
+from app.core.indice_invertido import FACETAS
+from app.core.texto import escapar_like
 from app.db.database import get_db_connection
+from app.db.linhas import Colunas, Linhas
+from app.services.emprestimo_service import emprestimo_service
+from app.services.indice_busca_service import indice_busca_service
 import logging
 
 logger = logging.getLogger(__name__)
 
+_COLUNAS_BUSCA = Colunas(("id_titulo", "tipo_midia", "titulo", "codigo", "editora", "data_pub"))
+
+# Identifier lookups: the one table each kind of identifier lives in (columns as in search_media)
+_BUSCA_IDENTIFICADOR = {
+    "isbn": ("livro", """
+        SELECT t.id_titulo, t.tipo_midia, l.titulo, l.isbn as codigo,
+               l.editora, l.data_publicacao::text as data_pub
+        FROM Livros l
+        JOIN Titulo t ON t.id_titulo = l.id_livro
+        WHERE l.codigo_normalizado = ANY(%s)
+    """),
+    "issn": ("revista", """
+        SELECT t.id_titulo, t.tipo_midia, r.titulo, r.issn as codigo,
+               r.editora, r.data_publicacao::text as data_pub
+        FROM Revistas r
+        JOIN Titulo t ON t.id_titulo = r.id_revista
+        WHERE r.codigo_normalizado = ANY(%s)
+    """),
+    "isan": ("dvd", """
+        SELECT t.id_titulo, t.tipo_midia, d.titulo, d.isan as codigo,
+               d.distribuidora as editora, d.data_lancamento::text as data_pub
+        FROM DVDs d
+        JOIN Titulo t ON t.id_titulo = d.id_dvd
+        WHERE d.codigo_normalizado = ANY(%s)
+    """),
+    "doi": ("artigo", """
+        SELECT t.id_titulo, t.tipo_midia, a.titulo, a.doi as codigo,
+               a.publicadora as editora, a.data_publicacao::text as data_pub
+        FROM Artigos a
+        JOIN Titulo t ON t.id_titulo = a.id_artigo
+        WHERE a.codigo_normalizado = ANY(%s)
+    """),
+}
+
+
+# Whether a title has a copy that is not on loan right now (the ``disponivel`` facet)
+_LIVRE = """EXISTS (
+    SELECT 1 FROM Estoque e
+    WHERE e.id_titulo = combined_results.id_titulo
+      AND NOT EXISTS (SELECT 1 FROM EmprestimoAberto ab WHERE ab.id_estoque = e.id_estoque)
+)"""
+
+
+def _condicoes_filtros(filters: Dict[str, Any]) -> Dict[str, Tuple[str, list]]:
+    """SQL predicate (and its parameters) of each facet filter over the ``combined_results`` rows"""
+    condicoes = {}
+    if filters.get("tipo_midia"):
+        condicoes["tipo_midia"] = ("tipo_midia = %s", [filters["tipo_midia"]])
+    if filters.get("editora"):
+        condicoes["editora"] = ("editora = %s", [filters["editora"]])
+    if filters.get("decada") is not None:
+        condicoes["decada"] = ("data_pub >= %s AND data_pub < %s",
+                               [f"{filters['decada']:04d}-01-01", f"{filters['decada'] + 10:04d}-01-01"])
+    if filters.get("biblioteca") is not None:
+        condicoes["biblioteca"] = ("""EXISTS (
+            SELECT 1 FROM Estoque e
+            WHERE e.id_titulo = combined_results.id_titulo AND e.id_biblioteca = %s
+        )""", [filters["biblioteca"]])
+    if filters.get("disponivel") is not None:
+        condicoes["disponivel"] = (("" if filters["disponivel"] else "NOT ") + _LIVRE, [])
+    return condicoes
+
+
+def _where_filtros(filters: Dict[str, Any]) -> Tuple[str, list]:
+    """WHERE clause (and its parameters) of the facet filters over the ``combined_results`` rows"""
+    condicoes = _condicoes_filtros(filters)
+    if not condicoes:
+        return "", []
+    where_clause = "WHERE " + " AND ".join(f"({sql})" for sql, _ in condicoes.values())
+    return where_clause, [param for _, params in condicoes.values() for param in params]
+
+
+def _contar_facetas(cursor, union_query: str, params: list, filters: Dict[str, Any],
+                    limite: int) -> Dict[str, List[Tuple[Any, int]]]:
+    """Facet counts of the ``union_query`` rows that pass ``filters``, in one grouped query.
+
+    Same semantics as app.core.indice_invertido: the counts of a facet ignore
+    the filter on that same facet, and each facet keeps its ``limite`` largest
+    values. Every grouping set groups one facet; its value is NULL in the rows
+    that fail one of the other filters, and NULL groups are dropped.
+    """
+    condicoes = _condicoes_filtros(filters)
+    valores = {
+        "tipo_midia": "l.tipo_midia",
+        "editora": "l.editora",
+        "decada": "l.decada",
+        "biblioteca": "b.id_biblioteca",
+        "disponivel": "l.disponivel",
+    }
+    colunas = []
+    for faceta in FACETAS:
+        outras = [f"l.filtro_{outra}" for outra in condicoes if outra != faceta]
+        valor = f"CASE WHEN {' AND '.join(outras)} THEN {valores[faceta]} END" if outras else valores[faceta]
+        colunas.append(f"{valor} AS faceta_{faceta}")
+    filtros = "".join(f", ({sql}) AS filtro_{faceta}" for faceta, (sql, _) in condicoes.items())
+    cursor.execute(f"""
+        WITH combined_results AS ({union_query}),
+        linhas AS (
+            SELECT id_titulo, tipo_midia, NULLIF(editora, '') AS editora,
+                   substr(data_pub, 1, 4)::int / 10 * 10 AS decada, {_LIVRE} AS disponivel{filtros}
+            FROM combined_results
+        )
+        SELECT {', '.join(f"faceta_{faceta}" for faceta in FACETAS)}, COUNT(DISTINCT id_titulo)
+        FROM (
+            SELECT l.id_titulo, {', '.join(colunas)}
+            FROM linhas l
+            LEFT JOIN LATERAL (
+                SELECT DISTINCT e.id_biblioteca FROM Estoque e WHERE e.id_titulo = l.id_titulo
+            ) b ON true
+        ) AS facetas
+        GROUP BY GROUPING SETS ({', '.join(f"(faceta_{faceta})" for faceta in FACETAS)})
+    """, params + [param for _, parametros in condicoes.values() for param in parametros])
+    contagens = {faceta: [] for faceta in FACETAS}
+    for *valores_linha, total in cursor.fetchall():
+        for faceta, valor in zip(FACETAS, valores_linha):
+            if valor is not None:
+                contagens[faceta].append((valor, total))
+    return {
+        faceta: sorted(itens, key=lambda item: (-item[1], str(item[0])))[:limite]
+        for faceta, itens in contagens.items()
+    }
+
 class MediaService:
     """Service for handling different media types (Livros, Revistas, DVDs, Artigos)"""
     
@@ -20,32 +149,50 @@ class MediaService:
         self.artigo_service = BaseService("Artigos", "id_artigo")
     
     def create_media_with_title(self, media_type: str, media_data: Dict[str, Any]) -> Optional[int]:
-        """Create a title and its corresponding media record"""
+        """Create a title and its corresponding media record in one transaction"""
+        service = self._get_media_service(media_type)
+        if service is None:
+            raise ValueError(f"Unknown media type: {media_type}")
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
                 try:
-                    # Create title first
+                    # Create title first (the pool's cursors return tuples)
                     cursor.execute(
                         "INSERT INTO Titulo (tipo_midia) VALUES (%s) RETURNING id_titulo",
                         (media_type,)
                     )
-                    title_id = cursor.fetchone()['id_titulo']
+                    title_id = cursor.fetchone()[0]
                     
                     # Add title_id to media_data
                     media_data[f'id_{media_type.lower()}'] = title_id
                     
-                    # Create media record
-                    service = self._get_media_service(media_type)
-                    if service:
-                        service.create(media_data)
+                    # Create media record on the same connection, so both rows commit together
+                    service.create(media_data, cursor=cursor)
                     
                     conn.commit()
-                    return title_id
-                    
                 except Exception as e:
                     conn.rollback()
                     logger.error(f"Error creating {media_type}: {e}")
                     raise
+        indice_busca_service.reindexar(title_id)
+        return title_id
+    
+    def update_media(self, media_type: str, media_id: int, media_data: Dict[str, Any]) -> bool:
+        """Update a media record, its open loans' title and its entry in the in-memory search index"""
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    updated = self._get_media_service(media_type).update(media_id, media_data, cursor=cursor)
+                    if updated and media_data.get('titulo') is not None:
+                        emprestimo_service.sincronizar_titulo(cursor, media_id, media_data['titulo'])
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error updating {media_type} {media_id}: {e}")
+                    raise
+        if updated:
+            indice_busca_service.reindexar(media_id)
+        return updated
     
     def get_media_details(self, title_id: int) -> Optional[Dict[str, Any]]:
         """Get complete media details including title and specific media info"""
@@ -72,73 +219,110 @@ class MediaService:
             'media_details': media_details
         }
     
-    def search_media(self, search_term: str, media_type: str = None, page: int = 1, size: int = 10) -> tuple[List[Dict[str, Any]], int]:
-        """Search across all media types or specific type"""
+    def search_media(self, search_term: str, media_type: str = None, page: int = 1, size: int = 10,
+                     filters: Optional[Dict[str, Any]] = None,
+                     facets: bool = False) -> Tuple[Linhas, int, Optional[Dict[str, List[Tuple[Any, int]]]]]:
+        """Search across all media types or specific type (tuple rows, see app.db.linhas).
+
+        An identifier-shaped term (ISBN, ISSN, ISAN, DOI) is an exact lookup,
+        see :meth:`lookup_identifier`. Other terms are served by the in-memory
+        inverted index while it is fresh (word and word-prefix matches on
+        titles, authors and codes); otherwise by SQL substring matching on the normalized titles.
+
+        ``filters`` narrows by the facets of app.core.indice_invertido (editora,
+        decada, biblioteca, disponivel). With ``facets`` the third item is the
+        facet counts: from the index's bitmaps, or from one grouped query
+        (:func:`_contar_facetas`) when SQL answered; None without ``facets``.
+        """
         offset = (page - 1) * size
-        search_pattern = f"%{search_term}%"
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+        identificador = identificar(search_term)
+        if identificador is not None:
+            rows = self.lookup_identifier(identificador, media_type, filters)
+            facet_counts = None
+            if facets:
+                _, query = _BUSCA_IDENTIFICADOR[identificador.tipo]
+                with get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        facet_counts = _contar_facetas(
+                            cursor, query, [list(identificador.valores)],
+                            dict(filters, tipo_midia=media_type), settings.SEARCH_FACET_LIMIT,
+                        )
+            return rows[offset:offset + size], len(rows), facet_counts
+        if indice_busca_service.fresco():
+            indice_busca_service.consultas_memoria += 1
+            resultado = indice_busca_service.indice.buscar(
+                search_term, dict(filters, tipo_midia=media_type), offset, size,
+                facetas=facets, limite_facetas=settings.SEARCH_FACET_LIMIT,
+            )
+            rows = Linhas(_COLUNAS_BUSCA, [documento[:6] for documento in resultado.documentos])
+            return rows, resultado.total, resultado.facetas
+        indice_busca_service.consultas_banco += 1
+        search_pattern = escapar_like(search_term)
         
-        where_conditions = []
-        params = []
+        filters = dict(filters, tipo_midia=media_type)
+        where_clause, filter_params = _where_filtros(filters)
         
-        if media_type:
-            where_conditions.append("t.tipo_midia = %s")
-            params.append(media_type)
+        params = []
         
-        # Build query for each media type
+        # Build query for each media type. The media type counts ignore the type
+        # filter, so with facets every type is searched and the filter narrows the rows
         union_queries = []
+        all_types = facets or not media_type
         
         # Livros
-        if not media_type or media_type == 'livro':
+        if all_types or media_type == 'livro':
             union_queries.append("""
                 SELECT t.id_titulo, t.tipo_midia, l.titulo, l.isbn as codigo,
                        l.editora, l.data_publicacao::text as data_pub
                 FROM Titulo t
                 JOIN Livros l ON t.id_titulo = l.id_livro
-                WHERE l.titulo ILIKE %s
+                WHERE l.titulo_busca LIKE '%%' || normalizar_busca(%s) || '%%'
             """)
             params.extend([search_pattern])
         
         # Revistas
-        if not media_type or media_type == 'revista':
+        if all_types or media_type == 'revista':
             union_queries.append("""
                 SELECT t.id_titulo, t.tipo_midia, r.titulo, r.issn as codigo,
                        r.editora, r.data_publicacao::text as data_pub
                 FROM Titulo t
                 JOIN Revistas r ON t.id_titulo = r.id_revista
-                WHERE r.titulo ILIKE %s
+                WHERE r.titulo_busca LIKE '%%' || normalizar_busca(%s) || '%%'
             """)
             params.extend([search_pattern])
         
         # DVDs
-        if not media_type or media_type == 'dvd':
+        if all_types or media_type == 'dvd':
             union_queries.append("""
                 SELECT t.id_titulo, t.tipo_midia, d.titulo, d.isan as codigo,
                        d.distribuidora as editora, d.data_lancamento::text as data_pub
                 FROM Titulo t
                 JOIN DVDs d ON t.id_titulo = d.id_dvd
-                WHERE d.titulo ILIKE %s
+                WHERE d.titulo_busca LIKE '%%' || normalizar_busca(%s) || '%%'
             """)
             params.extend([search_pattern])
         
         # Artigos
-        if not media_type or media_type == 'artigo':
+        if all_types or media_type == 'artigo':
             union_queries.append("""
                 SELECT t.id_titulo, t.tipo_midia, a.titulo, a.doi as codigo,
                        a.publicadora as editora, a.data_publicacao::text as data_pub
                 FROM Titulo t
                 JOIN Artigos a ON t.id_titulo = a.id_artigo
-                WHERE a.titulo ILIKE %s
+                WHERE a.titulo_busca LIKE '%%' || normalizar_busca(%s) || '%%'
             """)
             params.extend([search_pattern])
         
         if not union_queries:
-            return [], 0
+            return Linhas(Colunas(()), []), 0, None
         
         # Combine all queries
         full_query = f"""
             SELECT * FROM (
                 {' UNION ALL '.join(union_queries)}
             ) AS combined_results
+            {where_clause}
             ORDER BY titulo
             LIMIT %s OFFSET %s
         """
@@ -148,21 +332,46 @@ class MediaService:
             SELECT COUNT(*) as counter FROM (
                 {' UNION ALL '.join(union_queries)}
             ) AS combined_results
+            {where_clause}
         """
         
+        union_params = params
+        params = params + filter_params
         params_with_pagination = params + [size, offset]
         
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            with conn.cursor() as cursor:
                 # Get total count
                 cursor.execute(count_query, params)
-                total = cursor.fetchone()['counter']
+                total = cursor.fetchone()[0]
                 
                 # Get data
                 cursor.execute(full_query, params_with_pagination)
-                results = cursor.fetchall()
+                rows = Linhas.do_cursor(cursor)
                 
-                return [dict(row) for row in results], total
+                facet_counts = None
+                if facets:
+                    facet_counts = _contar_facetas(cursor, ' UNION ALL '.join(union_queries), union_params,
+                                                   filters, settings.SEARCH_FACET_LIMIT)
+                return rows, total, facet_counts
+    
+    def lookup_identifier(self, identificador: Identificador, media_type: str = None,
+                          filters: Optional[Dict[str, Any]] = None) -> Linhas:
+        """Titles with this identifier: an equality on the normalized, indexed code column.
+
+        Read from the database rather than the search index, so a copy catalogued
+        a moment ago by another worker is found when it is scanned at the desk.
+        ``filters`` are the facet filters of :meth:`search_media`.
+        """
+        tipo, query = _BUSCA_IDENTIFICADOR[identificador.tipo]
+        if media_type and media_type != tipo:
+            return Linhas(_COLUNAS_BUSCA, [])
+        where_clause, filter_params = _where_filtros(filters or {})
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM ({query}) AS combined_results {where_clause}",
+                               [list(identificador.valores)] + filter_params)
+                return Linhas.do_cursor(cursor)
     
     def _get_media_service(self, media_type: str) -> Optional[BaseService]:
         """Get the appropriate service for media type"""
@@ -0,0 +1,91 @@
+from typing import List, Optional
+from datetime import date
+from app.database.connection import get_db_cursor
+from app.schemas.schemas import (
+    EmprestimosPorBiblioteca, UsuarioPenalizado, FaixaDuracao, DuracaoEmprestimos,
+    AutorEmprestado, SituacaoRelatorios
+)
+
+# Os relatórios leem apenas as tabelas de agregação (migração v0005, job
+# app.jobs.relatorios); as junções com Biblioteca/Usuario/Autores só trazem os nomes
+
+class RelatorioService:
+    
+    def get_situacao(self) -> SituacaoRelatorios:
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT processado_ate FROM RelatorioCorte WHERE id = 1")
+            result = cursor.fetchone()
+            return SituacaoRelatorios(processado_ate=result['processado_ate'] if result else None)
+    
+    def get_emprestimos_por_biblioteca(self, desde: date, ate: date, tipo_midia: Optional[str] = None) -> List[EmprestimosPorBiblioteca]:
+        with get_db_cursor() as cursor:
+            query = '''
+                SELECT r.id_biblioteca, b.nome AS biblioteca, SUM(r.emprestimos) AS total_emprestimos
+                FROM RelatorioEmprestimoDia r
+                INNER JOIN Biblioteca b ON r.id_biblioteca = b.id_biblioteca
+                WHERE r.dia BETWEEN %s AND %s
+                  AND (%s::MidiaTipo IS NULL OR r.tipo_midia = %s::MidiaTipo)
+                GROUP BY r.id_biblioteca, b.nome
+                ORDER BY total_emprestimos DESC
+            '''
+            cursor.execute(query, (desde, ate, tipo_midia, tipo_midia))
+            results = cursor.fetchall()
+            return [EmprestimosPorBiblioteca(**result) for result in results]
+    
+    def get_usuarios_penalizados(self, acima_de: int = 3, skip: int = 0, limit: int = 100) -> List[UsuarioPenalizado]:
+        with get_db_cursor() as cursor:
+            query = '''
+                SELECT r.id_usuario, u.nome, r.penalizacoes AS total_penalizacoes
+                FROM RelatorioPenalizacaoUsuario r
+                INNER JOIN Usuario u ON r.id_usuario = u.id_usuario
+                WHERE r.penalizacoes > %s
+                ORDER BY r.penalizacoes DESC, r.id_usuario
+                OFFSET %s LIMIT %s
+            '''
+            cursor.execute(query, (acima_de, skip, limit))
+            results = cursor.fetchall()
+            return [UsuarioPenalizado(**result) for result in results]
+    
+    def get_duracao_emprestimos(self, desde: date, ate: date) -> List[DuracaoEmprestimos]:
+        with get_db_cursor() as cursor:
+            query = '''
+                SELECT tipo_midia, duracao_dias, SUM(devolucoes) AS devolucoes
+                FROM RelatorioDuracaoDia
+                WHERE dia BETWEEN %s AND %s
+                GROUP BY tipo_midia, duracao_dias
+                ORDER BY tipo_midia, duracao_dias
+            '''
+            cursor.execute(query, (desde, ate))
+            histogramas = {}
+            for row in cursor.fetchall():
+                histogramas.setdefault(row['tipo_midia'], []).append(
+                    FaixaDuracao(duracao_dias=row['duracao_dias'], devolucoes=row['devolucoes'])
+                )
+            
+            relatorio = []
+            for tipo_midia, faixas in histogramas.items():
+                total = sum(f.devolucoes for f in faixas)
+                relatorio.append(DuracaoEmprestimos(
+                    tipo_midia=tipo_midia,
+                    media_dias_emprestimo=sum(f.duracao_dias * f.devolucoes for f in faixas) / total,
+                    total_devolucoes=total,
+                    histograma=faixas
+                ))
+            return relatorio
+    
+    def get_autores_emprestados(self, desde: date, skip: int = 0, limit: int = 100) -> List[AutorEmprestado]:
+        with get_db_cursor() as cursor:
+            query = '''
+                SELECT r.id_autor, a.nome AS autor, r.tipo_midia, SUM(r.emprestimos) AS emprestimos
+                FROM RelatorioAutorDia r
+                INNER JOIN Autores a ON r.id_autor = a.id_autor
+                WHERE r.dia >= %s
+                GROUP BY r.id_autor, a.nome, r.tipo_midia
+                ORDER BY emprestimos DESC, r.id_autor
+                OFFSET %s LIMIT %s
+            '''
+            cursor.execute(query, (desde, skip, limit))
+            results = cursor.fetchall()
+            return [AutorEmprestado(**result) for result in results]
+
+relatorio_service = RelatorioService()
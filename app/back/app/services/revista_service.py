@@ -1,11 +1,14 @@
 from typing import List, Optional
 from app.database.connection import Database
 from app.database.connection import get_db_cursor
+from app.services.busca_service import REVISTAS, busca_service
 from app.schemas.revista import RevistaCreate, RevistaUpdate, RevistaResponse, RevistaWithAuthors
 import logging
 
 from app.schemas.schemas import Revista
 from app.services import estoque_service
+from app.services.emprestimo_service import emprestimo_service
+from app.services.indice_busca_service import indice_busca_service
 
 logger = logging.getLogger(__name__)
 
@@ -44,12 +47,15 @@ class RevistaService:
                 
                 result = cursor.fetchone()
                 # estoque_service.reload_materialized_view()  # Recarregar o serviço de estoque após criar uma revista
-                return RevistaResponse(**result)
+                criado = RevistaResponse(**result)
                 
             except Exception as e:
                 logger.error(f"Erro ao criar revista: {e}")
                 raise
-        
+        # Depois do commit, para o índice de busca ler o que foi gravado
+        indice_busca_service.reindexar(criado.id_revista)
+        return criado
+
 
     async def get_revista_by_id(self, revista_id: int) -> Optional[RevistaResponse]:
         """Buscar revista por ID"""
@@ -136,14 +142,17 @@ class RevistaService:
                 cursor.execute(query, values)
                 result = cursor.fetchone()
                 
-                if result:
-                    return RevistaResponse(**result)
-                return None
+                if not result:
+                    return None
+                if revista_data.titulo is not None:
+                    emprestimo_service.sincronizar_titulo(cursor, revista_id, result['titulo'])
                 
             except Exception as e:
                 logger.error(f"Erro ao atualizar revista {revista_id}: {e}")
                 raise
-        
+        indice_busca_service.reindexar(revista_id)
+        return RevistaResponse(**result)
+
 
     async def delete_revista(self, revista_id: int) -> bool:
         """Excluir revista"""
@@ -171,12 +180,15 @@ class RevistaService:
                 delete_titulo_query = "DELETE FROM Titulo WHERE id_titulo = %s"
                 cursor.execute(delete_titulo_query, (revista_id,))
                 
-                return cursor.rowcount > 0
+                excluido = cursor.rowcount > 0
                 
             except Exception as e:
                 logger.error(f"Erro ao excluir revista {revista_id}: {e}")
                 raise
-        
+        if excluido:
+            indice_busca_service.reindexar(revista_id)
+        return excluido
+
 
     # async def search_revistas(self, query: str) -> List[RevistaResponse]:
     #     """Buscar revistas por título, ISSN ou editora"""
@@ -244,14 +256,4 @@ class RevistaService:
                 raise
             
     async def search_revistas(self, q: str):
-        with get_db_cursor() as cursor:
-            query = """
-                SELECT id_revista, titulo, ISSN, periodicidade, editora, data_publicacao
-                FROM Revistas
-                WHERE titulo ILIKE %s OR ISSN ILIKE %s
-                LIMIT 200 
-            """
-            param = f"%{q}%"
-            cursor.execute(query, tuple([param for _ in range(2)]))
-            results = cursor.fetchall()
-            return [Revista(**row) for row in results]
\ No newline at end of file
+        return [Revista(**row) for row in busca_service.buscar(REVISTAS, q)]
@@ -1,6 +1,9 @@
 from typing import List, Optional
+from app.core.texto import escapar_like
 from app.database.connection import get_db_cursor
+from app.db.linhas import Linhas
 from app.schemas.schemas import UsuarioCreate, UsuarioUpdate, Usuario
+from app.services.emprestimo_service import emprestimo_service
 from fastapi import HTTPException
 
 class UsuarioService:
@@ -29,12 +32,15 @@ class UsuarioService:
                 return Usuario(**result)
             return None
     
-    def get_usuarios(self, skip: int = 0, limit: int = 100) -> List[Usuario]:
-        with get_db_cursor() as cursor:
+    # validar=False devolve as linhas do banco (ver app.core.serializacao)
+    
+    def get_usuarios(self, skip: int = 0, limit: int = 100, validar: bool = True) -> List[Usuario]:
+        with get_db_cursor(tuplas=not validar) as cursor:
             query = "SELECT * FROM Usuario ORDER BY id_usuario OFFSET %s LIMIT %s"
             cursor.execute(query, (skip, limit))
-            results = cursor.fetchall()
-            return [Usuario(**result) for result in results]
+            if not validar:
+                return Linhas.do_cursor(cursor)
+            return [Usuario(**result) for result in cursor.fetchall()]
     
     def update_usuario(self, id_usuario: int, usuario: UsuarioUpdate) -> Optional[Usuario]:
         # Construir query dinamicamente baseado nos campos fornecidos
@@ -69,16 +75,17 @@ class UsuarioService:
             cursor.execute(query, values)
             result = cursor.fetchone()
             if result:
+                emprestimo_service.sincronizar_usuario(cursor, result)
                 return Usuario(**result)
             return None
     
     def delete_usuario(self, id_usuario: int) -> bool:
         with get_db_cursor() as cursor:
             # Verificar se há empréstimos associados
-            cursor.execute("SELECT COUNT(*) FROM Emprestimo WHERE id_usuario = %s", (id_usuario,))
-            count = cursor.fetchone()['count']
+            # EXISTS para na primeira partição com empréstimo do usuário
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM Emprestimo WHERE id_usuario = %s) AS possui", (id_usuario,))
             
-            if count > 0:
+            if cursor.fetchone()['possui']:
                 raise HTTPException(
                     status_code=400,
                     detail="Não é possível excluir usuário com empréstimos associados"
@@ -88,30 +95,34 @@ class UsuarioService:
             cursor.execute(query, (id_usuario,))
             return cursor.rowcount > 0
     
-    def get_usuarios_com_emprestimos_em_andamento(self, skip: int=0, limit: int=0) -> List[Usuario]:
-        with get_db_cursor() as cursor:
+    def get_usuarios_com_emprestimos_em_andamento(self, skip: int=0, limit: int=0, validar: bool = True) -> List[Usuario]:
+        with get_db_cursor(tuplas=not validar) as cursor:
             query = '''
-                SELECT DISTINCT u.* 
+                SELECT u.* 
                 FROM Usuario u
-                INNER JOIN Emprestimo e 
-                    ON u.id_usuario = e.id_usuario
-                WHERE e.data_devolucao IS NULL
+                WHERE EXISTS (
+                    SELECT 1 FROM EmprestimoAberto ea
+                    WHERE ea.id_usuario = u.id_usuario
+                )
                 ORDER BY u.nome
                 OFFSET %s LIMIT %s
             '''
             cursor.execute(query, (skip, limit))
-            results = cursor.fetchall()
-            return [Usuario(**result) for result in results]
+            if not validar:
+                return Linhas.do_cursor(cursor)
+            return [Usuario(**result) for result in cursor.fetchall()]
     
     def search_usuarios(self, q: str):
         with get_db_cursor() as cursor:
             query = """
                 SELECT id_usuario, nome, email, endereco, telefone
                 FROM Usuario
-                WHERE nome ILIKE %s OR email ILIKE %s OR telefone ILIKE %s
+                WHERE nome_busca LIKE '%%' || normalizar_busca(%s) || '%%'
+                   OR lower(email) LIKE '%%' || lower(%s) || '%%'
+                   OR telefone LIKE '%%' || %s || '%%'
                 LIMIT 200 
             """
-            param = f"%{q}%"
+            param = escapar_like(q)
             cursor.execute(query, tuple([param for _ in range(3)]))
             results = cursor.fetchall()
             return [Usuario(**row) for row in results]
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark: dict rows (RealDictCursor) vs tuple rows (app.db.linhas)
+
+Simula uma página de Estoque como cada cursor a entrega e mede, sem banco:
+
+* memória retida pela página (tracemalloc), que é o que fica vivo enquanto a
+  resposta é montada;
+* pico de memória e tempo de página -> bytes JSON via resposta_rapida.
+
+    python -m benchmarks.bench_linhas --linhas 1000 --repeticoes 50
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import List
+
+from psycopg2.extras import RealDictRow
+
+from app.core.serializacao import resposta_rapida
+from app.db.linhas import Colunas, Linhas
+from app.schemas.schemas import Estoque
+
+COLUNAS = ("id_estoque", "condicao", "id_titulo", "id_biblioteca")
+
+
+def _tuplas(n: int) -> List[tuple]:
+    return [(i, "Bom" if i % 3 else None, 1000 + i % 97, 1 + i % 5) for i in range(n)]
+
+
+def pagina_dicts(tuplas: List[tuple]) -> list:
+    # O que RealDictCursor + dict(row) produzem: um RealDictRow e uma cópia por linha
+    pagina = []
+    for valores in tuplas:
+        row = RealDictRow()
+        for nome, valor in zip(COLUNAS, valores):
+            row[nome] = valor
+        pagina.append(dict(row))
+    return pagina
+
+
+def pagina_tuplas(tuplas: List[tuple]) -> Linhas:
+    # Uma tupla nova por linha, como o cursor entrega; as colunas são lidas uma vez
+    return Linhas(Colunas(COLUNAS), [(*valores,) for valores in tuplas])
+
+
+def _memoria_retida(montar, tuplas) -> int:
+    gc.collect()
+    tracemalloc.start()
+    pagina = montar(tuplas)
+    retida, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del pagina
+    return retida
+
+
+def _pico_resposta(montar, tuplas) -> int:
+    gc.collect()
+    tracemalloc.start()
+    resposta_rapida(List[Estoque], montar(tuplas))
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico
+
+
+def _tempo_resposta(montar, tuplas, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resposta_rapida(List[Estoque], montar(tuplas))
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def medir(linhas: int, repeticoes: int) -> dict:
+    tuplas = _tuplas(linhas)
+    a = resposta_rapida(List[Estoque], pagina_dicts(tuplas)).body
+    b = resposta_rapida(List[Estoque], pagina_tuplas(tuplas)).body
+    assert a == b, "os dois caminhos devem gerar os mesmos bytes"
+
+    resultado = {"linhas": linhas}
+    for nome, montar in (("dicts", pagina_dicts), ("tuplas", pagina_tuplas)):
+        resultado[nome] = {
+            "bytes_por_linha_retidos": round(_memoria_retida(montar, tuplas) / linhas, 1),
+            "pico_resposta_kib": round(_pico_resposta(montar, tuplas) / 1024, 1),
+            "ms_por_pagina": round(_tempo_resposta(montar, tuplas, repeticoes), 3),
+        }
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=1000)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(medir(args.linhas, args.repeticoes), indent=2))
@@ -0,0 +1,172 @@
+"""
+Scenarios replayed by benchmarks.bench_http.
+
+A scenario is a generator: it yields :class:`Passo` (one HTTP request) and is
+sent back the :class:`Resposta`, so a step can depend on the previous one
+(checkout, then return the loan it created). Every step carries a route
+label, the endpoint template, and the percentiles are reported per label.
+
+The ids used come from :class:`Amostra`, read from the seeded database
+before the run, so requests hit rows that exist.
+"""
+import json
+import random
+from datetime import date
+from typing import Callable, Dict, Generator, List, NamedTuple, Optional
+
+API = "/api/v1"
+
+
+class Passo(NamedTuple):
+    rotulo: str
+    metodo: str
+    caminho: str
+    parametros: Optional[dict] = None
+    corpo: Optional[dict] = None
+
+
+class Resposta(NamedTuple):
+    status: int
+    corpo: bytes
+
+    def json(self):
+        return json.loads(self.corpo)
+
+
+Roteiro = Generator[Passo, Resposta, None]
+
+
+class Amostra(NamedTuple):
+    titulos: List[int]
+    populares: List[int]
+    livros: List[int]
+    termos: List[str]
+    usuarios: List[int]
+    bibliotecas: List[int]
+    exemplares_livres: List[int]
+
+
+def carregar_amostra(conn, limite: int = 5000) -> Amostra:
+    """Ids and search terms from the seeded database (after migrations: uses EmprestimoAberto)"""
+    with conn.cursor() as cursor:
+        def coluna(sql: str) -> list:
+            cursor.execute(sql, (limite,))
+            return [linha[0] for linha in cursor.fetchall()]
+
+        titulos = coluna("SELECT id_titulo FROM Titulo ORDER BY random() LIMIT %s")
+        populares = coluna("""
+            SELECT e.id_titulo FROM Emprestimo m JOIN Estoque e ON e.id_estoque = m.id_estoque
+            WHERE m.data_emprestimo >= CURRENT_DATE - 90
+            GROUP BY e.id_titulo ORDER BY COUNT(*) DESC LIMIT %s
+        """)
+        livros = coluna("SELECT id_livro FROM Livros ORDER BY random() LIMIT %s")
+        nomes = coluna("SELECT titulo FROM mv_titulos_completos ORDER BY random() LIMIT %s")
+        usuarios = coluna("SELECT id_usuario FROM Usuario ORDER BY random() LIMIT %s")
+        bibliotecas = coluna("SELECT id_biblioteca FROM Biblioteca LIMIT %s")
+        livres = coluna("""
+            SELECT id_estoque FROM (
+                SELECT id_estoque FROM Estoque EXCEPT SELECT id_estoque FROM EmprestimoAberto
+            ) livres ORDER BY random() LIMIT %s
+        """)
+
+    # Search terms as people type them: one significant word, or two adjacent ones
+    termos = []
+    for nome in nomes:
+        palavras = [palavra for palavra in nome.lower().split() if len(palavra) > 3]
+        if not palavras:
+            continue
+        termos.append(palavras[0])
+        if len(palavras) > 1:
+            termos.append(" ".join(palavras[:2]))
+    return Amostra(titulos, populares or titulos, livros, termos, usuarios, bibliotecas, livres)
+
+
+def busca_catalogo(rng: random.Random, amostra: Amostra) -> Roteiro:
+    termo = rng.choice(amostra.termos)
+    if rng.random() < 0.5:
+        yield Passo("GET /estoque/pesquisar/titulo", "GET", f"{API}/estoque/pesquisar/titulo", {"title": termo})
+    else:
+        yield Passo("GET /estoque/pesquisar/titulo?modo=relevancia", "GET", f"{API}/estoque/pesquisar/titulo",
+                    {"title": termo, "modo": "relevancia"})
+    if rng.random() < 0.5:
+        yield Passo("GET /livros/search/", "GET", f"{API}/livros/search/", {"q": termo.split()[0]})
+    if amostra.livros and rng.random() < 0.5:
+        yield Passo("GET /livros/{id_livro}", "GET", f"{API}/livros/{rng.choice(amostra.livros)}")
+
+
+def autocomplete(rng: random.Random, amostra: Amostra) -> Roteiro:
+    """Someone typing a title: one request per keystroke from the second character"""
+    termo = rng.choice(amostra.termos)
+    for tamanho in range(2, len(termo) + 1):
+        yield Passo("GET /autocomplete", "GET", f"{API}/autocomplete", {"q": termo[:tamanho]})
+
+
+def disponibilidade(rng: random.Random, amostra: Amostra) -> Roteiro:
+    # Most lookups are for what people are borrowing now
+    titulos = amostra.populares if rng.random() < 0.8 else amostra.titulos
+    yield Passo("GET /estoque/disponibilidade/{id_titulo}", "GET", f"{API}/estoque/disponibilidade/{rng.choice(titulos)}")
+    if rng.random() < 0.1:
+        yield Passo("GET /bibliotecas/{id}/itens-disponiveis", "GET",
+                    f"{API}/bibliotecas/{rng.choice(amostra.bibliotecas)}/itens-disponiveis")
+
+
+def _emprestar(rng: random.Random, amostra: Amostra) -> Passo:
+    return Passo("POST /emprestimos/", "POST", f"{API}/emprestimos/", corpo={
+        "data_emprestimo": date.today().isoformat(),
+        "id_estoque": rng.choice(amostra.exemplares_livres),
+        "id_usuario": rng.choice(amostra.usuarios),
+    })
+
+
+def _devolver(id_emprestimo: int) -> Passo:
+    return Passo("PATCH /emprestimos/{id}/devolver", "PATCH", f"{API}/emprestimos/{id_emprestimo}/devolver")
+
+
+def emprestimo_devolucao(rng: random.Random, amostra: Amostra) -> Roteiro:
+    resposta = yield _emprestar(rng, amostra)
+    if resposta.status == 201:
+        yield _devolver(resposta.json()["id_emprestimo"])
+
+
+def rajada_emprestimos(rng: random.Random, amostra: Amostra) -> Roteiro:
+    """A counter at opening time: a batch of checkouts back to back, then the returns"""
+    criados = []
+    for _ in range(rng.randint(5, 15)):
+        resposta = yield _emprestar(rng, amostra)
+        if resposta.status == 201:
+            criados.append(resposta.json()["id_emprestimo"])
+    for id_emprestimo in criados:
+        yield _devolver(id_emprestimo)
+
+
+def paineis(rng: random.Random, amostra: Amostra) -> Roteiro:
+    yield Passo("GET /emprestimos/relatorio/", "GET", f"{API}/emprestimos/relatorio/")
+    yield Passo("GET /relatorios/emprestimos-por-biblioteca", "GET", f"{API}/relatorios/emprestimos-por-biblioteca")
+    yield Passo("GET /relatorios/autores-emprestados", "GET", f"{API}/relatorios/autores-emprestados")
+    yield Passo("GET /emprestimos/vencidos/", "GET", f"{API}/emprestimos/vencidos/", {"limit": 50})
+    if rng.random() < 0.3:
+        yield Passo("GET /relatorios/duracao-emprestimos", "GET", f"{API}/relatorios/duracao-emprestimos")
+
+
+def conta_usuario(rng: random.Random, amostra: Amostra) -> Roteiro:
+    yield Passo("GET /usuarios/{id_usuario}", "GET", f"{API}/usuarios/{rng.choice(amostra.usuarios)}")
+    yield Passo("GET /emprestimos/em-andamento/", "GET", f"{API}/emprestimos/em-andamento/",
+                {"skip": rng.randrange(0, 500), "limit": 20})
+
+
+class Cenario(NamedTuple):
+    nome: str
+    peso: float
+    roteiro: Callable[[random.Random, Amostra], Roteiro]
+
+
+# The default mix: mostly reads, catalog first
+CENARIOS: Dict[str, Cenario] = {cenario.nome: cenario for cenario in (
+    Cenario("busca", 35, busca_catalogo),
+    Cenario("autocomplete", 10, autocomplete),
+    Cenario("disponibilidade", 25, disponibilidade),
+    Cenario("usuario", 15, conta_usuario),
+    Cenario("emprestimo", 10, emprestimo_devolucao),
+    Cenario("rajada", 5, rajada_emprestimos),
+    Cenario("paineis", 10, paineis),
+)}
@@ -0,0 +1,284 @@
+"""
+Synthetic library at a chosen scale, for the HTTP benchmarks.
+
+data_import.py loads the real datasets plus Faker data at a fixed (large)
+size. The benchmarks need something else: a database of any size, built in
+seconds, identical between runs. Everything here comes from one seeded
+``random.Random`` and is bulk-loaded with ``COPY``.
+
+``escala=1`` is roughly 20k titles, 60k copies, 10k users and 200k loans;
+counts grow linearly. Loans follow a Zipf-like popularity over titles (a few
+titles are borrowed a lot, most rarely), about 3% of the copies are on loan
+right now (part of those overdue), and the rest of the history is returned.
+
+    python -m benchmarks.gerador --dsn postgresql://... --escala 0.5
+"""
+import argparse
+import io
+import itertools
+import logging
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Sequence
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+BASE = {
+    "titulos": 20_000,
+    "autores": 5_000,
+    "usuarios": 10_000,
+    "exemplares_por_titulo": 3,
+    "emprestimos": 200_000,
+}
+
+TIPOS = (("livro", 0.60), ("revista", 0.15), ("dvd", 0.10), ("artigo", 0.15))
+
+BIBLIOTECAS = [
+    ("Biblioteca Onix Jaçanã", "Rua das Palmeiras, 123 – Jaçanã, São Paulo – SP"),
+    ("Biblioteca Onix Tatuapé", "Av. Álvaro Ramos, 456 – Tatuapé, São Paulo – SP"),
+    ("Biblioteca Onix Vila Prudente", "Rua José Zappi, 789 – Vila Prudente, São Paulo – SP"),
+    ("Biblioteca Onix Paulista", "Av. Paulista, 1001 – Bela Vista, São Paulo – SP"),
+    ("Biblioteca Onix Santana", "Rua Voluntários da Pátria, 321 – Santana, São Paulo – SP"),
+    ("Biblioteca Onix Santo André", "Rua General Glicério, 159 – Centro, Santo André – SP"),
+    ("Biblioteca Onix São Bernardo do Campo", "Av. Faria Lima, 987 – Centro, São Bernardo do Campo – SP"),
+    ("Biblioteca Onix São Caetano do Sul", "Rua Alegre, 202 – Santa Paula, São Caetano do Sul – SP"),
+    ("Biblioteca Onix São José dos Campos", "Av. Adhemar de Barros, 1550 – São José dos Campos – SP"),
+    ("Biblioteca Onix Higienópolis", "Rua Itacolomi, 415 – Higienópolis, São Paulo – SP"),
+    ("Biblioteca Onix Vila Madalena", "Rua Harmonia, 678 – Vila Madalena, São Paulo – SP"),
+]
+
+# Title vocabulary: Portuguese and English, so both text-search configurations get exercised
+PALAVRAS_PT = (
+    "história", "amor", "guerra", "cidade", "noite", "mar", "tempo", "segredo", "caminho", "memórias",
+    "sombra", "luz", "coração", "viagem", "ciência", "política", "economia", "brasil", "sertão", "rio",
+    "introdução", "análise", "sistemas", "dados", "teoria", "prática", "vida", "morte", "jardim", "estrela",
+    "filosofia", "música", "arte", "poesia", "contos", "romance", "mistério", "família", "ilha", "fronteira",
+)
+PALAVRAS_EN = (
+    "history", "love", "war", "city", "night", "sea", "time", "secret", "road", "memories",
+    "shadow", "light", "heart", "journey", "science", "politics", "economics", "river", "garden", "star",
+    "introduction", "analysis", "systems", "data", "theory", "practice", "life", "death", "music", "island",
+)
+CONECTIVOS_PT = ("de", "da", "do", "e", "o", "a", "em", "para")
+CONECTIVOS_EN = ("of", "the", "and", "in", "for", "a")
+
+NOMES = (
+    "Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+    "Karina", "Lucas", "Mariana", "Nicolas", "Olívia", "Pedro", "Queila", "Rafael", "Sofia", "Thiago",
+    "Úrsula", "Vinícius", "Wesley", "Yasmin", "Zeca", "Maria", "José", "Antônio", "Francisca", "Luiz",
+)
+SOBRENOMES = (
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+    "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas",
+)
+EDITORAS = ("Companhia das Letras", "Record", "Rocco", "Intrínseca", "Editora 34", "Penguin", "Springer", "Elsevier")
+PERIODICIDADES = ("semanal", "quinzenal", "mensal", "bimestral", "trimestral")
+CONDICOES = ("novo", "usado", "danificado")
+
+
+def contagens(escala: float) -> Dict[str, int]:
+    return {
+        "titulos": max(int(BASE["titulos"] * escala), len(TIPOS)),
+        "autores": max(int(BASE["autores"] * escala), 1),
+        "usuarios": max(int(BASE["usuarios"] * escala), 1),
+        "exemplares_por_titulo": BASE["exemplares_por_titulo"],
+        "emprestimos": max(int(BASE["emprestimos"] * escala), 1),
+    }
+
+
+def _isbn13(rng: random.Random) -> str:
+    digitos = [9, 7, 8] + [rng.randrange(10) for _ in range(9)]
+    verificador = (10 - sum(d * (1 if i % 2 == 0 else 3) for i, d in enumerate(digitos)) % 10) % 10
+    return "".join(map(str, digitos + [verificador]))
+
+
+def _issn(rng: random.Random) -> str:
+    digitos = [rng.randrange(10) for _ in range(7)]
+    resto = (11 - sum(d * (8 - i) for i, d in enumerate(digitos)) % 11) % 11
+    verificador = "X" if resto == 10 else str(resto)
+    texto = "".join(map(str, digitos)) + verificador
+    return f"{texto[:4]}-{texto[4:]}"
+
+
+def _isan(rng: random.Random) -> str:
+    grupos = [f"{rng.randrange(16 ** 4):04X}" for _ in range(6)]
+    return f"{'-'.join(grupos[:4])}-{rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}-{'-'.join(grupos[4:])}"
+
+
+def _doi(rng: random.Random, n: int) -> str:
+    return f"10.{rng.randrange(1000, 99999)}/onix.{n:07d}"
+
+
+def _titulo(rng: random.Random) -> str:
+    if rng.random() < 0.7:
+        palavras, conectivos = PALAVRAS_PT, CONECTIVOS_PT
+    else:
+        palavras, conectivos = PALAVRAS_EN, CONECTIVOS_EN
+    partes = [rng.choice(palavras).capitalize()]
+    for _ in range(rng.randint(1, 4)):
+        if rng.random() < 0.5:
+            partes.append(rng.choice(conectivos))
+        partes.append(rng.choice(palavras))
+    return " ".join(partes)
+
+
+def _nome(rng: random.Random) -> str:
+    return f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+
+
+def _data(rng: random.Random, inicio: date, fim: date) -> date:
+    return inicio + timedelta(days=rng.randrange(max((fim - inicio).days, 1)))
+
+
+def _copiar(cursor, tabela: str, colunas: Sequence[str], linhas: Iterable[Sequence], lote: int = 50_000) -> int:
+    """COPY in batches; None becomes \\N, nothing generated here needs escaping"""
+    total = 0
+    linhas = iter(linhas)
+    while True:
+        bloco = list(itertools.islice(linhas, lote))
+        if not bloco:
+            return total
+        buffer = io.StringIO()
+        for linha in bloco:
+            buffer.write("\t".join("\\N" if valor is None else str(valor) for valor in linha))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN", buffer)
+        total += len(bloco)
+
+
+def _pesos_zipf(n: int, expoente: float = 1.1) -> List[float]:
+    return [1 / (posicao ** expoente) for posicao in range(1, n + 1)]
+
+
+def gerar(conn, escala: float = 1.0, semente: int = 42, hoje: date = None) -> Dict[str, int]:
+    """Fill an empty schema (BD2_ONIX_SCRIPT.sql, before migrations); returns rows per table"""
+    rng = random.Random(semente)
+    hoje = hoje or date.today()
+    n = contagens(escala)
+    resultado: Dict[str, int] = {}
+    inicio = time.perf_counter()
+
+    with conn.cursor() as cursor:
+        resultado["biblioteca"] = _copiar(cursor, "Biblioteca", ("id_biblioteca", "nome", "endereco"),
+                                          ((i, nome, endereco) for i, (nome, endereco) in enumerate(BIBLIOTECAS, 1)))
+
+        tipos = rng.choices([tipo for tipo, _ in TIPOS], [peso for _, peso in TIPOS], k=n["titulos"])
+        resultado["titulo"] = _copiar(cursor, "Titulo", ("id_titulo", "tipo_midia"),
+                                      ((i, tipo) for i, tipo in enumerate(tipos, 1)))
+        por_tipo: Dict[str, List[int]] = {tipo: [] for tipo, _ in TIPOS}
+        for i, tipo in enumerate(tipos, 1):
+            por_tipo[tipo].append(i)
+
+        dez_anos = hoje - timedelta(days=3650)
+        resultado["livros"] = _copiar(cursor, "Livros", ("id_livro", "titulo", "ISBN", "numero_paginas", "editora", "data_publicacao"), (
+            (i, _titulo(rng), _isbn13(rng), rng.randint(60, 900), rng.choice(EDITORAS), _data(rng, dez_anos, hoje))
+            for i in por_tipo["livro"]
+        ))
+        resultado["revistas"] = _copiar(cursor, "Revistas", ("id_revista", "titulo", "ISSN", "periodicidade", "editora", "data_publicacao"), (
+            (i, _titulo(rng), _issn(rng), rng.choice(PERIODICIDADES), rng.choice(EDITORAS), _data(rng, dez_anos, hoje))
+            for i in por_tipo["revista"]
+        ))
+        resultado["dvds"] = _copiar(cursor, "DVDs", ("id_dvd", "titulo", "ISAN", "duracao", "distribuidora", "data_lancamento"), (
+            (i, _titulo(rng), _isan(rng), rng.randint(70, 200), rng.choice(EDITORAS), _data(rng, dez_anos, hoje))
+            for i in por_tipo["dvd"]
+        ))
+        resultado["artigos"] = _copiar(cursor, "Artigos", ("id_artigo", "titulo", "DOI", "publicadora", "data_publicacao"), (
+            (i, _titulo(rng), _doi(rng, i), rng.choice(EDITORAS), _data(rng, dez_anos, hoje))
+            for i in por_tipo["artigo"]
+        ))
+
+        resultado["autores"] = _copiar(cursor, "Autores", ("id_autor", "nome", "data_nascimento", "data_falecimento"), (
+            (i, _nome(rng), _data(rng, date(1900, 1, 1), date(2000, 1, 1)), None if rng.random() > 0.2 else _data(rng, date(1950, 1, 1), hoje))
+            for i in range(1, n["autores"] + 1)
+        ))
+        autorias = (
+            (id_autor, id_titulo)
+            for id_titulo in range(1, n["titulos"] + 1)
+            for id_autor in rng.sample(range(1, n["autores"] + 1), min(rng.randint(1, 3), n["autores"]))
+        )
+        resultado["autorias"] = _copiar(cursor, "Autorias", ("id_autor", "id_titulo"), autorias)
+
+        resultado["usuario"] = _copiar(cursor, "Usuario", ("id_usuario", "nome", "email", "endereco", "telefone"), (
+            (i, _nome(rng), f"usuario{i}@onix.example", f"Rua {rng.choice(SOBRENOMES)}, {rng.randint(1, 3000)}",
+             f"(11) 9{rng.randrange(10 ** 8):08d}")
+            for i in range(1, n["usuarios"] + 1)
+        ))
+
+        # Copies: ~exemplares_por_titulo each, spread over the libraries
+        exemplares: List[int] = []  # id_titulo of each id_estoque (index + 1)
+        for id_titulo in range(1, n["titulos"] + 1):
+            exemplares.extend([id_titulo] * rng.randint(1, 2 * n["exemplares_por_titulo"] - 1))
+        resultado["estoque"] = _copiar(cursor, "Estoque", ("id_estoque", "condicao", "id_titulo", "id_biblioteca"), (
+            (i, rng.choice(CONDICOES), id_titulo, rng.randint(1, len(BIBLIOTECAS)))
+            for i, id_titulo in enumerate(exemplares, 1)
+        ))
+
+        # Popularity: titles ranked in a random order, loans drawn from a Zipf distribution over the rank
+        copias_por_titulo: Dict[int, List[int]] = {}
+        for id_estoque, id_titulo in enumerate(exemplares, 1):
+            copias_por_titulo.setdefault(id_titulo, []).append(id_estoque)
+        ranking = list(range(1, n["titulos"] + 1))
+        rng.shuffle(ranking)
+        pesos = list(itertools.accumulate(_pesos_zipf(len(ranking))))
+
+        # Open loans: ~3% of the copies, each copy at most once, a third of them overdue
+        abertos = rng.sample(range(1, len(exemplares) + 1), max(len(exemplares) * 3 // 100, 1))
+        dois_anos = hoje - timedelta(days=730)
+        emprestimos = []
+        for id_estoque in abertos:
+            emprestado = hoje - timedelta(days=rng.randint(1, 45))
+            emprestimos.append((emprestado, emprestado + timedelta(days=rng.choice((7, 14, 21, 30))), None, id_estoque,
+                                rng.randint(1, n["usuarios"])))
+        for _ in range(max(n["emprestimos"] - len(abertos), 0)):
+            id_titulo = rng.choices(ranking, cum_weights=pesos)[0]
+            emprestado = _data(rng, dois_anos, hoje - timedelta(days=1))
+            prevista = emprestado + timedelta(days=rng.choice((7, 14, 21, 30)))
+            devolvido = min(emprestado + timedelta(days=rng.randint(1, 40)), hoje)
+            emprestimos.append((emprestado, prevista, devolvido, rng.choice(copias_por_titulo[id_titulo]),
+                                rng.randint(1, n["usuarios"])))
+        emprestimos.sort(key=lambda emprestimo: emprestimo[0])
+        resultado["emprestimo"] = _copiar(
+            cursor, "Emprestimo",
+            ("id_emprestimo", "data_emprestimo", "data_devolucao_prevista", "data_devolucao", "id_estoque", "id_usuario"),
+            ((i, *emprestimo) for i, emprestimo in enumerate(emprestimos, 1)),
+        )
+
+        # Penalties for the late returns (and for some still-open overdue loans)
+        atrasados = [
+            (i, emprestimo) for i, emprestimo in enumerate(emprestimos, 1)
+            if (emprestimo[2] or hoje) > emprestimo[1]
+        ]
+        penalizados = rng.sample(atrasados, len(atrasados) // 4)
+        resultado["penalizacao"] = _copiar(
+            cursor, "Penalizacao", ("descricao", "Final_penalizacao", "id_usuario", "id_emprestimo"),
+            (("Devolução em atraso", (emprestimo[2] or hoje) + timedelta(days=rng.randint(7, 60)),
+              emprestimo[4], i) for i, emprestimo in penalizados),
+        )
+
+        for tabela, coluna in (("Biblioteca", "id_biblioteca"), ("Titulo", "id_titulo"), ("Autores", "id_autor"),
+                               ("Usuario", "id_usuario"), ("Estoque", "id_estoque"), ("Emprestimo", "id_emprestimo")):
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{tabela}', '{coluna}'), (SELECT MAX({coluna}) FROM {tabela}))")
+        cursor.execute("REFRESH MATERIALIZED VIEW mv_titulos_completos")
+        cursor.execute("ANALYZE")
+    conn.commit()
+    logger.info(f"Dados sintéticos (escala {escala}) gerados em {time.perf_counter() - inicio:.1f}s: {resultado}")
+    return resultado
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Gera uma biblioteca sintética num esquema vazio")
+    parser.add_argument("--dsn", required=True, help="Banco com o esquema de BD2_ONIX_SCRIPT.sql, sem dados")
+    parser.add_argument("--escala", type=float, default=1.0, help="1 = ~20 mil títulos e 200 mil empréstimos")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    conexao = psycopg2.connect(args.dsn)
+    try:
+        gerar(conexao, args.escala, args.semente)
+    finally:
+        conexao.close()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Aplica as migrações de esquema pendentes (app/db/migrations)
+
+    python migrate.py              aplica as migrações pendentes
+    python migrate.py --status     lista as migrações e quando foram aplicadas
+    python migrate.py --dry-run    executa e compara os planos, mas desfaz tudo
+    python migrate.py --no-plan-check   cria os índices sem comparar planos
+"""
+import argparse
+import json
+import logging
+
+from app.db.migrator import MigrationRunner
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Migrações de esquema da Biblioteca Onix")
+    parser.add_argument("--status", action="store_true", help="Listar migrações e seu estado")
+    parser.add_argument("--dry-run", action="store_true", help="Aplicar em transação e desfazer ao final")
+    parser.add_argument("--no-plan-check", action="store_true", help="Não exigir melhora de plano para índices")
+    parser.add_argument("--target", type=int, default=None, help="Aplicar até esta versão (inclusive)")
+    parser.add_argument("--min-gain", type=float, default=None, help="Ganho relativo mínimo de custo/buffers")
+    args = parser.parse_args()
+
+    runner = MigrationRunner(
+        min_gain=args.min_gain,
+        check_plans=not args.no_plan_check,
+        dry_run=args.dry_run,
+    )
+
+    if args.status:
+        for migration in runner.status():
+            applied = migration["applied_at"] or "pendente"
+            print(f"{migration['version']:04d}  {migration['name']:<40} {applied}")
+    else:
+        for report in runner.run(target=args.target):
+            print(json.dumps(report, indent=2, default=str, ensure_ascii=False))
@@ -0,0 +1,53 @@
+"""
+Recording stand-in for the database cursor of the services that take ``get_db_cursor()``
+"""
+from contextlib import contextmanager
+
+import pytest
+
+
+class CursorGravado:
+    """Records every statement; ``respostas`` maps an SQL fragment to the rows it returns.
+
+    The rows of the last executed statement whose text contains a fragment are
+    served by fetchone/fetchall, first matching fragment wins.
+    """
+
+    def __init__(self, respostas=None):
+        self.respostas = dict(respostas or {})
+        self.comandos = []
+        self.commits = 0
+        self._linhas = []
+        self.rowcount = 0
+
+    def execute(self, sql, parametros=None):
+        sql = " ".join(str(sql).split())
+        self.comandos.append((sql, parametros))
+        self._linhas = next((list(linhas) for trecho, linhas in self.respostas.items() if trecho in sql), [])
+        self.rowcount = len(self._linhas) or 1
+
+    def fetchone(self):
+        return self._linhas[0] if self._linhas else None
+
+    def fetchall(self):
+        return self._linhas
+
+    def executados(self, trecho):
+        return [(sql, parametros) for sql, parametros in self.comandos if trecho in sql]
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    """``banco(modulo, ..., respostas={...})``: one CursorGravado behind get_db_cursor of those modules"""
+    def instalar(*modulos, respostas=None):
+        cursor = CursorGravado(respostas)
+
+        @contextmanager
+        def get_db_cursor(tuplas=False):
+            yield cursor
+            cursor.commits += 1
+
+        for modulo in modulos:
+            monkeypatch.setattr(modulo, "get_db_cursor", get_db_cursor)
+        return cursor
+    return instalar
@@ -0,0 +1,32 @@
+"""
+Autocomplete prefix index: word-boundary prefixes, accent folding, weight order
+"""
+from app.core.autocompletar import IndicePrefixos, Sugestao
+from app.core.texto import escapar_like, normalizar, palavras
+
+
+def test_normalization_folds_case_accents_and_spaces():
+    assert normalizar("  Coração   de   LEÃO ") == "coracao de leao"
+    assert palavras("O Senhor dos Anéis: A Sociedade do Anel") == [
+        "o", "senhor", "dos", "aneis", "a", "sociedade", "do", "anel"
+    ]
+    assert normalizar("São\tPaulo") == normalizar("sao paulo") and normalizar("AÇÃO") == "acao"
+    # LIKE patterns built from user input: wildcards are literal
+    assert escapar_like("100%_a\\b") == "100\\%\\_a\\\\b"
+
+
+def test_prefixes_match_any_word_heaviest_first():
+    indice = IndicePrefixos([
+        Sugestao("titulo", 1, "A Guerra dos Tronos", 30, "livro"),
+        Sugestao("titulo", 2, "Guerra e Paz", 50, "livro"),
+        Sugestao("autor", 3, "Machado de Assis", 40),
+        Sugestao("titulo", 4, "Guerreiros do Sol", 10, "dvd"),
+    ], pre_calculado=2)
+    # precomputed (<= 2 chars) and range scan (longer) give the same order
+    assert [s.id for s in indice.buscar("gu")] == [2, 1, 4]
+    assert [s.id for s in indice.buscar("guerra")] == [2, 1]
+    assert [s.id for s in indice.buscar("guerra d")] == [1]
+    assert [s.id for s in indice.buscar("TRÔNOS")] == [1]
+    assert [s.id for s in indice.buscar("assis")] == [3]
+    assert [s.id for s in indice.buscar("gu", limite=1)] == [2]
+    assert indice.buscar("xyz") == [] and indice.buscar("  ") == []
@@ -0,0 +1,89 @@
+"""
+Author works routes and their keyset paging
+"""
+from contextlib import contextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import autor
+from app.services import autor_service as modulo
+
+OBRA = {"id_titulo": 3, "titulo": "Dom Casmurro", "tipo_midia": "livro", "autores": ["Machado de Assis"],
+        "total_exemplares": 2, "exemplares_disponiveis": 1}
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    chamadas = []
+
+    def obras(**kwargs):
+        chamadas.append(kwargs)
+        return [OBRA], None
+
+    monkeypatch.setattr(autor.autor_service, "obras", obras)
+    app = FastAPI()
+    app.include_router(autor.router, prefix="/api/v1/autores")
+    return TestClient(app), chamadas
+
+
+def test_search_by_name_is_not_shadowed_by_author_id(cliente):
+    client, chamadas = cliente
+    resposta = client.get("/api/v1/autores/pesquisar/obras", params={"nome": "machado", "size": 5})
+    assert resposta.status_code == 200
+    assert resposta.json()["data"][0]["id_titulo"] == 3
+    assert chamadas == [{"nome": "machado", "apos": 0, "limite": 5}]
+
+
+def test_works_by_author_id(cliente):
+    client, chamadas = cliente
+    resposta = client.get("/api/v1/autores/7/obras", params={"apos": 10})
+    assert resposta.status_code == 200
+    assert resposta.json()["proximo"] is None
+    assert chamadas == [{"id_autor": 7, "apos": 10, "limite": 20}]
+
+
+class _Cursor:
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.parametros = None
+
+    def execute(self, sql, parametros):
+        self.parametros = parametros
+
+    def fetchall(self):
+        # Como o banco: no máximo LIMIT linhas depois do cursor
+        apos, limite = self.parametros[1], self.parametros[2]
+        return [linha for linha in self.linhas if linha["id_titulo"] > apos][:limite]
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    cursor = _Cursor([dict(OBRA, id_titulo=id_titulo) for id_titulo in (2, 5, 9, 14, 20)])
+
+    @contextmanager
+    def get_db_cursor():
+        yield cursor
+
+    monkeypatch.setattr(modulo, "get_db_cursor", get_db_cursor)
+    return cursor
+
+
+def test_keyset_paging_cursor_is_last_returned_title(cursor):
+    pagina, proximo = modulo.autor_service.obras(id_autor=1, limite=2)
+    assert [obra["id_titulo"] for obra in pagina] == [2, 5]
+    assert proximo == 5
+    # Uma linha a mais só para saber se há próxima página
+    assert cursor.parametros == (1, 0, 3)
+
+    pagina, proximo = modulo.autor_service.obras(id_autor=1, apos=proximo, limite=2)
+    assert [obra["id_titulo"] for obra in pagina] == [9, 14]
+    assert proximo == 14
+
+
+def test_keyset_paging_last_page_has_no_cursor(cursor):
+    pagina, proximo = modulo.autor_service.obras(nome="Machado", apos=14, limite=2)
+    assert [obra["id_titulo"] for obra in pagina] == [20]
+    assert proximo is None
+    assert cursor.parametros[0] == "Machado"
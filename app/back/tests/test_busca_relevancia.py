@@ -0,0 +1,43 @@
+"""
+Ranked title search (modo=relevancia): full-text first, trigram word similarity when it finds nothing
+"""
+from app.schemas.schemas import ModoBusca
+from app.services import busca_service, estoque_service
+
+TEXTO = {"id_titulo": 7, "tipo_midia": "livro", "titulo": "Dom Casmurro", "pontuacao": 0.5, "correspondencia": "texto"}
+TRIGRAMA = {"id_titulo": 7, "tipo_midia": "livro", "titulo": "Dom Casmurro", "pontuacao": 0.8,
+            "correspondencia": "trigrama"}
+
+
+def test_full_text_hits_skip_the_trigram_fallback(banco):
+    cursor = banco(estoque_service, respostas={"'texto' AS correspondencia": [TEXTO]})
+
+    resultados = estoque_service.estoque_service.search_from_title("casmurro", ModoBusca.relevancia, k=5)
+
+    assert [r.correspondencia for r in resultados] == ["texto"]
+    assert cursor.executados("websearch_to_tsquery")[0][1] == {"q": "casmurro", "k": 5}
+    assert not cursor.executados("word_similarity")
+
+
+def test_no_full_text_hit_falls_back_to_trigram(banco, monkeypatch):
+    monkeypatch.setattr(estoque_service.settings, "SEARCH_TRIGRAM_THRESHOLD", 0.4)
+    monkeypatch.setattr(estoque_service.settings, "SEARCH_TOP_K", 20)
+    cursor = banco(estoque_service, respostas={"'trigrama' AS correspondencia": [TRIGRAMA]})
+
+    resultados = estoque_service.estoque_service.search_from_title("casmuro", ModoBusca.relevancia)
+
+    assert [(r.id_titulo, r.correspondencia) for r in resultados] == [(7, "trigrama")]
+    # O limiar vale só para a transação da busca
+    assert cursor.executados("set_config('pg_trgm.word_similarity_threshold'")[0][1] == ("0.4",)
+    assert cursor.executados("word_similarity(")[0][1] == {"q": "casmuro", "k": 20}
+
+
+def test_default_mode_is_unranked_substring(banco, monkeypatch):
+    monkeypatch.setattr(busca_service.settings, "SEARCH_BACKEND", "trigrama")
+    cursor = banco(busca_service, respostas={"FROM mv_titulos_completos": [{"id_titulo": 7, "tipo_midia": "livro",
+                                                                           "titulo": "Dom Casmurro"}]})
+
+    resultados = estoque_service.estoque_service.search_from_title("casmurro")
+
+    assert resultados[0].pontuacao is None
+    assert not cursor.executados("websearch_to_tsquery")
@@ -0,0 +1,85 @@
+"""
+Shared search service: backend selection and identifier lookups before the text backends
+"""
+import pytest
+
+from app.services import busca_service
+from app.services.busca_service import ARTIGOS, AUTORES, LIVROS, REVISTAS, busca_service as servico
+
+
+@pytest.fixture
+def indice_fresco(monkeypatch):
+    def definir(fresco):
+        monkeypatch.setattr(busca_service.indice_busca_service, "fresco", lambda: fresco)
+    return definir
+
+
+def test_configured_backend_is_the_default(monkeypatch, indice_fresco):
+    indice_fresco(True)
+    monkeypatch.setattr(busca_service.settings, "SEARCH_BACKEND", "indice")
+    assert servico.backend(None, LIVROS).nome == "indice"
+    # O parâmetro da requisição vence a configuração
+    assert servico.backend("texto", LIVROS).nome == "texto"
+
+
+def test_unknown_backend_falls_back_to_trigram():
+    assert servico.backend("elasticsearch", LIVROS).nome == "trigrama"
+
+
+def test_title_backends_do_not_serve_other_catalogs(indice_fresco):
+    indice_fresco(True)
+    assert servico.backend("texto", AUTORES).nome == "trigrama"
+    assert servico.backend("indice", AUTORES).nome == "trigrama"
+
+
+def test_stale_index_falls_back_to_trigram(indice_fresco):
+    indice_fresco(False)
+    assert servico.backend("indice", LIVROS).nome == "trigrama"
+
+
+def test_identifier_becomes_exact_code_lookup(banco):
+    cursor = banco(busca_service, respostas={"codigo_normalizado": [{"id_livro": 1}]})
+
+    assert servico.buscar(LIVROS, "978-85-359-0277-8", backend="trigrama") == [{"id_livro": 1}]
+
+    (sql, parametros), = cursor.comandos
+    assert "WHERE codigo_normalizado = ANY(%s)" in sql
+    assert parametros == (["9788535902778", "8535902775"],)
+
+
+def test_identifier_of_another_type_returns_nothing(banco):
+    cursor = banco(busca_service)
+
+    assert servico.buscar(REVISTAS, "978-85-359-0277-8") == []
+    assert not cursor.comandos
+
+
+def test_text_goes_to_the_trigram_backend(banco):
+    cursor = banco(busca_service, respostas={"FROM Livros": [{"id_livro": 1}]})
+
+    servico.buscar(LIVROS, "Guerra e Paz", limite=10, backend="trigrama")
+
+    (sql, parametros), = cursor.comandos
+    assert "titulo_busca LIKE" in sql and "codigo_normalizado" not in sql
+    # Sem dígitos no termo a coluna de código (sem índice) fica fora do filtro
+    assert "ISBN ILIKE" not in sql
+    assert parametros == ["Guerra e Paz", 10]
+
+
+def test_digits_add_the_code_column_to_the_trigram_filter(banco):
+    cursor = banco(busca_service)
+
+    servico.buscar(ARTIGOS, "10 anos", limite=5, backend="trigrama")
+
+    (sql, parametros), = cursor.comandos
+    assert "OR DOI ILIKE %s" in sql
+    assert parametros == ["10 anos", "%10 anos%", 5]
+
+
+def test_catalog_without_identifier_never_checks_codes(banco):
+    cursor = banco(busca_service)
+
+    servico.buscar(AUTORES, "978-85-359-0277-8", backend="trigrama")
+
+    assert not cursor.executados("codigo_normalizado")
+    assert cursor.executados("nome_busca LIKE")
@@ -0,0 +1,86 @@
+"""
+Search result cache: normalized keys, TTL, LRU bound, write invalidation, per-endpoint counts
+"""
+import asyncio
+
+from app.core.cache_busca import CacheBusca
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _contador():
+    chamadas = []
+
+    def calcular():
+        chamadas.append(None)
+        return len(chamadas)
+
+    return calcular, chamadas
+
+
+def test_normalized_keys_and_parameters():
+    cache = CacheBusca(10, 30)
+    calcular, chamadas = _contador()
+    assert cache.buscar("midias", "Coração", {"page": 1, "tipo": None}, calcular) == 1
+    assert cache.buscar("midias", "  coracao ", {"page": 1}, calcular) == 1
+    assert cache.buscar("midias", "coracao", {"page": 2}, calcular) == 2
+    assert cache.buscar("revistas", "coracao", {"page": 1}, calcular) == 3
+    # full-text modes keep accents apart, but still fold case and spacing
+    assert cache.buscar("estoque_titulo", "Ação", None, calcular, preservar_acentos=True) == 4
+    assert cache.buscar("estoque_titulo", " ação", None, calcular, preservar_acentos=True) == 4
+    assert cache.buscar("estoque_titulo", "acao", None, calcular, preservar_acentos=True) == 5
+    assert cache.contagens("midias") == (1, 2)
+    assert cache.contagens("estoque_titulo") == (1, 2)
+    assert cache.contagens("inexistente") == (0, 0)
+
+
+def test_ttl_and_lru_bound():
+    relogio = _Relogio()
+    cache = CacheBusca(2, 30, relogio)
+    calcular, chamadas = _contador()
+    cache.buscar("midias", "a", None, calcular)
+    cache.buscar("midias", "b", None, calcular)
+    cache.buscar("midias", "a", None, calcular)
+    cache.buscar("midias", "c", None, calcular)  # evicts b, the least recently used
+    assert len(cache) == 2
+    assert cache.buscar("midias", "a", None, calcular) == 1
+    assert cache.buscar("midias", "b", None, calcular) == 4
+    relogio.agora = 30
+    assert cache.buscar("midias", "b", None, calcular) == 5
+
+
+def test_writes_invalidate_and_race_is_not_stored():
+    cache = CacheBusca(10, 30)
+    calcular, chamadas = _contador()
+    cache.buscar("midias", "guerra", None, calcular)
+    cache.invalidar()
+    assert len(cache) == 0
+    assert cache.buscar("midias", "guerra", None, calcular) == 2
+
+    def escrita_no_meio():
+        cache.invalidar()
+        return "antigo"
+
+    assert cache.buscar("midias", "paz", None, escrita_no_meio) == "antigo"
+    assert cache.buscar("midias", "paz", None, calcular) == 3
+
+
+def test_async_and_disabled():
+    cache = CacheBusca(10, 30)
+    calcular, chamadas = _contador()
+
+    async def calcular_async():
+        return calcular()
+
+    assert asyncio.run(cache.buscar_async("revistas", "Veja", None, calcular_async)) == 1
+    assert asyncio.run(cache.buscar_async("revistas", "veja", None, calcular_async)) == 1
+    desligado = CacheBusca(0, 30)
+    assert desligado.buscar("midias", "a", None, calcular) == 2
+    assert desligado.buscar("midias", "a", None, calcular) == 3
+    assert len(desligado) == 0
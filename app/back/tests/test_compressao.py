@@ -0,0 +1,122 @@
+"""
+Compression middleware: negotiation, threshold, streaming and the precompressed cache
+"""
+import gzip
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compressao import CompressaoMiddleware, escolher_codificacao
+
+GRANDE = b'{"titulo":"Dom Casmurro"}' * 200
+PEQUENO = b'{"ok":true}'
+
+app = FastAPI()
+app.add_middleware(CompressaoMiddleware, minimo=1024, cache_bytes=1024 * 1024)
+
+
+@app.get("/grande")
+def grande():
+    return Response(GRANDE, media_type="application/json")
+
+
+@app.get("/pequeno")
+def pequeno():
+    return Response(PEQUENO, media_type="application/json")
+
+
+@app.get("/ja-comprimido")
+def ja_comprimido():
+    return Response(gzip.compress(GRANDE), media_type="application/x-ndjson",
+                    headers={"Content-Encoding": "gzip"})
+
+
+@app.get("/imagem")
+def imagem():
+    return Response(GRANDE, media_type="image/png")
+
+
+@app.get("/fluxo")
+def fluxo():
+    def blocos():
+        for i in range(50):
+            yield b'{"linha":%d,"titulo":"Memorias Postumas"}\n' % i
+    return StreamingResponse(blocos(), media_type="application/x-ndjson")
+
+
+client = TestClient(app)
+
+
+def _cache():
+    pilha = app.middleware_stack
+    while not isinstance(pilha, CompressaoMiddleware):
+        pilha = pilha.app
+    return pilha.cache
+
+
+def _bruto(caminho, codificacao="gzip"):
+    # Reads the bytes on the wire, without httpx decoding them
+    with client.stream("GET", caminho, headers={"Accept-Encoding": codificacao}) as resposta:
+        return resposta, b"".join(resposta.iter_raw())
+
+
+def test_negotiation_honours_q_values_and_server_preference():
+    assert escolher_codificacao("gzip, deflate") == "gzip"
+    assert escolher_codificacao("br;q=1.0, gzip;q=0.5", ["br", "gzip"]) == "br"
+    assert escolher_codificacao("br;q=0.2, gzip;q=0.5", ["br", "gzip"]) == "gzip"
+    assert escolher_codificacao("*", ["br", "zstd", "gzip"]) == "br"
+    assert escolher_codificacao("gzip;q=0, identity") is None
+    assert escolher_codificacao("") is None
+
+
+def test_large_body_is_compressed_and_small_one_is_not():
+    resposta, corpo = _bruto("/grande")
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert resposta.headers["vary"] == "Accept-Encoding"
+    assert int(resposta.headers["content-length"]) == len(corpo) < len(GRANDE)
+    assert gzip.decompress(corpo) == GRANDE
+
+    resposta, corpo = _bruto("/pequeno")
+    assert "content-encoding" not in resposta.headers
+    assert corpo == PEQUENO
+
+    resposta, corpo = _bruto("/grande", "identity")
+    assert "content-encoding" not in resposta.headers and corpo == GRANDE
+
+
+def test_vary_is_set_on_every_compressible_response():
+    # Abaixo do limiar, ou sem codificação aceita, o corpo vai sem compressão mas ainda varia
+    for caminho, codificacao in (("/pequeno", "gzip"), ("/grande", "identity"), ("/fluxo", "identity")):
+        resposta, _ = _bruto(caminho, codificacao)
+        assert "content-encoding" not in resposta.headers
+        assert resposta.headers["vary"] == "Accept-Encoding"
+    resposta, _ = _bruto("/imagem")
+    assert "vary" not in resposta.headers
+
+
+def test_encoded_and_binary_responses_pass_through():
+    resposta, corpo = _bruto("/ja-comprimido")
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(corpo) == GRANDE
+    resposta, corpo = _bruto("/imagem")
+    assert "content-encoding" not in resposta.headers and corpo == GRANDE
+
+
+def test_stream_is_compressed_incrementally():
+    resposta, corpo = _bruto("/fluxo")
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert "content-length" not in resposta.headers
+    esperado = b"".join(b'{"linha":%d,"titulo":"Memorias Postumas"}\n' % i for i in range(50))
+    assert zlib.decompress(corpo, 31) == esperado
+
+
+def test_hot_body_is_compressed_once():
+    _bruto("/grande")
+    cache = _cache()
+    acertos, falhas = cache.acertos, cache.falhas
+    _, primeiro = _bruto("/grande")
+    _, segundo = _bruto("/grande")
+    assert cache.acertos == acertos + 2 and cache.falhas == falhas
+    assert primeiro == segundo
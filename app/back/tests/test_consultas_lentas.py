@@ -0,0 +1,33 @@
+"""
+Slow-query recorder: redaction, threshold, ring buffer and the on-disk log
+"""
+import json
+from datetime import date
+
+from app.db.consultas_lentas import GravadorConsultasLentas, redigir
+from app.db.instrumentacao import Execucao
+
+
+def test_redaction_keeps_numbers_and_hides_text():
+    assert redigir(("ana@exemplo.com", 42, 1.5, None, True, date(2024, 1, 2), b"abc")) == [
+        "<str:15>", 42, 1.5, None, True, "2024-01-02", "<bytes:3>"
+    ]
+    assert redigir({"senha": "segredo", "ids": [1, 2]}) == {"senha": "<str:7>", "ids": [1, 2]}
+
+
+def test_threshold_ring_buffer_and_log(tmp_path):
+    arquivo = tmp_path / "lentas.jsonl"
+    gravador = GravadorConsultasLentas(limite_ms=100, amostragem=1.0, capacidade=2, arquivo=str(arquivo))
+    sql = "SELECT * FROM Usuario WHERE email = %s"
+    gravador(Execucao(sql, sql, ("a@b.c",), 0.05, 1))
+    for duracao in (0.1, 0.2, 0.3):
+        gravador(Execucao(sql, sql, ("a@b.c",), duracao, 1))
+    gravador.encerrar()
+
+    recentes = gravador.recentes()
+    assert [registro["duracao_ms"] for registro in recentes] == [300.0, 200.0]
+    assert recentes[0]["parametros"] == ["<str:5>"]
+    assert recentes[0]["chamador"].endswith("in test_threshold_ring_buffer_and_log")
+    assert "plano" not in recentes[0]  # no dsn, no EXPLAIN
+    linhas = [json.loads(linha) for linha in arquivo.read_text().splitlines()]
+    assert [linha["duracao_ms"] for linha in linhas] == [100.0, 200.0, 300.0]
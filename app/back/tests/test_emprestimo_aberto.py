@@ -0,0 +1,98 @@
+"""
+EmprestimoAberto read model: kept in step with loans and with the rows it copies, in the same transaction
+"""
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.schemas import BibliotecaUpdate, EmprestimoCreate, EstoqueUpdate, LivroUpdate
+from app.services import biblioteca_service, emprestimo_service, estoque_service, livro_service
+
+EMPRESTIMO = {"id_emprestimo": 17, "data_emprestimo": date(2024, 3, 1), "data_devolucao_prevista": date(2024, 3, 16),
+              "data_devolucao": None, "id_estoque": 5, "id_usuario": 3}
+
+
+def test_checkout_opens_the_read_model_row_and_counts_it(banco):
+    cursor = banco(emprestimo_service, respostas={
+        "SELECT COUNT(*) FROM EmprestimoAberto": [{"count": 0}],
+        "FROM Usuario": [{"id_usuario": 3}],
+        "FROM Estoque": [{"id_estoque": 5}],
+        "INSERT INTO Emprestimo (": [EMPRESTIMO],
+    })
+    emprestimo = emprestimo_service.emprestimo_service.create_emprestimo(
+        EmprestimoCreate(data_emprestimo=date(2024, 3, 1), id_estoque=5, id_usuario=3)
+    )
+    assert emprestimo.id_emprestimo == 17
+    assert cursor.executados("INSERT INTO EmprestimoAberto")[0][1] == (17,)
+    # Fatia 17 % 8 nos contadores e no balde do vencimento
+    assert cursor.executados("UPDATE EstatisticaEmprestimo")[0][1] == (1,)
+    assert cursor.executados("INSERT INTO VencimentoEmprestimo")[0][1] == (date(2024, 3, 16), 1)
+    assert cursor.commits == 1
+
+
+def test_checkout_of_a_copy_on_loan_writes_nothing(banco):
+    cursor = banco(emprestimo_service, respostas={"SELECT COUNT(*) FROM EmprestimoAberto": [{"count": 1}]})
+    with pytest.raises(HTTPException) as erro:
+        emprestimo_service.emprestimo_service.create_emprestimo(
+            EmprestimoCreate(data_emprestimo=date(2024, 3, 1), id_estoque=5, id_usuario=3)
+        )
+    assert erro.value.status_code == 400
+    assert not cursor.executados("INSERT")
+
+
+def test_return_removes_the_read_model_row(banco):
+    devolvido = dict(EMPRESTIMO, data_devolucao=date(2024, 3, 10))
+    cursor = banco(emprestimo_service, respostas={
+        "FROM EmprestimoAberto WHERE id_emprestimo": [{"data_emprestimo": date(2024, 3, 1)}],
+        "UPDATE Emprestimo ": [devolvido],
+    })
+    emprestimo_service.emprestimo_service.devolver_item(17, date(2024, 3, 10))
+    # O UPDATE leva data_emprestimo para tocar uma partição só
+    assert cursor.executados("UPDATE Emprestimo ")[0][1] == (date(2024, 3, 10), 17, date(2024, 3, 1))
+    assert cursor.executados("DELETE FROM EmprestimoAberto")[0][1] == (17,)
+    assert cursor.executados("UPDATE EstatisticaEmprestimo")
+
+
+def test_return_of_a_closed_loan_is_rejected(banco):
+    cursor = banco(emprestimo_service)
+    with pytest.raises(HTTPException):
+        emprestimo_service.emprestimo_service.devolver_item(17)
+    assert not cursor.executados("DELETE")
+
+
+def test_title_rename_updates_open_loans(banco, monkeypatch):
+    monkeypatch.setattr(livro_service.indice_busca_service, "reindexar", lambda *ids: None)
+    cursor = banco(livro_service, respostas={"UPDATE Livros": [
+        {"id_livro": 9, "titulo": "Novo", "isbn": None, "numero_paginas": None, "editora": None, "data_publicacao": None}
+    ]})
+    livro_service.livro_service.update_livro(9, LivroUpdate(titulo="Novo"))
+    assert cursor.executados("UPDATE EmprestimoAberto SET item_titulo")[0][1] == ("Novo", 9)
+
+
+def test_library_rename_updates_open_loans(banco):
+    cursor = banco(biblioteca_service, respostas={"UPDATE Biblioteca": [
+        {"id_biblioteca": 2, "nome": "Central", "endereco": None}
+    ]})
+    biblioteca_service.biblioteca_service.update_biblioteca(2, BibliotecaUpdate(nome="Central"))
+    assert cursor.executados("UPDATE EmprestimoAberto SET biblioteca_nome")[0][1] == ("Central", 2)
+
+
+@pytest.mark.parametrize("alteracao", [{"id_titulo": 4}, {"id_biblioteca": 6}])
+def test_moving_a_copy_resyncs_its_open_loan(banco, alteracao):
+    cursor = banco(estoque_service, respostas={"UPDATE Estoque": [
+        dict({"id_estoque": 5, "condicao": "Bom", "id_titulo": 1, "id_biblioteca": 2}, **alteracao)
+    ]})
+    estoque_service.estoque_service.update_estoque(5, EstoqueUpdate(**alteracao))
+    (sql, parametros), = cursor.executados("UPDATE EmprestimoAberto")
+    assert "id_titulo = t.id_titulo" in sql and "biblioteca_nome = b.nome" in sql
+    assert parametros == (5,)
+    assert cursor.commits == 1
+
+
+def test_condition_change_leaves_open_loans_alone(banco):
+    cursor = banco(estoque_service, respostas={"UPDATE Estoque": [
+        {"id_estoque": 5, "condicao": "Ruim", "id_titulo": 1, "id_biblioteca": 2}
+    ]})
+    estoque_service.estoque_service.update_estoque(5, EstoqueUpdate(condicao="Ruim"))
+    assert not cursor.executados("EmprestimoAberto")
@@ -0,0 +1,112 @@
+"""
+Sharded loan counters (EstatisticaEmprestimo/VencimentoEmprestimo) and their reconciliation job
+"""
+from datetime import date
+
+from app.jobs import estatisticas
+from app.services import emprestimo_service
+
+HOJE = date(2024, 3, 20)
+CONTAGEM = {"total_emprestimos": 10, "emprestimos_em_andamento": 4,
+            "emprestimos_devolvidos": 6, "emprestimos_vencidos": 1}
+
+
+def _com_rowcount(cursor, trecho, rowcount):
+    """Faz os comandos que contêm ``trecho`` reportarem ``rowcount`` linhas afetadas"""
+    execute = cursor.execute
+
+    def executar(sql, parametros=None):
+        execute(sql, parametros)
+        if trecho in " ".join(str(sql).split()):
+            cursor.rowcount = rowcount
+    cursor.execute = executar
+
+
+def test_checkout_and_return_touch_only_their_shard(banco):
+    cursor = banco(emprestimo_service)
+    servico = emprestimo_service.emprestimo_service
+    emprestimo = {"id_emprestimo": 13, "data_devolucao_prevista": date(2024, 4, 1)}
+
+    servico._contabilizar_emprestimo(cursor, emprestimo)
+    servico._contabilizar_devolucao(cursor, emprestimo)
+
+    # 13 % 8: empréstimos concorrentes de outras fatias não disputam a mesma linha
+    assert [p for _, p in cursor.executados("UPDATE EstatisticaEmprestimo")] == [(5,), (0, 5)]
+    assert cursor.executados("INSERT INTO VencimentoEmprestimo")[0][1] == (date(2024, 4, 1), 5)
+    assert cursor.executados("UPDATE VencimentoEmprestimo")[0][1] == (date(2024, 4, 1), 5)
+
+
+def test_return_after_consolidation_decrements_consolidated_overdue(banco):
+    cursor = banco(emprestimo_service)
+    _com_rowcount(cursor, "UPDATE VencimentoEmprestimo", 0)
+
+    emprestimo_service.emprestimo_service._contabilizar_devolucao(
+        cursor, {"id_emprestimo": 8, "data_devolucao_prevista": date(2024, 1, 1)}
+    )
+
+    # O balde já foi dobrado em vencidos_consolidados pelo job diário
+    assert cursor.executados("UPDATE EstatisticaEmprestimo")[0][1] == (1, 0)
+
+
+def test_return_without_due_date_skips_buckets(banco):
+    cursor = banco(emprestimo_service)
+
+    emprestimo_service.emprestimo_service._contabilizar_devolucao(
+        cursor, {"id_emprestimo": 3, "data_devolucao_prevista": None}
+    )
+
+    assert not cursor.executados("VencimentoEmprestimo")
+    assert cursor.executados("UPDATE EstatisticaEmprestimo")[0][1] == (0, 3)
+
+
+def test_report_exposes_last_consolidation(banco):
+    banco(emprestimo_service, respostas={
+        "FROM EstatisticaEmprestimo": [dict(CONTAGEM, consolidado_ate=date(2024, 3, 19))],
+    })
+
+    relatorio = emprestimo_service.emprestimo_service.get_relatorio_emprestimos()
+
+    assert relatorio.emprestimos_vencidos == 1
+    assert relatorio.consolidado_ate == date(2024, 3, 19)
+
+
+def test_consolidation_folds_past_buckets_and_moves_the_cutoff(banco):
+    cursor = banco(estatisticas)
+
+    estatisticas.consolidar_vencidos(HOJE)
+
+    assert cursor.executados("DELETE FROM VencimentoEmprestimo WHERE data_devolucao_prevista <")[0][1] == (HOJE,)
+    assert cursor.executados("UPDATE EstatisticaEmprestimoCorte SET consolidado_ate")[0][1] == (HOJE,)
+
+
+def test_reconcile_reports_consistent_counters(banco):
+    cursor = banco(estatisticas, respostas={"FROM EstatisticaEmprestimo": [CONTAGEM], "FROM Emprestimo": [CONTAGEM]})
+
+    resultado = estatisticas.reconciliar(hoje=HOJE)
+
+    assert resultado == {"data": "2024-03-20", "consistente": True, "divergencias": {}, "corrigido": False}
+    assert not cursor.executados("LOCK TABLE")
+
+
+def test_reconcile_reports_divergence_without_touching_counters(banco):
+    real = dict(CONTAGEM, emprestimos_vencidos=3)
+    cursor = banco(estatisticas, respostas={"FROM EstatisticaEmprestimo": [CONTAGEM], "FROM Emprestimo": [real]})
+
+    resultado = estatisticas.reconciliar(hoje=HOJE)
+
+    assert resultado["divergencias"] == {"emprestimos_vencidos": {"contador": 1, "real": 3}}
+    assert not resultado["corrigido"]
+    assert not cursor.executados("DELETE FROM VencimentoEmprestimo")
+
+
+def test_reconcile_with_fix_locks_and_rebuilds(banco):
+    real = dict(CONTAGEM, total_emprestimos=11, emprestimos_devolvidos=7)
+    cursor = banco(estatisticas, respostas={"FROM EstatisticaEmprestimo": [CONTAGEM], "FROM Emprestimo": [real]})
+
+    resultado = estatisticas.reconciliar(corrigir=True, hoje=HOJE)
+
+    assert resultado["corrigido"]
+    assert cursor.comandos[0][0] == "LOCK TABLE Emprestimo IN SHARE MODE"
+    assert cursor.executados("DELETE FROM VencimentoEmprestimo")
+    assert cursor.executados("INSERT INTO VencimentoEmprestimo")[0][1] == (HOJE,)
+    assert cursor.commits == 1
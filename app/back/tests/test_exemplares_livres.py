@@ -0,0 +1,60 @@
+"""
+Free copies of a title per library (GET /estoque/disponibilidade/{id_titulo}/bibliotecas)
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import estoque
+from app.services import estoque_service
+
+CENTRAL = {"id_biblioteca": 2, "biblioteca": "Central", "total_exemplares": 3, "exemplares_disponiveis": 2,
+           "exemplares_livres": [11, 14]}
+BAIRRO = {"id_biblioteca": 5, "biblioteca": "Bairro", "total_exemplares": 1, "exemplares_disponiveis": 0,
+          "exemplares_livres": []}
+SEM_EXEMPLARES = {"id_biblioteca": None, "biblioteca": None, "total_exemplares": 0, "exemplares_disponiveis": 0,
+                  "exemplares_livres": []}
+
+
+def _cliente():
+    app = FastAPI()
+    app.include_router(estoque.router, prefix="/api/v1/estoque")
+    return TestClient(app)
+
+
+def test_one_query_with_preference_and_cap(banco):
+    cursor = banco(estoque_service, respostas={"FROM Titulo t": [CENTRAL, BAIRRO]})
+
+    bibliotecas = estoque_service.estoque_service.exemplares_livres(9, preferencia=[5, 2], livres=2)
+
+    assert [b.id_biblioteca for b in bibliotecas] == [2, 5]
+    assert bibliotecas[0].exemplares_livres == [11, 14]
+    (sql, parametros), = cursor.comandos
+    assert parametros == {"id_titulo": 9, "preferencia": [5, 2], "livres": 2}
+    # Ordem das preferidas no banco, e anti-join com o modelo de leitura de empréstimos abertos
+    assert "array_position(%(preferencia)s::int[], e.id_biblioteca) NULLS LAST" in sql
+    assert "LEFT JOIN EmprestimoAberto ab ON ab.id_estoque = e.id_estoque" in sql
+
+
+def test_missing_title_is_none_and_title_without_copies_is_empty(banco):
+    banco(estoque_service)
+    assert estoque_service.estoque_service.exemplares_livres(9) is None
+
+    cursor = banco(estoque_service, respostas={"FROM Titulo t": [SEM_EXEMPLARES]})
+    assert estoque_service.estoque_service.exemplares_livres(9) == []
+    assert cursor.comandos[0][1]["preferencia"] == []
+
+
+def test_route_passes_repeated_preference_and_maps_404(banco):
+    cursor = banco(estoque_service, respostas={"FROM Titulo t": [CENTRAL]})
+    client = _cliente()
+
+    resposta = client.get("/api/v1/estoque/disponibilidade/9/bibliotecas",
+                          params=[("preferencia", 5), ("preferencia", 2), ("livres", 1)])
+
+    assert resposta.status_code == 200
+    assert resposta.json()[0]["exemplares_livres"] == [11, 14]
+    assert cursor.comandos[0][1] == {"id_titulo": 9, "preferencia": [5, 2], "livres": 1}
+
+    banco(estoque_service)
+    assert client.get("/api/v1/estoque/disponibilidade/9/bibliotecas").status_code == 404
+    assert client.get("/api/v1/estoque/disponibilidade/9/bibliotecas", params={"livres": 101}).status_code == 422
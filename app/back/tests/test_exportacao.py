@@ -0,0 +1,165 @@
+import gzip
+import json
+import threading
+from collections import namedtuple
+
+import anyio
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.schemas import FormatoExportacao
+from app.services import exportacao_service as modulo
+from app.services.exportacao_service import exportacao_service
+
+Coluna = namedtuple("Coluna", "name")
+
+
+class CursorServidor:
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.description = [Coluna("id"), Coluna("nome")]
+        self.fechado = False
+
+    def execute(self, query, params):
+        self.conexao.consultas.append(params)
+
+    def fetchmany(self, quantidade):
+        if self.conexao.travar.is_set():
+            self.conexao.buscando.set()
+            if not self.conexao.cancelada.wait(5):
+                raise AssertionError("consulta não foi cancelada")
+            raise RuntimeError("canceling statement due to user request")
+        bloco, self.conexao.linhas = self.conexao.linhas[:quantidade], self.conexao.linhas[quantidade:]
+        return bloco
+
+    def close(self):
+        self.fechado = True
+
+
+class Conexao:
+    def __init__(self, linhas):
+        self.linhas = list(linhas)
+        self.consultas = []
+        self.closed = 0
+        self.rollbacks = 0
+        self.travar = threading.Event()
+        self.buscando = threading.Event()
+        self.cancelada = threading.Event()
+        self.cursores = []
+
+    def cursor(self, name=None):
+        cursor = CursorServidor(self)
+        self.cursores.append(cursor)
+        return cursor
+
+    def cancel(self):
+        self.cancelada.set()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class Pool:
+    def __init__(self, linhas=()):
+        self.linhas = linhas
+        self.emprestadas = []
+        self.devolvidas = threading.Semaphore(0)
+
+    def getconn(self):
+        conexao = Conexao(self.linhas)
+        self.emprestadas.append(conexao)
+        return conexao
+
+    def putconn(self, conexao, close=False):
+        self.devolvidas.release()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    def instalar(linhas=(), vagas=2, bloco=2):
+        falso = Pool(linhas)
+        monkeypatch.setattr(modulo, "db_manager", falso)
+        monkeypatch.setattr(modulo, "_vagas", threading.BoundedSemaphore(vagas))
+        monkeypatch.setattr(modulo.settings, "EXPORT_CHUNK_SIZE", bloco)
+        return falso
+    return instalar
+
+
+def _baixar(resposta) -> bytes:
+    async def ler():
+        return b"".join([bloco async for bloco in resposta.body_iterator])
+    return anyio.run(ler)
+
+
+def _devolvida(pool) -> bool:
+    return pool.devolvidas.acquire(timeout=5)
+
+
+def test_ndjson_streams_every_chunk(pool):
+    falso = pool(linhas=[(1, "Ana"), (2, "Bia"), (3, "Caio")])
+
+    resposta = exportacao_service.exportar_emprestimos_vencidos(FormatoExportacao.ndjson, compactar=False)
+
+    linhas = [json.loads(linha) for linha in _baixar(resposta).decode().splitlines()]
+    assert linhas == [{"id": 1, "nome": "Ana"}, {"id": 2, "nome": "Bia"}, {"id": 3, "nome": "Caio"}]
+    assert resposta.media_type == "application/x-ndjson"
+    assert _devolvida(falso)
+    assert falso.emprestadas[0].cursores[0].fechado
+
+
+def test_csv_header_written_once(pool):
+    pool(linhas=[(1, "Ana"), (2, "Bia"), (3, "Caio")])
+
+    resposta = exportacao_service.exportar_usuarios_com_emprestimos_ativos(FormatoExportacao.csv, compactar=False)
+
+    assert _baixar(resposta).decode().splitlines() == ["id,nome", "1,Ana", "2,Bia", "3,Caio"]
+
+
+def test_gzip_body_is_a_single_valid_stream(pool):
+    pool(linhas=[(i, f"usuario {i}") for i in range(7)])
+
+    resposta = exportacao_service.exportar_estoque_biblioteca(4, FormatoExportacao.csv, compactar=True)
+
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert 'filename="estoque-biblioteca-4.csv"' in resposta.headers["content-disposition"]
+    texto = gzip.decompress(_baixar(resposta)).decode()
+    assert texto.splitlines()[0] == "id,nome"
+    assert len(texto.splitlines()) == 8
+
+
+def test_disconnect_mid_fetch_cancels_query_and_returns_connection(pool):
+    falso = pool(linhas=[(1, "Ana"), (2, "Bia"), (3, "Caio")])
+    resposta = exportacao_service.exportar_emprestimos_vencidos(FormatoExportacao.ndjson, compactar=False)
+    conexao = falso.emprestadas[0]
+
+    async def cair_no_meio():
+        corpo = resposta.body_iterator
+        await corpo.__anext__()
+        conexao.travar.set()
+        with anyio.move_on_after(0.2):
+            await corpo.__anext__()
+        await corpo.aclose()
+
+    anyio.run(cair_no_meio)
+
+    assert conexao.buscando.is_set()
+    assert conexao.cancelada.is_set()
+    assert _devolvida(falso)
+    assert conexao.rollbacks == 1
+
+
+def test_concurrency_cap_leaves_pool_for_the_api(pool):
+    falso = pool(linhas=[(1, "Ana")], vagas=1)
+    primeira = exportacao_service.exportar_emprestimos_vencidos(FormatoExportacao.ndjson, compactar=False)
+
+    with pytest.raises(HTTPException) as erro:
+        exportacao_service.exportar_emprestimos_vencidos(FormatoExportacao.ndjson, compactar=False)
+    assert erro.value.status_code == 503
+    assert len(falso.emprestadas) == 1
+
+    _baixar(primeira)
+    # A vaga volta junto com a conexão, na thread de limpeza
+    assert modulo._vagas.acquire(timeout=5)
+    modulo._vagas.release()
+    segunda = exportacao_service.exportar_emprestimos_vencidos(FormatoExportacao.ndjson, compactar=False)
+    _baixar(segunda)
@@ -0,0 +1,33 @@
+"""
+Identifier detection for search: ISBN-10/13, ISSN, ISAN, DOI, normalized as in migration 0008
+"""
+from app.core.identificadores import identificar, normalizar_codigo, normalizar_doi
+
+
+def test_isbn_both_forms_with_or_without_hyphens():
+    esperado = ("isbn", ("9788535902778", "8535902775"))
+    assert identificar("978-85-359-0277-8") == esperado
+    assert identificar("ISBN 85-359-0277-5") == esperado
+    assert identificar("  8535902775 ") == esperado
+    # 979 ISBNs have no 10-digit form; X check digit in ISBN-10
+    assert identificar("979-10-90636-07-1") == ("isbn", ("9791090636071",))
+    assert identificar("0-8044-2957-X") == ("isbn", ("9780804429573", "080442957X"))
+
+
+def test_issn_isan_doi():
+    assert identificar("ISSN 0317-8471") == ("issn", ("03178471",))
+    assert identificar("ISAN 0000-0001-8CFA-0000-Q-0000-0000-X") == ("isan", ("000000018CFA0000Q00000000X",))
+    assert identificar("0000-0001-8CFA-0000") == ("isan", ("000000018CFA0000",))
+    assert identificar("https://doi.org/10.1038/NPHYS1170") == ("doi", ("10.1038/nphys1170",))
+    assert identificar("doi: 10.1000/xyz123") == ("doi", ("10.1000/xyz123",))
+
+
+def test_text_and_bad_check_digits_are_not_identifiers():
+    for termo in ("Guerra e Paz", "1984", "978-85-359-0277-5", "0317-8472", "deadbeefcafebabe", "10 anos"):
+        assert identificar(termo) is None
+
+
+def test_stored_values_normalize_like_queries():
+    assert normalizar_codigo("isbn: 978-85-359-0277-8") == "9788535902778"
+    assert normalizar_codigo("0000-0001-8cfa-0000") == "000000018CFA0000"
+    assert normalizar_doi(" DOI:10.1000/XYZ123") == "10.1000/xyz123"
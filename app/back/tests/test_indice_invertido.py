@@ -0,0 +1,119 @@
+"""
+Catalog inverted index: word/prefix matching, codes, title order after writes, snapshots, facets
+"""
+import random
+from datetime import datetime
+
+from app.core import indice_invertido
+from app.core.indice_invertido import Documento, IndiceInvertido
+
+
+def _indice():
+    return IndiceInvertido([
+        Documento(1, "livro", "Guerra e Paz", "978-85-359-0277-5", "Cosac", "2011-01-01", ("Liev Tolstói",)),
+        Documento(2, "dvd", "A Guerra dos Mundos", "0000-0001-2C7A", "Paramount", "2005-06-29", ()),
+        Documento(3, "livro", "Dom Casmurro", None, "Garnier", "1899-01-01", ("Machado de Assis",)),
+        Documento(4, "artigo", "Guerrilha e estado", "10.1000/xyz123", None, None, ("Ana Tolstoi",)),
+    ])
+
+
+def _ids(resultado):
+    return [documento.id_titulo for documento in resultado.documentos], resultado.total
+
+
+def test_words_prefix_authors_and_codes():
+    indice = _indice()
+    assert _ids(indice.buscar("guerra")) == ([2, 1], 2)
+    # last word is a prefix, the others must be whole words
+    assert _ids(indice.buscar("guer")) == ([2, 1, 4], 3)
+    assert _ids(indice.buscar("guerra mun")) == ([2], 1)
+    assert _ids(indice.buscar("tolstoi")) == ([1, 4], 2)
+    assert _ids(indice.buscar("machado casm")) == ([3], 1)
+    assert _ids(indice.buscar("9788535902775")) == ([1], 1)
+    assert _ids(indice.buscar("10.1000/XYZ123")) == ([4], 1)
+    assert _ids(indice.buscar("guer", {"tipo_midia": "livro"})) == ([1], 1)
+    assert _ids(indice.buscar("guer", deslocamento=1, limite=1)) == ([1], 3)
+    assert _ids(indice.buscar("inexistente")) == ([], 0)
+
+
+def test_writes_keep_title_order():
+    indice = _indice()
+    indice.adicionar(Documento(5, "revista", "Guerreiros Antigos"))
+    indice.adicionar(Documento(2, "dvd", "Zorro e a Guerra"))
+    assert _ids(indice.buscar("guer")) == ([1, 5, 4, 2], 4)
+    assert _ids(indice.buscar("mundos")) == ([], 0)
+    assert indice.remover(1) and not indice.remover(99)
+    assert _ids(indice.buscar("guer", limite=2)) == ([5, 4], 3)
+    assert len(indice) == 4
+    assert set(indice.memoria()) == {"postagens", "documentos", "ids", "facetas"}
+
+
+def test_snapshot_round_trip(tmp_path):
+    indice = _indice()
+    indice.remover(3)
+    caminho = str(tmp_path / "indice.json.gz")
+    gerado_em = datetime(2024, 5, 1, 12, 0)
+    indice.salvar(caminho, gerado_em)
+    carregado, quando = IndiceInvertido.carregar(caminho)
+    assert quando == gerado_em
+    assert sorted(carregado.documentos()) == sorted(indice.documentos())
+    assert _ids(carregado.buscar("guer")) == _ids(indice.buscar("guer"))
+
+
+def _catalogo(quantidade=400):
+    rng = random.Random(7)
+    return [
+        Documento(
+            i, rng.choice(indice_invertido.TIPOS), f"{rng.choice(['Guerra', 'Paz', 'Mar'])} {i}",
+            editora=rng.choice(["Cosac", "Globo", "Record", None]),
+            data_pub=rng.choice([f"{ano}-01-01" for ano in range(1950, 2030, 7)] + [None]),
+            bibliotecas=tuple(rng.sample([1, 2, 3], rng.randint(0, 2))),
+            disponivel=rng.random() < 0.5,
+        )
+        for i in range(quantidade)
+    ]
+
+
+def test_facets_are_disjunctive_and_filters_narrow():
+    indice = IndiceInvertido(_catalogo())
+    todos = indice.buscar("guerra", facetas=True)
+    filtrado = indice.buscar("guerra", {"editora": "Globo", "decada": 1970}, facetas=True, limite=1000)
+    assert all(
+        d.editora == "Globo" and d.data_pub.startswith("197") and d.titulo.startswith("Guerra")
+        for d in filtrado.documentos
+    )
+    assert filtrado.total == len(filtrado.documentos) > 0
+    # the editora counts ignore the editora filter, but respect the decade one
+    por_editora = dict(filtrado.facetas["editora"])
+    assert por_editora["Globo"] == filtrado.total
+    assert sum(por_editora.values()) <= todos.total
+    assert dict(filtrado.facetas["decada"])[1970] == filtrado.total
+    assert sum(dict(todos.facetas["disponivel"]).values()) == todos.total
+
+
+def test_bitmap_and_scan_paths_agree(monkeypatch):
+    indice = IndiceInvertido(_catalogo())
+    indice.adicionar(Documento(1000, "livro", "Guerra Nova", editora="Globo", bibliotecas=(2,)))
+    indice.remover(3)
+    indice.atualizar_disponibilidade(range(0, 1001, 3))
+    consultas = [("guerra", {}), ("g", {"biblioteca": 2}), ("mar", {"disponivel": True, "tipo_midia": "dvd"})]
+    monkeypatch.setattr(indice_invertido, "_VARREDURA", 0)
+    cruzado = [indice.buscar(q, f, limite=1000, facetas=True, limite_facetas=2) for q, f in consultas]
+    monkeypatch.setattr(indice_invertido, "_VARREDURA", 2)
+    varrido = [indice.buscar(q, f, limite=1000, facetas=True, limite_facetas=2) for q, f in consultas]
+    assert cruzado == varrido
+    assert all(d.disponivel == (d.id_titulo % 3 == 0) for d in indice.documentos())
+
+
+def test_writes_never_resize_a_facet_dict_a_search_is_reading():
+    indice = IndiceInvertido(_catalogo())
+    lendo = indice._facetas["editora"]
+    visitados = 0
+    for i, valor in enumerate(lendo):
+        # A write with a new publisher and a new decade lands mid-iteration
+        indice.adicionar(Documento(2000 + i, "livro", f"Guerra {i}", editora=f"Nova {i}",
+                                   data_pub=f"{1800 + 10 * i}-01-01"))
+        visitados += 1
+    assert visitados == 3
+    assert "Nova 0" in indice._facetas["editora"] and "Nova 0" not in lendo
+    assert dict(indice.buscar("guerra", {"editora": "Nova 1"}, facetas=True).facetas["editora"])["Nova 1"] == 1
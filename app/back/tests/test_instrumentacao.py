@@ -0,0 +1,75 @@
+"""
+Query instrumentation: statement shapes, per-request collection and the N+1 flag
+"""
+import json
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.instrumentacao import InstrumentacaoMiddleware
+from app.db.instrumentacao import _Instrumentado, coletor_atual, normalizar_sql
+
+
+class _CursorFalso:
+    """Stands in for the psycopg2 cursor the mixin wraps"""
+    rowcount = -1
+
+    def execute(self, query, vars=None):
+        self.rowcount = 1
+
+
+class Cursor(_Instrumentado, _CursorFalso):
+    pass
+
+
+app = FastAPI()
+app.add_middleware(InstrumentacaoMiddleware, limite_repeticoes=3)
+
+
+@app.get("/livros/{id_livro}")
+def livro(id_livro: int, autores: int = 0):
+    # Sync endpoint: runs in a worker thread, like the real services
+    cursor = Cursor()
+    cursor.execute("SELECT * FROM Livros WHERE id_livro = %s", (id_livro,))
+    for id_autor in range(autores):
+        cursor.execute("SELECT nome FROM Autores WHERE id_autor = %s", (id_autor,))
+    return {"ok": True}
+
+
+client = TestClient(app)
+
+
+def test_statement_shapes():
+    assert normalizar_sql("SELECT *\n  FROM Livros  WHERE id_livro = %s") == "SELECT * FROM Livros WHERE id_livro = ?"
+    assert normalizar_sql("SELECT 1 FROM t WHERE a = 'x''y' AND b IN (1, 2, 3) -- c") == \
+        "SELECT ? FROM t WHERE a = ? AND b IN (...)"
+    assert normalizar_sql("SELECT * FROM emprestimo_p2024_05 LIMIT %(n)s") == "SELECT * FROM emprestimo_p2024_05 LIMIT ?"
+
+
+def test_server_timing_and_log_line(caplog):
+    with caplog.at_level(logging.INFO, logger="app.core.instrumentacao"):
+        resposta = client.get("/livros/7", params={"autores": 2})
+    assert resposta.headers["server-timing"].startswith("db;dur=")
+    assert 'desc="3 consultas"' in resposta.headers["server-timing"]
+    linha = json.loads(caplog.records[-1].getMessage())
+    assert caplog.records[-1].levelno == logging.INFO
+    assert linha["rota"] == "/livros/{id_livro}" and linha["status"] == 200
+    assert linha["consultas"] == 3
+    assert linha["formatos"][0] == {"sql": "SELECT nome FROM Autores WHERE id_autor = ?", "vezes": 2,
+                                    "ms": linha["formatos"][0]["ms"], "linhas": 2}
+    assert "repetidas" not in linha
+
+
+def test_repeated_shape_is_flagged(caplog):
+    with caplog.at_level(logging.INFO, logger="app.core.instrumentacao"):
+        client.get("/livros/7", params={"autores": 5})
+    registro = caplog.records[-1]
+    assert registro.levelno == logging.WARNING
+    assert json.loads(registro.getMessage())["repetidas"] == {"SELECT nome FROM Autores WHERE id_autor = ?": 5}
+
+
+def test_nothing_is_collected_outside_a_request():
+    assert coletor_atual() is None
+    Cursor().execute("SELECT 1")
+    assert coletor_atual() is None
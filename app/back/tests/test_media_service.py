@@ -0,0 +1,106 @@
+"""
+Media writes through MediaService: one transaction per title, index refreshed after commit
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from app.services import media_service as modulo
+
+
+class _Cursor:
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.rowcount = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+    def execute(self, sql, parametros=None):
+        if self.conexao.falhar_em and self.conexao.falhar_em in sql:
+            raise RuntimeError("falha no INSERT")
+        self.conexao.comandos.append((" ".join(sql.split()), parametros))
+
+    def fetchone(self):
+        # Tuplas, como CursorInstrumentado
+        return (42,)
+
+
+class _Conexao:
+    def __init__(self, falhar_em=None):
+        self.falhar_em = falhar_em
+        self.comandos = []
+        self.eventos = []
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.eventos.append("commit")
+
+    def rollback(self):
+        self.eventos.append("rollback")
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    conexoes = []
+    reindexados = []
+
+    def nova(falhar_em=None):
+        conexao = _Conexao(falhar_em)
+
+        @contextmanager
+        def get_db_connection():
+            conexoes.append(conexao)
+            yield conexao
+
+        monkeypatch.setattr(modulo, "get_db_connection", get_db_connection)
+        monkeypatch.setattr("app.services.base_service.get_db_connection", get_db_connection)
+        return conexao
+
+    monkeypatch.setattr(modulo.indice_busca_service, "reindexar", lambda *ids: reindexados.append(ids))
+    return nova, conexoes, reindexados
+
+
+def test_title_and_media_rows_share_one_transaction(banco):
+    nova, conexoes, reindexados = banco
+    conexao = nova()
+    id_titulo = modulo.media_service.create_media_with_title("livro", {"titulo": "Dom Casmurro"})
+    assert id_titulo == 42
+    assert len(conexoes) == 1
+    assert [sql.split(" (")[0] for sql, _ in conexao.comandos] == ["INSERT INTO Titulo", "INSERT INTO Livros"]
+    assert conexao.comandos[1][1] == ["Dom Casmurro", 42]
+    assert conexao.eventos == ["commit"]
+    assert reindexados == [(42,)]
+
+
+def test_failed_media_insert_rolls_the_title_back(banco):
+    nova, _, reindexados = banco
+    conexao = nova(falhar_em="INSERT INTO Livros")
+    with pytest.raises(RuntimeError):
+        modulo.media_service.create_media_with_title("livro", {"titulo": "Dom Casmurro"})
+    assert conexao.eventos == ["rollback"]
+    assert reindexados == []
+
+
+def test_unknown_media_type_is_rejected_before_writing(banco):
+    nova, conexoes, _ = banco
+    nova()
+    with pytest.raises(ValueError):
+        modulo.media_service.create_media_with_title("cd", {"titulo": "x"})
+    assert conexoes == []
+
+
+def test_rename_updates_open_loans_in_the_same_transaction(banco):
+    nova, conexoes, reindexados = banco
+    conexao = nova()
+    assert modulo.media_service.update_media("revista", 42, {"titulo": "Piauí"})
+    assert len(conexoes) == 1
+    assert [sql.split(" SET")[0] for sql, _ in conexao.comandos] == ["UPDATE Revistas", "UPDATE EmprestimoAberto"]
+    assert conexao.comandos[1][1] == ("Piauí", 42)
+    assert conexao.eventos == ["commit"]
+    assert reindexados == [(42,)]
@@ -0,0 +1,70 @@
+"""
+Metrics: sharded counters, bucket percentiles and the exposition format
+"""
+import threading
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+
+from app.core import metricas
+from app.core.metricas import Contador, Histograma, MetricasMiddleware
+from app.db.instrumentacao import Execucao
+
+
+def test_counter_shards_sum_across_threads():
+    contador = Contador("teste_total", "teste")
+
+    def trabalhar():
+        for _ in range(1000):
+            contador.somar(1, (("rota", "/x"),))
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert contador.valores() == {(("rota", "/x"),): 8000}
+    assert len(contador._fragmentos) == 8
+
+
+def test_histogram_buckets_and_percentiles():
+    histograma = Histograma("teste_segundos", "teste", (0.1, 0.2, 0.4))
+    for valor in [0.05] * 50 + [0.15] * 45 + [0.3] * 4 + [1.0]:
+        histograma.observar(valor)
+    contagens = histograma.valores()[()]
+    assert contagens[:4] == [50, 45, 4, 1] and contagens[-1] == 100
+    p50, p95, p99 = histograma.quantis(contagens, (0.5, 0.95, 0.99))
+    assert p50 == 0.1 and p95 == 0.2 and 0.2 < p99 <= 0.4
+    linhas = list(histograma.exposicao())
+    assert 'teste_segundos_bucket{le="0.2"} 95' in linhas
+    assert 'teste_segundos_bucket{le="+Inf"} 100' in linhas
+    assert "teste_segundos_count 100" in linhas
+
+
+def test_http_middleware_and_exposition():
+    app = FastAPI()
+    app.add_middleware(MetricasMiddleware)
+
+    @app.get("/livros/{id_livro}")
+    def livro(id_livro: int):
+        return {"id_livro": id_livro}
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(metricas.exposicao(), media_type=metricas.TIPO_CONTEUDO)
+
+    client = TestClient(app)
+    client.get("/livros/1")
+    client.get("/livros/2")
+    client.get("/nao-existe/3")
+    sql = 'SELECT * FROM "Livros" WHERE id = ?'
+    metricas.observar_consulta(Execucao(sql, sql, (1,), 0.002, 1))
+    metricas.registrar_cache("teste", lambda: (3, 1))
+
+    texto = client.get("/metrics").text
+    assert 'onix_http_request_duration_seconds_count{method="GET",route="/livros/{id_livro}",status="200"} 2' in texto
+    assert 'route="desconhecida",status="404"' in texto
+    assert "onix_http_requests_in_flight 1" in texto  # the scrape itself
+    assert 'statement="SELECT * FROM \\"Livros\\" WHERE id = ?",quantile="0.99"' in texto
+    assert 'onix_cache_hit_ratio{cache="teste"} 0.75' in texto
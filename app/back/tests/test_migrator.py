@@ -0,0 +1,221 @@
+"""
+Migration runner bookkeeping and planner-checked indexes, against a recording connection
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.db import migrator
+from app.db.migrator import Migration, MigrationRunner, PlannedIndex
+
+
+def _plano(custo, buffers=100):
+    return [{"Plan": {"Node Type": "Seq Scan", "Total Cost": custo, "Shared Hit Blocks": buffers},
+             "Execution Time": 1.0}]
+
+
+class Cursor:
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self._linhas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.conexao.comandos.append((sql, params, self.conexao.autocommit))
+        if sql.startswith("SELECT version, name, applied_at"):
+            self._linhas = [(versao, "aplicada", "2024-01-01") for versao in self.conexao.aplicadas]
+        elif sql.startswith("EXPLAIN"):
+            self._linhas = [(self.conexao.planos.pop(0),)]
+        elif "FROM pg_index" in sql:
+            self._linhas = [("emprestimo",)]
+        if self.conexao.falhar_em and self.conexao.falhar_em in sql:
+            raise RuntimeError("falha simulada")
+
+    def fetchone(self):
+        return self._linhas[0]
+
+    def fetchall(self):
+        return self._linhas
+
+
+class Conexao:
+    def __init__(self, aplicadas=(), planos=(), falhar_em=None):
+        self.aplicadas = list(aplicadas)
+        self.planos = list(planos)
+        self.falhar_em = falhar_em
+        self.comandos = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.autocommit = False
+        self.fechada = False
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.fechada = True
+
+    def executados(self, trecho):
+        return [comando for comando in self.comandos if trecho in comando[0]]
+
+    def versoes_gravadas(self):
+        return [params[0] for _, params, _ in self.executados("INSERT INTO schema_migrations")]
+
+
+def _migracao(versao, **atributos):
+    return Migration(versao, f"m{versao}", SimpleNamespace(**atributos))
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    def instalar(conexao, migracoes, **opcoes):
+        monkeypatch.setattr(migrator, "discover_migrations", lambda: migracoes)
+        runner = MigrationRunner(dsn="postgresql://teste", **opcoes)
+        monkeypatch.setattr(runner, "connect", lambda: conexao)
+        return runner
+    return instalar
+
+
+def test_discovers_every_module_in_version_order():
+    versoes = [migracao.version for migracao in migrator.discover_migrations()]
+    assert versoes == sorted(versoes)
+    assert versoes[0] == 1 and len(versoes) == len(set(versoes))
+
+
+def test_run_skips_applied_versions_and_records_new_ones(executor):
+    conexao = Conexao(aplicadas=[1])
+    runner = executor(conexao, [_migracao(1, STATEMENTS=["CREATE TABLE a ()"]),
+                                _migracao(2, STATEMENTS=["CREATE TABLE b ()"])])
+
+    relatorios = runner.run()
+
+    assert [r["version"] for r in relatorios] == [2]
+    assert not conexao.executados("CREATE TABLE a")
+    assert conexao.versoes_gravadas() == [2]
+    assert conexao.fechada
+
+
+def test_run_stops_at_target(executor):
+    conexao = Conexao()
+    runner = executor(conexao, [_migracao(1), _migracao(2), _migracao(3)])
+
+    runner.run(target=2)
+
+    assert conexao.versoes_gravadas() == [1, 2]
+
+
+def test_failed_migration_rolls_back_and_is_not_recorded(executor):
+    conexao = Conexao(falhar_em="CREATE TABLE quebrada")
+    runner = executor(conexao, [_migracao(1, STATEMENTS=["CREATE TABLE quebrada ()"]), _migracao(2)])
+
+    with pytest.raises(RuntimeError):
+        runner.run()
+
+    assert conexao.rollbacks == 1
+    assert conexao.versoes_gravadas() == []
+    assert conexao.fechada
+
+
+def test_dry_run_rolls_back_without_recording(executor):
+    conexao = Conexao()
+    runner = executor(conexao, [_migracao(1, STATEMENTS=["CREATE TABLE a ()"])], dry_run=True)
+
+    relatorios = runner.run()
+
+    assert relatorios[0]["dry_run"]
+    assert conexao.rollbacks == 1
+    assert conexao.versoes_gravadas() == []
+
+
+def test_non_transactional_migration_runs_in_autocommit_then_records(executor):
+    chamadas = []
+
+    def upgrade(conn):
+        chamadas.append(conn.autocommit)
+
+    conexao = Conexao()
+    runner = executor(conexao, [_migracao(4, TRANSACTIONAL=False, STATEMENTS=["CREATE INDEX CONCURRENTLY i ON t (c)"],
+                                          upgrade=upgrade)])
+
+    runner.run()
+
+    assert conexao.executados("CONCURRENTLY")[0][2] is True
+    assert chamadas == [True]
+    # O registro da versão volta ao modo transacional e é confirmado
+    (_, params, autocommit), = conexao.executados("INSERT INTO schema_migrations")
+    assert params[0] == 4 and autocommit is False
+    assert not conexao.autocommit
+
+
+def test_non_transactional_migration_is_skipped_on_dry_run(executor):
+    conexao = Conexao()
+    runner = executor(conexao, [_migracao(4, TRANSACTIONAL=False, STATEMENTS=["CREATE INDEX CONCURRENTLY i ON t (c)"])],
+                      dry_run=True)
+
+    relatorio, = runner.run()
+
+    assert "skipped" in relatorio
+    assert not conexao.executados("CONCURRENTLY")
+
+
+INDICE = PlannedIndex("idx_teste", "CREATE INDEX idx_teste ON emprestimo (id_usuario)",
+                      [("SELECT * FROM emprestimo WHERE id_usuario = %s", (1,))])
+
+
+def test_planned_index_kept_when_the_plan_improves():
+    conexao = Conexao(planos=[_plano(1000), _plano(10)])
+
+    resultado = MigrationRunner(dsn="x", min_gain=0.05)._apply_index(conexao, INDICE, transactional=True)
+
+    assert resultado["decision"] == "applied"
+    assert resultado["queries"][0]["improved"]
+    assert conexao.executados("RELEASE SAVEPOINT planned_index")
+    assert conexao.executados("ANALYZE emprestimo")
+
+
+def test_planned_index_rolled_back_when_no_query_improves():
+    conexao = Conexao(planos=[_plano(1000), _plano(990)])
+
+    resultado = MigrationRunner(dsn="x", min_gain=0.05)._apply_index(conexao, INDICE, transactional=True)
+
+    assert resultado["decision"].startswith("rejected")
+    assert conexao.executados("ROLLBACK TO SAVEPOINT planned_index")
+
+
+def test_planned_index_without_plan_check_is_created_directly():
+    conexao = Conexao()
+
+    resultado = MigrationRunner(dsn="x", check_plans=False)._apply_index(conexao, INDICE, transactional=True)
+
+    assert resultado["decision"] == "applied (plan check disabled)"
+    assert not conexao.executados("EXPLAIN")
+
+
+def test_planned_index_needs_a_transaction_for_the_savepoint():
+    with pytest.raises(RuntimeError):
+        MigrationRunner(dsn="x")._apply_index(Conexao(), INDICE, transactional=False)
+
+
+def test_planner_check_rejects_writes():
+    indice = PlannedIndex("idx_teste", "CREATE INDEX idx_teste ON t (c)", [("DELETE FROM t", ())])
+    with pytest.raises(ValueError):
+        MigrationRunner(dsn="x")._apply_index(Conexao(), indice, transactional=True)
+
+
+def test_fewer_buffers_alone_counts_as_improvement():
+    antes = migrator.PlanMetrics(_plano(100, buffers=1000)[0])
+    depois = migrator.PlanMetrics(_plano(100, buffers=10)[0])
+    assert migrator.improved(antes, depois, 0.05)
+    assert not migrator.improved(antes, antes, 0.05)
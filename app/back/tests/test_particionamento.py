@@ -0,0 +1,34 @@
+"""
+Tests for the partition naming and bounds helpers
+"""
+from datetime import date
+
+from app.db.particionamento import EMPRESTIMO, PENALIZACAO, meses_adiante
+
+
+def test_monthly_bounds_cross_year():
+    assert EMPRESTIMO.limites(date(2024, 12, 17)) == (date(2024, 12, 1), date(2025, 1, 1))
+    assert [inicio for inicio, _ in EMPRESTIMO.intervalos(date(2024, 11, 30), date(2025, 2, 1))] == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)
+    ]
+
+
+def test_yearly_bounds():
+    assert PENALIZACAO.limites(date(2024, 6, 3)) == (date(2024, 1, 1), date(2025, 1, 1))
+    assert [inicio for inicio, _ in PENALIZACAO.intervalos(date(2023, 5, 1), date(2024, 1, 1))] == [
+        date(2023, 1, 1), date(2024, 1, 1)
+    ]
+
+
+def test_partition_names_round_trip():
+    assert EMPRESTIMO.nome(date(2024, 3, 1)) == "emprestimo_p2024_03"
+    assert EMPRESTIMO.inicio_do_nome("emprestimo_p2024_03") == date(2024, 3, 1)
+    assert PENALIZACAO.nome(date(2024, 1, 1)) == "penalizacao_p2024"
+    assert PENALIZACAO.inicio_do_nome("penalizacao_p2024") == date(2024, 1, 1)
+    assert EMPRESTIMO.inicio_do_nome("emprestimo_padrao") is None
+    assert EMPRESTIMO.inicio_do_nome("emprestimo_legado") is None
+
+
+def test_meses_adiante():
+    assert meses_adiante(date(2024, 11, 15), 3) == date(2025, 2, 1)
+    assert meses_adiante(date(2024, 1, 31), 0) == date(2024, 1, 1)
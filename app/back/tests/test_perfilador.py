@@ -0,0 +1,61 @@
+"""
+Sampling profiler: collapsed stacks of busy threads and of suspended asyncio tasks
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.perfilador import Perfilador, perfilar
+
+
+def _ocupado(ate: float):
+    while time.monotonic() < ate:
+        sum(range(1000))
+
+
+def test_thread_mode_collapses_busy_stacks():
+    thread = threading.Thread(target=_ocupado, args=(time.monotonic() + 0.5,))
+    thread.start()
+    texto, amostras = perfilar(0.2, intervalo=0.01)
+    thread.join()
+    assert amostras >= 10
+    linha = next(linha for linha in texto.splitlines() if "_ocupado" in linha)
+    pilha, contagem = linha.rsplit(" ", 1)
+    assert pilha.split(";")[-1].startswith("_ocupado (") and int(contagem) > 0
+    # idle threads (e.g. waiting on join) are left out
+    assert "_wait_for_tstate_lock" not in texto
+
+
+def test_task_mode_follows_await_chain():
+    loop = asyncio.new_event_loop()
+    iniciado = threading.Event()
+
+    async def consultar():
+        await asyncio.sleep(1)
+
+    async def endpoint():
+        iniciado.set()
+        await consultar()
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(endpoint(),))
+    thread.start()
+    iniciado.wait()
+    perfilador = Perfilador("tarefas", intervalo=0.01, loop=loop, thread_loop=thread.ident).executar(0.1)
+    thread.join()
+    loop.close()
+    pilha = max(perfilador.pilhas, key=perfilador.pilhas.get).split(";")
+    assert pilha[0].startswith("tarefa:")
+    assert [rotulo.split(" ")[0].rsplit(".", 1)[-1] for rotulo in pilha[1:3]] == ["endpoint", "consultar"]
+
+
+def test_one_profile_at_a_time():
+    resultado = {}
+    thread = threading.Thread(target=lambda: resultado.update(primeiro=perfilar(0.3)))
+    thread.start()
+    time.sleep(0.05)
+    with pytest.raises(RuntimeError):
+        perfilar(0.1)
+    thread.join()
+    assert resultado["primeiro"][1] > 0
@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+from app.jobs import relatorios
+
+
+def test_default_start_reprocesses_trailing_window(banco):
+    cursor = banco(relatorios, respostas={"SELECT processado_ate": [{"processado_ate": date(2024, 3, 10)}]})
+
+    resultado = relatorios.atualizar_relatorios(ate=date(2024, 3, 12))
+
+    inicio = date(2024, 3, 11) - timedelta(days=relatorios.JANELA_REPROCESSAMENTO)
+    assert resultado["desde"] == inicio.isoformat()
+    assert resultado["dias_processados"] == (date(2024, 3, 12) - inicio).days + 1
+    assert [p for _, p in cursor.executados("DELETE FROM RelatorioEmprestimoDia")][0] == (inicio,)
+
+
+def test_explicit_start_skips_cutoff_lookup(banco):
+    cursor = banco(relatorios)
+
+    resultado = relatorios.atualizar_relatorios(desde=date(2024, 1, 1), ate=date(2024, 1, 2))
+
+    assert resultado["dias_processados"] == 2
+    assert not cursor.executados("SELECT processado_ate")
+
+
+def test_each_day_is_deleted_before_insert(banco):
+    cursor = banco(relatorios)
+
+    relatorios.atualizar_relatorios(desde=date(2024, 1, 1), ate=date(2024, 1, 1))
+
+    for tabela in ("RelatorioEmprestimoDia", "RelatorioAutorDia", "RelatorioDuracaoDia"):
+        apagar = cursor.comandos.index(cursor.executados(f"DELETE FROM {tabela}")[0])
+        inserir = cursor.comandos.index(cursor.executados(f"INSERT INTO {tabela}")[0])
+        assert apagar < inserir
+
+
+def test_penalties_are_recounted_from_the_whole_table(banco):
+    cursor = banco(relatorios)
+
+    relatorios.atualizar_relatorios(desde=date(2024, 1, 1), ate=date(2023, 12, 31))
+
+    (upsert, parametros), = cursor.executados("INSERT INTO RelatorioPenalizacaoUsuario")
+    assert parametros is None
+    assert "id_penalizacao >" not in upsert
+    assert "penalizacoes = EXCLUDED.penalizacoes" in upsert
+    # Usuários sem nenhuma penalização restante saem do relatório
+    assert cursor.executados("DELETE FROM RelatorioPenalizacaoUsuario r WHERE NOT EXISTS")
+
+
+def test_penalty_count_reports_changed_users(banco):
+    cursor = banco(relatorios)
+    contagens = iter([2, 1])
+    execute = cursor.execute
+
+    def execute_com_contagem(sql, parametros=None):
+        execute(sql, parametros)
+        if "RelatorioPenalizacaoUsuario" in sql:
+            cursor.rowcount = next(contagens)
+    cursor.execute = execute_com_contagem
+
+    resultado = relatorios.atualizar_relatorios(desde=date(2024, 1, 1), ate=date(2023, 12, 31))
+
+    assert resultado["usuarios_penalizados_atualizados"] == 3
+
+
+def test_rebuild_truncates_and_resets_cutoff(banco):
+    cursor = banco(relatorios, respostas={"SELECT processado_ate": [{"processado_ate": None}],
+                                          "MIN(data_emprestimo)": [{"primeiro": date(2024, 1, 1)}]})
+
+    resultado = relatorios.atualizar_relatorios(ate=date(2024, 1, 1), reconstruir=True)
+
+    assert cursor.executados("TRUNCATE RelatorioEmprestimoDia")
+    assert cursor.executados("SET processado_ate = NULL")
+    assert resultado["desde"] == "2024-01-01"
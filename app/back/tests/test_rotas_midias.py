@@ -0,0 +1,35 @@
+"""
+/midias/buscar goes through the search cache and is served off the event loop
+"""
+import inspect
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.cache_busca import cache_busca
+from app.db.linhas import Colunas, Linhas
+from app.routers import media
+
+
+def test_search_endpoint_is_sync():
+    # FastAPI runs plain def endpoints in its threadpool
+    assert not inspect.iscoroutinefunction(media.search_media)
+
+
+def test_search_is_cached_per_normalized_term(monkeypatch):
+    chamadas = []
+
+    def search_media(termo, media_type, page, size, filters, facets):
+        chamadas.append(termo)
+        return Linhas(Colunas(("id_titulo", "titulo")), [(1, "Coração")]), 1, None
+
+    monkeypatch.setattr(media.media_service, "search_media", search_media)
+    cache_busca.invalidar()
+    app = FastAPI()
+    app.include_router(media.router, prefix="/api/v1")
+    client = TestClient(app)
+    for termo in ("Coração", " coracao "):
+        resposta = client.get("/api/v1/midias/buscar", params={"termo": termo})
+        assert resposta.status_code == 200
+        assert resposta.json()["data"] == [{"id_titulo": 1, "titulo": "Coração"}]
+    assert chamadas == ["Coração"]
@@ -0,0 +1,187 @@
+"""
+The fast serialization path must produce exactly the bytes of the validated path
+"""
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+
+import json
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.core import serializacao
+from app.core.serializacao import FormatoResposta, formato_resposta, resposta_rapida, resposta_validada
+from app.db.linhas import Colunas, Linhas
+from app.schemas.biblioteca import BibliotecaListResponse
+from app.schemas.schemas import Emprestimo, EmprestimoCompleto, Estoque, Livro
+
+# Rows as RealDictCursor returns them: column order of the table, not of the model
+ESTOQUES = [
+    {"id_estoque": 1, "condicao": "Bom", "id_titulo": 10, "id_biblioteca": 2},
+    {"id_estoque": 2, "condicao": None, "id_titulo": 11, "id_biblioteca": 2},
+]
+LIVROS = [
+    {"id_livro": 7, "titulo": "Memórias Póstumas de Brás Cubas", "isbn": "978-85-359-0277-8",
+     "numero_paginas": 208, "editora": "Penguin \"Clássicos\"", "data_publicacao": date(1881, 1, 1)},
+    {"id_livro": 8, "titulo": "Tab\there, barra \\ e controle \x01 — 日本語 😀", "isbn": None,
+     "numero_paginas": None, "editora": None, "data_publicacao": None},
+]
+EMPRESTIMOS = [
+    {"id_emprestimo": 3, "data_emprestimo": date(2024, 5, 1), "data_devolucao_prevista": date(2024, 5, 16),
+     "data_devolucao": None, "id_estoque": 1, "id_usuario": 4},
+]
+EMPRESTIMOS_COMPLETOS = [
+    {"id_emprestimo": 3, "data_emprestimo": date(2024, 5, 1), "data_devolucao_prevista": None,
+     "data_devolucao": None,
+     "usuario": {"id_usuario": 4, "nome": "Ana Conceição", "email": "ana@example.com",
+                 "endereco": None, "telefone": "+55 11 9999-0000"},
+     "item_titulo": "Dom Casmurro", "tipo_midia": "livro", "biblioteca": "Central"},
+]
+
+CASOS = {
+    "estoques": (List[Estoque], ESTOQUES),
+    "livros": (List[Livro], LIVROS),
+    "livro": (Livro, LIVROS[0]),
+    "emprestimos": (List[Emprestimo], EMPRESTIMOS),
+    "completos": (List[EmprestimoCompleto], EMPRESTIMOS_COMPLETOS),
+}
+
+app = FastAPI()
+
+
+def _rotas(nome, tipo, dados):
+    # Validated path: the service builds models and FastAPI applies response_model
+    @app.get(f"/validado/{nome}", response_model=tipo)
+    def validado():
+        if isinstance(dados, list):
+            return [tipo.__args__[0](**row) for row in dados]
+        return tipo(**dados)
+
+    @app.get(f"/rapido/{nome}", response_model=tipo)
+    def rapido():
+        return resposta_rapida(tipo, dados)
+
+
+for _nome, (_tipo, _dados) in CASOS.items():
+    _rotas(_nome, _tipo, _dados)
+
+client = TestClient(app)
+
+
+def test_fast_path_matches_validated_path_byte_for_byte():
+    for nome in CASOS:
+        validado = client.get(f"/validado/{nome}")
+        rapido = client.get(f"/rapido/{nome}")
+        assert validado.status_code == rapido.status_code == 200
+        assert rapido.content == validado.content, nome
+        assert rapido.headers["content-type"] == validado.headers["content-type"]
+
+
+def test_stdlib_encoder_matches_too(monkeypatch):
+    monkeypatch.setattr(serializacao, "orjson", None)
+    for nome, (tipo, dados) in CASOS.items():
+        assert resposta_rapida(tipo, dados).body == client.get(f"/validado/{nome}").content, nome
+
+
+class Multa(BaseModel):
+    id_penalizacao: int
+    valor: Decimal
+    desconto: Optional[Decimal] = None
+
+
+def test_decimal_is_encoded_as_pydantic_does(monkeypatch):
+    linhas = [{"id_penalizacao": 1, "valor": Decimal("12.50"), "desconto": Decimal("0.1000000000000000055")},
+              {"id_penalizacao": 2, "valor": Decimal("1E+3"), "desconto": None}]
+    validado = resposta_validada(List[Multa], linhas).body
+    assert resposta_rapida(List[Multa], linhas).body == validado
+    assert b'"12.50"' in validado
+    monkeypatch.setattr(serializacao, "orjson", None)
+    assert resposta_rapida(List[Multa], linhas).body == validado
+
+
+def test_switch_off_uses_validated_path(monkeypatch):
+    monkeypatch.setattr(serializacao.settings, "FAST_SERIALIZATION", False)
+    resposta = resposta_rapida(List[Estoque], ESTOQUES)
+    assert resposta.body == resposta_validada(List[Estoque], ESTOQUES).body
+
+
+def _linhas(rows):
+    colunas = Colunas(rows[0].keys())
+    return Linhas(colunas, [tuple(row.values()) for row in rows])
+
+
+def test_tuple_rows_match_validated_path():
+    for nome, tipo, dados in (("estoques", List[Estoque], ESTOQUES), ("livros", List[Livro], LIVROS),
+                              ("emprestimos", List[Emprestimo], EMPRESTIMOS)):
+        esperado = client.get(f"/validado/{nome}").content
+        assert resposta_rapida(tipo, _linhas(dados)).body == esperado, nome
+    # Missing optional columns fall back to the field defaults, as on the mapping path
+    parcial = [{k: v for k, v in row.items() if k != "condicao"} for row in ESTOQUES]
+    assert resposta_rapida(List[Estoque], _linhas(parcial)).body == resposta_rapida(List[Estoque], parcial).body
+
+
+def test_tuple_rows_behave_as_read_only_mappings():
+    linhas = _linhas(ESTOQUES)
+    assert len(linhas) == 2
+    assert linhas[1]["condicao"] is None and linhas[1].get("inexistente", 0) == 0
+    assert Estoque(**linhas[0]) == Estoque(**ESTOQUES[0])
+    assert linhas.dicts() == ESTOQUES
+    assert linhas.namedtuples()[0].id_titulo == 10
+    assert linhas.colunas.tupla_nomeada is linhas.colunas.tupla_nomeada
+
+
+COLUNAR = FormatoResposta(colunar=True)
+
+
+@app.get("/formato/estoques", response_model=List[Estoque])
+def estoques_negociados(formato: FormatoResposta = Depends(formato_resposta)):
+    return resposta_rapida(List[Estoque], _linhas(ESTOQUES), formato=formato)
+
+
+def _transpor(objetos):
+    colunas = list(objetos[0])
+    return {"columns": colunas, "values": [[o[c] for o in objetos] for c in colunas]}
+
+
+def test_columnar_is_the_transposed_validated_page():
+    for nome in ("estoques", "livros", "emprestimos", "completos"):
+        tipo, dados = CASOS[nome]
+        esperado = _transpor(client.get(f"/validado/{nome}").json())
+        assert json.loads(resposta_rapida(tipo, dados, formato=COLUNAR).body) == esperado, nome
+        if nome != "completos":
+            assert resposta_rapida(tipo, _linhas(dados), formato=COLUNAR).body == \
+                resposta_rapida(tipo, dados, formato=COLUNAR).body, nome
+
+
+def test_columnar_list_response_envelope():
+    bibliotecas = [{"id_biblioteca": 1, "nome": "Central", "endereco": None},
+                   {"id_biblioteca": 2, "nome": "Norte", "endereco": "Rua A"}]
+    corpo = json.loads(resposta_rapida(
+        BibliotecaListResponse, {"data": _linhas(bibliotecas), "total": 2}, formato=COLUNAR
+    ).body)
+    assert corpo == {
+        "success": True, "message": "Operation completed successfully",
+        "data": {"columns": ["nome", "endereco", "id_biblioteca"],
+                 "values": [["Central", "Norte"], [None, "Rua A"], [1, 2]]},
+        "total": 2,
+    }
+    vazio = json.loads(resposta_rapida(BibliotecaListResponse, {"data": [], "total": 0}, formato=COLUNAR).body)
+    assert vazio["data"] == {"columns": ["nome", "endereco", "id_biblioteca"], "values": [[], [], []]}
+
+
+def test_format_query_parameter_and_accept_negotiation():
+    objetos = client.get("/formato/estoques")
+    assert objetos.content == client.get("/validado/estoques").content
+    assert objetos.headers["vary"] == "Accept"
+    colunar = client.get("/formato/estoques", params={"format": "columnar"})
+    assert colunar.json() == _transpor(objetos.json())
+    assert client.get("/formato/estoques", params={"format": "xml"}).status_code == 422
+
+    msgpack = pytest.importorskip("msgpack")
+    empacotado = client.get("/formato/estoques", params={"format": "columnar"},
+                            headers={"Accept": "application/msgpack"})
+    assert empacotado.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(empacotado.content) == colunar.json()